@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Blossomvest.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, since it loads models
+from messaging.websocket import websocket_router  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """HTTP goes to Django; WebSocket connections (realtime messaging) to websocket_router"""
+    if scope['type'] == 'websocket':
+        await websocket_router(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,33 @@
+"""
+Helpers for the benchmark management commands, which call the API in-process
+outside the test runner. The runner adds 'testserver' (the test client's
+default host) to ALLOWED_HOSTS; a management command doesn't, so requests
+are made as a host the settings allow.
+"""
+from django.conf import settings
+from rest_framework.test import APIClient, APIRequestFactory
+
+
+def benchmark_host():
+    """The first concrete host in ALLOWED_HOSTS, or 'localhost' (allowed while DEBUG is on)"""
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')
+        if host and '*' not in host:
+            return host
+    return 'localhost'
+
+
+def api_client():
+    return APIClient(SERVER_NAME=benchmark_host())
+
+
+def request_factory():
+    return APIRequestFactory(SERVER_NAME=benchmark_host())
+
+
+def response_error(response):
+    """What went wrong with a response, for a CommandError: its parsed data if any, else its body"""
+    data = getattr(response, 'data', None)
+    if data is not None:
+        return data
+    return response.content.decode(errors='replace')[:500]
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from datetime import timedelta
 from pathlib import Path
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -32,6 +33,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than the shared in-memory database, whose table locks
+        # fail concurrent writers at once instead of letting them wait their turn
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        # Seconds a writer waits for the write lock before "database is locked";
+        # investments in a popular business queue for it one at a time
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -54,6 +61,10 @@ INSTALLED_APPS = [
     'logs',
     'investments_tracking',
     'notifications',
+    'jobs',
+    'response_cache',
+    'images',
+    'uploads',
 ]
 
 MIDDLEWARE = [
@@ -71,6 +82,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173", # Your Vite frontend URL
     "http://127.0.0.1:5173",
 ]
+# Chunked uploads say where each chunk goes with Content-Range (see uploads/views.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'content-range')
 
 ROOT_URLCONF = 'Blossomvest.urls'
 
@@ -186,3 +199,61 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media files configuration for file uploads
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Background jobs (see jobs/queue.py). Profit distribution and notification
+# fan-out are queued and run by `python manage.py run_jobs`. Set to True to run
+# them in-process right after the request's transaction commits instead.
+JOBS_RUN_EAGERLY = False
+
+# Seconds between fund ledger snapshots (users/jobs.py). The first one is queued
+# by `python manage.py reconcile_funds --snapshot`; each run queues the next.
+FUND_SNAPSHOT_INTERVAL = 3600
+# Snapshots leave out ledger entries younger than this, so one written by a
+# transaction that hasn't committed yet can't fall behind the watermark
+FUND_SNAPSHOT_SETTLE_SECONDS = 300
+
+# Cached dashboard responses (see response_cache/cache.py). Entries are keyed
+# per user and dropped when the investments, logs or distributions they were
+# built from change. The job worker invalidates from its own process, so the
+# cache must be shared between processes: the file cache works on one machine,
+# use Redis or Memcached when running several hosts. LocMemCache is enough for
+# a single process with JOBS_RUN_EAGERLY = True.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'responses',
+    },
+}
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 300  # seconds; also bounds staleness from edits with no invalidation hook
+RESPONSE_CACHE_ENABLED = True
+
+# Local model server answering the AI chat (see investments/chat.py), with the
+# Ollama API. Answers are streamed to the browser through the backend, which
+# caches the business context and the answers in the response cache and shares
+# one generation between identical questions asked at the same time.
+AI_MODEL_SERVER_URL = 'http://localhost:11434'
+AI_CHAT_MODEL = 'llama3.2:1b'
+AI_CHAT_TIMEOUT = 120  # seconds to wait for the next token
+AI_CHAT_CONTEXT_TIMEOUT = 3600  # seconds; the context is also dropped when the business changes
+AI_CHAT_ANSWER_TIMEOUT = 3600  # seconds an answer is reused for the same question and context
+
+# Chunked, resumable uploads of pitch media (see uploads/sessions.py). Chunks are
+# streamed into part files under MEDIA_ROOT/uploads/partial and a finished file
+# is moved, not copied, next to the other media. `python manage.py clean_uploads`
+# deletes uploads left alone for longer than CHUNKED_UPLOAD_EXPIRY.
+CHUNKED_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # bytes per chunk suggested to clients
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 2 * 1024 ** 3
+CHUNKED_UPLOAD_EXPIRY = 86400  # seconds
+
+# Realtime messaging over WebSockets (see messaging/realtime.py), served by the
+# ASGI entry point: run an ASGI server such as `uvicorn Blossomvest.asgi:application`.
+# The in-process broker only reaches sockets held by the same process; with
+# several workers use 'messaging.realtime.RedisBroker' (needs the redis package).
+REALTIME_BROKER = 'messaging.realtime.InProcessBroker'
+REALTIME_REDIS_URL = 'redis://localhost:6379/0'
+REALTIME_QUEUE_SIZE = 100  # events buffered per socket before dropping
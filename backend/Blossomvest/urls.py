@@ -32,6 +32,8 @@ urlpatterns = [
     path('api/logs/', include('logs.urls')),
     path('api/investments-tracking/', include('investments_tracking.urls')),
     path('api/notifications/', include('notifications.urls')),
+    path('api/jobs/', include('jobs.urls')),
+    path('api/uploads/', include('uploads.urls')),
     path('api/users/', include('users.urls')),
 ]
 
@@ -0,0 +1,195 @@
+import io
+import os
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from jobs.models import Job
+from jobs.queue import enqueue, job_reference
+
+DERIVATIVES_JOB = 'images.build_derivatives'
+
+# Encoder settings per derivative format, and the file extension of each
+FORMATS = {
+    'webp': {'extension': 'webp', 'options': {'quality': 80, 'method': 4}},
+    'jpeg': {'extension': 'jpg', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+}
+
+
+class DerivativeSpec:
+    """
+    The derivatives kept for one image field: `widths` in pixels (squares of
+    that size when `square`), recorded in the JSONField `derivatives_field`
+    of the same model as {'source': original name, 'images': [{'width',
+    'height', 'webp', 'jpeg'}, ...]}.
+    """
+
+    def __init__(self, model, field, derivatives_field, widths, square=False):
+        self.model = model
+        self.field = field
+        self.derivatives_field = derivatives_field
+        self.widths = tuple(sorted(widths))
+        self.square = square
+
+    def get_model(self):
+        return apps.get_model(self.model)
+
+
+SPECS = {
+    # Catalogue cards are a quarter to the whole of the screen wide
+    ('investments.businessimage', 'image'): DerivativeSpec(
+        'investments.businessimage', 'image', 'derivatives', widths=(320, 640, 1024),
+    ),
+    # Avatars, shown at 32 to 128 CSS pixels
+    ('users.customuser', 'prof_pic'): DerivativeSpec(
+        'users.customuser', 'prof_pic', 'prof_pic_derivatives', widths=(64, 128, 256), square=True,
+    ),
+}
+
+
+def get_spec(instance, field):
+    return SPECS[(instance._meta.label_lower, field)]
+
+
+def derivative_name(source, width, extension):
+    """Where the derivative of the stored file `source` is kept: a derivatives/ folder beside it"""
+    folder, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(folder, 'derivatives', f'{stem}_{width}.{extension}')
+
+
+def needs_derivatives(instance, field):
+    """Whether the current file of `field` has no derivatives yet"""
+    field_file = getattr(instance, field)
+    derivatives = getattr(instance, get_spec(instance, field).derivatives_field) or {}
+    return bool(field_file) and derivatives.get('source') != field_file.name
+
+
+def queue_derivatives(instance, field, owner=None):
+    """
+    Queue building the derivatives of `instance`'s `field` unless they exist
+    for its current file or a job for it is already waiting. Returns the job.
+    """
+    if not needs_derivatives(instance, field):
+        return None
+    reference = job_reference(instance)
+    busy = Job.objects.filter(
+        name=DERIVATIVES_JOB, reference=reference, payload__field=field,
+        status__in=[Job.STATUS_QUEUED, Job.STATUS_RUNNING],
+    )
+    if busy.exists():
+        return None
+    return enqueue(
+        DERIVATIVES_JOB,
+        {'model': instance._meta.label_lower, 'pk': instance.pk, 'field': field},
+        owner=owner,
+        reference=reference,
+    )
+
+
+def _render(image, width, square):
+    if square:
+        return ImageOps.fit(image, (width, width), Image.LANCZOS)
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def _encode(image, fmt):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        # JPEG has no alpha: flatten transparent images onto white
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    output = io.BytesIO()
+    image.save(output, format=fmt.upper(), **FORMATS[fmt]['options'])
+    return output.getvalue()
+
+
+def build_derivatives(instance, field):
+    """
+    Render and store the derivatives of `instance`'s `field`, replacing those
+    of a previous file, and record them on the instance. Returns the recorded
+    derivatives, or None if the file was replaced while they were built.
+    Raises OSError (including UnidentifiedImageError) for unreadable files.
+    """
+    spec = get_spec(instance, field)
+    field_file = getattr(instance, field)
+    source, storage = field_file.name, field_file.storage
+
+    with field_file.open('rb') as file:
+        image = Image.open(file)
+        # JPEGs can be decoded straight at a fraction of their size
+        largest = spec.widths[-1]
+        image.draft('RGB', (largest, largest) if spec.square else (largest, image.height * largest // image.width))
+        image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    # Never upscale: smaller sizes, plus the original size if it falls short of the largest
+    size = min(image.size) if spec.square else image.width
+    widths = [width for width in spec.widths if width < size]
+    if len(widths) < len(spec.widths):
+        widths.append(size)
+
+    images = []
+    for width in widths:
+        rendered = _render(image, width, spec.square)
+        entry = {'width': rendered.width, 'height': rendered.height}
+        for fmt, settings in FORMATS.items():
+            name = derivative_name(source, width, settings['extension'])
+            storage.delete(name)
+            entry[fmt] = storage.save(name, ContentFile(_encode(rendered, fmt)))
+        images.append(entry)
+    derivatives = {'source': source, 'images': images}
+
+    model = type(instance)
+    previous = getattr(instance, spec.derivatives_field) or {}
+    updated = model._default_manager.filter(pk=instance.pk, **{field: source}).update(
+        **{spec.derivatives_field: derivatives}
+    )
+    if not updated:
+        # The file was replaced meanwhile; its own job builds the new ones
+        delete_derivatives(derivatives, storage)
+        return None
+    if previous.get('source') != source:
+        delete_derivatives(previous, storage)
+    setattr(instance, spec.derivatives_field, derivatives)
+    return derivatives
+
+
+def delete_derivatives(derivatives, storage):
+    for entry in (derivatives or {}).get('images', []):
+        for fmt in FORMATS:
+            if entry.get(fmt):
+                storage.delete(entry[fmt])
+
+
+def derivative_urls(derivatives, source, storage, build_url, width, fmt='webp'):
+    """
+    URLs of the `fmt` derivatives of the stored file `source` for an <img>:
+    {'src': the smallest at least `width` pixels wide (else the largest),
+    'srcset': 'url 320w, url 640w, ...'}. None when there are none for this
+    file yet, so callers fall back to the original.
+    """
+    if not derivatives or derivatives.get('source') != source or not derivatives.get('images'):
+        return None
+    images = sorted(derivatives['images'], key=lambda entry: entry['width'])
+    chosen = next((entry for entry in images if entry['width'] >= width), images[-1])
+    return {
+        'src': build_url(storage.url(chosen[fmt])),
+        'srcset': ', '.join(f"{build_url(storage.url(entry[fmt]))} {entry['width']}w" for entry in images),
+    }
+
+
+def build_pending(queryset, field):
+    """Build derivatives now for the rows of `queryset` that need them. Returns (built, failed)."""
+    built, failed = 0, []
+    for instance in queryset.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).iterator():
+        if not needs_derivatives(instance, field):
+            continue
+        try:
+            if build_derivatives(instance, field) is not None:
+                built += 1
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+            failed.append((instance, e))
+    return built, failed
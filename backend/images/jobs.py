@@ -0,0 +1,22 @@
+from django.apps import apps
+
+from jobs.queue import register_job
+from .derivatives import DERIVATIVES_JOB, build_derivatives, needs_derivatives
+
+
+@register_job(DERIVATIVES_JOB)
+def build_derivatives_job(job, model, pk, field):
+    """Render the resized WebP/JPEG copies of an uploaded image"""
+    instance = apps.get_model(model)._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return {'skipped': f'{model} {pk} no longer exists'}
+    if not needs_derivatives(instance, field):
+        return {'skipped': 'Derivatives are up to date'}
+
+    derivatives = build_derivatives(instance, field)
+    if derivatives is None:
+        return {'skipped': 'The image was replaced while its derivatives were built'}
+    return {
+        'source': derivatives['source'],
+        'widths': [entry['width'] for entry in derivatives['images']],
+    }
@@ -0,0 +1,167 @@
+import io
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image, ImageDraw
+
+from Blossomvest.benchmarks import api_client, response_error
+from images.derivatives import DERIVATIVES_JOB, delete_derivatives
+from investments.models import Business, BusinessImage
+from jobs.models import Job
+from jobs.queue import run_pending_jobs
+from users.models import CustomUser
+
+CATEGORY = 'Image benchmark'
+
+
+def sample_photo(width, height, seed, fmt='JPEG'):
+    """A photo-like image (gradients, shapes and sensor noise) that compresses like a real upload"""
+    image = Image.linear_gradient('L').resize((width, height))
+    image = Image.merge('RGB', (image, image.rotate(90).resize((width, height)), image.transpose(Image.FLIP_LEFT_RIGHT)))
+    draw = ImageDraw.Draw(image)
+    for i in range(12):
+        x, y = (seed * 97 + i * 211) % width, (seed * 53 + i * 157) % height
+        draw.ellipse((x, y, x + width // 5, y + height // 5), fill=((seed * 40 + i * 30) % 256, (i * 70) % 256, 120))
+    noise = Image.effect_noise((width, height), 40).convert('RGB')
+    image = Image.blend(image, noise, 0.25)
+    output = io.BytesIO()
+    image.save(output, format=fmt, **({'quality': 92} if fmt == 'JPEG' else {}))
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        'Upload full-size business images and a profile picture, let the job worker render '
+        'their derivatives, and compare the image bytes a catalogue page downloads before and '
+        'after (created data and files are deleted afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, default=24, help='Businesses on the catalogue page')
+        parser.add_argument('--width', type=int, default=2400, help='Width of the uploaded photos')
+        parser.add_argument('--height', type=int, default=1600, help='Height of the uploaded photos')
+
+    def handle(self, *args, **options):
+        self._cleanup()
+        try:
+            self._run(options)
+        finally:
+            self._cleanup()
+
+    def _cleanup(self):
+        images = BusinessImage.objects.filter(business__user__username__startswith='images_bench_')
+        users = CustomUser.objects.filter(username__startswith='images_bench_')
+        for image in images:
+            delete_derivatives(image.derivatives, image.image.storage)
+            image.image.delete(save=False)
+        for user in users.exclude(prof_pic=''):
+            delete_derivatives(user.prof_pic_derivatives, user.prof_pic.storage)
+            user.prof_pic.delete(save=False)
+        Job.objects.filter(name=DERIVATIVES_JOB, owner__in=users).delete()
+        users.delete()
+
+    def _file_bytes(self, url):
+        """Size of the stored file a media URL points at"""
+        path = url.split(settings.MEDIA_URL, 1)[1]
+        return default_storage.size(path)
+
+    def _get(self, client, url, params=None):
+        response = client.get(url, params)
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned {response.status_code}: {response_error(response)}')
+        return response
+
+    def _catalogue(self, client, count):
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self._get(client, '/api/businesses/', {'category': CATEGORY, 'page_size': count})
+        cards = response.data['results']
+        if len(cards) != count:
+            raise CommandError(f'The catalogue returned {len(cards)} cards')
+        return cards, len(context.captured_queries), len(response.content)
+
+    def _run(self, options):
+        count = options['businesses']
+        owner = CustomUser.objects.create(username='images_bench_owner', user_type='entrepreneur')
+        photos = [sample_photo(options['width'], options['height'], seed) for seed in range(4)]
+        for i in range(count):
+            business = Business.objects.create(
+                title=f'Image business {i}', tagline='Benchmark', description='Image derivative benchmark',
+                category=CATEGORY, location='Nowhere', funding_goal=Decimal('1000'), min_investment=Decimal('1'), user=owner,
+            )
+            BusinessImage.objects.create(business=business, image=ContentFile(photos[i % len(photos)], name=f'images_bench_{i}.jpg'))
+        queued = Job.objects.filter(name=DERIVATIVES_JOB, owner=owner, status=Job.STATUS_QUEUED).count()
+        self.stdout.write(
+            f'{count} photos of {options["width"]}x{options["height"]} '
+            f'({sum(map(len, photos)) / len(photos) / 1024:.0f} KB each), {queued} derivative jobs queued on upload'
+        )
+        if queued != count:
+            raise CommandError('Uploading an image did not queue its derivatives')
+
+        client = api_client()
+        cards, queries_before, payload_before = self._catalogue(client, count)
+        if any(card['image_srcset'] for card in cards):
+            raise CommandError('Derivatives were served before being built')
+        bytes_before = sum(self._file_bytes(card['image']) for card in cards)
+
+        started = time.perf_counter()
+        ran = run_pending_jobs(names=[DERIVATIVES_JOB])
+        worker_ms = (time.perf_counter() - started) * 1000
+        if ran != count:
+            raise CommandError(f'{ran} derivative jobs ran, expected {count}')
+
+        cards, queries_after, payload_after = self._catalogue(client, count)
+        if not all(card['image_srcset'] and card['image'].endswith('_640.webp') for card in cards):
+            raise CommandError(f'Cards do not point at their derivatives: {cards[0]["image"]}')
+        bytes_after = sum(self._file_bytes(card['image']) for card in cards)
+
+        self.stdout.write(f'Job worker: {worker_ms / count:.0f} ms per image for 3 widths in WebP and JPEG')
+        self.stdout.write(f'{"":<26} {"image KB":>9} {"JSON KB":>8} {"queries":>8}')
+        self.stdout.write(f'{"Originals":<26} {bytes_before / 1024:>9.0f} {payload_before / 1024:>8.1f} {queries_before:>8}')
+        self.stdout.write(f'{"640px WebP derivatives":<26} {bytes_after / 1024:>9.0f} {payload_after / 1024:>8.1f} {queries_after:>8}')
+        self.stdout.write(f'Catalogue image bytes: {bytes_before / bytes_after:.0f}x smaller')
+        if queries_after != queries_before:
+            raise CommandError('Serving derivatives added queries to the catalogue')
+        if bytes_before < 10 * bytes_after:
+            raise CommandError('Derivatives cut the catalogue image bytes by less than 10x')
+
+        # A replaced image is served as uploaded until its own derivatives exist
+        image = BusinessImage.objects.filter(business__category=CATEGORY).order_by('id').first()
+        old = image.derivatives
+        image.image.delete(save=False)
+        image.image = ContentFile(photos[1], name='images_bench_replaced.jpg')
+        image.save()
+        card = next(card for card in self._catalogue(client, count)[0] if card['id'] == image.business_id)
+        if card['image_srcset'] or 'images_bench_replaced' not in card['image']:
+            raise CommandError('A replaced image was served with the old derivatives')
+        run_pending_jobs(names=[DERIVATIVES_JOB])
+        if any(default_storage.exists(entry['webp']) for entry in old['images']):
+            raise CommandError('The derivatives of the replaced image were left behind')
+        self.stdout.write('A replaced image falls back to the original until its derivatives are rebuilt')
+
+        # Profile pictures get square thumbnails
+        user = CustomUser.objects.create(username='images_bench_investor', user_type='investor')
+        client.force_authenticate(user)
+        upload = ContentFile(sample_photo(1600, 1200, 9, fmt='PNG'), name='avatar.png')
+        upload.content_type = 'image/png'
+        response = client.post('/api/users/profile/upload-picture/', {'profile_picture': upload}, format='multipart')
+        if response.status_code != 200:
+            raise CommandError(f'The profile picture upload returned {response.status_code}: {response_error(response)}')
+        run_pending_jobs(names=[DERIVATIVES_JOB])
+        # A real request loads the user afresh; force_authenticate would reuse the stale instance
+        client.force_authenticate(CustomUser.objects.get(pk=user.pk))
+        profile = self._get(client, '/api/users/profile/').data
+        if not profile['prof_pic_srcset'] or not profile['prof_pic_thumbnail'].endswith('_128.webp'):
+            raise CommandError(f'The profile has no thumbnail: {profile}')
+        self.stdout.write(
+            f'Profile picture: {self._file_bytes(profile["prof_pic"]) / 1024:.0f} KB original, '
+            f'{self._file_bytes(profile["prof_pic_thumbnail"]) / 1024:.1f} KB 128px thumbnail'
+        )
+
+        self.stdout.write(self.style.SUCCESS('Cards and avatars are served from resized copies made by the job worker'))
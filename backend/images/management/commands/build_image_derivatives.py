@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from images.derivatives import SPECS, build_pending, needs_derivatives, queue_derivatives
+
+
+class Command(BaseCommand):
+    help = (
+        'Queue resized copies of business images and profile pictures that have none yet, '
+        'e.g. images uploaded before the derivative pipeline existed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--now', action='store_true', help='Build in this process instead of queueing jobs')
+
+    def handle(self, *args, **options):
+        for spec in SPECS.values():
+            queryset = spec.get_model()._default_manager.exclude(**{spec.field: ''}).exclude(**{f'{spec.field}__isnull': True})
+            if options['now']:
+                built, failed = build_pending(queryset, spec.field)
+                for instance, e in failed:
+                    self.stderr.write(f'{spec.model} {instance.pk} ({getattr(instance, spec.field).name}): {e}')
+                self.stdout.write(f'{spec.model}.{spec.field}: built {built}, {len(failed)} failed')
+            else:
+                queued = sum(
+                    queue_derivatives(instance, spec.field) is not None
+                    for instance in queryset.iterator() if needs_derivatives(instance, spec.field)
+                )
+                self.stdout.write(f'{spec.model}.{spec.field}: queued {queued}')
+        self.stdout.write(self.style.SUCCESS('Done'))
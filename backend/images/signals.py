@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from investments.media import media_attached
+from .derivatives import SPECS, queue_derivatives
+
+
+def _owner(instance):
+    # Jobs are listed for the user they concern: the uploader, or the business owner
+    if instance._meta.label_lower == 'users.customuser':
+        return instance
+    business = getattr(instance, 'business', None)
+    return business.user if business is not None else None
+
+
+def queue_uploaded_derivatives(sender, instance, update_fields=None, **kwargs):
+    # Thumbnails are rendered by the job worker, not in the upload request.
+    # Saves that didn't touch the image field (fund updates, last_login) skip
+    # the check; an unchanged file already has its derivatives.
+    for spec in SPECS.values():
+        if spec.get_model() is sender and (update_fields is None or spec.field in update_fields):
+            if getattr(instance, spec.field):
+                queue_derivatives(instance, spec.field, owner=_owner(instance))
+
+
+for _spec in SPECS.values():
+    post_save.connect(queue_uploaded_derivatives, sender=_spec.get_model(), dispatch_uid=f'images.derivatives.{_spec.model}')
+
+
+@receiver(media_attached)
+def queue_attached_derivatives(sender, business, images, **kwargs):
+    # Images attached with a pitch are bulk inserted, so this stands in for post_save
+    for image in images:
+        queue_derivatives(image, 'image', owner=business.user)
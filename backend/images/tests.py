@@ -0,0 +1,132 @@
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from investments.models import Business, BusinessImage
+from jobs.models import Job
+from jobs.queue import run_pending_jobs
+from users.models import CustomUser
+
+from .derivatives import DERIVATIVES_JOB, build_derivatives
+
+
+def image_file(name, size, mode='RGB', color='red', fmt='PNG'):
+    output = io.BytesIO()
+    Image.new(mode, size, color).save(output, format=fmt)
+    return SimpleUploadedFile(name, output.getvalue(), content_type=f'image/{fmt.lower()}')
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        self.business = Business.objects.create(
+            title='Pictured', tagline='Test', description='Image test', category='Images',
+            location='Nowhere', funding_goal=Decimal('1000'), min_investment=Decimal('1'), user=self.owner,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def _upload(self, size, **kwargs):
+        return BusinessImage.objects.create(business=self.business, image=image_file('photo.png', size, **kwargs))
+
+    def _jobs(self):
+        return Job.objects.filter(name=DERIVATIVES_JOB)
+
+    def _open(self, image, name):
+        with image.image.storage.open(name) as file:
+            opened = Image.open(file)
+            opened.load()
+        return opened
+
+    def test_an_upload_queues_one_job(self):
+        image = self._upload((800, 600))
+        # Saving it again while the job waits doesn't queue another
+        image.order = 1
+        image.save()
+        self.assertEqual(self._jobs().count(), 1)
+        self.assertEqual(self._jobs().get().owner, self.owner)
+
+        self.assertEqual(run_pending_jobs(names=[DERIVATIVES_JOB]), 1)
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives['source'], image.image.name)
+        # Nor once the derivatives are built, or for saves that don't touch the image
+        image.save()
+        self.owner.fund = Decimal('5')
+        self.owner.save(update_fields=['fund'])
+        self.assertEqual(self._jobs().count(), 1)
+
+    def test_widths_are_never_upscaled(self):
+        image = self._upload((500, 250))
+        derivatives = build_derivatives(image, 'image')
+        self.assertEqual(
+            [(entry['width'], entry['height']) for entry in derivatives['images']], [(320, 160), (500, 250)],
+        )
+        for entry in derivatives['images']:
+            self.assertEqual(self._open(image, entry['webp']).size, (entry['width'], entry['height']))
+
+        self.owner.prof_pic = image_file('avatar.png', (100, 150))
+        self.owner.save()
+        derivatives = build_derivatives(self.owner, 'prof_pic')
+        self.assertEqual([(entry['width'], entry['height']) for entry in derivatives['images']], [(64, 64), (100, 100)])
+
+    def test_transparent_pngs_are_flattened_onto_white_for_jpeg(self):
+        image = self._upload((400, 400), mode='RGBA', color=(255, 0, 0, 0))
+        [entry, _] = build_derivatives(image, 'image')['images']
+
+        jpeg = self._open(image, entry['jpeg'])
+        self.assertEqual(jpeg.mode, 'RGB')
+        red, green, blue = jpeg.getpixel((10, 10))
+        self.assertTrue(min(red, green, blue) > 245, (red, green, blue))
+        # WebP keeps the transparency
+        self.assertEqual(self._open(image, entry['webp']).getpixel((10, 10))[3], 0)
+
+    def test_replacing_the_file_mid_build_discards_the_stale_derivatives(self):
+        image = self._upload((700, 400))
+        stale = BusinessImage.objects.get(pk=image.pk)
+        # The owner uploads a new photo while the job still works on the old one
+        image.image = image_file('new.png', (700, 400), color='blue')
+        image.save()
+
+        storage = image.image.storage
+        self.assertIsNone(build_derivatives(stale, 'image'))
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives, {})
+        _, written = storage.listdir('business_images/derivatives')
+        self.assertEqual(written, [])
+
+        # The new photo's own build is kept, and replaces the old photo's derivatives
+        image.refresh_from_db()
+        old = build_derivatives(image, 'image')
+        image.image = image_file('newer.png', (700, 400), color='green')
+        image.save()
+        new = build_derivatives(image, 'image')
+        self.assertTrue(all(storage.exists(entry['webp']) for entry in new['images']))
+        self.assertFalse(any(storage.exists(entry['webp']) for entry in old['images']))
+
+    def test_serializers_fall_back_to_the_original_without_derivatives(self):
+        image = self._upload((800, 600))
+        original = f'http://testserver{image.image.url}'
+
+        [card] = self.client.get('/api/businesses/', {'category': 'Images'}).data
+        self.assertEqual((card['image'], card['image_srcset']), (original, None))
+        [detail] = self.client.get(f'/api/businesses/{self.business.pk}/').data['images']
+        self.assertEqual((detail['image_url'], detail['srcset']), (original, None))
+
+        run_pending_jobs(names=[DERIVATIVES_JOB])
+        [card] = self.client.get('/api/businesses/', {'category': 'Images'}).data
+        self.assertTrue(card['image'].endswith('photo_640.webp'), card['image'])
+        self.assertEqual(card['image_srcset'].count('w, ') + 1, 3)
+        [detail] = self.client.get(f'/api/businesses/{self.business.pk}/').data['images']
+        self.assertEqual((detail['image_url'], detail['srcset']), (original, card['image_srcset']))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Business, BusinessImage, BusinessVideo, BusinessDocument, CalendarEvent
+from .models import Business, BusinessImage, BusinessVideo, BusinessDocument, CalendarEvent, DocumentText
 
 @admin.register(Business)
 class BusinessAdmin(admin.ModelAdmin):
@@ -56,10 +56,17 @@ class BusinessVideoAdmin(admin.ModelAdmin):
 
 @admin.register(BusinessDocument)
 class BusinessDocumentAdmin(admin.ModelAdmin):
-    list_display = ['business', 'name', 'size', 'id']
+    list_display = ['business', 'name', 'size', 'extracted_text', 'id']
     list_filter = ['business__category']
     search_fields = ['business__title', 'name']
     ordering = ['business', 'name']
+    readonly_fields = ['extracted_text']
+
+@admin.register(DocumentText)
+class DocumentTextAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'extracted_at', 'error']
+    search_fields = ['content_hash']
+    readonly_fields = ['content_hash', 'text', 'error', 'extracted_at']
 
 @admin.register(CalendarEvent)
 class CalendarEventAdmin(admin.ModelAdmin):
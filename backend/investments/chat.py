@@ -0,0 +1,282 @@
+import hashlib
+import json
+import logging
+import threading
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from response_cache.cache import business_scope, get_cache, scope_fingerprint
+from .models import Business, BusinessDocument
+from .retrieval import retrieve_chunks
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ai_chat'
+
+# Longest question accepted, in characters
+MAX_QUESTION_LENGTH = 2000
+
+# Document passages put in each prompt
+PROMPT_CHUNKS = 5
+
+INSTRUCTIONS = """INSTRUCTIONS:
+1. Act as a professional investment assistant representing this business
+2. Help investors understand the business model, risks, and opportunities
+3. Provide investment advice based on the business data and documents
+4. If the user asks about unrelated topics, politely redirect them back to investment discussion
+5. Be friendly but professional and knowledgeable
+6. Use emojis sparingly to maintain professionalism
+7. Focus on helping them make an informed investment decision
+8. Provide specific, actionable insights based on the business data and documents
+9. When discussing risks, also mention mitigation strategies
+10. Always consider the investor's perspective and provide balanced analysis
+11. If the user asks about specific documents, reference the content from the documents provided
+12. If no documents are available, mention this limitation but still provide analysis based on other business data"""
+
+
+class ModelServerError(Exception):
+    """The local model server could not be reached or answered with an error"""
+
+
+def model_server_url(path):
+    return getattr(settings, 'AI_MODEL_SERVER_URL', 'http://localhost:11434').rstrip('/') + path
+
+
+def chat_model():
+    return getattr(settings, 'AI_CHAT_MODEL', 'llama3.2:1b')
+
+
+def model_server_status():
+    """Whether the model server is up, and whether it has the chat model"""
+    try:
+        response = requests.get(model_server_url('/api/tags'), timeout=5)
+        response.raise_for_status()
+        models = {model.get('name') for model in response.json().get('models', [])}
+    except (requests.RequestException, ValueError):
+        return {'available': False, 'model': chat_model(), 'model_installed': False}
+    return {'available': True, 'model': chat_model(), 'model_installed': chat_model() in models}
+
+
+def business_context(business_id):
+    """
+    The part of the AI chat prompt describing a business: its details, funding
+    and documents. Cached until the business, its investments or its
+    documents change (the response cache's business scope), so a chat turn
+    doesn't rebuild it. Returns None if there is no such business.
+    """
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:context:{business_id}:{scope_fingerprint(business_scope(business_id))}'
+    context = cache.get(key)
+    if context is None:
+        business = Business.objects.select_related('user').filter(pk=business_id).first()
+        if business is None:
+            return None
+        context = _build_context(business)
+        cache.set(key, context, timeout=getattr(settings, 'AI_CHAT_CONTEXT_TIMEOUT', 3600))
+    return context
+
+
+def _build_context(business):
+    entrepreneur = business.entrepreneur_name or (business.user and business.user.get_full_name()) or 'Not specified'
+    progress = round(business.current_funding / business.funding_goal * 100) if business.funding_goal else 0
+    documents = [document.name for document in business.documents.all()]
+
+    def provided(value):
+        return value or 'Not provided'
+
+    return f"""You are an investment assistant for "{business.title}". Act as a professional, friendly business representative helping potential investors make informed decisions. Stay focused on investment-related topics and business analysis.
+
+BUSINESS DETAILS:
+- Business Name: {business.title}
+- Category: {business.category}
+- Description: {business.description}
+- Entrepreneur: {entrepreneur}
+- Founded: {business.founding_year or 'Not specified'}
+- Location: {business.location}
+- Team Size: {business.team_size} members
+
+INVESTMENT DETAILS:
+- Funding Goal: ${business.funding_goal:,.2f}
+- Current Funding: ${business.current_funding:,.2f} ({progress}%)
+- Backers: {business.backers}
+- Minimum Investment: ${business.min_investment:,.2f}
+
+BUSINESS ANALYSIS:
+- Business Plan: {provided(business.business_plan)}
+- Financial Projections: {provided(business.financial_projections)}
+- Market Analysis: {provided(business.market_analysis)}
+- Competitive Advantage: {provided(business.competitive_advantage)}
+- Use of Funds: {provided(business.use_of_funds)}
+- Industry Experience: {provided(business.industry_experience)}
+- Key Achievements: {provided(business.key_achievements)}
+- Target Market Size: {provided(business.target_market_size)}
+- Revenue Model: {provided(business.revenue_model)}
+- Growth Metrics: {provided(business.growth_metrics)}
+
+BUSINESS DOCUMENTS:
+{'Available documents: ' + ', '.join(documents) if documents else 'No documents available for this business.'}"""
+
+
+def build_prompt(business_id, question):
+    """
+    The full prompt for `question` about a business: its cached context, the
+    document passages relevant to the question and the instructions. Returns
+    None if there is no such business.
+    """
+    context = business_context(business_id)
+    if context is None:
+        return None
+    parts = [context]
+    documents = BusinessDocument.objects.filter(business_id=business_id).select_related('extracted_text')
+    chunks = retrieve_chunks(documents, question, PROMPT_CHUNKS)
+    if chunks:
+        parts.append('Relevant excerpts:\n\n' + '\n\n'.join(
+            f"=== {document.name}{f' (page {chunk.page})' if chunk.page else ''} ===\n{chunk.text}"
+            for document, chunk, _ in chunks
+        ))
+    parts.append(INSTRUCTIONS)
+    parts.append(f'User Question: {question}')
+    parts.append(
+        'Please respond as the business investment assistant, helping the user understand this investment '
+        'opportunity and make a decision. Provide specific insights based on the business data and documents provided.'
+    )
+    return '\n\n'.join(parts)
+
+
+class _Generation:
+    """One answer being streamed from the model server, read by every request asking for it"""
+
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def add(self, token):
+        with self.condition:
+            self.tokens.append(token)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    def follow(self, timeout):
+        """Yield the tokens from the first, waiting for new ones until the answer is done"""
+        position = 0
+        while True:
+            with self.condition:
+                if not self.condition.wait_for(lambda: len(self.tokens) > position or self.done, timeout):
+                    raise ModelServerError(f'No token from the model server in {timeout} seconds')
+                tokens = self.tokens[position:]
+                done, error = self.done, self.error
+            position += len(tokens)
+            yield from tokens
+            if done and position == len(self.tokens):
+                if error:
+                    raise ModelServerError(error)
+                return
+
+
+# Answers being generated in this process, by answer key. Identical prompts
+# arriving meanwhile read the same generation instead of starting another.
+_generations = {}
+_generations_lock = threading.Lock()
+
+
+def _answer_key(prompt):
+    digest = hashlib.sha256(f'{chat_model()}\n{prompt}'.encode()).hexdigest()
+    return f'{KEY_PREFIX}:answer:{digest}'
+
+
+def _generate(key, prompt, generation):
+    """Stream the answer to `prompt` from the model server into `generation`, then cache it"""
+    try:
+        timeout = getattr(settings, 'AI_CHAT_TIMEOUT', 120)
+        with requests.post(
+            model_server_url('/api/generate'),
+            json={'model': chat_model(), 'prompt': prompt, 'stream': True},
+            stream=True, timeout=(5, timeout),
+        ) as response:
+            response.raise_for_status()
+            # chunk_size=None hands each line on as it arrives instead of waiting for 512 bytes
+            for line in response.iter_lines(chunk_size=None):
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get('error'):
+                    raise ModelServerError(data['error'])
+                if data.get('response'):
+                    generation.add(data['response'])
+                if data.get('done'):
+                    break
+    except Exception as e:
+        # Whatever went wrong, the requests following this generation must be released
+        logger.error(f'AI chat generation failed: {e}')
+        generation.finish(error=str(e) or e.__class__.__name__)
+    else:
+        answer = ''.join(generation.tokens)
+        if answer:
+            get_cache().set(key, answer, timeout=getattr(settings, 'AI_CHAT_ANSWER_TIMEOUT', 3600))
+        generation.finish()
+    finally:
+        with _generations_lock:
+            _generations.pop(key, None)
+
+
+def stream_answer(prompt):
+    """
+    Yield events answering `prompt`: {'token': text} as the model produces it,
+    then {'done': True, 'source': ...} or {'error': message}. 'source' is
+    'cache' for an answer given before, 'shared' when an identical prompt was
+    already being answered and its tokens were followed, else 'model'.
+
+    The model server is read by a background thread, so a client that goes
+    away doesn't cut the answer short for the others following it.
+    """
+    key = _answer_key(prompt)
+    answer = get_cache().get(key)
+    if answer is not None:
+        yield {'token': answer}
+        yield {'done': True, 'source': 'cache'}
+        return
+
+    with _generations_lock:
+        generation = _generations.get(key)
+        source = 'shared' if generation else 'model'
+        if generation is None:
+            generation = _generations[key] = _Generation()
+            threading.Thread(target=_generate, args=(key, prompt, generation), daemon=True).start()
+
+    try:
+        for token in generation.follow(getattr(settings, 'AI_CHAT_TIMEOUT', 120)):
+            yield {'token': token}
+    except ModelServerError as e:
+        yield {'error': str(e)}
+        return
+    yield {'done': True, 'source': source}
+
+
+def server_sent_events(events):
+    """Encode `events` as a text/event-stream body"""
+    for event in events:
+        yield f'data: {json.dumps(event)}\n\n'
+
+
+async def iterate_in_thread(iterator):
+    """
+    The blocking `iterator` as an async iterator, each item read in a worker
+    thread. Under ASGI a streaming response over a sync iterator is read in
+    full before anything is sent, so the tokens would arrive all at once.
+    """
+    iterator = iter(iterator)
+    end = object()
+    while True:
+        item = await sync_to_async(next, thread_sensitive=False)(iterator, end)
+        if item is end:
+            return
+        yield item
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sys
+
+from django.db import IntegrityError, transaction
+
+from jobs.models import Job
+from jobs.queue import enqueue, job_reference
+from .models import Business, BusinessDocument, DocumentText
+from .retrieval import index_document_text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extractor import PDFExtractor
+
+EXTRACT_JOB = 'investments.extract_document'
+
+# Bytes read at a time while hashing a file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def is_pdf(document):
+    return bool(document.document_file) and document.document_file.name.lower().endswith('.pdf')
+
+
+def content_hash(field_file):
+    """SHA-256 of a stored file, read from storage in chunks"""
+    digest = hashlib.sha256()
+    with field_file.open('rb') as file:
+        for chunk in file.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def queue_extraction(documents, retry_failed=False):
+    """
+    Queue text extraction for the PDFs among `documents` that don't already
+    have a job waiting or running. Returns the number of jobs queued.
+
+    A document whose extraction failed for good (e.g. its file is missing) is
+    skipped too unless `retry_failed`, so pages that queue the pending PDFs on
+    every view don't queue it again each time. Pass it when the file may have
+    changed since.
+    """
+    references = {job_reference(document): document for document in documents if is_pdf(document)}
+    if not references:
+        return 0
+    statuses = [Job.STATUS_QUEUED, Job.STATUS_RUNNING] + ([] if retry_failed else [Job.STATUS_FAILED])
+    busy = set(
+        Job.objects.filter(
+            name=EXTRACT_JOB, reference__in=list(references), status__in=statuses,
+        ).values_list('reference', flat=True)
+    )
+    documents = [document for reference, document in references.items() if reference not in busy]
+
+    # Owners in one query for documents loaded without them, not one each
+    unloaded = {
+        document.pk: document for document in documents
+        if not (BusinessDocument.business.is_cached(document) and Business.user.is_cached(document.business))
+    }
+    if unloaded:
+        for pk, loaded in BusinessDocument.objects.select_related('business__user').in_bulk(list(unloaded)).items():
+            unloaded[pk].business = loaded.business
+
+    for document in documents:
+        enqueue(
+            EXTRACT_JOB,
+            {'document_id': document.pk},
+            owner=document.business.user,
+            reference=job_reference(document),
+        )
+    return len(documents)
+
+
+def extract_document(document):
+    """
+    Link `document` to the text of its file, parsing the file (read from
+    storage, i.e. MEDIA_ROOT) only if no document with the same content was
+    parsed before. Returns (DocumentText, parsed).
+    """
+    digest = content_hash(document.document_file)
+    extracted = DocumentText.objects.filter(content_hash=digest).first()
+    parsed = extracted is None
+    if parsed:
+        with document.document_file.open('rb') as file:
+            text = PDFExtractor().extract_text_from_stream(file)
+        extracted = _store_text(digest, text)
+    _link_text(document, extracted)
+    return extracted, parsed
+
+
+def extract_documents(documents, workers, timeout=None):
+    """
+    extract_document() for many documents at once, parsing the files that
+    aren't cached yet in a pool of `workers` processes, each given at most
+    `timeout` seconds per file. The files must be on the local filesystem.
+    Returns (files parsed, [(document, error) for files that can't be read]).
+    """
+    digests, failed = {}, []
+    for document in documents:
+        try:
+            digests[document.pk] = content_hash(document.document_file)
+        except OSError as e:
+            failed.append((document, e))
+    documents = [document for document in documents if document.pk in digests]
+    cached = {text.content_hash: text for text in DocumentText.objects.filter(content_hash__in=set(digests.values()))}
+    # One parse per distinct file, named by its hash
+    sources = {}
+    for document in documents:
+        digest = digests[document.pk]
+        if digest not in cached and digest not in sources:
+            sources[digest] = {'name': digest, 'file_path': document.document_file.path}
+    texts = PDFExtractor().process_business_documents(list(sources.values()), workers=workers, timeout=timeout)
+    for digest in sources:
+        cached[digest] = _store_text(digest, texts.get(digest))
+    for document in documents:
+        _link_text(document, cached[digests[document.pk]])
+    return len(sources), failed
+
+
+def _store_text(digest, text):
+    try:
+        with transaction.atomic():
+            extracted = DocumentText.objects.create(
+                content_hash=digest,
+                text=text or '',
+                error='' if text else 'No text could be extracted from this PDF.',
+            )
+            # Chunked for AI chat retrieval alongside the text
+            index_document_text(extracted)
+            return extracted
+    except IntegrityError:
+        # The same file was extracted for another document meanwhile
+        return DocumentText.objects.get(content_hash=digest)
+
+
+def _link_text(document, extracted):
+    BusinessDocument.objects.filter(pk=document.pk).update(extracted_text=extracted)
+    document.extracted_text = extracted
+
+
+def document_texts(documents):
+    """
+    The extracted text of each PDF in `documents` (which should have
+    `extracted_text` selected), as ({name: text}, [PDFs still waiting for
+    extraction]). Reads nothing from the files themselves.
+    """
+    texts, pending = {}, []
+    for document in documents:
+        if not is_pdf(document):
+            continue
+        if document.extracted_text is None:
+            pending.append(document)
+        elif document.extracted_text.text:
+            texts[document.name] = document.extracted_text.text
+    return texts, pending
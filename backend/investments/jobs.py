@@ -0,0 +1,20 @@
+from jobs.queue import register_job
+from .documents import EXTRACT_JOB, extract_document, is_pdf
+from .models import BusinessDocument
+
+@register_job(EXTRACT_JOB)
+def extract_document_job(job, document_id):
+    """Extract the text of an uploaded PDF into the content-hash keyed DocumentText cache"""
+    try:
+        document = BusinessDocument.objects.get(pk=document_id)
+    except BusinessDocument.DoesNotExist:
+        return {'skipped': f'Document {document_id} no longer exists'}
+    if not is_pdf(document):
+        return {'skipped': 'Not a PDF'}
+
+    extracted, parsed = extract_document(document)
+    return {
+        'content_hash': extracted.content_hash,
+        'parsed': parsed,
+        'characters': len(extracted.text),
+    }
@@ -0,0 +1,89 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import force_authenticate
+
+from Blossomvest.benchmarks import request_factory, response_error
+from investments.models import Business, BusinessImage, SavedBusiness
+from investments.views import BusinessListView
+from investments_tracking.models import Investment
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the /api/businesses/ feed runs a fixed number of queries '
+        'whatever the number of businesses (all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[20, 200, 2000],
+            help='Numbers of extra businesses to add to the feed',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'businesses':>10} {'queries':>8} {'seconds':>9}")
+        query_counts = set()
+        for size in options['sizes']:
+            queries, elapsed = self._run(size)
+            query_counts.add(queries)
+            self.stdout.write(f"{size:>10} {queries:>8} {elapsed:>9.3f}")
+
+        if len(query_counts) > 1:
+            raise CommandError('The feed query count depends on the number of businesses')
+        self.stdout.write(self.style.SUCCESS('The feed query count is constant'))
+
+    def _run(self, size):
+        with transaction.atomic():
+            owner = CustomUser.objects.create(username=f'feed_owner_{size}', user_type='entrepreneur')
+            viewer = CustomUser.objects.create(username=f'feed_viewer_{size}', user_type='investor')
+            businesses = Business.objects.bulk_create([
+                Business(
+                    title=f'Feed Business {i}',
+                    tagline='Benchmark',
+                    description='Business feed benchmark',
+                    category='Benchmark',
+                    location='Nowhere',
+                    funding_goal=Decimal('1000'),
+                    min_investment=Decimal('1'),
+                    user=owner,
+                )
+                for i in range(size)
+            ], batch_size=500)
+            BusinessImage.objects.bulk_create([
+                BusinessImage(business=business, image=f'business_images/feed_{business.pk}.jpg')
+                for business in businesses
+            ], batch_size=500)
+            # The viewer invested in and saved every other business
+            Investment.objects.bulk_create([
+                Investment(user=viewer, business=business, amount=Decimal('10'))
+                for business in businesses[::2]
+            ], batch_size=500)
+            SavedBusiness.objects.bulk_create([
+                SavedBusiness(user=viewer, business=business)
+                for business in businesses[::2]
+            ], batch_size=500)
+
+            request = request_factory().get('/api/businesses/', {'category': 'Benchmark'})
+            force_authenticate(request, user=viewer)
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = BusinessListView.as_view()(request)
+                response.render()
+                elapsed = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        if response.status_code != 200:
+            raise CommandError(f'The feed returned {response.status_code}: {response_error(response)}')
+        if len(response.data) != size:
+            raise CommandError(f'The feed listed {len(response.data)} businesses, expected {size}')
+
+        return len(context.captured_queries), elapsed
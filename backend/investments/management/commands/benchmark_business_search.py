@@ -0,0 +1,98 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from investments.models import Business
+from investments.search import fts_available, search_businesses
+
+WORDS = (
+    'solar farm energy bakery coffee rental car hospital clinic urban garden green '
+    'fintech payments logistics delivery fashion textile education tutoring robotics '
+    'drone water filter recycling plastic furniture wood organic dairy poultry fishery '
+    'software cloud analytics marketplace travel tourism hotel restaurant street food'
+).split()
+CATEGORIES = ['Technology', 'Food', 'Health', 'Energy', 'Transport', 'Retail', 'Education']
+
+
+class Command(BaseCommand):
+    help = 'Compare FTS search against the old icontains scan on synthetic businesses (all data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Synthetic businesses to add')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query (the best is reported)')
+        parser.add_argument(
+            '--queries',
+            nargs='+',
+            default=['solar', 'coff', 'green energy', 'hospital clinic', 'robo'],
+            help='Search box queries to time',
+        )
+
+    def handle(self, *args, **options):
+        if not fts_available(connection.alias):
+            self.stdout.write(self.style.WARNING('No FTS index on this database; timing the fallback search instead'))
+
+        with transaction.atomic():
+            self.stdout.write(f"Creating {options['rows']} businesses...")
+            self._create_rows(options['rows'])
+
+            self.stdout.write(
+                f"{'query':<18} {'matches':>8} | {'icontains page/all ms':>22} | {'search page/all ms':>19}"
+            )
+            for query in options['queries']:
+                scan = self._time(options['repeat'], lambda: self._icontains(query))
+                search = self._time(options['repeat'], lambda: search_businesses(Business.objects.all(), query))
+                self.stdout.write(
+                    f"{query:<18} {search[2]:>8} | {scan[0]:>10.1f} {scan[1]:>11.1f} | {search[0]:>8.1f} {search[1]:>10.1f}"
+                )
+                if scan[2] != search[2]:
+                    self.stdout.write(
+                        f"  (icontains matched {scan[2]}: it matches the whole phrase anywhere, "
+                        f"the index matches every word as a word prefix)"
+                    )
+
+            transaction.set_rollback(True)
+
+    def _create_rows(self, rows):
+        rng = random.Random(42)
+        # Mostly filler words, with a couple of real keywords per business so
+        # each keyword matches a few percent of the catalog
+        filler = [''.join(rng.choices('bcdfghklmnprstvz', k=3)) + rng.choice(['ia', 'or', 'ex', 'um']) for _ in range(5000)]
+        Business.objects.bulk_create([
+            Business(
+                title=f"{rng.choice(WORDS).title()} {' '.join(rng.sample(filler, 2)).title()}",
+                tagline=' '.join(rng.sample(filler, 5)),
+                description=' '.join(rng.choices(filler, k=150) + rng.sample(WORDS, 2)),
+                category=rng.choice(CATEGORIES),
+                location='Dhaka',
+                funding_goal=Decimal(rng.randint(1, 100) * 1000),
+                min_investment=Decimal('100'),
+            )
+            for _ in range(rows)
+        ], batch_size=1000)
+
+    def _icontains(self, query):
+        # What BusinessListView did before the search index
+        return Business.objects.filter(Q(title__icontains=query) | Q(description__icontains=query))
+
+    def _time(self, repeat, make_queryset):
+        """
+        Best times to fetch the first feed page (ordered like the trending feed)
+        and every match (the unpaginated feed), plus the match count
+        """
+        best_page = best_all = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(make_queryset().order_by('-backers', '-id').values_list('id', flat=True)[:24])
+            page = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            count = len(make_queryset().order_by('-backers', '-id').values_list('id', flat=True))
+            every = (time.perf_counter() - started) * 1000
+
+            best_page = page if best_page is None else min(best_page, page)
+            best_all = every if best_all is None else min(best_all, every)
+        return best_page, best_all, count
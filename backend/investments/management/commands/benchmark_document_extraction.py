@@ -0,0 +1,167 @@
+import io
+import random
+import time
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from Blossomvest.benchmarks import api_client, response_error
+from investments.documents import EXTRACT_JOB, document_texts
+from investments.models import Business, BusinessDocument, DocumentText
+from jobs.models import Job
+from jobs.queue import run_pending_jobs
+from pdf_extractor import PDFExtractor
+from users.models import CustomUser
+
+WORDS = (
+    'revenue growth margin customers market share retention churn forecast pricing '
+    'supplier inventory logistics funding runway payroll expansion regional export '
+    'equipment lease contract pilot partnership subscription'
+).split()
+
+
+def sample_pdf(pages, seed=0, lines_per_page=45, facts=None):
+    """
+    The bytes of a `pages` page PDF of generated business prose that PyPDF2 can
+    read back. `facts` maps page indexes to a line of text put on that page.
+    """
+    rng = random.Random(seed)
+    facts = facts or {}
+    font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    })
+    writer = PdfWriter()
+    for index in range(pages):
+        page = PageObject.create_blank_page(None, 612, 792)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font}),
+        })
+        content = DecodedStreamObject()
+        lines = [' '.join(rng.choice(WORDS) for _ in range(14)) for _ in range(lines_per_page)]
+        if index in facts:
+            lines[len(lines) // 2] = facts[index]
+        content.set_data(''.join(
+            f"BT /F1 9 Tf 36 {760 - 16 * number} Td ({line}) Tj ET\n" for number, line in enumerate(lines)
+        ).encode())
+        page[NameObject('/Contents')] = content
+        writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare re-parsing business PDFs on every AI chat open with serving the text '
+        'extracted once by the job worker (created data and files are deleted afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=5, help='PDFs of the business')
+        parser.add_argument('--pages', type=int, default=30, help='Pages per PDF')
+        parser.add_argument('--opens', type=int, default=20, help='Chat opens to time')
+
+    def handle(self, *args, **options):
+        self._cleanup()
+        owner = CustomUser.objects.create(username='docs_bench_owner', user_type='entrepreneur')
+        try:
+            self._run(owner, options)
+        finally:
+            self._cleanup()
+
+    def _cleanup(self):
+        documents = BusinessDocument.objects.filter(business__user__username__startswith='docs_bench_')
+        hashes = list(documents.exclude(extracted_text=None).values_list('extracted_text__content_hash', flat=True))
+        for document in documents:
+            document.document_file.delete(save=False)
+        Job.objects.filter(name=EXTRACT_JOB, reference__in=[f'investments.businessdocument:{pk}' for pk in documents.values_list('pk', flat=True)]).delete()
+        CustomUser.objects.filter(username__startswith='docs_bench_').delete()
+        DocumentText.objects.filter(content_hash__in=hashes, documents=None).delete()
+
+    def _business(self, owner, title):
+        return Business.objects.create(
+            title=title, tagline='Benchmark', description='Document extraction benchmark', category='Benchmark',
+            location='Nowhere', funding_goal=Decimal('1000'), min_investment=Decimal('1'), user=owner,
+        )
+
+    def _run(self, owner, options):
+        business = self._business(owner, 'Documents business')
+        files = [sample_pdf(options['pages'], seed=i) for i in range(options['documents'])]
+        documents = [
+            BusinessDocument.objects.create(
+                business=business, name=f'Report {i}', document_file=ContentFile(content, name=f'docs_bench_{i}.pdf'),
+            )
+            for i, content in enumerate(files)
+        ]
+        self.stdout.write(
+            f"{len(documents)} PDFs of {options['pages']} pages ({sum(map(len, files)) / 1024:.0f} KB), "
+            f"{Job.objects.filter(name=EXTRACT_JOB, status=Job.STATUS_QUEUED).count()} extraction jobs queued on upload"
+        )
+
+        # What every chat open used to cost, less the HTTP download of each file
+        extractor = PDFExtractor()
+        started = time.perf_counter()
+        parsed = {}
+        for document in documents:
+            with document.document_file.open('rb') as file:
+                parsed[document.name] = extractor.extract_text_from_stream(file)
+        parse_ms = (time.perf_counter() - started) * 1000
+
+        url = f'/api/businesses/{business.pk}/documents/extract/'
+        client = api_client()
+        data = self._get(client, url).data
+        if data['documents'] or len(data['pending']) != len(documents):
+            raise CommandError('Documents were served before being extracted')
+
+        started = time.perf_counter()
+        ran = run_pending_jobs(names=[EXTRACT_JOB])
+        worker_ms = (time.perf_counter() - started) * 1000
+        if ran < len(documents):
+            raise CommandError(f'Only {ran} extraction jobs ran')
+
+        timings = []
+        for _ in range(options['opens']):
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = self._get(client, url)
+                timings.append((time.perf_counter() - started) * 1000)
+        if response.data['pending'] or response.data['documents'] != parsed:
+            raise CommandError('The cached text differs from parsing the files')
+
+        self.stdout.write(f'Parsing the PDFs on each chat open: {parse_ms:.1f} ms')
+        self.stdout.write(f'Extraction by the job worker, once per file: {worker_ms:.1f} ms')
+        self.stdout.write(
+            f'Chat open from the cache: {sorted(timings)[len(timings) // 2]:.2f} ms median, '
+            f'{len(context.captured_queries)} queries'
+        )
+
+        # The same file uploaded again is matched by its hash, not parsed again
+        other = self._business(owner, 'Copy business')
+        copy = BusinessDocument.objects.create(
+            business=other, name='Copy', document_file=ContentFile(files[0], name='docs_bench_copy.pdf'),
+        )
+        job = Job.objects.get(name=EXTRACT_JOB, reference=f'investments.businessdocument:{copy.pk}')
+        run_pending_jobs(names=[EXTRACT_JOB])
+        job.refresh_from_db()
+        if job.result.get('parsed') is not False:
+            raise CommandError(f'An identical file was parsed again: {job.result}')
+        texts, pending = document_texts(BusinessDocument.objects.filter(pk=copy.pk).select_related('extracted_text'))
+        if pending or texts['Copy'] != parsed['Report 0']:
+            raise CommandError('The re-uploaded file did not get the cached text')
+        self.stdout.write('Re-uploading an identical file reused its text without parsing')
+
+        self.stdout.write(self.style.SUCCESS('Document text is extracted once per file and served from the cache'))
+
+    def _get(self, client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned {response.status_code}: {response_error(response)}')
+        return response
@@ -0,0 +1,109 @@
+import time
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from Blossomvest.benchmarks import api_client, response_error
+from investments.documents import EXTRACT_JOB
+from investments.management.commands.benchmark_document_extraction import sample_pdf
+from investments.models import Business, BusinessDocument, DocumentChunk, DocumentText
+from investments.retrieval import MAX_CHUNKS
+from jobs.models import Job
+from jobs.queue import run_pending_jobs
+from users.models import CustomUser
+
+FACT = 'The export licence for Norway expires in March 2027 pending a customs review'
+QUESTION = 'When does the Norway export licence expire?'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the AI chat prompt built from whole business documents with the top '
+        'chunks retrieved for a question, and check a planted fact is retrieved (created '
+        'data and files are deleted afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=10, help='PDFs of the business')
+        parser.add_argument('--pages', type=int, default=20, help='Pages per PDF')
+        parser.add_argument('--questions', type=int, default=20, help='Retrievals to time')
+
+    def handle(self, *args, **options):
+        self._cleanup()
+        owner = CustomUser.objects.create(username='retrieval_bench_owner', user_type='entrepreneur')
+        try:
+            self._run(owner, options)
+        finally:
+            self._cleanup()
+
+    def _cleanup(self):
+        documents = BusinessDocument.objects.filter(business__user__username__startswith='retrieval_bench_')
+        hashes = list(documents.exclude(extracted_text=None).values_list('extracted_text__content_hash', flat=True))
+        for document in documents:
+            document.document_file.delete(save=False)
+        Job.objects.filter(name=EXTRACT_JOB, reference__in=[f'investments.businessdocument:{pk}' for pk in documents.values_list('pk', flat=True)]).delete()
+        CustomUser.objects.filter(username__startswith='retrieval_bench_').delete()
+        DocumentText.objects.filter(content_hash__in=hashes, documents=None).delete()
+
+    def _run(self, owner, options):
+        business = Business.objects.create(
+            title='Retrieval business', tagline='Benchmark', description='Document retrieval benchmark',
+            category='Benchmark', location='Nowhere', funding_goal=Decimal('1000'), min_investment=Decimal('1'), user=owner,
+        )
+        # The fact sits on page 8 of the fourth document (or the last one)
+        planted = min(3, options['documents'] - 1)
+        for i in range(options['documents']):
+            content = sample_pdf(options['pages'], seed=1000 + i, facts={7: FACT} if i == planted else None)
+            BusinessDocument.objects.create(
+                business=business, name=f'Deck {i}', document_file=ContentFile(content, name=f'retrieval_bench_{i}.pdf'),
+            )
+        run_pending_jobs(names=[EXTRACT_JOB])
+        chunk_count = DocumentChunk.objects.filter(document_text__documents__business=business).count()
+
+        client = api_client()
+        whole = self._get(client, f'/api/businesses/{business.pk}/documents/extract/').data['documents']
+        if len(whole) != options['documents']:
+            raise CommandError(f'Only {len(whole)} documents were extracted')
+        whole_chars = sum(len(text) for text in whole.values())
+
+        url = f'/api/businesses/{business.pk}/documents/context/'
+        timings = []
+        for _ in range(options['questions']):
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = self._get(client, url, {'q': QUESTION})
+                timings.append((time.perf_counter() - started) * 1000)
+        chunks = response.data['chunks']
+        chunk_chars = sum(len(chunk['text']) for chunk in chunks)
+
+        self.stdout.write(f"{options['documents']} PDFs of {options['pages']} pages, {chunk_count} chunks indexed")
+        self.stdout.write(f'Prompt context from whole documents: {whole_chars} characters (~{whole_chars // 4} tokens)')
+        self.stdout.write(
+            f'Prompt context from the top {len(chunks)} chunks: {chunk_chars} characters (~{chunk_chars // 4} tokens), '
+            f'{whole_chars / max(chunk_chars, 1):.0f}x smaller'
+        )
+        self.stdout.write(
+            f'Retrieval: {sorted(timings)[len(timings) // 2]:.2f} ms median, {len(context.captured_queries)} queries'
+        )
+
+        top = chunks[0] if chunks else None
+        if not top or top['document'] != f'Deck {planted}' or top['page'] != 8 or 'Norway' not in top['text']:
+            raise CommandError(f'The planted fact was not the top chunk: {top}')
+        self.stdout.write(f"Top chunk: {top['document']}, page {top['page']}, score {top['score']}")
+
+        if self._get(client, url, {'q': 'the and of'}).data['chunks']:
+            raise CommandError('A question of stop words retrieved chunks')
+        if len(self._get(client, url, {'q': 'revenue', 'k': 100}).data['chunks']) != MAX_CHUNKS:
+            raise CommandError(f'k was not capped at {MAX_CHUNKS} chunks')
+
+        self.stdout.write(self.style.SUCCESS('AI chat context is bounded to the chunks relevant to the question'))
+
+    def _get(self, client, url, params=None):
+        response = client.get(url, params)
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned {response.status_code}: {response_error(response)}')
+        return response
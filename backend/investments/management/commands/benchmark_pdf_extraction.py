@@ -0,0 +1,121 @@
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from investments.management.commands.benchmark_document_extraction import sample_pdf
+from pdf_extractor import MAX_TEXT_LENGTH, PDFExtractor
+
+
+class Command(BaseCommand):
+    help = (
+        'Extract a synthetic corpus of multi-page PDFs the old way (every page materialized, '
+        'then cleaned) and with page streaming, the character budget and the process pool, '
+        'comparing time and peak memory; the pool only helps with more than one CPU (the '
+        'files are written to a temporary directory)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=10, help='PDFs in the corpus')
+        parser.add_argument('--pages', type=int, default=200, help='Pages per PDF')
+        parser.add_argument('--workers', type=int, default=max(2, min(4, os.cpu_count() or 1)), help='Processes in the pool')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            documents = []
+            for i in range(options['documents']):
+                path = os.path.join(directory, f'deck_{i}.pdf')
+                with open(path, 'wb') as file:
+                    file.write(sample_pdf(options['pages'], seed=i))
+                documents.append({'name': f'Deck {i}', 'file_path': path})
+            size = sum(os.path.getsize(document['file_path']) for document in documents)
+            self.stdout.write(
+                f"{len(documents)} PDFs of {options['pages']} pages ({size / 1024:.0f} KB), "
+                f"budget {MAX_TEXT_LENGTH} characters each, {options['workers']} workers"
+            )
+            self._run(documents, options['workers'])
+
+    def _old(self, documents):
+        # process_business_documents before streaming: all pages joined, then cleaned and cut
+        extractor = PDFExtractor()
+        results = {}
+        for document in documents:
+            with open(document['file_path'], 'rb') as file:
+                text = extractor._extract_text_from_bytes(io.BytesIO(file.read()))
+            results[document['name']] = extractor._clean_text(text)
+        return results
+
+    def _time(self, label, call):
+        started = time.perf_counter()
+        result = call()
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(f'{label:<44} {elapsed:>9.0f}')
+        return result, elapsed
+
+    def _peak_mb(self, call):
+        tracemalloc.start()
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak / 1024 / 1024
+
+    def _run(self, documents, workers):
+        logging.getLogger('pdf_extractor').setLevel(logging.WARNING)
+        unlimited = PDFExtractor(max_length=sys.maxsize)
+        self.stdout.write(f'{"":<44} {"ms":>9}')
+        old, old_ms = self._time('All pages, then cleaned (before)', lambda: self._old(documents))
+        budgeted, budgeted_ms = self._time(
+            'Streamed, stopping at the budget', lambda: PDFExtractor().process_business_documents(documents)
+        )
+        pooled, pooled_ms = self._time(
+            f'Streamed with the budget, {workers} processes',
+            lambda: PDFExtractor().process_business_documents(documents, workers=workers),
+        )
+        full, full_ms = self._time(
+            'Whole documents, 1 process', lambda: unlimited.process_business_documents(documents)
+        )
+        full_pooled, full_pooled_ms = self._time(
+            f'Whole documents, {workers} processes',
+            lambda: unlimited.process_business_documents(documents, workers=workers),
+        )
+
+        if budgeted != old or pooled != old:
+            raise CommandError('Streaming with the budget changed the extracted text')
+        if full != full_pooled or len(full) != len(documents):
+            raise CommandError('The process pool changed the extracted text')
+        self.stdout.write(
+            f'Budget: {old_ms / budgeted_ms:.1f}x faster with the same text; pool on whole documents: '
+            f'{full_ms / full_pooled_ms:.1f}x faster on {os.cpu_count()} CPUs'
+        )
+
+        # Peak memory of extracting one document, traced separately as tracing slows parsing
+        one = documents[:1]
+        self.stdout.write(
+            f'Peak memory for one document: {self._peak_mb(lambda: self._old(one)):.1f} MB before, '
+            f'{self._peak_mb(lambda: PDFExtractor().process_business_documents(one)):.1f} MB with the budget, '
+            f'{self._peak_mb(lambda: unlimited.process_business_documents(one)):.1f} MB streaming it whole'
+        )
+
+        # Page streaming hands over the first page without parsing the rest
+        with open(documents[0]['file_path'], 'rb') as file:
+            started = time.perf_counter()
+            next(PDFExtractor().iter_page_texts(file))
+            first_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(f'First page of a document streamed in {first_ms:.1f} ms')
+
+        # A document out of time keeps the pages parsed before its deadline
+        name = documents[0]['name']
+        with open(documents[0]['file_path'], 'rb') as file:
+            text, timed_out = unlimited._collect_text(file, deadline=time.monotonic() + first_ms * 5 / 1000)
+        if not timed_out or not text or len(text) >= len(full[name]):
+            raise CommandError('The per-document timeout did not cut extraction short')
+        self.stdout.write(
+            f'A document out of time kept {text.count("--- Page ")} of its {full[name].count("--- Page ")} pages'
+        )
+
+        self.stdout.write(self.style.SUCCESS('PDFs are streamed page by page, stop at the budget and parse in parallel'))
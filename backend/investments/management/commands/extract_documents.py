@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from investments.documents import extract_document, extract_documents, is_pdf, queue_extraction
+from investments.models import BusinessDocument
+
+
+class Command(BaseCommand):
+    help = (
+        'Queue text extraction for business PDFs that have no extracted text yet, e.g. '
+        'documents uploaded before extraction moved to the job worker'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--now', action='store_true', help='Extract in this process instead of queueing jobs')
+        parser.add_argument('--all', action='store_true', help='Re-check every PDF, not just those without text')
+        parser.add_argument('--workers', type=int, default=1, help='With --now, parse files in this many processes')
+        parser.add_argument('--timeout', type=float, help='With --now and --workers, the most seconds spent parsing one file')
+
+    def handle(self, *args, **options):
+        documents = BusinessDocument.objects.select_related('business__user').exclude(document_file='')
+        if not options['all']:
+            documents = documents.filter(extracted_text__isnull=True)
+        documents = [document for document in documents if is_pdf(document)]
+
+        if not options['now']:
+            queued = queue_extraction(documents, retry_failed=True)
+            self.stdout.write(self.style.SUCCESS(f'Queued extraction of {queued} of {len(documents)} documents'))
+            return
+
+        if options['workers'] > 1:
+            parsed, failed = extract_documents(documents, options['workers'], options['timeout'])
+            for document, e in failed:
+                self.stderr.write(f'Document {document.pk} ({document.document_file.name}): {e}')
+            self.stdout.write(self.style.SUCCESS(
+                f'Extracted {len(documents) - len(failed)} of {len(documents)} documents, '
+                f'parsing {parsed} files in {options["workers"]} processes'
+            ))
+            return
+
+        extracted = parsed = 0
+        for document in documents:
+            try:
+                parsed += extract_document(document)[1]
+                extracted += 1
+            except OSError as e:
+                self.stderr.write(f'Document {document.pk} ({document.document_file.name}): {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Extracted {extracted} of {len(documents)} documents, parsing {parsed} files (the rest were cached)'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from investments.search import install_fts_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate the SQLite FTS5 business search index, its triggers and its contents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to rebuild')
+
+    def handle(self, *args, **options):
+        if install_fts_index(connections[options['database']]):
+            self.stdout.write(self.style.SUCCESS('Business search index rebuilt'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                'This database has no FTS5 support; search uses the icontains fallback'
+            ))
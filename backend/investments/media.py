@@ -0,0 +1,45 @@
+from django.db.models import Max
+from django.dispatch import Signal
+
+from .models import Business, BusinessDocument, BusinessImage, BusinessVideo
+
+# Sent by attach_media, whose bulk inserts skip post_save. Receivers get
+# `business`, `images`, `videos` and `documents` (the created rows) keyword
+# arguments.
+media_attached = Signal()
+
+
+def document_size(size):
+    """How a document's size is shown, e.g. '2.4 MB'"""
+    return f'{size / 1024 / 1024:.1f} MB'
+
+
+def attach_media(business, images=(), videos=(), documents=()):
+    """
+    Add files to `business` with one INSERT per kind. Each file is given as
+    (file, name, size): `file` is either an uploaded file, saved to storage
+    as its row is inserted, or the name of a file already in storage such as
+    a finished chunked upload. Images are ordered after the existing ones.
+    Returns the created (images, videos, documents).
+    """
+    first = 0
+    if images and business.images.exists():
+        first = business.images.aggregate(last=Max('order'))['last'] + 1
+    created_images = BusinessImage.objects.bulk_create([
+        BusinessImage(business=business, image=file, order=first + i)
+        for i, (file, _, _) in enumerate(images)
+    ])
+    created_videos = BusinessVideo.objects.bulk_create([
+        BusinessVideo(business=business, video_file=file, title=name)
+        for file, name, _ in videos
+    ])
+    created_documents = BusinessDocument.objects.bulk_create([
+        BusinessDocument(business=business, document_file=file, name=name, size=document_size(size))
+        for file, name, size in documents
+    ])
+    if created_images or created_videos or created_documents:
+        media_attached.send(
+            sender=Business, business=business,
+            images=created_images, videos=created_videos, documents=created_documents,
+        )
+    return created_images, created_videos, created_documents
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.13 on 2026-10-18 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0008_savedbusiness'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['backers', 'id'], name='business_backers_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['current_funding', 'id'], name='business_funding_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['funding_goal', 'id'], name='business_goal_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['category', 'backers', 'id'], name='business_cat_backers_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['category', 'current_funding', 'id'], name='business_cat_funding_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['category', 'funding_goal', 'id'], name='business_cat_goal_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from investments.search import FTS_DROP_STATEMENTS, install_fts_index
+
+
+def create_search_index(apps, schema_editor):
+    # Without FTS5 (e.g. on MySQL) search falls back to icontains lookups
+    install_fts_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_DROP_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0009_business_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
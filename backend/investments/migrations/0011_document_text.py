@@ -0,0 +1,29 @@
+# Generated by Django 4.2.13 on 2026-10-18 01:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0010_business_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('text', models.TextField(blank=True)),
+                ('error', models.CharField(blank=True, help_text='Why no text could be extracted, if none was', max_length=255)),
+                ('extracted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='businessdocument',
+            name='extracted_text',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='documents', to='investments.documenttext'),
+        ),
+    ]
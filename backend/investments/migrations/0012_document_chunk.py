@@ -0,0 +1,33 @@
+# Generated by Django 4.2.13 on 2026-10-18 01:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0011_document_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('page', models.PositiveIntegerField(blank=True, help_text='PDF page the passage starts on', null=True)),
+                ('text', models.TextField()),
+                ('terms', models.JSONField(default=dict, help_text='Count of each search term in the passage')),
+                ('length', models.PositiveIntegerField(help_text='Number of search terms in the passage')),
+                ('document_text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='investments.documenttext')),
+            ],
+            options={
+                'ordering': ['document_text', 'position'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentchunk',
+            constraint=models.UniqueConstraint(fields=('document_text', 'position'), name='unique_chunk_position'),
+        ),
+    ]
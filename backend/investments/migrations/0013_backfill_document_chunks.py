@@ -0,0 +1,31 @@
+from collections import Counter
+
+from django.db import migrations
+
+from investments.retrieval import chunk_text, index_terms
+
+
+def backfill_document_chunks(apps, schema_editor):
+    DocumentText = apps.get_model('investments', 'DocumentText')
+    DocumentChunk = apps.get_model('investments', 'DocumentChunk')
+
+    for document_text in DocumentText.objects.exclude(text='').iterator():
+        chunks = []
+        for position, (page, text) in enumerate(chunk_text(document_text.text)):
+            terms = index_terms(text)
+            chunks.append(DocumentChunk(
+                document_text=document_text, position=position, page=page, text=text,
+                terms=dict(Counter(terms)), length=len(terms),
+            ))
+        DocumentChunk.objects.bulk_create(chunks, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0012_document_chunk'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_document_chunks, migrations.RunPython.noop),
+    ]
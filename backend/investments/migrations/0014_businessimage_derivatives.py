@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0013_backfill_document_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessimage',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
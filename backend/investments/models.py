@@ -1,8 +1,34 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Subquery
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+class BusinessQuerySet(models.QuerySet):
+    def with_card_data(self, user=None):
+        """
+        Annotate everything a business card needs so BusinessListSerializer runs
+        no per-row queries: the first image's file name (`first_image`) and its
+        resized copies (`first_image_derivatives`) and, for an authenticated
+        user, their invested amount (`user_investment`) and whether they saved
+        the business (`user_saved`).
+        """
+        from investments_tracking.models import Investment
+
+        first_image = BusinessImage.objects.filter(business=OuterRef('pk')).order_by('order', 'id')
+        queryset = self.annotate(
+            first_image=Subquery(first_image.values('image')[:1]),
+            first_image_derivatives=Subquery(first_image.values('derivatives')[:1], output_field=models.JSONField()),
+        )
+
+        if user is not None and user.is_authenticated:
+            user_investment = Investment.objects.filter(business=OuterRef('pk'), user=user).values('amount')[:1]
+            queryset = queryset.annotate(
+                user_investment=Subquery(user_investment),
+                user_saved=Exists(SavedBusiness.objects.filter(business=OuterRef('pk'), user=user)),
+            )
+        return queryset
+
 class Business(models.Model):
     # Core Information
     title = models.CharField(max_length=255)
@@ -39,6 +65,19 @@ class Business(models.Model):
     revenue_model = models.CharField(max_length=255, blank=True, null=True)
     growth_metrics = models.TextField(blank=True, null=True)
 
+    objects = BusinessQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the feed for each sort_by order, with and without a category filter
+            models.Index(fields=['backers', 'id'], name='business_backers_id_idx'),
+            models.Index(fields=['current_funding', 'id'], name='business_funding_id_idx'),
+            models.Index(fields=['funding_goal', 'id'], name='business_goal_id_idx'),
+            models.Index(fields=['category', 'backers', 'id'], name='business_cat_backers_id_idx'),
+            models.Index(fields=['category', 'current_funding', 'id'], name='business_cat_funding_id_idx'),
+            models.Index(fields=['category', 'funding_goal', 'id'], name='business_cat_goal_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -58,6 +97,8 @@ class BusinessImage(models.Model):
     business = models.ForeignKey(Business, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='business_images/',blank=True, null=True)
     order = models.PositiveIntegerField(default=0) # To maintain order of images
+    # Resized copies of the image, written by the job worker (see images/derivatives.py)
+    derivatives = models.JSONField(default=dict, blank=True)
 
     class Meta:
         ordering = ['order']
@@ -69,11 +110,48 @@ class BusinessVideo(models.Model):
     thumbnail = models.ImageField(upload_to='business_thumbnails/',blank=True, null=True)
     duration = models.CharField(max_length=20) # e.g., "3:45"
 
+class DocumentText(models.Model):
+    """
+    Text extracted from an uploaded document, keyed by the SHA-256 of the file's
+    content so a file is only ever parsed once, however many documents share
+    it. Written by the 'investments.extract_document' job (see documents.py).
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    text = models.TextField(blank=True)
+    error = models.CharField(max_length=255, blank=True, help_text="Why no text could be extracted, if none was")
+    extracted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({len(self.text)} characters)"
+
+class DocumentChunk(models.Model):
+    """
+    A passage of a DocumentText with its term counts, the unit AI chat context
+    is retrieved in (see retrieval.py). Shared like the text it comes from.
+    """
+    document_text = models.ForeignKey(DocumentText, related_name='chunks', on_delete=models.CASCADE)
+    position = models.PositiveIntegerField()
+    page = models.PositiveIntegerField(null=True, blank=True, help_text="PDF page the passage starts on")
+    text = models.TextField()
+    terms = models.JSONField(default=dict, help_text="Count of each search term in the passage")
+    length = models.PositiveIntegerField(help_text="Number of search terms in the passage")
+
+    class Meta:
+        ordering = ['document_text', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['document_text', 'position'], name='unique_chunk_position'),
+        ]
+
+    def __str__(self):
+        return f"{self.document_text} #{self.position}"
+
 class BusinessDocument(models.Model):
     business = models.ForeignKey(Business, related_name='documents', on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     document_file = models.FileField(upload_to='business_documents/',blank=True, null=True ) # Changed to FileField
     size = models.CharField(max_length=50, blank=True, null=True)
+    # Set by the extraction job once the file's text is in DocumentText
+    extracted_text = models.ForeignKey(DocumentText, related_name='documents', on_delete=models.SET_NULL, blank=True, null=True)
 
 class CalendarEvent(models.Model):
     EVENT_TYPES = [
@@ -0,0 +1,94 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class BusinessKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for the business feed.
+
+    Pages are ordered by the view's sort field, descending, with the id as a
+    tie-breaker, and the cursor stores the (value, id) of the last row served.
+    The next page is then a range scan on the (sort field, id) index, so a page
+    deep in the catalog costs the same as the first one, unlike OFFSET or DRF's
+    CursorPagination (which offsets through ties on the sort field).
+
+    Pagination is opt-in: it only applies when `page_size` or `cursor` is
+    given, so existing clients keep getting the full list.
+    """
+    page_size = 24
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.sort_field = view.get_sort_field()
+        queryset = queryset.order_by(f'-{self.sort_field}', '-id')
+
+        encoded = params.get(self.cursor_query_param)
+        if encoded:
+            value, last_id = self.decode_cursor(encoded)
+            queryset = queryset.filter(
+                Q(**{f'{self.sort_field}__lt': value}) |
+                Q(**{self.sort_field: value, 'id__lt': last_id})
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or self.last_row is None:
+            return None
+        cursor = self.encode_cursor(getattr(self.last_row, self.sort_field), self.last_row.id)
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, value, last_id):
+        payload = json.dumps([str(value), last_id]).encode('ascii')
+        return base64.urlsafe_b64encode(payload).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return Decimal(value), int(last_id)
+        except (TypeError, ValueError, ArithmeticError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
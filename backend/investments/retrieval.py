@@ -0,0 +1,118 @@
+import math
+import re
+from collections import Counter
+
+from .models import DocumentChunk
+from .search import search_terms
+
+# Words per chunk, and words repeated from the end of the previous chunk of
+# the same page so a passage cut in two is still found whole in one of them
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 40
+
+# Chunks returned per question by default, and at most
+DEFAULT_CHUNKS = 5
+MAX_CHUNKS = 20
+
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Common words that say nothing about which passage is relevant
+STOP_WORDS = frozenset(
+    'a an and are as at be by can do does for from has have how i in is it its of on or '
+    'that the their there this to was what when where which who why will with you your'.split()
+)
+
+# The page markers PDFExtractor puts in the text
+_PAGE_MARKER = re.compile(r'--- Page (\d+) ---')
+
+
+def index_terms(text):
+    """The search terms of `text`: search_terms() without stop words"""
+    return [term for term in search_terms(text) if term not in STOP_WORDS]
+
+
+def chunk_text(text):
+    """
+    Split extracted document text into overlapping passages of about
+    CHUNK_WORDS words that don't cross pages. Returns [(page or None, text)].
+    """
+    pieces = _PAGE_MARKER.split(text)
+    # Text before the first marker (or all of it, without markers) has no page
+    pages = [(None, pieces[0])] + [(int(number), body) for number, body in zip(pieces[1::2], pieces[2::2])]
+    chunks = []
+    for page, body in pages:
+        words = body.split()
+        start = 0
+        while start < len(words):
+            chunks.append((page, ' '.join(words[start:start + CHUNK_WORDS])))
+            if start + CHUNK_WORDS >= len(words):
+                break
+            start += CHUNK_WORDS - CHUNK_OVERLAP
+    return chunks
+
+
+def build_chunks(document_text):
+    """Unsaved DocumentChunks for `document_text`"""
+    chunks = []
+    for position, (page, text) in enumerate(chunk_text(document_text.text)):
+        terms = index_terms(text)
+        chunks.append(DocumentChunk(
+            document_text=document_text, position=position, page=page, text=text,
+            terms=dict(Counter(terms)), length=len(terms),
+        ))
+    return chunks
+
+
+def index_document_text(document_text):
+    """(Re)build the chunks of `document_text`. Returns how many there are."""
+    DocumentChunk.objects.filter(document_text=document_text).delete()
+    chunks = build_chunks(document_text)
+    DocumentChunk.objects.bulk_create(chunks, batch_size=500)
+    return len(chunks)
+
+
+def retrieve_chunks(documents, question, limit=DEFAULT_CHUNKS):
+    """
+    The `limit` chunks of `documents` (which should have `extracted_text`
+    selected) most relevant to `question` by BM25, best first, as
+    [(document, chunk, score)]. Document frequencies are counted over these
+    documents only, so a term common to one business's decks ranks low there.
+
+    Scores are computed here rather than with the FTS5 index search.py uses:
+    a business has a few hundred chunks at most, and this works the same on
+    every database. Only the chunks returned are loaded with their text.
+    """
+    terms = set(index_terms(question))
+    by_text = {}
+    for document in documents:
+        if document.extracted_text_id and document.extracted_text.text:
+            by_text.setdefault(document.extracted_text_id, document)
+    if not terms or not by_text:
+        return []
+
+    stats = list(DocumentChunk.objects.filter(document_text_id__in=by_text).values_list('id', 'terms', 'length'))
+    if not stats:
+        return []
+    average_length = sum(length for _, _, length in stats) / len(stats) or 1
+    frequencies = Counter(term for _, counts, _ in stats for term in terms if term in counts)
+    idf = {
+        term: math.log(1 + (len(stats) - frequency + 0.5) / (frequency + 0.5))
+        for term, frequency in frequencies.items()
+    }
+
+    scores = {}
+    for chunk_id, counts, length in stats:
+        score = 0.0
+        for term, weight in idf.items():
+            count = counts.get(term)
+            if count:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                score += weight * count * (BM25_K1 + 1) / (count + norm)
+        if score:
+            scores[chunk_id] = score
+    best = sorted(scores, key=lambda chunk_id: (-scores[chunk_id], chunk_id))[:limit]
+
+    chunks = DocumentChunk.objects.only('document_text_id', 'position', 'page', 'text').in_bulk(best)
+    return [(by_text[chunks[chunk_id].document_text_id], chunks[chunk_id], scores[chunk_id]) for chunk_id in best]
@@ -0,0 +1,150 @@
+import re
+
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'investments_business_fts'
+
+# Columns indexed for search, with their relevance weights
+SEARCH_COLUMNS = [
+    ('title', 10.0),
+    ('tagline', 5.0),
+    ('description', 1.0),
+    ('category', 3.0),
+]
+
+_fts_available = {}
+
+_COLUMN_NAMES = ', '.join(column for column, _ in SEARCH_COLUMNS)
+_NEW_VALUES = ', '.join(f'new.{column}' for column, _ in SEARCH_COLUMNS)
+_OLD_VALUES = ', '.join(f'old.{column}' for column, _ in SEARCH_COLUMNS)
+
+FTS_CREATE_STATEMENTS = [
+    # External-content FTS5 index over the business table (rowid = business id)
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        {_COLUMN_NAMES},
+        content='investments_business',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    # Keep the index in sync on insert, delete and edits of the indexed columns
+    # (funding and backer updates don't touch these columns, so don't fire)
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON investments_business BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_COLUMN_NAMES}) VALUES (new.id, {_NEW_VALUES});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON investments_business BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMN_NAMES}) VALUES ('delete', old.id, {_OLD_VALUES});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {_COLUMN_NAMES} ON investments_business BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_COLUMN_NAMES}) VALUES ('delete', old.id, {_OLD_VALUES});
+        INSERT INTO {FTS_TABLE}(rowid, {_COLUMN_NAMES}) VALUES (new.id, {_NEW_VALUES});
+    END""",
+    # Index the existing businesses
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+FTS_DROP_STATEMENTS = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def fts5_supported(connection):
+    """Whether `connection` is SQLite built with the FTS5 extension"""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def install_fts_index(connection):
+    """
+    (Re)create the FTS5 table and its sync triggers and index every business.
+    Also needed after a migration rebuilds the business table on SQLite, which
+    drops its triggers. Returns False when FTS5 isn't available.
+    """
+    if not fts5_supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        for statement in FTS_DROP_STATEMENTS + FTS_CREATE_STATEMENTS:
+            cursor.execute(statement)
+    _fts_available.pop(connection.alias, None)
+    return True
+
+
+def search_terms(query):
+    """Split a search box query into lower-cased word tokens"""
+    return re.findall(r'\w+', query.lower())
+
+
+def fts_available(using='default'):
+    """Whether the SQLite FTS5 index table exists on this database"""
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = (
+            connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[using]
+
+
+def search_businesses(queryset, query):
+    """
+    Filter a Business queryset to the rows matching `query` and annotate each
+    with `search_score` (higher is more relevant). Every word must match, and
+    the last characters typed match as a prefix so typeahead works.
+
+    Uses the SQLite FTS5 index (see install_fts_index, kept in sync by
+    triggers) when available, and falls back to ranked icontains lookups on
+    other databases.
+    """
+    terms = search_terms(query)
+    if not terms:
+        # Nothing to match, e.g. only punctuation: no results rather than the whole catalogue
+        return queryset.annotate(search_score=Value(0.0, output_field=FloatField())).none()
+
+    if fts_available(queryset.db):
+        return _fts_search(queryset, terms)
+    return _fallback_search(queryset, terms)
+
+
+def _fts_search(queryset, terms):
+    match = ' '.join(f'"{term}"*' for term in terms)
+    weights = ', '.join(str(weight) for _, weight in SEARCH_COLUMNS)
+    business_table = queryset.model._meta.db_table
+
+    queryset = queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+    )
+    # bm25() is lower for better matches, so negate it to sort descending like the other feed orders
+    return queryset.annotate(search_score=RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {business_table}.id',
+        [match],
+        output_field=FloatField(),
+    ))
+
+
+def _fallback_search(queryset, terms):
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) | Q(tagline__icontains=term) |
+            Q(description__icontains=term) | Q(category__icontains=term)
+        )
+
+    # Score by the best-weighted column each term appears in
+    score = Value(0.0, output_field=FloatField())
+    for term in terms:
+        score = score + Case(
+            *[
+                When(**{f'{column}__icontains': term}, then=Value(weight))
+                for column, weight in sorted(SEARCH_COLUMNS, key=lambda column: -column[1])
+            ],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    return queryset.annotate(search_score=score)
@@ -1,7 +1,16 @@
 # investments/serializers.py
+from django.db import transaction
 from rest_framework import serializers
+from investments_tracking.services import MAX_BATCH_INVESTMENTS
+from .media import attach_media
 from .models import Business, BusinessImage, BusinessVideo, BusinessDocument, CalendarEvent, SavedBusiness
 from investments_tracking.models import Investment
+from images.derivatives import derivative_urls
+from uploads.models import UploadSession
+from uploads.sessions import UploadError, attach_uploads
+
+# Width the catalogue card image is chosen for (2x a ~320px card); srcset offers the others
+CARD_IMAGE_WIDTH = 640
 
 # --- Serializers for creating/uploading related files ---
 class BusinessImageCreateSerializer(serializers.ModelSerializer):
@@ -61,6 +70,10 @@ class BusinessPitchSerializer(serializers.ModelSerializer):
     documents = serializers.ListField(
         child=serializers.FileField(), write_only=True, required=False
     )
+    # Ids of finished chunked uploads (see uploads/), for media too large for one request
+    uploads = serializers.ListField(
+        child=serializers.UUIDField(), write_only=True, required=False
+    )
 
     class Meta:
         model = Business
@@ -74,44 +87,55 @@ class BusinessPitchSerializer(serializers.ModelSerializer):
             'founding_year', 'industry_experience', 'key_achievements',
             'target_market_size', 'revenue_model', 'growth_metrics',
             'user', 'created_at', 'updated_at',
-            'images', 'videos', 'documents' # Include nested fields
+            'images', 'videos', 'documents', 'uploads' # Include nested fields
         ]
         read_only_fields = ['user', 'created_at', 'updated_at']
 
-    # Override create method to handle nested writes for images, videos, and documents
-    def create(self, validated_data):
-        # Extract file data from request
+    def _pop_media(self, validated_data):
+        # Multipart files come from request.FILES, chunked uploads by id
         request = self.context.get('request')
-        images_data = request.FILES.getlist('images') if request else []
-        videos_data = request.FILES.getlist('videos') if request else []
-        documents_data = request.FILES.getlist('documents') if request else []
-
-        # Remove nested fields from validated_data
-        validated_data.pop('images', None)
-        validated_data.pop('videos', None)
-        validated_data.pop('documents', None)
-
-        # Create the business
-        business = Business.objects.create(**validated_data)
-
-        # Create related files
-        for image_data in images_data:
-            BusinessImage.objects.create(business=business, image=image_data)
-        for video_data in videos_data:
-            BusinessVideo.objects.create(business=business, video_file=video_data, title=video_data.name)
-        for document_data in documents_data:
-            BusinessDocument.objects.create(business=business, document_file=document_data, name=document_data.name)
-            
+        media = {kind: request.FILES.getlist(kind) if request else [] for kind in ('images', 'videos', 'documents')}
+        for kind in media:
+            validated_data.pop(kind, None)
+        media['uploads'] = validated_data.pop('uploads', [])
+        return media
+
+    def _attach_media(self, business, media):
+        files = {kind: [(file, file.name, file.size) for file in media[kind]] for kind in ('images', 'videos', 'documents')}
+        if media['uploads']:
+            try:
+                sessions = attach_uploads(self.context['request'].user, media['uploads'])
+            except UploadError as e:
+                raise serializers.ValidationError({'uploads': str(e)})
+            kinds = {UploadSession.KIND_IMAGE: 'images', UploadSession.KIND_VIDEO: 'videos', UploadSession.KIND_DOCUMENT: 'documents'}
+            for session in sessions:
+                files[kinds[session.kind]].append((session.file.name, session.filename, session.size))
+        attach_media(business, **files)
+
+    # Override create and update to add the images, videos and documents, one INSERT per kind
+    def create(self, validated_data):
+        media = self._pop_media(validated_data)
+        with transaction.atomic():
+            business = Business.objects.create(**validated_data)
+            self._attach_media(business, media)
+        return business
+
+    def update(self, instance, validated_data):
+        media = self._pop_media(validated_data)
+        with transaction.atomic():
+            business = super().update(instance, validated_data)
+            self._attach_media(business, media)
         return business
 
 
 # --- Existing serializers for displaying business data (modified to use FileField URLs) ---
 class BusinessImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = BusinessImage
-        fields = ['image_url', 'order']
+        fields = ['image_url', 'srcset', 'order']
 
     def get_image_url(self, obj):
         request = self.context.get('request')
@@ -119,6 +143,15 @@ class BusinessImageSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.image.url)
         return None
 
+    def get_srcset(self, obj):
+        # Resized WebP copies with width hints; null until the job worker has made them
+        if not obj.image:
+            return None
+        urls = derivative_urls(
+            obj.derivatives, obj.image.name, obj.image.storage, self.context['request'].build_absolute_uri, CARD_IMAGE_WIDTH,
+        )
+        return urls and urls['srcset']
+
 class BusinessVideoSerializer(serializers.ModelSerializer):
     thumbnail_url = serializers.SerializerMethodField() # Frontend expects 'thumbnail_url'
     video_file_url = serializers.SerializerMethodField() # Add URL for video file
@@ -154,6 +187,7 @@ class BusinessDocumentSerializer(serializers.ModelSerializer):
 
 class BusinessListSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     user_investment_amount = serializers.SerializerMethodField()
     user_investment_percentage = serializers.SerializerMethodField()
     is_saved = serializers.SerializerMethodField()
@@ -163,42 +197,70 @@ class BusinessListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'category', 'location',
             'funding_goal', 'current_funding', 'backers',
-            'min_investment', 'image', 'user', 'user_investment_amount', 'user_investment_percentage', 'is_saved'
+            'min_investment', 'image', 'image_srcset', 'user', 'user_investment_amount', 'user_investment_percentage', 'is_saved'
         ]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Optional field projection, e.g. {'id', 'title', 'image'} from ?fields=
+        requested = self.context.get('fields')
+        if requested:
+            for field_name in set(self.fields) - set(requested):
+                self.fields.pop(field_name)
+
+    def _card_image_urls(self, obj):
+        """{'src', 'srcset'} of the card's image (the first one), or None without images"""
+        if not hasattr(obj, '_card_image_urls'):
+            # Querysets from Business.objects.with_card_data() carry the first image's file name and derivatives
+            if hasattr(obj, 'first_image'):
+                name, derivatives = obj.first_image, obj.first_image_derivatives
+            else:
+                first_image = obj.images.first()
+                name, derivatives = (first_image.image.name, first_image.derivatives) if first_image and first_image.image else (None, None)
+            urls = None
+            if name:
+                storage = BusinessImage._meta.get_field('image').storage
+                build_url = self.context['request'].build_absolute_uri  # Requires 'request' in serializer context
+                # A resized copy once the job worker has made it, the original until then
+                urls = derivative_urls(derivatives, name, storage, build_url, CARD_IMAGE_WIDTH) or {
+                    'src': build_url(storage.url(name)), 'srcset': None,
+                }
+            obj._card_image_urls = urls
+        return obj._card_image_urls
+
     def get_image(self, obj):
-        first_image = obj.images.first()
-        if first_image and first_image.image:
-            # Requires 'request' in serializer context
-            return self.context['request'].build_absolute_uri(first_image.image.url)
+        urls = self._card_image_urls(obj)
         # Return a simple placeholder path
-        return "/placeholder.svg"
+        return urls['src'] if urls else "/placeholder.svg"
 
-    def get_user_investment_amount(self, obj):
+    def get_image_srcset(self, obj):
+        urls = self._card_image_urls(obj)
+        return urls['srcset'] if urls else None
+
+    def _user_investment(self, obj):
+        """The current user's invested amount in `obj`, or None"""
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                investment = Investment.objects.get(user=request.user, business=obj)
-                return float(investment.amount)
-            except Investment.DoesNotExist:
-                return 0
-        return 0
+        if not (request and request.user.is_authenticated):
+            return None
+        if hasattr(obj, 'user_investment'):
+            return obj.user_investment
+        return Investment.objects.filter(user=request.user, business=obj).values_list('amount', flat=True).first()
+
+    def get_user_investment_amount(self, obj):
+        amount = self._user_investment(obj)
+        return float(amount) if amount is not None else 0
 
     def get_user_investment_percentage(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                investment = Investment.objects.get(user=request.user, business=obj)
-                if obj.funding_goal > 0:
-                    return round((float(investment.amount) / float(obj.funding_goal)) * 100, 2)
-                return 0
-            except Investment.DoesNotExist:
-                return 0
+        amount = self._user_investment(obj)
+        if amount is not None and obj.funding_goal > 0:
+            return round((float(amount) / float(obj.funding_goal)) * 100, 2)
         return 0
 
     def get_is_saved(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
+            if hasattr(obj, 'user_saved'):
+                return obj.user_saved
             return SavedBusiness.objects.filter(user=request.user, business=obj).exists()
         return False
 
@@ -253,7 +315,9 @@ class BusinessDetailSerializer(serializers.ModelSerializer):
 class InvestmentSerializer(serializers.Serializer):
     """
     Serializer for handling investment actions.
-    Receives business ID and investment amount.
+    Receives business ID and investment amount. Whether the business exists,
+    belongs to someone else and has room left in its funding goal is checked by
+    InvestmentService in the same UPDATE that claims the funding.
     """
     business_id = serializers.IntegerField(write_only=True, required=True)
     investment_amount = serializers.DecimalField(
@@ -261,60 +325,13 @@ class InvestmentSerializer(serializers.Serializer):
         min_value=1 # Ensure a positive investment
     )
 
-    def validate(self, data):
-        """
-        Check if the business exists and if the investment amount is valid.
-        """
-        try:
-            business = Business.objects.get(id=data['business_id'])
-        except Business.DoesNotExist:
-            raise serializers.ValidationError("Business not found.")
-
-        # Check if the current user is the owner of the business
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            if business.user == request.user:
-                raise serializers.ValidationError("You cannot invest in your own business.")
-
-        # Ensure investment doesn't exceed the remaining goal
-        remaining_goal = business.funding_goal - business.current_funding
-        if data['investment_amount'] > remaining_goal:
-            # We want to allow investing up to the remaining goal if user inputs more
-            # This validation will prevent over-investing past the goal
-            raise serializers.ValidationError(
-                f"Investment amount exceeds the remaining funding goal of {remaining_goal:.0f}."
-            )
-        # If unlimited money is allowed (as per prompt), no need to check user's balance here.
-
-        data['business'] = business # Attach business object to validated_data for easy access in save/view
-        return data
-
-    def create(self, validated_data):
-        # This serializer doesn't create a new model instance directly,
-        # but performs an update. We will handle the update in the view.
-        # Or, we can override save() here. Let's do it in the view for clarity.
-        pass
-
-    def save(self, **kwargs):
-        """
-        Performs the update to the Business instance.
-        """
-        business = self.validated_data['business']
-        investment_amount = self.validated_data['investment_amount']
-
-        business.current_funding += investment_amount
-        business.backers += 1 # Increment backer count for each investment
-        business.save(update_fields=['current_funding', 'backers']) # Only update these fields
-
-        # We need to return something that the view can serialize back to the frontend.
-        # Let's return the updated business data for the frontend to refresh its view.
-        # Create a dictionary representing the updated fields.
-        return {
-            'id': business.id,
-            'current_funding': business.current_funding,
-            'backers': business.backers,
-            'funding_goal': business.funding_goal # Also send goal for progress bar
-        }
+class InvestmentBatchSerializer(serializers.Serializer):
+    """
+    A list of investments to make at once, e.g.
+    {"investments": [{"business_id": 1, "investment_amount": "250.00"}, ...]}.
+    Checked and made together by InvestmentService.invest_many.
+    """
+    investments = InvestmentSerializer(many=True, allow_empty=False, max_length=MAX_BATCH_INVESTMENTS)
 
 class CalendarEventSerializer(serializers.ModelSerializer):
     business_title = serializers.CharField(source='business.title', read_only=True)
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .documents import queue_extraction
+from .media import media_attached
+from .models import BusinessDocument
+
+
+@receiver(post_save, sender=BusinessDocument)
+def extract_uploaded_document(sender, instance, created, update_fields=None, **kwargs):
+    # Parse the PDF once, in the job worker, instead of on every AI chat open.
+    # Saves that may have replaced the file queue it again; an unchanged file
+    # is matched by its hash and not parsed twice.
+    if created or update_fields is None or 'document_file' in update_fields:
+        queue_extraction([instance], retry_failed=True)
+
+
+@receiver(media_attached)
+def extract_attached_documents(sender, documents, **kwargs):
+    # Documents attached with a pitch are bulk inserted, so this stands in for post_save
+    queue_extraction(documents)
@@ -1,3 +1,397 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.db import connection, connections
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from investments_tracking.models import Investment
+from users.models import CustomUser
+
+from jobs.models import Job
+
+from .chat import build_prompt, chat_model
+from .documents import EXTRACT_JOB, queue_extraction
+from .models import Business, BusinessDocument, BusinessImage, SavedBusiness
+from .search import fts_available
+
+
+class BusinessFeedTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        self.viewer = CustomUser.objects.create(username='viewer', user_type='investor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def _add_businesses(self, count):
+        businesses = Business.objects.bulk_create([
+            Business(
+                title=f'Feed business {i}', tagline='Test', description='Feed test', category='Feed',
+                location='Nowhere', funding_goal=Decimal('1000'), min_investment=Decimal('1'), user=self.owner,
+            )
+            for i in range(count)
+        ])
+        BusinessImage.objects.bulk_create([
+            BusinessImage(business=business, image=f'business_images/feed_{business.pk}.jpg') for business in businesses
+        ])
+        # The viewer invested in and saved every other business
+        Investment.objects.bulk_create([
+            Investment(user=self.viewer, business=business, amount=Decimal('10')) for business in businesses[::2]
+        ])
+        SavedBusiness.objects.bulk_create([
+            SavedBusiness(user=self.viewer, business=business) for business in businesses[::2]
+        ])
+
+    def _feed(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/businesses/', {'category': 'Feed'})
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(context.captured_queries)
+
+    def test_feed_query_count_does_not_grow_with_businesses(self):
+        self._add_businesses(5)
+        cards, queries = self._feed()
+        self.assertEqual(len(cards), 5)
+
+        for total in (50, 500):
+            self._add_businesses(total - len(cards))
+            with self.assertNumQueries(queries):
+                cards, _ = self._feed()
+            self.assertEqual(len(cards), total)
+
+    def test_cards_carry_the_viewers_investment_and_saves(self):
+        self._add_businesses(4)
+        cards, _ = self._feed()
+        invested = set(Investment.objects.filter(user=self.viewer).values_list('business_id', flat=True))
+        for card in cards:
+            self.assertEqual(card['is_saved'], card['id'] in invested)
+            self.assertEqual(card['user_investment_amount'], 10.0 if card['id'] in invested else 0)
+            self.assertTrue(card['image'].endswith(f"feed_{card['id']}.jpg"))
+
+    def _pages(self, params):
+        """The ids of every page from following the next links"""
+        pages, url = [], '/api/businesses/'
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append([card['id'] for card in response.data['results']])
+            url, params = response.data['next'], None
+        return pages
+
+    def test_cursor_pages_follow_the_feed_order_through_ties(self):
+        self._add_businesses(11)
+        # Mostly ties on the sort field, which the id breaks
+        ids = Business.objects.filter(category='Feed').order_by('id').values_list('id', flat=True)
+        backers = {pk: [3, 1, 1][i % 3] for i, pk in enumerate(ids)}
+        for pk, count in backers.items():
+            Business.objects.filter(pk=pk).update(backers=count)
+        expected = sorted(backers, key=lambda pk: (backers[pk], pk), reverse=True)
+
+        pages = self._pages({'category': 'Feed', 'page_size': 4})
+        self.assertEqual([len(page) for page in pages], [4, 4, 3])
+        self.assertEqual(sum(pages, []), expected)
+        # The same pages when asked again
+        self.assertEqual(self._pages({'category': 'Feed', 'page_size': 4}), pages)
+
+        response = self.client.get('/api/businesses/', {'category': 'Feed', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_pagination_and_projection_are_opt_in(self):
+        self._add_businesses(5)
+        cards, _ = self._feed()
+        self.assertIsInstance(cards, list)
+        self.assertEqual(set(cards[0]), {
+            'id', 'title', 'description', 'category', 'location', 'funding_goal', 'current_funding', 'backers',
+            'min_investment', 'image', 'image_srcset', 'user', 'user_investment_amount', 'user_investment_percentage',
+            'is_saved',
+        })
+
+        response = self.client.get('/api/businesses/', {'category': 'Feed', 'fields': 'title,image', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([set(card) for card in response.data['results']], [{'id', 'title', 'image'}] * 2)
+        self.assertEqual(response.data['results'][0]['id'], cards[0]['id'])
+
+
+class BusinessSearchTests(TestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        listings = {
+            'title': ('Solar Farms Kenya', 'Clean power', 'Rooftop panels for schools'),
+            'description': ('Green Grid', 'Power for villages', 'Solar microgrids in Kenya and Uganda'),
+            'other': ('Coffee Roasters', 'Single origin', 'Beans from Ethiopia'),
+        }
+        self.businesses = {
+            key: Business.objects.create(
+                title=title, tagline=tagline, description=description, category='Energy', location='Nairobi',
+                funding_goal=Decimal('1000'), min_investment=Decimal('1'), user=owner,
+            )
+            for key, (title, tagline, description) in listings.items()
+        }
+        self.client = APIClient()
+
+    def _search(self, query):
+        response = self.client.get('/api/businesses/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [card['id'] for card in response.data]
+
+    def _assert_ranked_matches(self):
+        title, description = self.businesses['title'].pk, self.businesses['description'].pk
+        self.assertEqual(self._search('solar'), [title, description])
+        # The last word typed matches as a prefix, and every word must match
+        self.assertEqual(self._search('Kenya sol'), [title, description])
+        self.assertEqual(self._search('solar uganda'), [description])
+        self.assertEqual(self._search('solar coffee'), [])
+
+    def test_full_text_index_ranks_matches(self):
+        self.assertTrue(fts_available())
+        self._assert_ranked_matches()
+
+    def test_icontains_fallback_ranks_matches(self):
+        with mock.patch('investments.search.fts_available', return_value=False):
+            self._assert_ranked_matches()
+
+    def test_queries_without_words_match_nothing(self):
+        self.assertEqual(self._search('!!! ...'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        business = self.businesses['other']
+        self.assertEqual(self._search('coffee'), [business.pk])
+        business.title = 'Tea Growers'
+        business.save()
+        self.assertEqual(self._search('coffee'), [])
+        self.assertEqual(self._search('tea'), [business.pk])
+
+        # Funding updates leave the index alone
+        Business.objects.filter(pk=business.pk).update(current_funding=Decimal('50'))
+        self.assertEqual(self._search('tea'), [business.pk])
+
+        business.delete()
+        self.assertEqual(self._search('tea'), [])
+
+
+class DocumentExtractionTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        self.business = Business.objects.create(
+            title='Documented', tagline='Test', description='Document test', category='Docs',
+            location='Nowhere', funding_goal=Decimal('1000'), min_investment=Decimal('1'), user=self.owner,
+        )
+
+    def _jobs(self, document):
+        return list(Job.objects.filter(name=EXTRACT_JOB, payload__document_id=document.pk).values_list('status', flat=True))
+
+    def test_failed_extractions_are_not_queued_again_by_views(self):
+        document = BusinessDocument.objects.create(business=self.business, name='Plan', document_file='business_documents/gone.pdf')
+        # The file was missing, so the job failed for good
+        Job.objects.filter(name=EXTRACT_JOB).update(status=Job.STATUS_FAILED)
+
+        for _ in range(3):
+            response = APIClient().get(f'/api/businesses/{self.business.pk}/documents/context/')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._jobs(document), [Job.STATUS_FAILED])
+
+        # A new file is worth another try
+        document.document_file = 'business_documents/plan.pdf'
+        document.save(update_fields=['document_file'])
+        self.assertEqual(sorted(self._jobs(document)), sorted([Job.STATUS_FAILED, Job.STATUS_QUEUED]))
+
+    def test_owners_are_loaded_in_one_query(self):
+        def documents(count):
+            # bulk_create skips the signal that queues the jobs
+            BusinessDocument.objects.bulk_create([
+                BusinessDocument(business=self.business, name=f'Doc {i}', document_file=f'business_documents/{i}.pdf')
+                for i in range(count)
+            ])
+            return list(BusinessDocument.objects.all())
+
+        counts = []
+        for count in (2, 20):
+            Job.objects.all().delete()
+            BusinessDocument.objects.all().delete()
+            loaded = documents(count)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(queue_extraction(loaded), count)
+            counts.append(len(queries) - count)  # one insert per job
+        self.assertEqual(counts[0], counts[1])
+
+
+class StubModelServer(ThreadingHTTPServer):
+    """A stand-in for Ollama that streams a numbered answer one word at a time"""
+    daemon_threads = True
+
+    def __init__(self, tokens=20, delay=0.02):
+        super().__init__(('127.0.0.1', 0), StubModelHandler)
+        self.tokens = tokens
+        self.delay = delay
+        self.generations = 0
+        self.reply = None  # Set to bytes to answer with them instead
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def answer(self, number):
+        return ' '.join([f'Answer {number}:'] + [f'word{i}' for i in range(self.tokens)])
+
+
+class StubModelHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def end_headers(self):
+        # One request per connection, so clients that hang up don't reset a kept-alive one
+        self.send_header('Connection', 'close')
+        super().end_headers()
+
+    def do_GET(self):
+        if self.path != '/api/tags':
+            self.send_error(404)
+            return
+        body = json.dumps({'models': [{'name': chat_model()}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.generations += 1
+            number = self.server.generations
+        if self.server.reply is not None:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(self.server.reply)))
+            self.end_headers()
+            self.wfile.write(self.server.reply)
+            return
+        # Chunked, one line per chunk, like Ollama
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, word in enumerate(self.server.answer(number).split(' ')):
+            time.sleep(self.server.delay)
+            self._write_chunk({'response': word if i == 0 else f' {word}', 'done': False})
+        self._write_chunk({'response': '', 'done': True})
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, data):
+        line = json.dumps(data).encode() + b'\n'
+        self.wfile.write(f'{len(line):x}\r\n'.encode() + line + b'\r\n')
+        self.wfile.flush()
+
+
+def parse_events(chunks):
+    """The server-sent events in a streamed response body"""
+    body = ''.join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in chunks)
+    return [json.loads(event.removeprefix('data: ')) for event in body.split('\n\n') if event]
+
+
+@override_settings(RESPONSE_CACHE_ALIAS='default', AI_CHAT_TIMEOUT=10)
+class BusinessChatTests(TransactionTestCase):
+    """The AI chat endpoint against a stub model server (a transaction test, so concurrent requests see the data)"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubModelServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        # Answers and contexts are cached by business id, which the next test reuses
+        caches['default'].clear()
+        self.server.generations, self.server.reply = 0, None
+        settings_override = override_settings(AI_MODEL_SERVER_URL=self.server.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        self.business = Business.objects.create(
+            title='Chat business', tagline='Test', description='AI chat test', category='Test',
+            location='Nowhere', funding_goal=Decimal('1000'), min_investment=Decimal('1'), user=owner,
+        )
+        self.url = f'/api/businesses/{self.business.pk}/chat/'
+
+    def _ask(self, question):
+        """(answer, final event)"""
+        response = APIClient().post(self.url, {'question': question}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = parse_events(response.streaming_content)
+        return ''.join(event['token'] for event in events if 'token' in event), events[-1]
+
+    def test_status_sees_the_model_server(self):
+        response = APIClient().get('/api/ai/status/')
+        self.assertEqual(response.data, {'available': True, 'model': chat_model(), 'model_installed': True})
+
+    def test_business_context_is_cached(self):
+        with CaptureQueriesContext(connection) as cold:
+            build_prompt(self.business.pk, 'What is the revenue model?')
+        with CaptureQueriesContext(connection) as warm:
+            build_prompt(self.business.pk, 'What is the revenue model?')
+        self.assertLess(len(warm.captured_queries), len(cold.captured_queries))
+
+    def test_identical_questions_at_once_share_one_generation(self):
+        def ask(_):
+            try:
+                return self._ask('What are the key risks?')
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(ask, range(4)))
+        self.assertEqual(self.server.generations, 1)
+        self.assertEqual({answer for answer, _ in results}, {self.server.answer(1)})
+        self.assertIn('model', [final['source'] for _, final in results])
+        self.assertTrue(all(final['done'] for _, final in results))
+
+    def test_repeated_questions_are_answered_from_the_cache(self):
+        self._ask('What are the key risks?')
+        answer, final = self._ask('What are the key risks?')
+        self.assertEqual((answer, final['source'], self.server.generations), (self.server.answer(1), 'cache', 1))
+
+        # Another question, or a change to the business, needs a new answer
+        self._ask('Who is on the team?')
+        self.business.current_funding = Decimal('500')
+        self.business.save()
+        answer, final = self._ask('What are the key risks?')
+        self.assertEqual((answer, final['source'], self.server.generations), (self.server.answer(3), 'model', 3))
+
+    def test_model_server_errors_end_the_stream_with_an_error(self):
+        self.server.reply = json.dumps({'error': 'model crashed'}).encode() + b'\n'
+        answer, final = self._ask('Will this be answered?')
+        self.assertEqual((answer, final), ('', {'error': 'model crashed'}))
+
+    def test_unexpected_replies_end_the_stream_instead_of_stalling_it(self):
+        self.server.reply = b'[1, 2, 3]\n'
+        started = time.perf_counter()
+        answer, final = self._ask('Will this be answered?')
+        self.assertEqual(answer, '')
+        self.assertIn('error', final)
+        self.assertLess(time.perf_counter() - started, 5)
+
+    async def test_tokens_are_streamed_under_asgi(self):
+        response = await AsyncClient().post(self.url, {'question': 'How is it going?'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        chunks, arrivals = [], []
+        async for chunk in response.streaming_content:
+            chunks.append(chunk)
+            arrivals.append(time.perf_counter())
+        events = parse_events(chunks)
+        self.assertEqual(''.join(event['token'] for event in events if 'token' in event), self.server.answer(1))
+        self.assertEqual(events[-1], {'done': True, 'source': 'model'})
+        # Tokens arrive as they are generated, not all at once when the answer is complete
+        self.assertGreater(arrivals[-1] - arrivals[0], self.server.tokens * self.server.delay / 2)
@@ -1,9 +1,9 @@
 from django.urls import path
 from .views import (
     BusinessListView, BusinessDetailView, BusinessCreateView, BusinessUpdateView, 
-    BusinessDeleteView, UserBusinessListView, InvestAPIView, calendar_events, create_calendar_event,
+    BusinessDeleteView, UserBusinessListView, InvestAPIView, InvestBatchAPIView, calendar_events, create_calendar_event,
     SavedBusinessListView, SavedBusinessCreateView, SavedBusinessDeleteView, toggle_save_business,
-    extract_business_documents
+    extract_business_documents, business_document_context, business_chat, ai_status
 )
 
 urlpatterns = [
@@ -15,6 +15,7 @@ urlpatterns = [
     path('businesses/<int:id>/delete/', BusinessDeleteView.as_view(), name='business-delete'),
     path('my-businesses/', UserBusinessListView.as_view(), name='user-business-list'),
     path('invest/', InvestAPIView.as_view(), name='invest'),
+    path('invest/batch/', InvestBatchAPIView.as_view(), name='invest-batch'),
     path('calendar/events/', calendar_events, name='calendar-events'),
     path('calendar/events/create/', create_calendar_event, name='create-calendar-event'),
     
@@ -26,4 +27,7 @@ urlpatterns = [
     
     # Document extraction for AI chat
     path('businesses/<int:business_id>/documents/extract/', extract_business_documents, name='extract-business-documents'),
+    path('businesses/<int:business_id>/documents/context/', business_document_context, name='business-document-context'),
+    path('businesses/<int:business_id>/chat/', business_chat, name='business-chat'),
+    path('ai/status/', ai_status, name='ai-status'),
 ]
\ No newline at end of file
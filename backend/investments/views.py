@@ -11,6 +11,7 @@ from .serializers import (
     BusinessDetailSerializer,
     BusinessPitchSerializer,
     InvestmentSerializer,
+    InvestmentBatchSerializer,
     BusinessImageSerializer,
     BusinessVideoSerializer,
     BusinessDocumentSerializer,
@@ -19,88 +20,49 @@ from .serializers import (
     SavedBusinessListSerializer
 )
 from .permissions import IsOwnerOrReadOnly, IsOwner, IsAuthenticatedOrReadOnly
+from .pagination import BusinessKeysetPagination
+from .search import search_businesses
 from django.db.models import F
 from investments_tracking.models import Investment
+from investments_tracking.views import invest_batch_response, invest_response
 from django.utils.dateparse import parse_date
 from datetime import datetime
 from rest_framework.decorators import api_view, permission_classes
-from messaging.utils import create_automatic_friendship
 from django.shortcuts import get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from pdf_extractor import PDFExtractor
+from .documents import document_texts, queue_extraction
+from .retrieval import DEFAULT_CHUNKS, MAX_CHUNKS, retrieve_chunks
+from .chat import (
+    MAX_QUESTION_LENGTH, build_prompt, iterate_in_thread, model_server_status, server_sent_events, stream_answer,
+)
 
 class InvestAPIView(generics.GenericAPIView):
     serializer_class = InvestmentSerializer
     permission_classes = [IsAuthenticated]  # Require authentication for investment
 
-    @transaction.atomic
     def post(self, request, *args, **kwargs):
-        # Check if user is an entrepreneur - they cannot invest in any business
-        if request.user.user_type == 'entrepreneur':
-            return Response({
-                'error': 'Entrepreneurs cannot invest in other businesses. Focus on growing your own business!'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        serializer = self.get_serializer(data=request.data, context={'request': request})
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        
-        # Get the business and investment amount
-        business_id = serializer.validated_data['business_id']
-        investment_amount = serializer.validated_data['investment_amount']
-        
-        # Get the business
-        business = Business.objects.get(id=business_id)
-        
-        # Check if user has already invested in this business
-        existing_investment = Investment.objects.filter(user=request.user, business=business).first()
-        
-        if existing_investment:
-            # Update existing investment
-            old_amount = existing_investment.amount
-            existing_investment.amount += investment_amount
-            existing_investment.save()
-            
-            # Update the business funding (only add the new amount)
-            business.current_funding += investment_amount
-            business.save(update_fields=['current_funding'])
-            
-            # Automatically create friendship between investor and business owner
-            create_automatic_friendship(request.user, business.user)
-            
-            # Return the updated business data
-            return Response({
-                'message': f'Additional investment of ${investment_amount} successful! Total investment: ${existing_investment.amount}',
-                'current_funding': business.current_funding,
-                'backers': business.backers,
-                'investment_id': existing_investment.id,
-                'total_investment': existing_investment.amount
-            }, status=status.HTTP_200_OK)
-        else:
-            # Create new investment record
-            investment = Investment.objects.create(
-                user=request.user,
-                business=business,
-                amount=investment_amount
-            )
-            
-            # Update the business funding and backers count
-            business.current_funding += investment_amount
-            business.backers += 1
-            business.save(update_fields=['current_funding', 'backers'])
-            
-            # Automatically create friendship between investor and business owner
-            create_automatic_friendship(request.user, business.user)
-            
-            # Return the updated business data
-            return Response({
-                'message': 'Investment successful!',
-                'current_funding': business.current_funding,
-                'backers': business.backers,
-                'investment_id': investment.id
-            }, status=status.HTTP_200_OK)
+        # Funding, backers, the investment and its ledger entry in one locked transaction
+        return invest_response(request, serializer.validated_data['business_id'], serializer.validated_data['investment_amount'])
+
+class InvestBatchAPIView(generics.GenericAPIView):
+    serializer_class = InvestmentBatchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # All or nothing, checked against the goals and the user's fund up front
+        return invest_batch_response(request, [
+            (item['business_id'], item['investment_amount']) for item in serializer.validated_data['investments']
+        ])
 
 class BusinessDeleteView(generics.DestroyAPIView):
     queryset = Business.objects.all()
@@ -121,12 +83,48 @@ class BusinessListView(generics.ListAPIView):
     queryset = Business.objects.all()
     serializer_class = BusinessListSerializer
     permission_classes = [AllowAny]  # Allow public access to browse businesses
+    pagination_class = BusinessKeysetPagination  # Opt-in with ?page_size= or ?cursor=
+
+    # sort_by value -> column the feed is ordered by (descending, then by id)
+    SORT_FIELDS = {
+        'trending': 'backers',
+        'funding': 'current_funding',
+        'goal': 'funding_goal',
+        'relevance': 'search_score',  # only with ?search=, annotated by search_businesses
+    }
+    # Columns BusinessListSerializer reads from the business row itself
+    CARD_COLUMNS = [
+        'id', 'title', 'description', 'category', 'location',
+        'funding_goal', 'current_funding', 'backers', 'min_investment', 'user'
+    ]
 
     def get_serializer_context(self): # Add this method to pass request context
-        return {'request': self.request}
+        return {'request': self.request, 'fields': self.get_requested_fields()}
+
+    def get_sort_field(self):
+        searching = bool(self.request.query_params.get('search'))
+        sort_by = self.request.query_params.get('sort_by', 'relevance' if searching else 'trending')
+        if sort_by == 'relevance' and not searching:
+            sort_by = 'trending'
+        return self.SORT_FIELDS.get(sort_by, self.SORT_FIELDS['trending'])
+
+    def get_requested_fields(self):
+        """Field projection from ?fields=id,title,..., or None for every field"""
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        return {field.strip() for field in fields.split(',') if field.strip()} | {'id'}
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().with_card_data(self.request.user)
+
+        # Skip the long text columns the cards never show (and description unless asked for)
+        requested = self.get_requested_fields()
+        sort_field = self.get_sort_field()
+        columns = [column for column in self.CARD_COLUMNS if requested is None or column in requested]
+        if sort_field in self.CARD_COLUMNS:
+            columns.append(sort_field)
+        queryset = queryset.only('id', 'funding_goal', *columns)
 
         category = self.request.query_params.get('category', None)
         search = self.request.query_params.get('search', None)
@@ -134,21 +132,10 @@ class BusinessListView(generics.ListAPIView):
         if category and category != 'All Categories':
             queryset = queryset.filter(category=category)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search)
-            )
-
-        sort_by = self.request.query_params.get('sort_by', 'trending')
+            # Full-text match over title, tagline, description and category
+            queryset = search_businesses(queryset, search)
 
-        if sort_by == 'funding':
-            queryset = queryset.order_by('-current_funding')
-        elif sort_by == 'goal':
-            queryset = queryset.order_by('-funding_goal')
-        else:
-            queryset = queryset.order_by('-backers')
-
-        return queryset
+        return queryset.order_by(f'-{sort_field}', '-id')
 
 class BusinessDetailView(generics.RetrieveAPIView):
     queryset = Business.objects.all()
@@ -174,7 +161,7 @@ class UserBusinessListView(generics.ListAPIView):
 
     def get_queryset(self):
         # Return only businesses owned by the current user
-        return Business.objects.filter(user=self.request.user)
+        return Business.objects.filter(user=self.request.user).with_card_data(self.request.user)
 
     def get_serializer_context(self):
         return {'request': self.request}
@@ -284,40 +271,48 @@ def toggle_save_business(request, business_id):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def extract_business_documents(request, business_id):
-    """Extract text from business documents for AI chat"""
+    """
+    Text of a business's documents for AI chat. The text is extracted once per
+    file by the job worker when a document is uploaded (see documents.py), so
+    this only reads the cache; PDFs not extracted yet are queued and listed
+    under 'pending'.
+    """
     try:
         # Get the business
         business = get_object_or_404(Business, id=business_id)
         
-        # Get documents from the business
-        documents = business.documents.all()
+        # Get documents from the business, with their cached text
+        documents = list(business.documents.select_related('extracted_text', 'business__user'))
         
-        if not documents.exists():
+        if not documents:
             return Response({
                 'documents': {},
                 'summary': 'No documents available for this business.',
                 'message': 'This business has no documents uploaded.'
             })
         
-        # Convert documents to the format expected by PDFExtractor
+        # Describe the documents in the format expected by PDFExtractor
         documents_data = []
         for doc in documents:
             if doc.document_file:  # Check if file exists
                 documents_data.append({
                     'name': doc.name,
-                    'file_url': request.build_absolute_uri(doc.document_file.url),
+                    'file_url': doc.document_file.name,
                     'size': doc.size or f"{doc.document_file.size / 1024 / 1024:.1f} MB" if doc.document_file.size else "Unknown"
                 })
         
-        # Extract text from documents
-        extractor = PDFExtractor()
-        extracted_documents = extractor.process_business_documents(documents_data)
-        document_summary = extractor.get_document_summary(documents_data)
+        extracted_documents, pending = document_texts(documents)
+        queue_extraction(pending)
+        document_summary = PDFExtractor().get_document_summary(documents_data)
         
+        message = f'Successfully processed {len(extracted_documents)} documents.'
+        if pending:
+            message += f' {len(pending)} still being processed.'
         return Response({
             'documents': extracted_documents,
+            'pending': [doc.name for doc in pending],
             'summary': document_summary,
-            'message': f'Successfully processed {len(extracted_documents)} documents.'
+            'message': message
         })
         
     except Exception as e:
@@ -325,4 +320,78 @@ def extract_business_documents(request, business_id):
             'error': f'Failed to extract documents: {str(e)}',
             'documents': {},
             'summary': 'Error processing documents.'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def business_document_context(request, business_id):
+    """
+    The passages of a business's documents most relevant to the question in
+    `q`, for the AI chat prompt: at most `k` chunks (default 5, up to 20) of
+    about 200 words each, however long the documents are. Without `q` only
+    the document names and those still being extracted are returned.
+    """
+    business = get_object_or_404(Business, id=business_id)
+    question = request.query_params.get('q', '')
+    try:
+        limit = min(max(int(request.query_params.get('k', DEFAULT_CHUNKS)), 1), MAX_CHUNKS)
+    except ValueError:
+        return Response({'error': 'k must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    documents = list(business.documents.select_related('extracted_text', 'business__user'))
+    texts, pending = document_texts(documents)
+    queue_extraction(pending)
+
+    chunks = [
+        {
+            'document': document.name,
+            'page': chunk.page,
+            'text': chunk.text,
+            'score': round(score, 3),
+        }
+        for document, chunk, score in retrieve_chunks(documents, question, limit)
+    ]
+    return Response({
+        'documents': sorted(texts),
+        'pending': [doc.name for doc in pending],
+        'chunks': chunks,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def business_chat(request, business_id):
+    """
+    Answer an AI chat question about a business through the local model server
+    (AI_MODEL_SERVER_URL), streamed as server-sent events: {"token": ...} as
+    the answer is generated, then {"done": true, "source": ...} or
+    {"error": ...}. See chat.py for the context, coalescing and answer caches.
+    """
+    question = str(request.data.get('question', '')).strip()
+    if not question:
+        return Response({'error': 'Ask a question'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(question) > MAX_QUESTION_LENGTH:
+        return Response(
+            {'error': f'Questions are limited to {MAX_QUESTION_LENGTH} characters'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    prompt = build_prompt(business_id, question)
+    if prompt is None:
+        return Response({'error': 'Business not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    events = server_sent_events(stream_answer(prompt))
+    if isinstance(request._request, ASGIRequest):
+        events = iterate_in_thread(events)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let a proxy hold the tokens back until the answer is complete
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def ai_status(request):
+    """Whether the AI chat's model server is reachable and has the chat model"""
+    return Response(model_server_status())
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Investment
+from .models import Investment, InvestmentLedgerEntry, PortfolioHolding, PortfolioSummary
 
 @admin.register(Investment)
 class InvestmentAdmin(admin.ModelAdmin):
@@ -8,3 +8,24 @@ class InvestmentAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'business__title']
     readonly_fields = ['invested_at']
     ordering = ['-invested_at']
+
+@admin.register(PortfolioHolding)
+class PortfolioHoldingAdmin(admin.ModelAdmin):
+    list_display = ['user', 'business', 'invested', 'returns', 'share_percentage', 'roi_percentage', 'updated_at']
+    search_fields = ['user__username', 'business__title']
+    readonly_fields = ['updated_at']
+
+@admin.register(PortfolioSummary)
+class PortfolioSummaryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'total_invested', 'total_returns', 'investment_count', 'updated_at']
+    search_fields = ['user__username']
+    readonly_fields = ['updated_at']
+
+@admin.register(InvestmentLedgerEntry)
+class InvestmentLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'business', 'amount', 'funding_after', 'created_at']
+    search_fields = ['user__username', 'business__title']
+    readonly_fields = ['user', 'business', 'investment', 'amount', 'funding_after', 'created_at']
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class InvestmentsTrackingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'investments_tracking'
+
+    def ready(self):
+        import investments_tracking.signals
@@ -0,0 +1,127 @@
+import logging
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+
+from Blossomvest.benchmarks import api_client, response_error
+from investments.models import Business
+from investments_tracking.models import Investment, InvestmentLedgerEntry, PortfolioHolding, PortfolioSummary
+from notifications.models import Notification
+from users.funds import change_fund, reconcile_balances
+from users.models import CustomUser, FundTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Invest in many businesses one /api/invest/ call at a time and with one '
+        '/api/invest/batch/ call, compare queries and time, and check both leave the same '
+        'state behind (all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, default=50, help='Businesses per rebalance')
+
+    def handle(self, *args, **options):
+        count = options['businesses']
+        with transaction.atomic():
+            owner = CustomUser.objects.create(username='batch_bench_owner', user_type='entrepreneur')
+            businesses = [
+                Business.objects.create(
+                    title=f'Batch business {i}', tagline='Benchmark', description='Batch investment benchmark',
+                    category='Benchmark', location='Nowhere', funding_goal=Decimal('100000'),
+                    min_investment=Decimal('1'), user=owner,
+                )
+                for i in range(count)
+            ]
+            one_by_one, batched = [
+                CustomUser.objects.create(username=f'batch_bench_{name}', user_type='investor') for name in ('single', 'batch')
+            ]
+            for investor in (one_by_one, batched):
+                change_fund(investor, Decimal('1000000'), FundTransaction.DEPOSIT)
+            allocations = [(business.pk, Decimal(10 + i)) for i, business in enumerate(businesses)]
+
+            client = api_client()
+            client.force_authenticate(one_by_one)
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                for business_id, amount in allocations:
+                    response = client.post('/api/invest/', {'business_id': business_id, 'investment_amount': str(amount)}, format='json')
+                    if response.status_code != 201:
+                        raise CommandError(f'/api/invest/ returned {response.status_code}: {response_error(response)}')
+                single_ms = (time.perf_counter() - started) * 1000
+            single_queries = len(context.captured_queries)
+
+            client.force_authenticate(batched)
+            batch_queries, batch_ms, data = self._batch(client, allocations, 201)
+            self.stdout.write(f'{"":<28} {"queries":>8} {"ms":>9}')
+            self.stdout.write(f'{f"{count} x /api/invest/":<28} {single_queries:>8} {single_ms:>9.1f}')
+            self.stdout.write(f'{"1 x /api/invest/batch/":<28} {batch_queries:>8} {batch_ms:>9.1f}')
+
+            # Both investors end up in the same place, except that the batch is paid from the fund
+            total = sum(amount for _, amount in allocations)
+            for investor in (one_by_one, batched):
+                investments = Investment.objects.filter(user=investor)
+                if investments.count() != count or investments.aggregate(total=Sum('amount'))['total'] != total:
+                    raise CommandError(f'{investor.username} does not hold the expected investments')
+                if InvestmentLedgerEntry.objects.filter(user=investor).aggregate(total=Sum('amount'))['total'] != total:
+                    raise CommandError(f'The investment ledger of {investor.username} is wrong')
+                if PortfolioHolding.objects.filter(user=investor).aggregate(total=Sum('invested'))['total'] != total:
+                    raise CommandError(f'The portfolio holdings of {investor.username} are wrong')
+                if PortfolioSummary.objects.get(user=investor).investment_count != count:
+                    raise CommandError(f'The portfolio summary of {investor.username} is wrong')
+                if Notification.objects.filter(recipient=investor).count() != count:
+                    raise CommandError(f'{investor.username} did not get one notification per investment')
+            batched.refresh_from_db()
+            if batched.fund != Decimal('1000000') - total or data['fund'] != batched.fund:
+                raise CommandError(f'The batch left a fund of {batched.fund}')
+            if any(business.backers != 2 for business in Business.objects.filter(user=owner)):
+                raise CommandError('backers were not counted once per investor')
+            if Notification.objects.filter(recipient=owner).count() != 2 * count:
+                raise CommandError('The owner did not get one notification per investment')
+            # Equal stakes in every business, whichever way they were bought
+            if PortfolioHolding.objects.filter(business__user=owner).exclude(share_percentage=50).exists():
+                raise CommandError('Business shares were not refreshed by the batch')
+
+            # A top-up batch costs the same, whatever its size
+            small_queries = self._batch(client, allocations[:max(1, count // 5)], 201)[0]
+            large_queries = self._batch(client, allocations, 201)[0]
+            self.stdout.write(f'Top-up batch: {small_queries} queries for {max(1, count // 5)} businesses, {large_queries} for {count}')
+            if small_queries != large_queries:
+                raise CommandError('The batch costs more queries for more businesses')
+
+            # A refused batch reports every problem and changes nothing
+            logging.getLogger('django.request').setLevel(logging.ERROR)
+            before = (Investment.objects.filter(user=batched).aggregate(total=Sum('amount'))['total'], batched.fund)
+            full = businesses[0]
+            Business.objects.filter(pk=full.pk).update(current_funding=full.funding_goal)
+            queries, _, data = self._batch(client, [(full.pk, Decimal('5')), (0, Decimal('5')), (businesses[1].pk, Decimal('99999999'))], 400)
+            reasons = {problem['business_id'] for problem in data['problems']}
+            if reasons != {full.pk, 0, businesses[1].pk, None}:
+                raise CommandError(f'The refused batch reported {data["problems"]}')
+            batched.refresh_from_db()
+            if (Investment.objects.filter(user=batched).aggregate(total=Sum('amount'))['total'], batched.fund) != before:
+                raise CommandError('A refused batch changed investments or the fund')
+            self.stdout.write(f'Refused batch: {len(data["problems"])} problems reported in {queries} queries, nothing written')
+
+            if list(reconcile_balances()):
+                raise CommandError('Funds and the fund ledger disagree')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Batch investments are all-or-nothing and cost a fixed number of queries'))
+
+    def _batch(self, client, allocations, expected_status):
+        body = {'investments': [{'business_id': business_id, 'investment_amount': str(amount)} for business_id, amount in allocations]}
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.post('/api/invest/batch/', body, format='json')
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != expected_status:
+            raise CommandError(f'/api/invest/batch/ returned {response.status_code}: {response_error(response)}')
+        return len(context.captured_queries), elapsed, response.data
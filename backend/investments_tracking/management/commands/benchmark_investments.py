@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import force_authenticate
+
+from Blossomvest.benchmarks import api_client, request_factory, response_error
+from investments.models import Business
+from investments_tracking.models import Investment, InvestmentLedgerEntry
+from investments_tracking.views import create_investment
+from messaging.models import Conversation
+from users.funds import apply_fund_changes
+from users.models import CustomUser, FundTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Count the queries of each investment endpoint as a business gains investors, check '
+        'they answer alike, then measure investments/sec under concurrent load on the '
+        'configured database; point DATABASES at MySQL to compare it with SQLite, whose single '
+        'writer caps the rate however many threads are used (created data is deleted afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backers', type=int, default=500, help='Existing investors of the query-count business')
+        parser.add_argument('--businesses', type=int, default=20, help='Businesses receiving the concurrent load')
+        parser.add_argument('--investors', type=int, default=200, help='Investors in the concurrent load')
+        parser.add_argument('--investments', type=int, default=1000, help='Concurrent investments to fire')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent requests')
+
+    def handle(self, *args, **options):
+        self._cleanup()
+        try:
+            self._run(options)
+        finally:
+            self._cleanup()
+
+    def _cleanup(self):
+        users = CustomUser.objects.filter(username__startswith='invest_bench_')
+        Conversation.objects.filter(participants__in=users).delete()
+        users.delete()
+
+    def _business(self, owner, title, goal):
+        return Business.objects.create(
+            title=title, tagline='Benchmark', description='Investment benchmark', category='Benchmark',
+            location='Nowhere', funding_goal=goal, min_investment=Decimal('1'), user=owner,
+        )
+
+    def _investors(self, prefix, count):
+        investors = CustomUser.objects.bulk_create([
+            CustomUser(username=f'invest_bench_{prefix}_{i}', user_type='investor') for i in range(count)
+        ], batch_size=500)
+        # Enough in every fund for the endpoint that pays from it
+        apply_fund_changes({investor.pk: Decimal('100000') for investor in investors}, FundTransaction.DEPOSIT)
+        return investors
+
+    def _run(self, options):
+        self.stdout.write(f'Database: {connection.vendor}')
+        owner = CustomUser.objects.create(username='invest_bench_owner', user_type='entrepreneur')
+        self._query_counts(owner, options['backers'])
+        self._concurrent(owner, options)
+        self.stdout.write(self.style.SUCCESS('Every investment endpoint shares one fixed-cost, contention-safe path'))
+
+    def _query_counts(self, owner, backers):
+        business = self._business(owner, 'Query count business', Decimal('10000000'))
+        investors = self._investors('count', 6)
+        factory = request_factory()
+
+        def invest_api(user):
+            client = api_client()
+            client.force_authenticate(user)
+            return client.post('/api/invest/', {'business_id': business.pk, 'investment_amount': '10'}, format='json')
+
+        def tracking_create(user):
+            client = api_client()
+            client.force_authenticate(user)
+            return client.post('/api/investments-tracking/create/', {'business': business.pk, 'amount': '10'}, format='json')
+
+        def create_from_fund(user):
+            # Not routed; called directly
+            request = factory.post('/', {'business': business.pk, 'amount': '10'}, format='json')
+            force_authenticate(request, user=user)
+            response = create_investment(request)
+            response.render()
+            return response
+
+        endpoints = [('/api/invest/', invest_api), ('investments-tracking/create/', tracking_create), ('create_investment', create_from_fund)]
+        self.stdout.write('Queries per investment (first investment includes befriending the owner):')
+        self.stdout.write(f'  {"endpoint":<30} {"existing backers":>16} {"first":>6} {"top-up":>7}')
+        payload_keys = set()
+        counts = {}
+        for existing in (0, backers):
+            if existing:
+                others = self._investors('backer', backers)
+                Investment.objects.bulk_create([Investment(user=other, business=business, amount=Decimal('1')) for other in others])
+            for index, (name, call) in enumerate(endpoints):
+                user = investors[index + (3 if existing else 0)]
+                row = []
+                for expected_status in (201, 200):
+                    connection.queries_log.clear()
+                    with CaptureQueriesContext(connection) as context:
+                        response = call(user)
+                    if response.status_code != expected_status:
+                        raise CommandError(f'{name} returned {response.status_code}: {response_error(response)}')
+                    payload_keys.add(tuple(sorted(response.data)))
+                    row.append(len(context.captured_queries))
+                counts.setdefault(name, []).append(row)
+                self.stdout.write(f'  {name:<30} {existing:>16} {row[0]:>6} {row[1]:>7}')
+
+        for name, rows in counts.items():
+            if rows[0] != rows[1]:
+                raise CommandError(f'{name} costs more queries once the business has {backers} backers')
+        if len(payload_keys) != 1:
+            raise CommandError(f'The endpoints answer with different payloads: {sorted(payload_keys)}')
+
+        business.refresh_from_db()
+        if business.backers != 6:
+            raise CommandError(f'backers is {business.backers}, expected the 6 investors who went through the service')
+
+    def _concurrent(self, owner, options):
+        businesses = [
+            self._business(owner, f'Load business {i}', Decimal('10000000')) for i in range(options['businesses'])
+        ]
+        investors = self._investors('load', options['investors'])
+        amount = Decimal('10')
+        errors = []
+        lock = threading.Lock()
+
+        def invest(i):
+            client = api_client()
+            client.force_authenticate(investors[i % len(investors)])
+            business = businesses[(i * 7) % len(businesses)]
+            try:
+                response = client.post('/api/invest/', {'business_id': business.pk, 'investment_amount': str(amount)}, format='json')
+                if response.status_code not in (200, 201):
+                    with lock:
+                        errors.append(f'{response.status_code}: {response_error(response)}')
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+            finally:
+                connections.close_all()
+
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(invest, range(options['investments'])))
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(f'{len(errors)} investments failed, first: {errors[0]}')
+
+        self.stdout.write(
+            f"{options['investments']} investments in {len(businesses)} businesses on {options['threads']} threads: "
+            f"{elapsed:.2f} s, {options['investments'] / elapsed:.0f} investments/s"
+        )
+
+        ids = [business.pk for business in businesses]
+        invested = dict(
+            Investment.objects.filter(business_id__in=ids).values('business_id')
+            .annotate(total=Sum('amount'), count=Count('id')).values_list('business_id', 'total')
+        )
+        ledger = dict(
+            InvestmentLedgerEntry.objects.filter(business_id__in=ids).values('business_id')
+            .annotate(total=Sum('amount')).values_list('business_id', 'total')
+        )
+        backers = dict(
+            Investment.objects.filter(business_id__in=ids).values('business_id')
+            .annotate(count=Count('id')).values_list('business_id', 'count')
+        )
+        total = Decimal('0')
+        for business in Business.objects.filter(pk__in=ids):
+            total += business.current_funding
+            if not business.current_funding == invested.get(business.pk) == ledger.get(business.pk):
+                raise CommandError(f'Business {business.pk}: funding, investments and ledger disagree')
+            if business.backers != backers.get(business.pk):
+                raise CommandError(f'Business {business.pk}: backers {business.backers}, investors {backers.get(business.pk)}')
+        if total != amount * options['investments']:
+            raise CommandError(f'{total} invested in total, expected {amount * options["investments"]}')
@@ -0,0 +1,103 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from investments.models import Business
+from investments_tracking.models import Investment, PortfolioHolding, PortfolioSummary
+from investments_tracking.portfolio import rebuild_portfolios
+from investments_tracking.views import investor_statistics
+from logs.models import Log
+from logs.services import ProfitDistributionService
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the investor statistics dashboard runs a fixed number of queries '
+        'whatever the number of holdings, and that the maintained portfolio matches '
+        'a full rebuild (all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--holdings',
+            type=int,
+            nargs='+',
+            default=[5, 50, 200],
+            help='Numbers of businesses the investor holds',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'holdings':>8} {'queries':>8} {'seconds':>9}")
+        query_counts = set()
+        for count in options['holdings']:
+            queries, elapsed = self._run(count)
+            query_counts.add(queries)
+            self.stdout.write(f"{count:>8} {queries:>8} {elapsed:>9.3f}")
+
+        if len(query_counts) > 1:
+            raise CommandError('The dashboard query count depends on the number of holdings')
+        self.stdout.write(self.style.SUCCESS('The dashboard query count is constant and the portfolio is consistent'))
+
+    def _run(self, count):
+        with transaction.atomic():
+            owner = CustomUser.objects.create(username=f'stats_owner_{count}', user_type='entrepreneur')
+            investor = CustomUser.objects.create(username=f'stats_investor_{count}', user_type='investor')
+            other = CustomUser.objects.create(username=f'stats_other_{count}', user_type='investor')
+            businesses = Business.objects.bulk_create([
+                Business(
+                    title=f'Stats Business {i}',
+                    tagline='Benchmark',
+                    description='Investor statistics benchmark',
+                    category='Benchmark',
+                    location='Nowhere',
+                    funding_goal=Decimal('1000'),
+                    min_investment=Decimal('1'),
+                    user=owner,
+                )
+                for i in range(count)
+            ], batch_size=500)
+            # Investments go through save() so the portfolio is maintained the normal way
+            for i, business in enumerate(businesses):
+                Investment.objects.create(user=investor, business=business, amount=Decimal(100 + i))
+                Investment.objects.create(user=other, business=business, amount=Decimal('300'))
+            top_up = Investment.objects.get(user=investor, business=businesses[0])
+            top_up.amount += Decimal('50')
+            top_up.save(update_fields=['amount'])
+
+            service = ProfitDistributionService()
+            for business in businesses[::2]:
+                service.distribute(Log.objects.create(
+                    business=business, content='Benchmark', month=1, year=2025,
+                    total_revenue=Decimal('500'), total_expense=Decimal('120'),
+                ))
+
+            request = APIRequestFactory().get('/api/investments/investor-statistics/')
+            force_authenticate(request, user=investor)
+            connection.queries_log.clear()  # setup can overflow the capped query log
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = investor_statistics(request)
+                elapsed = time.perf_counter() - started
+
+            maintained = self._snapshot(investor)
+            rebuild_portfolios([investor.pk, other.pk])
+            if maintained != self._snapshot(investor):
+                raise CommandError('The maintained portfolio differs from a full rebuild')
+            if response.status_code != 200:
+                raise CommandError(f'Dashboard returned {response.status_code}: {response.data}')
+
+            transaction.set_rollback(True)
+
+        return len(context.captured_queries), elapsed
+
+    def _snapshot(self, investor):
+        holdings = PortfolioHolding.objects.filter(user=investor).order_by('business_id').values_list(
+            'business_id', 'invested', 'returns', 'share_percentage', 'roi_percentage'
+        )
+        summary = PortfolioSummary.objects.get(user=investor)
+        return list(holdings), (summary.total_invested, summary.total_returns, summary.investment_count)
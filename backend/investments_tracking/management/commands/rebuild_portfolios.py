@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from investments_tracking.portfolio import rebuild_portfolios
+
+
+class Command(BaseCommand):
+    help = 'Recompute investor portfolio holdings and summaries from investments and profit distributions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, nargs='+', dest='user_ids', help='Only rebuild these user ids')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_portfolios(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} portfolio holdings'))
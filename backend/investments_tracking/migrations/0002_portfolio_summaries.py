@@ -0,0 +1,47 @@
+# Generated by Django 4.2.13 on 2026-10-18 00:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('investments', '0010_business_search_index'),
+        ('investments_tracking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_invested', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_returns', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('investment_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PortfolioHolding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invested', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('returns', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('share_percentage', models.DecimalField(decimal_places=4, default=0, help_text="Share of the business's total investment", max_digits=7)),
+                ('roi_percentage', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('invested_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_holdings', to='investments.business')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_holdings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-invested_at'],
+                'indexes': [models.Index(fields=['user', '-invested_at'], name='holding_user_invested_at_idx')],
+                'unique_together': {('user', 'business')},
+            },
+        ),
+    ]
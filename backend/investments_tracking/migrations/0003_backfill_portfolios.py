@@ -0,0 +1,63 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Sum
+
+
+def backfill_portfolios(apps, schema_editor):
+    Investment = apps.get_model('investments_tracking', 'Investment')
+    PortfolioHolding = apps.get_model('investments_tracking', 'PortfolioHolding')
+    PortfolioSummary = apps.get_model('investments_tracking', 'PortfolioSummary')
+    ProfitDistribution = apps.get_model('logs', 'ProfitDistribution')
+
+    returns = {
+        (row['user_id'], row['log__business_id']): row['total']
+        for row in ProfitDistribution.objects.values('user_id', 'log__business_id').annotate(total=Sum('amount_distributed'))
+    }
+    business_totals = {
+        row['business_id']: row['total']
+        for row in Investment.objects.values('business_id').annotate(total=Sum('amount'))
+    }
+
+    holdings = []
+    summaries = defaultdict(lambda: {'invested': Decimal('0'), 'returns': Decimal('0'), 'count': 0})
+    for investment in Investment.objects.iterator():
+        holding_returns = returns.get((investment.user_id, investment.business_id), Decimal('0'))
+        business_total = business_totals.get(investment.business_id) or Decimal('0')
+        holdings.append(PortfolioHolding(
+            user_id=investment.user_id,
+            business_id=investment.business_id,
+            invested=investment.amount,
+            returns=holding_returns,
+            share_percentage=(investment.amount * 100 / business_total).quantize(Decimal('0.0001')) if business_total > 0 else 0,
+            roi_percentage=(holding_returns * 100 / investment.amount).quantize(Decimal('0.01')) if investment.amount > 0 else 0,
+            invested_at=investment.invested_at,
+        ))
+        summary = summaries[investment.user_id]
+        summary['invested'] += investment.amount
+        summary['returns'] += holding_returns
+        summary['count'] += 1
+
+    PortfolioHolding.objects.bulk_create(holdings, batch_size=500)
+    PortfolioSummary.objects.bulk_create([
+        PortfolioSummary(
+            user_id=user_id,
+            total_invested=summary['invested'],
+            total_returns=summary['returns'],
+            investment_count=summary['count'],
+        )
+        for user_id, summary in summaries.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_tracking', '0002_portfolio_summaries'),
+        ('logs', '0005_alter_log_title'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_portfolios, migrations.RunPython.noop),
+    ]
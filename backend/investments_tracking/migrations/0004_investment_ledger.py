@@ -0,0 +1,33 @@
+# Generated by Django 4.2.13 on 2026-10-18 01:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0010_business_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('investments_tracking', '0003_backfill_portfolios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvestmentLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('funding_after', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='investment_ledger', to='investments.business')),
+                ('investment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='investments_tracking.investment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='investment_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['business', 'id'], name='ledger_business_idx')],
+            },
+        ),
+    ]
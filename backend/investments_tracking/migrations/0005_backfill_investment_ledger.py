@@ -0,0 +1,34 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def backfill_investment_ledger(apps, schema_editor):
+    Investment = apps.get_model('investments_tracking', 'Investment')
+    InvestmentLedgerEntry = apps.get_model('investments_tracking', 'InvestmentLedgerEntry')
+
+    # One opening entry per existing investment, in the order they were made
+    funding = defaultdict(lambda: Decimal('0'))
+    entries = []
+    for investment in Investment.objects.order_by('invested_at', 'id').iterator():
+        funding[investment.business_id] += investment.amount
+        entries.append(InvestmentLedgerEntry(
+            user_id=investment.user_id,
+            business_id=investment.business_id,
+            investment_id=investment.id,
+            amount=investment.amount,
+            funding_after=funding[investment.business_id],
+        ))
+    InvestmentLedgerEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments_tracking', '0004_investment_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_investment_ledger, migrations.RunPython.noop),
+    ]
@@ -20,3 +20,75 @@ class Investment(models.Model):
     @property
     def formatted_amount(self):
         return f"${self.amount:,.2f}"
+
+
+class PortfolioHolding(models.Model):
+    """
+    One investor's position in one business, kept up to date when investments
+    and profit distributions are written (see investments_tracking.portfolio)
+    so the investor dashboard doesn't aggregate on every load.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='portfolio_holdings')
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='portfolio_holdings')
+    invested = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    returns = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    share_percentage = models.DecimalField(max_digits=7, decimal_places=4, default=0, help_text="Share of the business's total investment")
+    roi_percentage = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    invested_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'business']
+        ordering = ['-invested_at']
+        indexes = [
+            models.Index(fields=['user', '-invested_at'], name='holding_user_invested_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} holds {self.share_percentage}% of {self.business.title}"
+
+
+class PortfolioSummary(models.Model):
+    """Totals over an investor's holdings, maintained alongside PortfolioHolding"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='portfolio_summary')
+    total_invested = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_returns = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    investment_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username}: ${self.total_invested} invested, ${self.total_returns} returned"
+
+    @property
+    def roi_percentage(self):
+        return float(self.total_returns) / float(self.total_invested) * 100 if self.total_invested > 0 else 0
+
+
+class InvestmentLedgerEntry(models.Model):
+    """
+    Append-only record of every amount invested, written by
+    investments_tracking.services in the same transaction as the funding
+    update. `funding_after` is the business's current_funding once the entry
+    applied, so the ledger replays to the funding total. Entries are never
+    updated.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='investment_ledger')
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='investment_ledger')
+    investment = models.ForeignKey(Investment, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    funding_after = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['business', 'id'], name='ledger_business_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} invested ${self.amount} in business {self.business_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Investment ledger entries are append-only')
+        super().save(*args, **kwargs)
@@ -0,0 +1,231 @@
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+
+from users.funds import amount_case
+
+from .models import Investment, PortfolioHolding, PortfolioSummary
+
+# Users per set-based UPDATE when crediting distribution returns
+RETURNS_UPDATE_BATCH_SIZE = 500
+
+_money = DecimalField(max_digits=14, decimal_places=2)
+_percentage = DecimalField(max_digits=12, decimal_places=4)
+_ZERO = Value(Decimal('0'), output_field=_money)
+
+
+def _percentage_of(part, whole):
+    # Computed in floating point: SQLite would otherwise divide whole-number decimals as integers
+    return ExpressionWrapper(
+        Cast(part, FloatField()) * Value(100.0) / Cast(whole, FloatField()),
+        output_field=_percentage,
+    )
+
+
+def _roi(returns):
+    """ROI expression for holdings given an expression for their new returns"""
+    return Case(
+        When(invested__gt=0, then=_percentage_of(returns, F('invested'))),
+        default=_ZERO,
+        output_field=_percentage,
+    )
+
+
+def sync_investment(investment):
+    """
+    Bring the holding for `investment` in line with it after it was created or
+    topped up, then refresh the business's shares and the investor's summary.
+    Costs a fixed handful of queries however many investors the business has.
+    """
+    holding, created = PortfolioHolding.objects.get_or_create(
+        user_id=investment.user_id,
+        business_id=investment.business_id,
+        defaults={'invested': investment.amount, 'invested_at': investment.invested_at},
+    )
+    if not created:
+        PortfolioHolding.objects.filter(pk=holding.pk).update(
+            invested=investment.amount,
+            invested_at=investment.invested_at,
+            roi_percentage=(
+                _percentage_of(F('returns'), Value(investment.amount, output_field=_money))
+                if investment.amount > 0 else _ZERO
+            ),
+        )
+    refresh_business_shares(investment.business_id)
+    refresh_summary(investment.user_id)
+
+
+def sync_investments(user_id, investments):
+    """
+    sync_investment for many of one investor's investments at once (each in a
+    different business), e.g. after a batch of bulk writes. Costs the same
+    handful of queries however many investments there are.
+    """
+    holdings = {
+        holding.business_id: holding
+        for holding in PortfolioHolding.objects.filter(
+            user_id=user_id, business_id__in=[investment.business_id for investment in investments]
+        )
+    }
+    new, changed = [], []
+    for investment in investments:
+        holding = holdings.get(investment.business_id)
+        if holding is None:
+            new.append(PortfolioHolding(
+                user_id=user_id,
+                business_id=investment.business_id,
+                invested=investment.amount,
+                invested_at=investment.invested_at,
+            ))
+        else:
+            holding.invested = investment.amount
+            holding.invested_at = investment.invested_at
+            holding.roi_percentage = holding.returns * 100 / investment.amount if investment.amount > 0 else Decimal('0')
+            changed.append(holding)
+    PortfolioHolding.objects.bulk_create(new, batch_size=RETURNS_UPDATE_BATCH_SIZE)
+    PortfolioHolding.objects.bulk_update(
+        changed, ['invested', 'invested_at', 'roi_percentage'], batch_size=RETURNS_UPDATE_BATCH_SIZE
+    )
+    refresh_many_business_shares([investment.business_id for investment in investments])
+    refresh_summary(user_id)
+
+
+def remove_investment(investment, refresh_investor=True):
+    """
+    Drop the holding for a deleted investment and refresh what depended on it.
+    Pass refresh_investor=False when the investor is being deleted too.
+    """
+    PortfolioHolding.objects.filter(user_id=investment.user_id, business_id=investment.business_id).delete()
+    refresh_business_shares(investment.business_id)
+    if refresh_investor:
+        refresh_summary(investment.user_id)
+
+
+def refresh_business_shares(business_id):
+    """Recompute every holder's share of a business with one aggregate and one UPDATE"""
+    holdings = PortfolioHolding.objects.filter(business_id=business_id)
+    total = holdings.aggregate(total=Sum('invested'))['total'] or Decimal('0')
+    if total > 0:
+        holdings.update(share_percentage=_percentage_of(F('invested'), Value(total, output_field=_money)))
+    else:
+        holdings.update(share_percentage=_ZERO)
+
+
+def refresh_many_business_shares(business_ids):
+    """
+    refresh_business_shares for many businesses: one aggregate, then one
+    UPDATE per batch that picks each holding's business total with a CASE
+    (portable to MySQL, which can't UPDATE a table from a subquery on itself).
+    """
+    totals = [
+        (row['business_id'], row['total'])
+        for row in PortfolioHolding.objects.filter(business_id__in=business_ids).order_by().values('business_id')
+        .annotate(total=Sum('invested'))
+        if row['total'] and row['total'] > 0
+    ]
+    for start in range(0, len(totals), RETURNS_UPDATE_BATCH_SIZE):
+        batch = totals[start:start + RETURNS_UPDATE_BATCH_SIZE]
+        total = Case(
+            *[When(business_id=business_id, then=Value(total, output_field=_money)) for business_id, total in batch],
+            output_field=_money,
+        )
+        PortfolioHolding.objects.filter(business_id__in=[business_id for business_id, _ in batch]).update(
+            share_percentage=_percentage_of(F('invested'), total)
+        )
+
+
+def refresh_summary(user_id):
+    """Recompute an investor's totals from their holdings"""
+    totals = PortfolioHolding.objects.filter(user_id=user_id).aggregate(
+        invested=Sum('invested'),
+        returns=Sum('returns'),
+        count=Count('id'),
+    )
+    # One upsert, where update_or_create costs a SELECT and savepoints on top
+    PortfolioSummary.objects.bulk_create(
+        [PortfolioSummary(
+            user_id=user_id,
+            total_invested=totals['invested'] or Decimal('0'),
+            total_returns=totals['returns'] or Decimal('0'),
+            investment_count=totals['count'],
+        )],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['total_invested', 'total_returns', 'investment_count', 'updated_at'],
+    )
+
+
+def record_returns(business_id, returns):
+    """
+    Add distributed profit to holdings and summaries with set-based UPDATEs,
+    one pair per batch of investors. `returns` maps user id -> Decimal amount
+    (negative to take a distribution back).
+    """
+    items = [(user_id, amount) for user_id, amount in returns.items() if amount]
+
+    for start in range(0, len(items), RETURNS_UPDATE_BATCH_SIZE):
+        batch = items[start:start + RETURNS_UPDATE_BATCH_SIZE]
+        user_ids = [user_id for user_id, _ in batch]
+        delta = amount_case(batch, column='user_id')
+        # Both assignments read the pre-update returns, so ROI uses returns + delta
+        PortfolioHolding.objects.filter(business_id=business_id, user_id__in=user_ids).update(
+            returns=F('returns') + delta,
+            roi_percentage=_roi(F('returns') + delta),
+        )
+        PortfolioSummary.objects.filter(user_id__in=user_ids).update(
+            total_returns=F('total_returns') + delta,
+        )
+
+
+def rebuild_portfolios(user_ids=None):
+    """
+    Recompute holdings and summaries from the investment and distribution
+    tables (for all investors, or just `user_ids`). Used to repair drift; the
+    normal write paths keep these tables current incrementally.
+    """
+    from logs.models import ProfitDistribution
+
+    investments = Investment.objects.all()
+    holdings = PortfolioHolding.objects.all()
+    summaries = PortfolioSummary.objects.all()
+    distributions = ProfitDistribution.objects.all()
+    if user_ids is not None:
+        investments = investments.filter(user_id__in=user_ids)
+        holdings = holdings.filter(user_id__in=user_ids)
+        summaries = summaries.filter(user_id__in=user_ids)
+        distributions = distributions.filter(user_id__in=user_ids)
+
+    returns = {
+        (row['user_id'], row['log__business_id']): row['total']
+        for row in distributions.values('user_id', 'log__business_id').annotate(total=Sum('amount_distributed'))
+    }
+
+    holdings.delete()
+    summaries.delete()
+    new_holdings = []
+    for investment in investments.iterator():
+        holding_returns = returns.get((investment.user_id, investment.business_id), Decimal('0'))
+        new_holdings.append(PortfolioHolding(
+            user_id=investment.user_id,
+            business_id=investment.business_id,
+            invested=investment.amount,
+            returns=holding_returns,
+            roi_percentage=holding_returns * 100 / investment.amount if investment.amount > 0 else Decimal('0'),
+            invested_at=investment.invested_at,
+        ))
+    PortfolioHolding.objects.bulk_create(new_holdings, batch_size=500)
+
+    for business_id in {holding.business_id for holding in new_holdings}:
+        refresh_business_shares(business_id)
+
+    PortfolioSummary.objects.bulk_create([
+        PortfolioSummary(
+            user_id=row['user_id'],
+            total_invested=row['invested'],
+            total_returns=row['returns'],
+            investment_count=row['count'],
+        )
+        for row in holdings.values('user_id').annotate(invested=Sum('invested'), returns=Sum('returns'), count=Count('id'))
+    ], batch_size=500)
+    return len(new_holdings)
@@ -1,10 +1,12 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import Investment
 
 class InvestmentSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
     business_title = serializers.CharField(source='business.title', read_only=True)
-    formatted_amount = serializers.CharField(source='formatted_amount', read_only=True)
+    formatted_amount = serializers.CharField(read_only=True)
     business_category = serializers.CharField(source='business.category', read_only=True)
     entrepreneur_name = serializers.SerializerMethodField()
     
@@ -27,17 +29,30 @@ class InvestmentSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class InvestmentCreateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Investment
-        fields = ['business', 'amount']
-    
-    def create(self, validated_data):
-        user = self.context['request'].user
-        business = validated_data['business']
-        amount = validated_data['amount']
-        investment, created = Investment.objects.get_or_create(user=user, business=business, defaults={'amount': amount})
-        if not created:
-            investment.amount += amount
-            investment.save(update_fields=['amount'])
-        return investment 
\ No newline at end of file
+class InvestmentCreateSerializer(serializers.Serializer):
+    """Input for investing `amount` in business `business`; saved by InvestmentService"""
+    business = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+
+
+def investment_result_data(investment, business, created, amount):
+    """
+    The response body of every investment endpoint, for `amount` invested
+    with the given result of InvestmentService.invest (which loads everything
+    this reads, so it costs no queries).
+    """
+    if created:
+        message = 'Investment successful!'
+    else:
+        message = f'Additional investment of ${amount} successful! Total investment: ${investment.amount}'
+    return {
+        'message': message,
+        'created': created,
+        'investment_id': investment.id,
+        'amount': amount,
+        'total_investment': investment.amount,
+        'current_funding': business.current_funding,
+        'funding_goal': business.funding_goal,
+        'backers': business.backers,
+        'investment': InvestmentSerializer(investment).data,
+    }
@@ -0,0 +1,280 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Subquery, Value, When
+from django.dispatch import Signal
+
+from investments.models import Business
+from messaging.utils import create_automatic_friendship
+from users.funds import InsufficientFunds, change_fund
+from users.models import CustomUser, FundTransaction
+from .models import Investment, InvestmentLedgerEntry
+
+# Most businesses one batch may invest in
+MAX_BATCH_INVESTMENTS = 100
+
+# Sent inside the transaction of InvestmentService.invest and invest_many,
+# whose bulk writes skip post_save. Receivers get `user`, `results` (a list of
+# (investment, business, created)) and `amounts` (business id -> amount
+# invested by this batch) keyword arguments.
+investments_batched = Signal()
+
+_money = DecimalField(max_digits=10, decimal_places=2)
+
+
+class InvestmentError(Exception):
+    """Base class for reasons an investment is refused"""
+
+
+class InvestorsOnly(InvestmentError):
+    pass
+
+
+class InvalidInvestmentAmount(InvestmentError):
+    pass
+
+
+class BusinessNotFound(InvestmentError):
+    pass
+
+
+class OwnBusinessInvestment(InvestmentError):
+    pass
+
+
+class FundingGoalExceeded(InvestmentError):
+    pass
+
+
+class NotEnoughFunds(InvestmentError):
+    pass
+
+
+class BatchInvestmentRefused(InvestmentError):
+    """
+    Some investments of a batch were refused, so none were made. `problems`
+    maps business id -> reason, with None for reasons about the whole batch.
+    """
+
+    def __init__(self, problems):
+        super().__init__('Some investments in the batch were refused; nothing was invested.')
+        self.problems = problems
+
+
+class InvestmentService:
+    """
+    The one write path for investing in a business, behind /api/invest/,
+    /api/investments-tracking/create/ and create_investment: funding, backers,
+    the investment row and the ledger change together in one transaction, and
+    concurrent investors can neither lose each other's updates nor push a
+    business past its funding goal.
+    """
+
+    def invest(self, user, business_id, amount, debit_fund=False):
+        """
+        Invest `amount` from `user` in business `business_id`, topping up their
+        existing investment if they have one. With `debit_fund` the amount is
+        also taken from the user's fund, which must cover it. Returns
+        (investment, business, created), with `business` re-read after the
+        update and its owner loaded.
+
+        The funding is claimed first with a single conditional UPDATE
+        (current_funding + amount <= funding_goal, not the investor's own
+        business) that also counts a new backer. That statement takes the
+        business row's write lock, so concurrent investments in the same
+        business queue behind it (and on SQLite it opens the transaction as a
+        writer, instead of upgrading a read lock and failing with "database is
+        locked"). Everything after it runs under that lock, through the same
+        bulk writes as invest_many: the portfolio, rollup, notification and
+        cache side effects go out through `investments_batched` rather than
+        post_save chains, so the query count is small, fixed and the same
+        however many investors the business has.
+        """
+        if user.user_type == 'entrepreneur':
+            raise InvestorsOnly('Entrepreneurs cannot invest in other businesses. Focus on growing your own business!')
+        amount = Decimal(amount)
+        if amount <= 0:
+            raise InvalidInvestmentAmount('Investment amount must be positive.')
+
+        with transaction.atomic():
+            already_invested = Investment.objects.filter(user_id=user.pk, business_id=OuterRef('pk'))
+            claimed = Business.objects.filter(
+                pk=business_id, current_funding__lte=F('funding_goal') - amount
+            ).exclude(user_id=user.pk).update(
+                current_funding=F('current_funding') + amount,
+                backers=F('backers') + Case(When(Exists(already_invested), then=Value(0)), default=Value(1)),
+            )
+            if not claimed:
+                self._refuse(user, business_id)
+
+            if debit_fund:
+                try:
+                    change_fund(
+                        user, -amount, FundTransaction.INVESTMENT,
+                        reference=f'business:{business_id}', require_balance=True,
+                    )
+                except InsufficientFunds:
+                    raise NotEnoughFunds('Insufficient funds')
+
+            business = Business.objects.select_related('user').get(pk=business_id)
+            [result] = self._record_investments(user, {business_id: amount}, {business_id: business})
+        return result
+
+    def _refuse(self, user, business_id):
+        """Raise the reason the funding claim for `business_id` matched no row"""
+        business = Business.objects.filter(pk=business_id).values('funding_goal', 'current_funding', 'user_id').first()
+        if business is None:
+            raise BusinessNotFound('Business not found.')
+        if business['user_id'] == user.pk:
+            raise OwnBusinessInvestment('You cannot invest in your own business.')
+        remaining = business['funding_goal'] - business['current_funding']
+        raise FundingGoalExceeded(f'Investment amount exceeds the remaining funding goal of {remaining:.0f}.')
+
+    def invest_many(self, user, allocations):
+        """
+        Invest in several businesses at once, paid from `user`'s fund.
+        `allocations` is an iterable of (business_id, amount); amounts for the
+        same business are added up. Either every investment is made or none
+        is, and BatchInvestmentRefused lists every reason at once. Returns a
+        list of (investment, business, created) in business id order.
+
+        The batch is checked against the remaining goals and the fund with one
+        read first, so a bad batch is refused without writing anything. The
+        writes then repeat those checks as conditional UPDATEs (one for all
+        the businesses, one for the fund), which is what makes them safe
+        against concurrent investors. Everything else is a bulk write, and
+        side effects go out through `investments_batched` in bulk too, so the
+        query count doesn't grow with the number of businesses.
+        """
+        if user.user_type == 'entrepreneur':
+            raise InvestorsOnly('Entrepreneurs cannot invest in other businesses. Focus on growing your own business!')
+        amounts = {}
+        for business_id, amount in allocations:
+            amount = Decimal(amount)
+            if amount <= 0:
+                raise InvalidInvestmentAmount('Investment amount must be positive.')
+            amounts[business_id] = amounts.get(business_id, Decimal('0')) + amount
+        if not amounts:
+            raise InvalidInvestmentAmount('The batch has no investments.')
+        if len(amounts) > MAX_BATCH_INVESTMENTS:
+            raise InvalidInvestmentAmount(f'A batch can invest in at most {MAX_BATCH_INVESTMENTS} businesses.')
+
+        problems = self.batch_problems(user, amounts)
+        if problems:
+            raise BatchInvestmentRefused(problems)
+        try:
+            return self._invest_many(user, amounts)
+        except (FundingGoalExceeded, InsufficientFunds):
+            # A concurrent investment got in between the check and the writes
+            raise BatchInvestmentRefused(self.batch_problems(user, amounts) or {None: 'The batch could not be invested; try again.'})
+
+    def batch_problems(self, user, amounts):
+        """
+        Check a batch (business id -> amount) against the businesses' remaining
+        goals and `user`'s fund in one query. Returns business id -> reason for
+        everything that would be refused, with the fund under None.
+        """
+        fund = CustomUser.objects.filter(pk=user.pk).values('fund')
+        rows = {
+            row['pk']: row for row in Business.objects.filter(pk__in=list(amounts)).values(
+                'pk', 'funding_goal', 'current_funding', 'user_id', investor_fund=Subquery(fund, output_field=_money),
+            )
+        }
+        problems = {}
+        for business_id, amount in amounts.items():
+            row = rows.get(business_id)
+            if row is None:
+                problems[business_id] = 'Business not found.'
+            elif row['user_id'] == user.pk:
+                problems[business_id] = 'You cannot invest in your own business.'
+            elif row['current_funding'] + amount > row['funding_goal']:
+                remaining = row['funding_goal'] - row['current_funding']
+                problems[business_id] = f'Investment amount exceeds the remaining funding goal of {remaining:.0f}.'
+        total = sum(amounts.values())
+        if rows and next(iter(rows.values()))['investor_fund'] < total:
+            problems[None] = 'Insufficient funds'
+        return problems
+
+    def _invest_many(self, user, amounts):
+        business_ids = sorted(amounts)
+        with transaction.atomic():
+            already_invested = Investment.objects.filter(user_id=user.pk, business_id=OuterRef('pk'))
+            delta = Case(
+                *[When(pk=business_id, then=Value(amount, output_field=_money)) for business_id, amount in amounts.items()],
+                output_field=_money,
+            )
+            claimed = Business.objects.filter(
+                pk__in=business_ids, current_funding__lte=F('funding_goal') - delta
+            ).exclude(user_id=user.pk).update(
+                current_funding=F('current_funding') + delta,
+                backers=F('backers') + Case(When(Exists(already_invested), then=Value(0)), default=Value(1)),
+            )
+            if claimed != len(business_ids):
+                raise FundingGoalExceeded('A business in the batch has no room left for its investment.')
+            change_fund(
+                user, -sum(amounts.values()), FundTransaction.INVESTMENT,
+                reference=f'batch:{len(business_ids)} businesses', require_balance=True,
+            )
+
+            businesses = Business.objects.select_related('user').in_bulk(business_ids)
+            return self._record_investments(user, amounts, businesses)
+
+    def _record_investments(self, user, amounts, businesses):
+        """
+        Write the investments, ledger entries and side effects for funding
+        already claimed: `amounts` maps business id -> amount and `businesses`
+        business id -> the business re-read after the claim, owner loaded.
+        Runs in the caller's transaction. Returns a list of (investment,
+        business, created) in business id order.
+        """
+        business_ids = sorted(amounts)
+        investments = {
+            investment.business_id: investment
+            for investment in Investment.objects.select_for_update().filter(user=user, business_id__in=business_ids)
+        }
+        new = [
+            Investment(user=user, business=businesses[business_id], amount=amounts[business_id])
+            for business_id in business_ids if business_id not in investments
+        ]
+        Investment.objects.bulk_create(new)
+        if new and not connection.features.can_return_rows_from_bulk_insert:
+            # e.g. MySQL: read the new ids back
+            ids = dict(
+                Investment.objects.filter(user=user, business_id__in=[investment.business_id for investment in new])
+                .values_list('business_id', 'pk')
+            )
+            for investment in new:
+                investment.pk = ids[investment.business_id]
+        topped_up = list(investments.values())
+        for investment in topped_up:
+            investment.user, investment.business = user, businesses[investment.business_id]
+            investment.amount += amounts[investment.business_id]
+        Investment.objects.bulk_update(topped_up, ['amount'])
+
+        created_ids = {investment.business_id for investment in new}
+        investments.update({investment.business_id: investment for investment in new})
+        InvestmentLedgerEntry.objects.bulk_create([
+            InvestmentLedgerEntry(
+                user=user,
+                business_id=business_id,
+                investment=investments[business_id],
+                amount=amounts[business_id],
+                funding_after=businesses[business_id].current_funding,
+            )
+            for business_id in business_ids
+        ])
+
+        results = [
+            (investments[business_id], businesses[business_id], business_id in created_ids)
+            for business_id in business_ids
+        ]
+        investments_batched.send(sender=Investment, user=user, results=results, amounts=amounts)
+
+        owners = {businesses[business_id].user for business_id in created_ids}
+        if owners:
+            def befriend_owners():
+                for owner in owners:
+                    create_automatic_friendship(user, owner)
+            transaction.on_commit(befriend_owners)
+
+        return results
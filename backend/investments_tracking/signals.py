@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from logs.models import ProfitDistribution
+from logs.signals import profit_distributed
+from .models import Investment
+from .portfolio import record_returns, remove_investment, sync_investment, sync_investments
+from .services import investments_batched
+
+User = get_user_model()
+
+
+def _deleting_user(origin):
+    # Deleting an investor cascades to their holdings and summary, so only other investors need updating
+    return isinstance(origin, User) or getattr(origin, 'model', None) is User
+
+
+@receiver(post_save, sender=Investment)
+def update_portfolio_on_investment(sender, instance, **kwargs):
+    sync_investment(instance)
+
+
+@receiver(post_delete, sender=Investment)
+def update_portfolio_on_investment_delete(sender, instance, origin=None, **kwargs):
+    remove_investment(instance, refresh_investor=not _deleting_user(origin))
+
+
+@receiver(investments_batched)
+def update_portfolio_on_investment_batch(sender, user, results, **kwargs):
+    sync_investments(user.pk, [investment for investment, _, _ in results])
+
+
+@receiver(profit_distributed)
+def update_portfolio_on_distribution(sender, log, distributions, **kwargs):
+    """Credit a log's distributions to its investors' holdings in the distribution's transaction"""
+    returns = {}
+    for distribution in distributions:
+        returns[distribution.user_id] = returns.get(distribution.user_id, 0) + distribution.amount_distributed
+    record_returns(log.business_id, returns)
+
+
+@receiver(post_delete, sender=ProfitDistribution)
+def update_portfolio_on_distribution_delete(sender, instance, origin=None, **kwargs):
+    if not _deleting_user(origin):
+        record_returns(instance.log.business_id, {instance.user_id: -instance.amount_distributed})
@@ -1,3 +1,241 @@
-from django.test import TestCase
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import connections
+from django.db.models import Sum
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from investments.models import Business
+from notifications.models import Notification
+from users.models import CustomUser, FundTransaction
+
+from .models import Investment, InvestmentLedgerEntry, PortfolioHolding, PortfolioSummary
+from .portfolio import rebuild_portfolios
+from .services import MAX_BATCH_INVESTMENTS, InvestmentService
+
+
+class InvestmentServiceTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        self.investor = CustomUser.objects.create(username='investor', user_type='investor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.investor)
+
+    def _business(self, backers=0):
+        business = Business.objects.create(
+            title=f'Business with {backers} backers', tagline='Test', description='Investment service test',
+            category='Test', location='Nowhere', funding_goal=Decimal('100000'), min_investment=Decimal('1'),
+            user=self.owner,
+        )
+        others = CustomUser.objects.bulk_create([
+            CustomUser(username=f'backer_{business.pk}_{i}', user_type='investor') for i in range(backers)
+        ])
+        Investment.objects.bulk_create([Investment(user=other, business=business, amount=Decimal('5')) for other in others])
+        Business.objects.filter(pk=business.pk).update(backers=backers, current_funding=Decimal('5') * backers)
+        # bulk_create skips the signals that keep the portfolios
+        rebuild_portfolios([other.pk for other in others])
+        return business
+
+    def _invest(self, business, amount, status):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                '/api/invest/', {'business_id': business.pk, 'investment_amount': amount}, format='json'
+            )
+        self.assertEqual(response.status_code, status)
+        return len(context.captured_queries)
+
+    def test_investments_cost_a_fixed_number_of_queries(self):
+        counts = []
+        for backers in (0, 300):
+            business = self._business(backers)
+            counts.append((self._invest(business, '10', 201), self._invest(business, '15', 200)))
+        # The side effects go out in bulk rather than through post_save chains
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[0][0], 15)
+        self.assertLessEqual(counts[0][1], 14)
+
+    def test_side_effects_follow_the_investment(self):
+        business = self._business(3)
+        self._invest(business, '10', 201)
+        self._invest(business, '30', 200)
+
+        business.refresh_from_db()
+        self.assertEqual((business.backers, business.current_funding), (4, Decimal('55')))
+        self.assertEqual(
+            list(InvestmentLedgerEntry.objects.filter(user=self.investor).values_list('amount', 'funding_after')),
+            [(Decimal('10'), Decimal('25')), (Decimal('30'), Decimal('55'))],
+        )
+        holding = PortfolioHolding.objects.get(user=self.investor, business=business)
+        self.assertEqual((holding.invested, holding.share_percentage), (Decimal('40'), Decimal('72.7273')))
+        summary = PortfolioSummary.objects.get(user=self.investor)
+        self.assertEqual((summary.total_invested, summary.investment_count), (Decimal('40'), 1))
+        self.assertEqual(Notification.objects.filter(recipient=self.owner).count(), 2)
+        self.assertEqual(Notification.objects.filter(recipient=self.investor).count(), 2)
+
+
+class InvestmentBatchTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        self.investor = CustomUser.objects.create(username='investor', user_type='investor', fund=Decimal('5000'))
+        self.businesses = [self._business(self.owner, i) for i in range(40)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.investor)
+        # A holding to top up
+        self.assertEqual(self._post([(self.businesses[0], '10')]).status_code, 201)
+
+    def _business(self, owner, i):
+        return Business.objects.create(
+            title=f'Batch business {i}', tagline='Test', description='Batch investment test', category='Test',
+            location='Nowhere', funding_goal=Decimal('500'), min_investment=Decimal('1'), user=owner,
+        )
+
+    def _post(self, legs):
+        return self.client.post('/api/invest/batch/', {'investments': [
+            {'business_id': business if isinstance(business, int) else business.pk, 'investment_amount': amount}
+            for business, amount in legs
+        ]}, format='json')
+
+    def _state(self):
+        """Everything a batch writes"""
+        return (
+            CustomUser.objects.get(pk=self.investor.pk).fund,
+            list(Business.objects.order_by('id').values_list('current_funding', 'backers')),
+            list(Investment.objects.order_by('id').values_list('business_id', 'amount')),
+            list(InvestmentLedgerEntry.objects.order_by('id').values_list('business_id', 'amount')),
+            list(PortfolioHolding.objects.order_by('id').values_list('business_id', 'invested')),
+            FundTransaction.objects.count(),
+        )
+
+    def test_one_refused_leg_refuses_the_whole_batch(self):
+        mine = self._business(self.investor, 'own')
+        before = self._state()
+        batches = {
+            'funds': [(business, '400') for business in self.businesses[1:14]],
+            'goal': [(self.businesses[0], '50'), (self.businesses[1], '501')],
+            'own': [(self.businesses[1], '50'), (mine, '50')],
+            'missing': [(self.businesses[1], '50'), (999999, '50')],
+        }
+        problems = {'funds': None, 'goal': self.businesses[1].pk, 'own': mine.pk, 'missing': 999999}
+        for name, legs in batches.items():
+            response = self._post(legs)
+            self.assertEqual(response.status_code, 400, name)
+            self.assertEqual([problem['business_id'] for problem in response.data['problems']], [problems[name]], name)
+            self.assertEqual(self._state(), before, name)
+
+        too_many = [(business, '1') for business in self.businesses] * 3
+        self.assertGreater(len(too_many), MAX_BATCH_INVESTMENTS)
+        self.assertEqual(self._post(too_many).status_code, 400)
+        self.assertEqual(self._state(), before)
+
+    def test_writes_are_rolled_back_when_the_batch_fails_after_the_check(self):
+        before = self._state()
+        check = InvestmentService.batch_problems
+
+        def passes_first_time(service, user, amounts):
+            # As if a concurrent investment got in between the check and the writes
+            if not passes_first_time.called:
+                passes_first_time.called = True
+                return {}
+            return check(service, user, amounts)
+
+        for name, legs, problem in (
+            ('goal', [(self.businesses[2], '50'), (self.businesses[1], '501')], self.businesses[1].pk),
+            ('funds', [(business, '400') for business in self.businesses[1:14]], None),
+        ):
+            passes_first_time.called = False
+            with mock.patch.object(InvestmentService, 'batch_problems', passes_first_time):
+                response = self._post(legs)
+            self.assertEqual(response.status_code, 400, name)
+            self.assertEqual([row['business_id'] for row in response.data['problems']], [problem], name)
+            self.assertEqual(self._state(), before, name)
+
+    def _batch_queries(self, businesses):
+        with CaptureQueriesContext(connection) as context:
+            response = self._post([(business, '5') for business in businesses])
+        self.assertEqual(response.status_code, 201)
+        return len(context.captured_queries)
+
+    def test_batches_cost_a_fixed_number_of_queries(self):
+        # Each mixes a top-up with new investments
+        queries = self._batch_queries(self.businesses[:3])
+        self.assertEqual(self._batch_queries(self.businesses[:1] + self.businesses[3:40]), queries)
+
+        fund, funding, *_ = self._state()
+        self.assertEqual(fund, Decimal('5000') - 10 - 5 * 41)
+        self.assertEqual(funding[:3], [(Decimal('20'), 1), (Decimal('5'), 1), (Decimal('5'), 1)])
+        self.assertEqual(Investment.objects.get(user=self.investor, business=self.businesses[0]).amount, Decimal('20'))
+        self.assertEqual(PortfolioSummary.objects.get(user=self.investor).investment_count, 40)
+        self.assertEqual(InvestmentLedgerEntry.objects.filter(user=self.investor).count(), 1 + 3 + 38)
+
+
+class ConcurrentInvestmentTests(TransactionTestCase):
+    """Investments fired at one business from many threads through /api/invest/"""
+
+    INVESTMENTS = 300
+    INVESTORS = 50
+    THREADS = 16
+    AMOUNT = Decimal('10')
+
+    def setUp(self):
+        owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        # Room for 5 in 6 of the investments, so the goal is contended too
+        self.goal = self.AMOUNT * (self.INVESTMENTS * 5 // 6)
+        self.business = Business.objects.create(
+            title='Contended business', tagline='Test', description='Concurrent investment test', category='Test',
+            location='Nowhere', funding_goal=self.goal, min_investment=Decimal('1'), user=owner,
+        )
+        self.investors = CustomUser.objects.bulk_create([
+            CustomUser(username=f'investor_{i}', user_type='investor') for i in range(self.INVESTORS)
+        ])
+        # Rejections past the goal are expected; don't log each one
+        request_logger = logging.getLogger('django.request')
+        self.addCleanup(request_logger.setLevel, request_logger.level)
+        request_logger.setLevel(logging.CRITICAL)
+
+    def _invest_concurrently(self):
+        statuses = []
+        lock = threading.Lock()
+
+        def invest(i):
+            client = APIClient()
+            client.force_authenticate(self.investors[i % len(self.investors)])
+            try:
+                response = client.post(
+                    '/api/invest/', {'business_id': self.business.pk, 'investment_amount': str(self.AMOUNT)},
+                    format='json',
+                )
+                with lock:
+                    statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            list(pool.map(invest, range(self.INVESTMENTS)))
+        return statuses
+
+    def test_concurrent_investments_never_overfund_and_match_the_ledger(self):
+        statuses = self._invest_concurrently()
+        accepted = sum(status in (200, 201) for status in statuses)
+        self.assertEqual(len(statuses), self.INVESTMENTS)
+        self.assertEqual(accepted + statuses.count(400), self.INVESTMENTS)
+        self.assertEqual(accepted, int(self.goal / self.AMOUNT))
+
+        self.business.refresh_from_db()
+        investments = Investment.objects.filter(business=self.business)
+        ledger = InvestmentLedgerEntry.objects.filter(business=self.business)
+        self.assertLessEqual(self.business.current_funding, self.goal)
+        self.assertEqual(self.business.current_funding, self.AMOUNT * accepted)
+        self.assertEqual(ledger.aggregate(total=Sum('amount'))['total'], self.business.current_funding)
+        self.assertEqual(investments.aggregate(total=Sum('amount'))['total'], self.business.current_funding)
+        self.assertEqual(ledger.count(), accepted)
+        self.assertEqual(self.business.backers, investments.count())
+        self.assertEqual(
+            sorted(ledger.values_list('funding_after', flat=True)),
+            [self.AMOUNT * n for n in range(1, accepted + 1)],
+        )
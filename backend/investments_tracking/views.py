@@ -1,4 +1,4 @@
-from logs.models import Log
+from logs.models import InvestorMonthlyRollup
 from logs.models import ProfitDistribution
 from django.shortcuts import render
 from rest_framework import generics, status
@@ -6,62 +6,76 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
 from django.db.models import Sum, Count
-from .models import Investment
-from .serializers import InvestmentSerializer, InvestmentCreateSerializer
+from .models import Investment, PortfolioHolding, PortfolioSummary
+from .serializers import InvestmentSerializer, InvestmentCreateSerializer, investment_result_data
+from .services import BatchInvestmentRefused, InvestmentError, InvestmentService, InvestorsOnly
 from investments.models import Business
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes
+from response_cache.cache import business_scope, cache_response, owner_scope
 from django.db import models
 
 # Create your views here.
 
+def invest_response(request, business_id, amount, debit_fund=False):
+    """
+    Invest for the requesting user through InvestmentService and answer with the
+    payload every investment endpoint shares: 201 for a new investment, 200 for
+    a top-up, and {'error': ...} when the investment is refused.
+    """
+    try:
+        investment, business, created = InvestmentService().invest(
+            request.user, business_id, amount, debit_fund=debit_fund
+        )
+    except InvestorsOnly as e:
+        return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+    except InvestmentError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(
+        investment_result_data(investment, business, created, amount),
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+    )
+
+def invest_batch_response(request, allocations):
+    """
+    Make a batch of (business_id, amount) investments for the requesting user,
+    paid from their fund, and answer with every investment's usual payload.
+    A refused batch lists the reason for each business it was refused for.
+    """
+    try:
+        results = InvestmentService().invest_many(request.user, allocations)
+    except InvestorsOnly as e:
+        return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+    except BatchInvestmentRefused as e:
+        return Response({
+            'error': str(e),
+            'problems': [{'business_id': business_id, 'error': problem} for business_id, problem in e.problems.items()],
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except InvestmentError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    amounts = {}
+    for business_id, amount in allocations:
+        amounts[business_id] = amounts.get(business_id, 0) + amount
+    total = sum(amounts.values())
+    return Response({
+        'message': f'Invested ${total} in {len(results)} businesses.',
+        'total_invested': total,
+        'fund': request.user.fund,
+        'investments': [
+            investment_result_data(investment, business, created, amounts[business.pk])
+            for investment, business, created in results
+        ],
+    }, status=status.HTTP_201_CREATED)
+
 class InvestmentCreateView(generics.CreateAPIView):
     serializer_class = InvestmentCreateSerializer
     permission_classes = [IsAuthenticated]
     
-    @transaction.atomic
     def create(self, request, *args, **kwargs):
-        # Check if user is an entrepreneur - they cannot invest in any business
-        if request.user.user_type == 'entrepreneur':
-            return Response({
-                'error': 'Entrepreneurs cannot invest in other businesses. Focus on growing your own business!'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        serializer = self.get_serializer(data=request.data, context={'request': request})
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        
-        user = request.user
-        business = serializer.validated_data['business']
-        amount = serializer.validated_data['amount']
-        
-        # Check if user has enough funds (optional, add if needed)
-        # if user.fund < amount:
-        #     return Response({'error': 'Insufficient funds'}, status=status.HTTP_400_BAD_REQUEST)
-        # user.fund -= amount
-        # user.save(update_fields=['fund'])
-
-        investment, created = Investment.objects.get_or_create(user=user, business=business, defaults={'amount': amount})
-        if not created:
-            investment.amount += amount
-            investment.save(update_fields=['amount'])
-            new_investment = False
-        else:
-            new_investment = True
-        
-        # Update the business funding
-        business.current_funding += amount
-        if new_investment:
-            business.backers += 1
-        business.save(update_fields=['current_funding', 'backers'])
-        
-        return Response({
-            'message': 'Investment successful!',
-            'investment': InvestmentSerializer(investment, context={'request': request}).data,
-            'business_updated': {
-                'current_funding': business.current_funding,
-                'backers': business.backers
-            }
-        }, status=status.HTTP_201_CREATED)
+        return invest_response(request, serializer.validated_data['business'], serializer.validated_data['amount'])
 
 class UserInvestmentsListView(generics.ListAPIView):
     serializer_class = InvestmentSerializer
@@ -88,6 +102,7 @@ class BusinessInvestmentsListView(generics.ListAPIView):
 class BusinessInvestmentStatsView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     
+    @cache_response(lambda request, business_id: [business_scope(business_id)])
     def get(self, request, business_id):
         try:
             business = Business.objects.get(id=business_id)
@@ -170,50 +185,17 @@ def investment_list(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_investment(request):
-    """Create a new investment"""
-    # Check if user is an entrepreneur - they cannot invest in any business
-    if request.user.user_type == 'entrepreneur':
-        return Response({
-            'error': 'Entrepreneurs cannot invest in other businesses. Focus on growing your own business!'
-        }, status=status.HTTP_403_FORBIDDEN)
-    
-    serializer = InvestmentSerializer(data=request.data)
+    """Create a new investment paid from the user's fund"""
+    serializer = InvestmentCreateSerializer(data=request.data)
     if serializer.is_valid():
-        # Check if user already invested in this business
-        existing_investment = Investment.objects.filter(
-            user=request.user,
-            business=serializer.validated_data['business']
-        ).first()
-        
-        if existing_investment:
-            return Response(
-                {'error': 'You have already invested in this business'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Check if user has enough funds
-        if request.user.fund < serializer.validated_data['amount']:
-            return Response(
-                {'error': 'Insufficient funds'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Deduct amount from user's fund
-        request.user.fund -= serializer.validated_data['amount']
-        request.user.save(update_fields=['fund'])
-        
-        # Add amount to business current funding
-        business = serializer.validated_data['business']
-        business.current_funding += serializer.validated_data['amount']
-        business.backers = Investment.objects.filter(business=business).count() + 1
-        business.save(update_fields=['current_funding', 'backers'])
-        
-        serializer.save(user=request.user)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return invest_response(
+            request, serializer.validated_data['business'], serializer.validated_data['amount'], debit_fund=True
+        )
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response(lambda request, business_id: [business_scope(business_id)])
 def business_investment_stats(request, business_id):
     """Get investment statistics for a specific business"""
     try:
@@ -240,6 +222,7 @@ def business_investment_stats(request, business_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response(lambda request: [owner_scope(request.user.pk)])
 def recent_investments(request):
     """Get recent investments for businesses owned by the current user"""
     try:
@@ -334,6 +317,7 @@ def investor_recent_investments(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response(lambda request: [owner_scope(request.user.pk)])
 def entrepreneur_investors(request):
     """Get all investors for businesses owned by the current entrepreneur"""
     try:
@@ -397,28 +381,20 @@ def investor_statistics(request):
     """Get comprehensive investment statistics for the current investor, including monthwise revenue/expense/profit."""
     try:
         user = request.user
-        # Get all investments by the user
-        investments = Investment.objects.filter(user=user).select_related('business')
-        # All businesses the user has invested in
-        business_ids = investments.values_list('business_id', flat=True)
-        # Calculate total invested amount
-        total_invested = investments.aggregate(total=models.Sum('amount'))['total'] or 0
-        # Calculate total returns from profit distributions
-        total_returns = ProfitDistribution.objects.filter(user=user).aggregate(
-            total=models.Sum('amount_distributed')
-        )['total'] or 0
+        # Totals and per-business positions are maintained on write (see portfolio.py)
+        summary = PortfolioSummary.objects.filter(user=user).first() or PortfolioSummary(user=user)
+        holdings = list(PortfolioHolding.objects.filter(user=user).select_related('business'))
+        total_invested = summary.total_invested
+        total_returns = summary.total_returns
         # Get current fund balance
         current_fund = user.fund
         # Calculate portfolio value (invested + returns + current fund)
         portfolio_value = float(total_invested) + float(total_returns) + float(current_fund)
-        # Get active investments (businesses that are still active)
-        active_investments = investments.filter(
-            business__current_funding__lt=models.F('business__funding_goal')
-        ).count()
-        # Get completed investments (fully funded businesses)
-        completed_investments = investments.filter(
-            business__current_funding__gte=models.F('business__funding_goal')
-        ).count()
+        # Active investments are in businesses still raising, completed ones are fully funded
+        active_investments = sum(
+            1 for holding in holdings if holding.business.current_funding < holding.business.funding_goal
+        )
+        completed_investments = len(holdings) - active_investments
         # Get profit distribution history
         profit_distributions = ProfitDistribution.objects.filter(user=user).select_related(
             'log', 'log__business'
@@ -438,57 +414,36 @@ def investor_statistics(request):
                 'log_month': month_display,
                 'log_year': year_display
             })
-        # Get monthly profit data for charts
-        monthly_profit_data = ProfitDistribution.objects.filter(user=user).values(
-            'log__month', 'log__year'
-        ).annotate(
-            total_profit=models.Sum('amount_distributed')
-        ).order_by('log__year', 'log__month')
-        chart_data = []
-        for month_data in monthly_profit_data:
-            chart_data.append({
-                'month': f"{month_data['log__year']}-{month_data['log__month']:02d}",
-                'profit': float(month_data['total_profit'])
-            })
+        # Monthly figures of the held businesses and the user's returns, maintained by logs.rollups
+        rollups = list(InvestorMonthlyRollup.objects.filter(user=user).order_by('year', 'month'))
+        chart_data = [
+            {'month': f"{rollup.year}-{rollup.month:02d}", 'profit': float(rollup.returns)}
+            for rollup in rollups if rollup.returns
+        ]
         # Get investment breakdown by business
         investment_breakdown = []
-        for investment in investments.select_related('business'):
-            business = investment.business
-            total_business_investment = Investment.objects.filter(business=business).aggregate(
-                total=models.Sum('amount')
-            )['total'] or 0
-            # Calculate share percentage
-            share_percentage = (float(investment.amount) / float(total_business_investment)) * 100 if total_business_investment > 0 else 0
-            # Calculate total returns from this business
-            business_returns = ProfitDistribution.objects.filter(
-                user=user,
-                log__business=business
-            ).aggregate(total=models.Sum('amount_distributed'))['total'] or 0
+        for holding in holdings:
+            business = holding.business
             investment_breakdown.append({
                 'business_id': business.id,
                 'business_title': business.title,
                 'business_category': business.category,
-                'amount_invested': float(investment.amount),
-                'share_percentage': share_percentage,
-                'total_returns': float(business_returns),
-                'roi_percentage': (float(business_returns) / float(investment.amount)) * 100 if float(investment.amount) > 0 else 0,
-                'invested_at': investment.invested_at.isoformat(),
+                'amount_invested': float(holding.invested),
+                'share_percentage': float(holding.share_percentage),
+                'total_returns': float(holding.returns),
+                'roi_percentage': float(holding.roi_percentage),
+                'invested_at': holding.invested_at.isoformat(),
                 'is_active': business.current_funding < business.funding_goal
             })
         # Monthwise revenue/expense/profit for all businesses the user has invested in
-        logs = Log.objects.filter(business_id__in=business_ids)
-        monthwise = {}
-        for log in logs:
-            if log.month and log.year:
-                key = f"{log.year}-{log.month:02d}"
-                if key not in monthwise:
-                    monthwise[key] = {'revenue': 0, 'expense': 0, 'profit': 0}
-                monthwise[key]['revenue'] += float(log.total_revenue or 0)
-                monthwise[key]['expense'] += float(log.total_expense or 0)
-                monthwise[key]['profit'] += float(log.profit_generated or 0)
         monthwise_data = [
-            {'month': k, 'revenue': v['revenue'], 'expense': v['expense'], 'profit': v['profit']}
-            for k, v in sorted(monthwise.items())
+            {
+                'month': f"{rollup.year}-{rollup.month:02d}",
+                'revenue': float(rollup.revenue),
+                'expense': float(rollup.expense),
+                'profit': float(rollup.profit),
+            }
+            for rollup in rollups
         ]
         return Response({
             'summary': {
@@ -498,8 +453,8 @@ def investor_statistics(request):
                 'portfolio_value': portfolio_value,
                 'active_investments': active_investments,
                 'completed_investments': completed_investments,
-                'total_investments': investments.count(),
-                'overall_roi_percentage': (float(total_returns) / float(total_invested)) * 100 if float(total_invested) > 0 else 0
+                'total_investments': len(holdings),
+                'overall_roi_percentage': summary.roi_percentage
             },
             'profit_history': profit_history,
             'investment_breakdown': investment_breakdown,
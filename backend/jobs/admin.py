@@ -0,0 +1,16 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'reference', 'status', 'progress', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['status', 'name', 'created_at']
+    search_fields = ['name', 'reference', 'owner__username']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+    ordering = ['-created_at']
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        queryset.update(status=Job.STATUS_QUEUED, attempts=0, run_after=timezone.now())
+    requeue.short_description = "Requeue selected jobs"
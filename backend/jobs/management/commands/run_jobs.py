@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import requeue_stale_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (profit distribution, notification fan-out, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue once and exit instead of polling forever',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--name',
+            action='append',
+            dest='names',
+            help='Only run jobs with this handler name (can be repeated)',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help='Requeue jobs that have been running for longer than this many seconds',
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options['stale_after'])
+        self.stdout.write('Job worker started')
+        while True:
+            # Checked on every poll, so a job whose worker crashed is picked up again without a restart
+            requeued = requeue_stale_jobs(stale_after)
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale job(s)"))
+            count = run_pending_jobs(names=options['names'])
+            if count:
+                self.stdout.write(f"Ran {count} job(s)")
+            if options['once']:
+                break
+            if not count:
+                time.sleep(options['sleep'])
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-18 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='error_message',
+            field=models.TextField(blank=True, help_text="Message of the last failure, shown to the job's owner"),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='last_error',
+            field=models.TextField(blank=True, help_text='Traceback of the last failure, for admins'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+User = get_user_model()
+
+class Job(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100, help_text="Registered handler name, e.g. 'logs.distribute_profit'")
+    payload = models.JSONField(default=dict, blank=True, help_text="Keyword arguments passed to the handler")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Completion percentage reported by the handler")
+    result = models.JSONField(blank=True, null=True)
+    last_error = models.TextField(blank=True, help_text="Traceback of the last failure, for admins")
+    error_message = models.TextField(blank=True, help_text="Message of the last failure, shown to the job's owner")
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now, help_text="The job is not picked up before this time")
+
+    # Who may poll the job and what it is about, e.g. 'logs.log:12'
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    reference = models.CharField(max_length=100, blank=True, db_index=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='jobs_job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+    def set_progress(self, progress):
+        """Record handler progress (0-100) so pollers can follow a long job"""
+        self.progress = max(0, min(100, int(progress)))
+        Job.objects.filter(pk=self.pk).update(progress=self.progress)
@@ -0,0 +1,145 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+# Seconds to wait before retry n is 2**n times this
+RETRY_BACKOFF_SECONDS = 5
+
+
+def register_job(name):
+    """
+    Register a function as the handler for jobs called `name`.
+    The handler is called as handler(job, **job.payload) and its return value,
+    which must be JSON serializable, is stored on the job as its result.
+    """
+    def decorator(func):
+        if name in _registry and _registry[name] is not func:
+            raise ValueError(f"A job handler named '{name}' is already registered")
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def get_handler(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"No job handler registered for '{name}'")
+
+
+def job_reference(instance):
+    """Reference string used to find the jobs about a model instance, e.g. 'logs.log:12'"""
+    return f"{instance._meta.label_lower}:{instance.pk}"
+
+
+def enqueue(name, payload=None, owner=None, reference='', max_attempts=3, delay=None):
+    """
+    Queue a job for the background worker (`manage.py run_jobs`) and return it.
+    The job row is written in the caller's transaction, so it is only visible to
+    the worker once that transaction commits. With JOBS_RUN_EAGERLY the job runs
+    in-process right after the commit instead.
+    """
+    get_handler(name)  # fail fast on typos
+    job = Job.objects.create(
+        name=name,
+        payload=payload or {},
+        owner=owner,
+        reference=reference,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + (delay or timedelta(0)),
+    )
+    if getattr(settings, 'JOBS_RUN_EAGERLY', False):
+        transaction.on_commit(lambda: run_job_by_id(job.pk))
+    return job
+
+
+def claim_next_job(names=None):
+    """
+    Atomically move the oldest due job from queued to running and return it.
+    The claim is a conditional UPDATE, so concurrent workers never run the same job.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(status=Job.STATUS_QUEUED, run_after__lte=now)
+    if names:
+        candidates = candidates.filter(name__in=names)
+
+    for job_id in candidates.order_by('run_after', 'id').values_list('id', flat=True)[:20]:
+        claimed = Job.objects.filter(id=job_id, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """Run a claimed job, recording its result or scheduling a retry on failure"""
+    try:
+        handler = get_handler(job.name)
+        with transaction.atomic():
+            result = handler(job, **job.payload)
+    except Exception as e:
+        logger.exception(f"Job {job} failed on attempt {job.attempts}: {e}")
+        job.last_error = traceback.format_exc()
+        job.error_message = str(e)
+        if job.attempts < job.max_attempts:
+            job.status = Job.STATUS_QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** job.attempts)
+        else:
+            job.status = Job.STATUS_FAILED
+            job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'run_after', 'last_error', 'error_message', 'finished_at'])
+        return job
+
+    job.status = Job.STATUS_SUCCEEDED
+    job.progress = 100
+    job.result = result
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'result', 'finished_at'])
+    return job
+
+
+def run_job_by_id(job_id):
+    """Claim and run one specific job (used for eager execution)"""
+    claimed = Job.objects.filter(id=job_id, status=Job.STATUS_QUEUED).update(
+        status=Job.STATUS_RUNNING,
+        started_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    if claimed:
+        return run_job(Job.objects.get(id=job_id))
+    return None
+
+
+def run_pending_jobs(limit=None, names=None):
+    """Run due jobs until the queue is empty or `limit` jobs ran. Returns the count."""
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next_job(names)
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+def requeue_stale_jobs(timeout):
+    """Put jobs back in the queue whose worker died while running them"""
+    cutoff = timezone.now() - timeout
+    return Job.objects.filter(status=Job.STATUS_RUNNING, started_at__lt=cutoff).update(
+        status=Job.STATUS_QUEUED,
+        run_after=timezone.now(),
+    )
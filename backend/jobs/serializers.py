@@ -0,0 +1,14 @@
+from rest_framework import serializers
+from .models import Job
+
+class JobSerializer(serializers.ModelSerializer):
+    # The message only: the traceback stays in the logs and the admin
+    last_error = serializers.CharField(source='error_message', read_only=True)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'name', 'reference', 'status', 'progress', 'result', 'last_error',
+            'attempts', 'max_attempts', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
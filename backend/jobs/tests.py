@@ -0,0 +1,142 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import CustomUser
+
+from .models import Job
+from .queue import (
+    RETRY_BACKOFF_SECONDS, claim_next_job, enqueue, register_job, requeue_stale_jobs, run_job_by_id, run_pending_jobs,
+)
+
+OK_JOB = 'jobs.test_ok'
+FAILING_JOB = 'jobs.test_failing'
+
+
+@register_job(OK_JOB)
+def ok_job(job, value=None):
+    return {'value': value}
+
+
+@register_job(FAILING_JOB)
+def failing_job(job):
+    raise ValueError('The spreadsheet has no revenue column')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+
+    def _make_due(self, job):
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now() - timedelta(seconds=1))
+
+    def test_jobs_run_once_and_store_their_result(self):
+        job = enqueue(OK_JOB, {'value': 7}, owner=self.owner)
+        self.assertEqual(run_pending_jobs(names=[OK_JOB]), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.attempts, job.progress), (Job.STATUS_SUCCEEDED, {'value': 7}, 1, 100))
+        self.assertEqual(run_pending_jobs(names=[OK_JOB]), 0)
+
+    def test_failures_back_off_exponentially_then_fail(self):
+        job = enqueue(FAILING_JOB, owner=self.owner)
+        for attempt in (1, 2):
+            before = timezone.now()
+            with self.assertLogs('jobs.queue', 'ERROR'):
+                run_job_by_id(job.pk)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, attempt))
+            delay = job.run_after - before
+            expected = timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** attempt)
+            self.assertTrue(expected <= delay < expected + timedelta(seconds=5), delay)
+            # Not picked up before its backoff is over
+            self.assertIsNone(claim_next_job([FAILING_JOB]))
+            self._make_due(job)
+
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_job_by_id(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn('Traceback', job.last_error)
+
+    def test_owners_see_the_error_message_but_not_the_traceback(self):
+        job = enqueue(FAILING_JOB, owner=self.owner, max_attempts=1)
+        with self.assertLogs('jobs.queue', 'ERROR') as logs:
+            run_job_by_id(job.pk)
+        self.assertIn('Traceback', logs.output[0])
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.get(f'/api/jobs/{job.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], Job.STATUS_FAILED)
+        self.assertEqual(response.data['last_error'], 'The spreadsheet has no revenue column')
+
+        client.force_authenticate(CustomUser.objects.create(username='stranger', user_type='investor'))
+        self.assertEqual(client.get(f'/api/jobs/{job.pk}/').status_code, 404)
+
+    def test_stale_running_jobs_are_requeued(self):
+        stale, busy = enqueue(OK_JOB), enqueue(OK_JOB)
+        Job.objects.filter(pk=stale.pk).update(status=Job.STATUS_RUNNING, started_at=timezone.now() - timedelta(hours=1))
+        Job.objects.filter(pk=busy.pk).update(status=Job.STATUS_RUNNING, started_at=timezone.now())
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=10)), 1)
+        self.assertEqual(Job.objects.get(pk=stale.pk).status, Job.STATUS_QUEUED)
+        self.assertEqual(Job.objects.get(pk=busy.pk).status, Job.STATUS_RUNNING)
+
+    def test_worker_requeues_stale_jobs_while_polling(self):
+        job = enqueue(OK_JOB)
+
+        def poll(seconds):
+            if poll.calls:
+                raise KeyboardInterrupt
+            poll.calls += 1
+            # Another worker claimed the job and crashed after the worker started
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.STATUS_RUNNING, attempts=1, started_at=timezone.now() - timedelta(hours=1),
+            )
+        poll.calls = 0
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now() + timedelta(hours=1))
+        with mock.patch('jobs.management.commands.run_jobs.time.sleep', side_effect=poll):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('run_jobs', name=[OK_JOB], stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_SUCCEEDED, 2))
+
+
+class JobClaimTests(TransactionTestCase):
+    """Workers racing for jobs (a transaction test, so every thread sees them)"""
+
+    WORKERS = 6
+
+    def _race(self, claim):
+        barrier = threading.Barrier(self.WORKERS)
+
+        def worker(_):
+            barrier.wait()
+            try:
+                return claim()
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            return list(pool.map(worker, range(self.WORKERS)))
+
+    def test_one_job_has_one_winner(self):
+        job = enqueue(OK_JOB)
+        claims = self._race(lambda: claim_next_job([OK_JOB]))
+        self.assertEqual([claimed.pk for claimed in claims if claimed], [job.pk])
+        self.assertEqual(Job.objects.get(pk=job.pk).attempts, 1)
+
+    def test_workers_draining_the_queue_run_each_job_once(self):
+        jobs = [enqueue(OK_JOB, {'value': i}) for i in range(30)]
+        counts = self._race(lambda: run_pending_jobs(names=[OK_JOB]))
+        self.assertEqual(sum(counts), len(jobs))
+        self.assertEqual(set(Job.objects.filter(name=OK_JOB).values_list('status', 'attempts')), {(Job.STATUS_SUCCEEDED, 1)})
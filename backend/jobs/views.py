@@ -0,0 +1,27 @@
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
+from .models import Job
+from .serializers import JobSerializer
+
+class JobListView(generics.ListAPIView):
+    """Jobs started on behalf of the current user, filterable by ?reference= and ?status="""
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Job.objects.filter(owner=self.request.user)
+        reference = self.request.query_params.get('reference')
+        job_status = self.request.query_params.get('status')
+        if reference:
+            queryset = queryset.filter(reference=reference)
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        return queryset[:50]
+
+class JobDetailView(generics.RetrieveAPIView):
+    """Poll a single job's status and progress"""
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(owner=self.request.user)
@@ -0,0 +1,22 @@
+from jobs.queue import register_job
+from .models import Log
+from .services import ProfitDistributionService, ProfitDistributionError
+
+@register_job('logs.distribute_profit')
+def distribute_profit_job(job, log_id):
+    """Distribute a newly created log's profit to the business's investors"""
+    try:
+        log = Log.objects.select_related('business').get(pk=log_id)
+    except Log.DoesNotExist:
+        return {'skipped': f'Log {log_id} no longer exists'}
+
+    try:
+        distributions, total_distributed = ProfitDistributionService().distribute(log)
+    except ProfitDistributionError as e:
+        # Nothing to retry: the log was already paid out or has nothing to pay
+        return {'skipped': str(e)}
+
+    return {
+        'distributions': len(distributions),
+        'total_distributed': str(total_distributed),
+    }
@@ -0,0 +1,142 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from investments.models import Business
+from investments_tracking.models import Investment
+from logs.models import InvestorMonthlyRollup, Log
+from logs.rollups import rebuild_rollups
+from logs.services import ProfitDistributionService
+from logs.views import monthly_timeseries
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the monthly time series costs the same whatever the length of the log '
+        'history and that the maintained rollups match the logs (all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--years',
+            type=int,
+            nargs='+',
+            default=[1, 5, 20],
+            help='Years of monthly logs per business',
+        )
+        parser.add_argument('--businesses', type=int, default=20, help='Businesses the investor holds')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'logs':>7} {'queries':>8} {'rollup ms':>10} {'log scan ms':>12}")
+        query_counts = set()
+        for years in options['years']:
+            logs, queries, rollup_ms, scan_ms = self._run(years, options['businesses'])
+            query_counts.add(queries)
+            self.stdout.write(f"{logs:>7} {queries:>8} {rollup_ms:>10.1f} {scan_ms:>12.1f}")
+
+        if len(query_counts) > 1:
+            raise CommandError('The time series query count depends on the log history')
+        self.stdout.write(self.style.SUCCESS('The time series query count is constant and the rollups are consistent'))
+
+    def _run(self, years, business_count):
+        with transaction.atomic():
+            owner = CustomUser.objects.create(username=f'rollup_owner_{years}', user_type='entrepreneur')
+            investor = CustomUser.objects.create(username=f'rollup_investor_{years}', user_type='investor')
+            businesses = Business.objects.bulk_create([
+                Business(
+                    title=f'Rollup Business {i}',
+                    tagline='Benchmark',
+                    description='Monthly rollup benchmark',
+                    category='Benchmark',
+                    location='Nowhere',
+                    funding_goal=Decimal('1000'),
+                    min_investment=Decimal('1'),
+                    user=owner,
+                )
+                for i in range(business_count)
+            ], batch_size=500)
+            for business in businesses:
+                Investment.objects.create(user=investor, business=business, amount=Decimal('100'))
+
+            # Bulk history (bypassing the signals), then a rebuild, like the backfill migration
+            Log.objects.bulk_create([
+                Log(
+                    business=business, content='Benchmark', title='Benchmark',
+                    year=2000 + offset // 12, month=offset % 12 + 1,
+                    total_revenue=Decimal(500 + offset), total_expense=Decimal('200'),
+                    profit_generated=Decimal(300 + offset),
+                )
+                for business in businesses
+                for offset in range(years * 12)
+            ], batch_size=500)
+            rebuild_rollups()
+
+            # Then the normal write paths: create and distribute, edit, move and delete
+            latest = Log.objects.create(
+                business=businesses[0], content='Benchmark', year=2000 + years, month=1,
+                total_revenue=Decimal('900'), total_expense=Decimal('100'),
+            )
+            ProfitDistributionService().distribute(latest)
+            edited = Log.objects.filter(business=businesses[1]).first()
+            edited.total_revenue += Decimal('1000')
+            edited.save()
+            moved = Log.objects.filter(business=businesses[2]).first()
+            moved.year, moved.month = 2000 + years, 2
+            moved.save()
+            Log.objects.filter(business=businesses[3]).first().delete()
+
+            self._check_consistency(investor)
+
+            request = APIRequestFactory().get('/api/logs/timeseries/', {'from': '2001-01'})
+            force_authenticate(request, user=investor)
+            connection.queries_log.clear()  # setup can overflow the capped query log
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = monthly_timeseries(request)
+                rollup_ms = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(f'Time series returned {response.status_code}: {response.data}')
+
+            # What the dashboard did before: aggregate the held businesses' logs on every load
+            started = time.perf_counter()
+            list(Log.objects.filter(business__investments_received__user=investor, year__gte=2001).values(
+                'year', 'month'
+            ).annotate(revenue=Sum('total_revenue')).order_by('year', 'month'))
+            scan_ms = (time.perf_counter() - started) * 1000
+
+            log_count = Log.objects.filter(business__in=businesses).count()
+            transaction.set_rollback(True)
+
+        return log_count, len(context.captured_queries), rollup_ms, scan_ms
+
+    def _check_consistency(self, investor):
+        expected = {
+            (row['year'], row['month']): (row['revenue'], row['expense'], row['profit'])
+            for row in Log.objects.filter(business__investments_received__user=investor).values(
+                'year', 'month'
+            ).annotate(
+                revenue=Sum('total_revenue'),
+                expense=Sum('total_expense'),
+                profit=Sum('profit_generated'),
+            )
+        }
+        maintained = {
+            (rollup.year, rollup.month): (rollup.revenue, rollup.expense, rollup.profit)
+            for rollup in InvestorMonthlyRollup.objects.filter(user=investor)
+        }
+        if maintained != expected:
+            raise CommandError('The maintained investor rollups differ from the logs')
+
+        returns = investor.profit_distributions_received.values(
+            year=F('log__year'), month=F('log__month')
+        ).annotate(total=Sum('amount_distributed'))
+        for row in returns:
+            rollup = InvestorMonthlyRollup.objects.get(user=investor, year=row['year'], month=row['month'])
+            if rollup.returns != row['total']:
+                raise CommandError('The maintained investor returns differ from the distributions')
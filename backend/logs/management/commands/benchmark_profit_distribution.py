@@ -0,0 +1,79 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from investments.models import Business
+from investments_tracking.models import Investment
+from logs.models import Log
+from logs.services import ProfitDistributionService
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Benchmark profit distribution for growing investor counts (all data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--investors',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000, 5000],
+            help='Investor counts to benchmark',
+        )
+        parser.add_argument(
+            '--profit',
+            type=float,
+            default=100000.0,
+            help='Profit to distribute for each run',
+        )
+
+    def handle(self, *args, **options):
+        profit = Decimal(str(options['profit']))
+
+        self.stdout.write(f"{'investors':>10} {'queries':>8} {'seconds':>9} {'ms/investor':>12}")
+        for count in options['investors']:
+            queries, elapsed = self._run(count, profit)
+            self.stdout.write(
+                f"{count:>10} {queries:>8} {elapsed:>9.3f} {elapsed * 1000 / count:>12.3f}"
+            )
+
+    def _run(self, count, profit):
+        with transaction.atomic():
+            owner = CustomUser.objects.create(username=f'bench_owner_{count}', user_type='entrepreneur')
+            business = Business.objects.create(
+                title=f'Benchmark Business {count}',
+                tagline='Benchmark',
+                description='Profit distribution benchmark',
+                category='Benchmark',
+                location='Nowhere',
+                funding_goal=Decimal(count * 100),
+                min_investment=Decimal('1'),
+                user=owner,
+            )
+            # Create the log before any investor exists so no per-investor
+            # notifications are fired, then set the profit directly
+            month, year = Log.get_next_month_year(business.id)
+            log = Log.objects.create(business=business, content='Benchmark', month=month, year=year)
+            Log.objects.filter(pk=log.pk).update(total_revenue=profit, profit_generated=profit)
+            log.refresh_from_db()
+
+            investors = CustomUser.objects.bulk_create([
+                CustomUser(username=f'bench_investor_{count}_{i}', user_type='investor')
+                for i in range(count)
+            ], batch_size=500)
+            Investment.objects.bulk_create([
+                Investment(user=investor, business=business, amount=Decimal('100.00'))
+                for investor in investors
+            ], batch_size=500)
+
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                ProfitDistributionService().distribute(log)
+                elapsed = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        return len(context.captured_queries), elapsed
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from logs.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the business and investor monthly rollups from the logs and profit distributions'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS('Monthly rollups rebuilt'))
@@ -4,6 +4,8 @@ from investments.models import Business
 from investments_tracking.models import Investment
 from users.models import CustomUser
 from decimal import Decimal
+from jobs.models import Job
+from jobs.queue import job_reference, run_job_by_id
 
 class Command(BaseCommand):
     help = 'Test profit distribution functionality by creating a test log with profit'
@@ -68,6 +70,10 @@ class Command(BaseCommand):
                 )
             )
 
+            # Distribution is queued for the job worker; run this log's jobs now
+            for job_id in Job.objects.filter(reference=job_reference(log), status=Job.STATUS_QUEUED).values_list('id', flat=True):
+                run_job_by_id(job_id)
+
             # Check profit distributions
             from logs.models import ProfitDistribution
             distributions = ProfitDistribution.objects.filter(log=log)
@@ -0,0 +1,59 @@
+from django.db import migrations
+from django.db.models import Count, F, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    Log = apps.get_model('logs', 'Log')
+    ProfitDistribution = apps.get_model('logs', 'ProfitDistribution')
+    BusinessMonthlyRollup = apps.get_model('logs', 'BusinessMonthlyRollup')
+    InvestorMonthlyRollup = apps.get_model('logs', 'InvestorMonthlyRollup')
+    Investment = apps.get_model('investments_tracking', 'Investment')
+
+    BusinessMonthlyRollup.objects.bulk_create([
+        BusinessMonthlyRollup(
+            business_id=row['business_id'],
+            year=row['year'],
+            month=row['month'],
+            revenue=row['revenue'] or 0,
+            expense=row['expense'] or 0,
+            profit=row['profit'] or 0,
+            distributed=row['distributed'] or 0,
+            log_count=row['logs'],
+        )
+        for row in Log.objects.exclude(year=None).exclude(month=None).values('business_id', 'year', 'month').annotate(
+            revenue=Sum('total_revenue'),
+            expense=Sum('total_expense'),
+            profit=Sum('profit_generated'),
+            distributed=Sum('profit_distributed'),
+            logs=Count('id'),
+        )
+    ], batch_size=500)
+
+    totals = {}
+    for row in Investment.objects.values('user_id', year=F('business__monthly_rollups__year'), month=F('business__monthly_rollups__month')).exclude(year=None).annotate(
+        revenue=Sum('business__monthly_rollups__revenue'),
+        expense=Sum('business__monthly_rollups__expense'),
+        profit=Sum('business__monthly_rollups__profit'),
+    ):
+        totals[(row['user_id'], row['year'], row['month'])] = InvestorMonthlyRollup(
+            user_id=row['user_id'], year=row['year'], month=row['month'],
+            revenue=row['revenue'], expense=row['expense'], profit=row['profit'],
+        )
+    for row in ProfitDistribution.objects.exclude(log__year=None).exclude(log__month=None).values(
+        'user_id', year=F('log__year'), month=F('log__month'),
+    ).annotate(returns=Sum('amount_distributed')):
+        key = (row['user_id'], row['year'], row['month'])
+        rollup = totals.setdefault(key, InvestorMonthlyRollup(user_id=key[0], year=key[1], month=key[2]))
+        rollup.returns = row['returns']
+    InvestorMonthlyRollup.objects.bulk_create(totals.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0006_monthly_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
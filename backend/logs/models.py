@@ -132,3 +132,46 @@ class ProfitDistribution(models.Model):
     @property
     def formatted_amount(self):
         return f"${self.amount_distributed:,.2f}"
+
+
+class BusinessMonthlyRollup(models.Model):
+    """
+    A business's log figures for one month, aggregated in SQL and kept current as
+    logs are written (see logs.rollups), so charts read one row per month.
+    """
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='monthly_rollups')
+    year = models.IntegerField()
+    month = models.IntegerField(choices=Log.MONTH_CHOICES)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    distributed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    log_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['year', 'month']
+        unique_together = ['business', 'year', 'month']
+
+    def __str__(self):
+        return f"{self.business.title} - {self.year}-{self.month:02d}"
+
+
+class InvestorMonthlyRollup(models.Model):
+    """
+    The monthly figures of all the businesses an investor holds, plus the profit
+    they received that month, maintained alongside BusinessMonthlyRollup.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_rollups')
+    year = models.IntegerField()
+    month = models.IntegerField(choices=Log.MONTH_CHOICES)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    returns = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Profit distributed to this investor")
+
+    class Meta:
+        ordering = ['year', 'month']
+        unique_together = ['user', 'year', 'month']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.year}-{self.month:02d}"
@@ -0,0 +1,116 @@
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, Q, Sum
+
+from investments_tracking.models import Investment
+from .models import BusinessMonthlyRollup, InvestorMonthlyRollup, Log, ProfitDistribution
+
+ROLLUP_BATCH_SIZE = 500
+
+
+def log_period(log):
+    """The (year, month) a log reports on, or None for logs without one"""
+    if log.year is None or log.month is None:
+        return None
+    return (log.year, log.month)
+
+
+def _period_filter(periods, prefix=''):
+    return reduce(or_, (Q(**{f'{prefix}year': year, f'{prefix}month': month}) for year, month in periods))
+
+
+def refresh_business_months(business_id, periods):
+    """
+    Recompute a business's rollups for the given (year, month) periods with one
+    GROUP BY over its logs, then the rollups of everyone invested in it.
+    """
+    periods = {period for period in periods if period is not None}
+    if not periods:
+        return
+
+    BusinessMonthlyRollup.objects.filter(_period_filter(periods), business_id=business_id).delete()
+    BusinessMonthlyRollup.objects.bulk_create(
+        _business_rollups(Log.objects.filter(_period_filter(periods), business_id=business_id)),
+        batch_size=ROLLUP_BATCH_SIZE,
+    )
+
+    refresh_investor_months(Investment.objects.filter(business_id=business_id).values('user_id'), periods)
+
+
+def refresh_investor_months(users, periods=None):
+    """
+    Recompute investor rollups from the business rollups of their holdings and
+    the distributions they received, for the given periods (or all of them).
+    `users` is a list of user ids or a values('user_id') queryset, which is used
+    as a subquery so large holder lists don't become huge IN lists.
+    """
+    business_rollups = BusinessMonthlyRollup.objects.filter(business__investments_received__user__in=users)
+    distributions = ProfitDistribution.objects.filter(user__in=users)
+    existing = InvestorMonthlyRollup.objects.filter(user__in=users)
+    if periods is not None:
+        periods = {period for period in periods if period is not None}
+        if not periods:
+            return
+        business_rollups = business_rollups.filter(_period_filter(periods))
+        distributions = distributions.filter(_period_filter(periods, 'log__'))
+        existing = existing.filter(_period_filter(periods))
+
+    totals = {}
+    for row in business_rollups.values('year', 'month', investor=F('business__investments_received__user')).annotate(
+        revenue_sum=Sum('revenue'),
+        expense_sum=Sum('expense'),
+        profit_sum=Sum('profit'),
+    ):
+        totals[(row['investor'], row['year'], row['month'])] = InvestorMonthlyRollup(
+            user_id=row['investor'],
+            year=row['year'],
+            month=row['month'],
+            revenue=row['revenue_sum'],
+            expense=row['expense_sum'],
+            profit=row['profit_sum'],
+        )
+    for row in distributions.exclude(log__year=None).exclude(log__month=None).values(
+        'user_id', year=F('log__year'), month=F('log__month'),
+    ).annotate(returns_sum=Sum('amount_distributed')):
+        key = (row['user_id'], row['year'], row['month'])
+        rollup = totals.setdefault(key, InvestorMonthlyRollup(user_id=key[0], year=key[1], month=key[2]))
+        rollup.returns = row['returns_sum'] or Decimal('0')
+
+    existing.delete()
+    InvestorMonthlyRollup.objects.bulk_create(totals.values(), batch_size=ROLLUP_BATCH_SIZE)
+
+
+def rebuild_rollups():
+    """Recompute every business and investor rollup from scratch"""
+    BusinessMonthlyRollup.objects.all().delete()
+    BusinessMonthlyRollup.objects.bulk_create(
+        _business_rollups(Log.objects.exclude(year=None).exclude(month=None)),
+        batch_size=ROLLUP_BATCH_SIZE,
+    )
+    InvestorMonthlyRollup.objects.all().delete()
+    refresh_investor_months(Investment.objects.values('user_id'))
+
+
+def _business_rollups(logs):
+    """Unsaved rollups for `logs`, grouped by business and month in SQL"""
+    return [
+        BusinessMonthlyRollup(
+            business_id=row['business_id'],
+            year=row['year'],
+            month=row['month'],
+            revenue=row['revenue_sum'] or 0,
+            expense=row['expense_sum'] or 0,
+            profit=row['profit_sum'] or 0,
+            distributed=row['distributed_sum'] or 0,
+            log_count=row['logs'],
+        )
+        for row in logs.values('business_id', 'year', 'month').annotate(
+            revenue_sum=Sum('total_revenue'),
+            expense_sum=Sum('total_expense'),
+            profit_sum=Sum('profit_generated'),
+            distributed_sum=Sum('profit_distributed'),
+            logs=Count('id'),
+        )
+    ]
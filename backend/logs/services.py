@@ -0,0 +1,129 @@
+from decimal import Decimal, ROUND_DOWN
+
+from django.db import transaction
+from django.utils import timezone
+
+from investments_tracking.models import Investment
+from users.funds import apply_fund_changes
+from users.models import FundTransaction
+from .models import Log, ProfitDistribution
+from .signals import profit_distributed
+
+CENT = Decimal('0.01')
+
+# Rows per INSERT for ProfitDistribution. Kept well under SQLite's bound-parameter limit.
+DISTRIBUTION_BATCH_SIZE = 500
+
+
+class ProfitDistributionError(Exception):
+    """Base class for reasons a log's profit cannot be distributed"""
+
+
+class ProfitAlreadyDistributed(ProfitDistributionError):
+    pass
+
+
+class NoProfitToDistribute(ProfitDistributionError):
+    pass
+
+
+class NoInvestorsToDistributeTo(ProfitDistributionError):
+    pass
+
+
+def compute_shares(investments, profit):
+    """
+    Split `profit` across `investments` proportionally to the amount invested.
+    Every share is rounded down to the cent and the leftover cents go to the
+    largest remainders (ties broken by investment id), so the shares always sum
+    to exactly `profit`. Returns a list of (investment, share, percentage) tuples.
+    """
+    total_invested = sum((investment.amount for investment in investments), Decimal('0'))
+    if total_invested <= 0:
+        return []
+
+    profit = Decimal(profit).quantize(CENT, rounding=ROUND_DOWN)
+    shares = []
+    remainders = []
+    for index, investment in enumerate(investments):
+        exact = profit * investment.amount / total_invested
+        share = exact.quantize(CENT, rounding=ROUND_DOWN)
+        percentage = (investment.amount * 100 / total_invested).quantize(CENT)
+        shares.append([investment, share, percentage])
+        remainders.append((exact - share, -investment.pk, index))
+
+    leftover_cents = int((profit - sum(share for _, share, _ in shares)) / CENT)
+    for _, _, index in sorted(remainders, reverse=True)[:leftover_cents]:
+        shares[index][1] += CENT
+
+    return [tuple(share) for share in shares]
+
+
+class ProfitDistributionService:
+    """
+    The single place a log's profit is paid out to its business's investors.
+    Used by both the Log post_save signal and the distribute-profit API view.
+
+    Distribution is idempotent per log: the log row is locked and a log that
+    already has a distribution date or distribution rows is rejected, on top of
+    the (log, investment) unique constraint on ProfitDistribution.
+    """
+
+    def distribute(self, log):
+        """
+        Distribute `log`'s profit in a fixed number of queries: one read of the
+        investments, batched inserts of the ProfitDistribution rows, batched fund
+        updates and one UPDATE of the log (no save(), so no signals re-fire).
+        The passed instance is updated in memory. Returns (distributions, total).
+        """
+        with transaction.atomic():
+            locked = Log.objects.select_for_update().filter(pk=log.pk).values(
+                'profit_generated', 'profit_distribution_date'
+            ).first()
+            if locked is None:
+                raise Log.DoesNotExist(f'Log {log.pk} does not exist')
+            if locked['profit_distribution_date'] is not None or ProfitDistribution.objects.filter(log_id=log.pk).exists():
+                raise ProfitAlreadyDistributed('Profit has already been distributed for this log')
+
+            profit = Decimal(locked['profit_generated'] or 0)
+            if profit <= 0:
+                raise NoProfitToDistribute('This log has no profit to distribute')
+
+            investments = list(
+                Investment.objects.filter(business_id=log.business_id).select_related('user').order_by('pk')
+            )
+            shares = compute_shares(investments, profit)
+            if not shares:
+                raise NoInvestorsToDistributeTo('No investments found for this business')
+
+            distributions = [
+                ProfitDistribution(
+                    log=log,
+                    investment=investment,
+                    user=investment.user,
+                    amount_distributed=share,
+                    distribution_percentage=percentage,
+                )
+                for investment, share, percentage in shares
+            ]
+            ProfitDistribution.objects.bulk_create(distributions, batch_size=DISTRIBUTION_BATCH_SIZE)
+
+            apply_fund_changes(
+                {investment.user_id: share for investment, share, _ in shares},
+                FundTransaction.DISTRIBUTION, reference=f'log:{log.pk}'
+            )
+
+            total_distributed = sum((share for _, share, _ in shares), Decimal('0'))
+            distributed_at = timezone.now()
+            Log.objects.filter(pk=log.pk).update(
+                profit_distributed=total_distributed,
+                profit_distribution_date=distributed_at,
+            )
+            log.profit_distributed = total_distributed
+            log.profit_distribution_date = distributed_at
+
+            # bulk_create skips post_save, so listeners (e.g. notifications) hook in here
+            profit_distributed.send(sender=Log, log=log, distributions=distributions)
+
+        return distributions, total_distributed
+
@@ -1,59 +1,95 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from django.db import transaction, models
-from django.utils import timezone
-from .models import Log, ProfitDistribution
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver, Signal
+from jobs.queue import enqueue, job_reference
 from investments_tracking.models import Investment
-from users.models import CustomUser
+from investments_tracking.services import investments_batched
+from .models import BusinessMonthlyRollup, Log, ProfitDistribution
+from .rollups import log_period, refresh_business_months, refresh_investor_months
+
+User = get_user_model()
+
+# Sent after a log's profit has been distributed with bulk inserts (which skip
+# post_save). Receivers get `log` and `distributions` keyword arguments.
+profit_distributed = Signal()
 
 @receiver(post_save, sender=Log)
 def distribute_profit_to_investors(sender, instance, created, **kwargs):
     """
-    Automatically distribute profit to investors when a log is created with profit
+    Queue the distribution of profit to investors when a log is created with profit.
+    The work runs in the job worker so log creation doesn't scale with backer count.
     """
-    if created and instance.profit_generated and float(instance.profit_generated) > 0:
-        try:
-            with transaction.atomic():
-                # Get all investments for this business
-                investments = Investment.objects.filter(business=instance.business)
-                
-                if not investments.exists():
-                    return
-                
-                # Calculate total investment in this business
-                total_business_investment = investments.aggregate(
-                    total=models.Sum('amount')
-                )['total'] or 0
-                
-                if total_business_investment <= 0:
-                    return
-                
-                # Distribute profit proportionally to each investor
-                for investment in investments:
-                    # Calculate this investor's share of the profit
-                    investor_share = (float(investment.amount) / float(total_business_investment)) * float(instance.profit_generated)
-                    
-                    # Create profit distribution record
-                    ProfitDistribution.objects.create(
-                        log=instance,
-                        investment=investment,
-                        user=investment.user,
-                        amount_distributed=investor_share,
-                        distribution_percentage=(float(investment.amount) / float(total_business_investment)) * 100
-                    )
-                    
-                    # Add the profit to the investor's fund
-                    investor = investment.user
-                    current_fund = float(investor.fund or 0)
-                    investor.fund = current_fund + investor_share
-                    investor.save(update_fields=['fund'])
-                
-                # Update the log to mark profit as distributed
-                instance.profit_distributed = instance.profit_generated
-                instance.profit_distribution_date = timezone.now()
-                instance.save(update_fields=['profit_distributed', 'profit_distribution_date'])
-        except Exception as e:
-            # Log the error but don't crash the application
-            print(f"Error in profit distribution signal: {str(e)}")
-            import traceback
-            traceback.print_exc() 
\ No newline at end of file
+    if created and instance.profit_generated and instance.profit_generated > 0:
+        enqueue(
+            'logs.distribute_profit',
+            {'log_id': instance.pk},
+            owner=instance.business.user,
+            reference=job_reference(instance),
+        )
+
+
+@receiver(pre_save, sender=Log)
+def remember_log_period(sender, instance, **kwargs):
+    """Note the month an edited log used to report on so its old rollup is refreshed too"""
+    instance._previous_period = None
+    if instance.pk:
+        previous = Log.objects.filter(pk=instance.pk).values('business_id', 'year', 'month').first()
+        if previous and previous['year'] is not None and previous['month'] is not None:
+            instance._previous_period = (previous['business_id'], (previous['year'], previous['month']))
+
+
+@receiver(post_save, sender=Log)
+def update_rollups_on_log_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_period', None)
+    if previous and previous[0] != instance.business_id:
+        refresh_business_months(*previous)
+        previous = None
+    refresh_business_months(instance.business_id, [log_period(instance), previous and previous[1]])
+
+
+@receiver(post_delete, sender=Log)
+def update_rollups_on_log_delete(sender, instance, **kwargs):
+    refresh_business_months(instance.business_id, [log_period(instance)])
+
+
+@receiver(profit_distributed)
+def update_rollups_on_distribution(sender, log, **kwargs):
+    # The service updates the log with a queryset update, so post_save doesn't fire
+    refresh_business_months(log.business_id, [log_period(log)])
+
+
+def _deleting(origin, model):
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+@receiver(post_save, sender=Investment)
+def update_rollups_on_investment(sender, instance, created, **kwargs):
+    # Top-ups don't change which businesses the investor follows
+    if created:
+        refresh_investor_months([instance.user_id])
+
+
+@receiver(investments_batched)
+def update_rollups_on_investment_batch(sender, user, results, **kwargs):
+    # Only the months the newly backed businesses report on change, and usually there are none
+    new_business_ids = [business.pk for _, business, created in results if created]
+    if new_business_ids:
+        periods = set(
+            BusinessMonthlyRollup.objects.filter(business_id__in=new_business_ids).values_list('year', 'month')
+        )
+        if periods:
+            refresh_investor_months([user.pk], periods)
+
+
+@receiver(post_delete, sender=Investment)
+def update_rollups_on_investment_delete(sender, instance, origin=None, **kwargs):
+    # A deleted investor's rollups go with them
+    if not _deleting(origin, User):
+        refresh_investor_months([instance.user_id])
+
+
+@receiver(post_delete, sender=ProfitDistribution)
+def update_rollups_on_distribution_delete(sender, instance, origin=None, **kwargs):
+    # Cascades from a log, investment or user are handled by their own receivers
+    if _deleting(origin, ProfitDistribution):
+        refresh_investor_months([instance.user_id], [log_period(instance.log)])
@@ -1,3 +1,66 @@
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from investments.models import Business
+from investments_tracking.models import Investment, PortfolioHolding, PortfolioSummary
+from investments_tracking.portfolio import rebuild_portfolios
+from users.models import CustomUser, FundTransaction
+
+from .models import Log, ProfitDistribution
+from .services import ProfitAlreadyDistributed, ProfitDistributionService
+
+
+class ProfitDistributionServiceTests(TestCase):
+    def _log_with_investors(self, count, profit=Decimal('10000.00')):
+        owner = CustomUser.objects.create(username=f'owner_{count}', user_type='entrepreneur')
+        business = Business.objects.create(
+            title=f'Business {count}', tagline='Test', description='Profit distribution test',
+            category='Test', location='Nowhere', funding_goal=Decimal(count * 100),
+            min_investment=Decimal('1'), user=owner,
+        )
+        # Created before the investors, so saving it distributes nothing
+        month, year = Log.get_next_month_year(business.id)
+        log = Log.objects.create(business=business, content='Test', month=month, year=year)
+        Log.objects.filter(pk=log.pk).update(total_revenue=profit, profit_generated=profit)
+        log.refresh_from_db()
+
+        investors = CustomUser.objects.bulk_create([
+            CustomUser(username=f'investor_{count}_{i}', user_type='investor') for i in range(count)
+        ], batch_size=500)
+        Investment.objects.bulk_create([
+            Investment(user=investor, business=business, amount=Decimal(100 + i % 3 * 50))
+            for i, investor in enumerate(investors)
+        ], batch_size=500)
+        rebuild_portfolios()
+        return log
+
+    def _distribute(self, log):
+        with CaptureQueriesContext(connection) as context:
+            ProfitDistributionService().distribute(log)
+        return len(context.captured_queries)
+
+    def test_credits_funds_ledger_and_portfolios(self):
+        log = self._log_with_investors(30)
+        self._distribute(log)
+
+        shares = dict(ProfitDistribution.objects.filter(log=log).values_list('user_id', 'amount_distributed'))
+        self.assertEqual(sum(shares.values()), Decimal('10000.00'))
+        for user_id, fund in CustomUser.objects.filter(pk__in=shares).values_list('pk', 'fund'):
+            self.assertEqual(fund, shares[user_id])
+        ledger = dict(FundTransaction.objects.filter(reference=f'log:{log.pk}').values_list('user_id', 'amount'))
+        self.assertEqual(ledger, shares)
+        for holding in PortfolioHolding.objects.filter(business_id=log.business_id):
+            self.assertEqual(holding.returns, shares[holding.user_id])
+            self.assertEqual(holding.roi_percentage, (shares[holding.user_id] * 100 / holding.invested).quantize(Decimal('0.01')))
+        for summary in PortfolioSummary.objects.filter(user_id__in=shares):
+            self.assertEqual(summary.total_returns, shares[summary.user_id])
+
+        with self.assertRaises(ProfitAlreadyDistributed):
+            ProfitDistributionService().distribute(log)
 
-# Create your tests here.
+    def test_large_distribution_runs_in_batches(self):
+        # Timing is left to benchmark_profit_distribution
+        self.assertLess(self._distribute(self._log_with_investors(3000)), 150)
@@ -11,4 +11,5 @@ urlpatterns = [
     path('my-businesses/', views.my_businesses_logs, name='my_businesses_logs'),
     path('next-month-year/', views.next_month_year, name='next-month-year'),
     path('create/', views.create_log, name='create-log'),
+    path('timeseries/', views.monthly_timeseries, name='monthly-timeseries'),
 ] 
\ No newline at end of file
@@ -6,8 +6,10 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
-from .models import Log, ProfitDistribution
+from .models import BusinessMonthlyRollup, InvestorMonthlyRollup, Log, ProfitDistribution
 from .serializers import LogSerializer, LogListSerializer, ProfitDistributionSerializer
+from .services import ProfitDistributionService, ProfitDistributionError
+from response_cache.cache import cache_response, owner_scope
 from investments.models import Business
 from investments_tracking.models import Investment
 from django.db import models
@@ -149,6 +151,7 @@ def business_logs(request, business_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response(lambda request: [owner_scope(request.user.pk)])
 def recent_logs(request):
     """Get recent logs for businesses owned by the current user"""
     try:
@@ -210,55 +213,15 @@ def distribute_profit(request, log_id):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    # Check if profit has already been distributed
-    if log.profit_distributed > 0:
-        return Response(
-            {'error': 'Profit has already been distributed for this log'}, 
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    # Get all investments for this business
-    investments = Investment.objects.filter(business=log.business)
-    total_invested = investments.aggregate(total=models.Sum('amount'))['total'] or 0
-    
-    if total_invested == 0:
+    # Compute every share in one pass and write them with bulk inserts
+    try:
+        distributions, total_distributed = ProfitDistributionService().distribute(log)
+    except ProfitDistributionError as e:
         return Response(
-            {'error': 'No investments found for this business'}, 
+            {'error': str(e)}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Calculate profit distribution for each investor
-    distributions = []
-    total_distributed = 0
-    
-    for investment in investments:
-        # Calculate investor's percentage of total investment
-        investor_percentage = (investment.amount / total_invested) * 100
-        
-        # Calculate profit share for this investor
-        profit_share = (log.profit_generated * investor_percentage) / 100
-        
-        # Create profit distribution record
-        distribution = ProfitDistribution.objects.create(
-            log=log,
-            investment=investment,
-            user=investment.user,
-            amount_distributed=profit_share,
-            distribution_percentage=investor_percentage
-        )
-        
-        # Update user's fund balance
-        investment.user.fund += profit_share
-        investment.user.save(update_fields=['fund'])
-        
-        distributions.append(distribution)
-        total_distributed += profit_share
-    
-    # Update log with distribution details
-    log.profit_distributed = total_distributed
-    log.profit_distribution_date = timezone.now()
-    log.save(update_fields=['profit_distributed', 'profit_distribution_date'])
-    
     # Return distribution details
     distribution_serializer = ProfitDistributionSerializer(distributions, many=True)
     
@@ -379,3 +342,71 @@ def create_log(request):
             {'error': f'An error occurred: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+def _parse_period(value):
+    """Parse a 'YYYY-MM' query parameter into a (year, month) tuple"""
+    try:
+        year, month = (int(part) for part in value.split('-'))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid month '{value}', expected YYYY-MM")
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month '{value}', expected YYYY-MM")
+    return year, month
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def monthly_timeseries(request):
+    """
+    Monthly revenue/expense/profit series read from the rollup tables.
+    scope=investor (default): the businesses the current user invested in, with their returns
+    scope=business&business=<id>: one business the user owns or invested in
+    scope=owner: all businesses the current user owns
+    Optional from=YYYY-MM and to=YYYY-MM bound the range (inclusive).
+    """
+    scope = request.query_params.get('scope', 'investor')
+    try:
+        start = _parse_period(request.query_params['from']) if 'from' in request.query_params else None
+        end = _parse_period(request.query_params['to']) if 'to' in request.query_params else None
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if scope == 'investor':
+        rows = InvestorMonthlyRollup.objects.filter(user=request.user).values(
+            'year', 'month', 'revenue', 'expense', 'profit', 'returns'
+        )
+    elif scope == 'business':
+        business_id = request.query_params.get('business', '')
+        if not business_id.isdigit():
+            return Response({'error': 'Business ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+        business = get_object_or_404(Business, id=business_id)
+        if business.user != request.user and not Investment.objects.filter(business=business, user=request.user).exists():
+            return Response(
+                {'error': 'Access denied. You must own or have invested in this business to view its figures.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        rows = BusinessMonthlyRollup.objects.filter(business=business).values(
+            'year', 'month', 'revenue', 'expense', 'profit', 'distributed'
+        )
+    elif scope == 'owner':
+        rows = BusinessMonthlyRollup.objects.filter(business__user=request.user).values('year', 'month').annotate(
+            revenue=models.Sum('revenue'),
+            expense=models.Sum('expense'),
+            profit=models.Sum('profit'),
+            distributed=models.Sum('distributed'),
+        )
+    else:
+        return Response(
+            {'error': "scope must be one of 'investor', 'business' or 'owner'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if start:
+        rows = rows.filter(Q(year__gt=start[0]) | Q(year=start[0], month__gte=start[1]))
+    if end:
+        rows = rows.filter(Q(year__lt=end[0]) | Q(year=end[0], month__lte=end[1]))
+
+    results = []
+    for row in rows.order_by('year', 'month'):
+        year, month = row.pop('year'), row.pop('month')
+        results.append({'month': f"{year}-{month:02d}", **{key: float(value or 0) for key, value in row.items()}})
+    return Response({'scope': scope, 'results': results})
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FriendRequest, Conversation, Message
+from .models import FriendRequest, Conversation, ConversationParticipant, Message
 
 @admin.register(FriendRequest)
 class FriendRequestAdmin(admin.ModelAdmin):
@@ -9,13 +9,18 @@ class FriendRequestAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     ordering = ['-created_at']
 
+class ConversationParticipantInline(admin.TabularInline):
+    model = ConversationParticipant
+    extra = 0
+    readonly_fields = ['unread_count']
+
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
     list_display = ['id', 'participants_display', 'created_at', 'updated_at']
     list_filter = ['created_at', 'updated_at']
     search_fields = ['participants__username', 'participants__email']
-    readonly_fields = ['created_at', 'updated_at']
-    filter_horizontal = ['participants']
+    readonly_fields = ['last_message', 'created_at', 'updated_at']
+    inlines = [ConversationParticipantInline]
     ordering = ['-updated_at']
 
     def participants_display(self, obj):
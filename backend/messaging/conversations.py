@@ -0,0 +1,33 @@
+from django.db import IntegrityError, transaction
+
+from .models import Conversation
+
+
+def direct_key(a, b):
+    """Canonical key of the 1:1 conversation between users (or user ids) `a` and `b`"""
+    a, b = sorted(int(getattr(user, 'pk', user)) for user in (a, b))
+    return f'{a}:{b}'
+
+
+def find_direct_conversation(a, b):
+    """The 1:1 conversation between `a` and `b`, or None: one unique-index probe"""
+    return Conversation.objects.filter(direct_key=direct_key(a, b)).first()
+
+
+def get_or_create_direct_conversation(a, b):
+    """
+    The 1:1 conversation between `a` and `b`, created if needed, as
+    (conversation, created). The unique direct_key makes concurrent callers
+    (two investments landing at once, say) end up with the same conversation.
+    """
+    key = direct_key(a, b)
+    conversation = Conversation.objects.filter(direct_key=key).first()
+    if conversation:
+        return conversation, False
+    try:
+        with transaction.atomic():
+            conversation = Conversation.objects.create(direct_key=key)
+            conversation.participants.add(*{getattr(user, 'pk', user) for user in (a, b)})
+        return conversation, True
+    except IntegrityError:
+        return Conversation.objects.get(direct_key=key), False
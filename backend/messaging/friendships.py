@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+
+from .models import FriendRequest, Friendship
+
+User = get_user_model()
+
+
+def _id(user):
+    return getattr(user, 'pk', user)
+
+
+def are_friends(a, b):
+    """Whether users (or user ids) `a` and `b` are friends: one unique-index probe"""
+    return Friendship.objects.filter(user_id=_id(a), friend_id=_id(b)).exists()
+
+
+def friend_ids(user):
+    """Ids of `user`'s friends, as a subquery-ready values queryset"""
+    return Friendship.objects.filter(user_id=_id(user)).values('friend_id')
+
+
+def friends_of(user):
+    """`user`'s friends as a User queryset (a single query)"""
+    return User.objects.filter(friendships__friend_id=_id(user))
+
+
+def suggest_friends(user, limit=10):
+    """
+    Friends of `user`'s friends who aren't already friends with them, most
+    mutual friends first, annotated with `mutual_friends`. One query.
+    """
+    mine = friend_ids(user)
+    return (
+        User.objects.filter(friendships__friend_id__in=mine)
+        .exclude(pk=_id(user))
+        .exclude(pk__in=mine)
+        .annotate(mutual_friends=Count('friendships'))
+        .order_by('-mutual_friends', 'id')[:limit]
+    )
+
+
+def add_friendship(a, b):
+    Friendship.objects.bulk_create([
+        Friendship(user_id=_id(a), friend_id=_id(b)),
+        Friendship(user_id=_id(b), friend_id=_id(a)),
+    ], ignore_conflicts=True)
+
+
+def remove_friendship(a, b):
+    a, b = _id(a), _id(b)
+    Friendship.objects.filter(Q(user_id=a, friend_id=b) | Q(user_id=b, friend_id=a)).delete()
+
+
+def sync_friendship(a, b):
+    """
+    Make the friendship edges of `a` and `b` match their friend requests: they
+    are friends while a request in either direction is accepted.
+    """
+    a, b = _id(a), _id(b)
+    accepted = FriendRequest.objects.filter(
+        Q(from_user_id=a, to_user_id=b) | Q(from_user_id=b, to_user_id=a),
+        status='accepted'
+    ).exists()
+    if accepted:
+        add_friendship(a, b)
+    else:
+        remove_friendship(a, b)
+
+
+def rebuild_friendships():
+    """Recreate every friendship edge from the accepted friend requests"""
+    Friendship.objects.all().delete()
+    pairs = set()
+    for from_id, to_id in FriendRequest.objects.filter(status='accepted').values_list('from_user_id', 'to_user_id'):
+        if from_id != to_id:
+            pairs.update({(from_id, to_id), (to_id, from_id)})
+    Friendship.objects.bulk_create(
+        [Friendship(user_id=user_id, friend_id=friend_id) for user_id, friend_id in pairs],
+        batch_size=500, ignore_conflicts=True
+    )
+    return len(pairs) // 2
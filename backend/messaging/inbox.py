@@ -0,0 +1,53 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Conversation, ConversationParticipant, Message
+
+
+def record_message(message):
+    """
+    A new message: point the conversation at it and bump the unread counter
+    of every participant but the sender. Two UPDATEs, however long the thread.
+    """
+    Conversation.objects.filter(pk=message.conversation_id).update(
+        last_message=message, updated_at=message.created_at
+    )
+    ConversationParticipant.objects.filter(
+        conversation_id=message.conversation_id
+    ).exclude(user_id=message.sender_id).update(unread_count=F('unread_count') + 1)
+
+
+def mark_read(conversation, user):
+    """
+    Mark the messages other participants sent to `user` in `conversation` as
+    read and clear their unread counter. Returns how many messages were marked.
+    """
+    marked = Message.objects.filter(
+        conversation=conversation,
+        is_read=False
+    ).exclude(sender=user).update(is_read=True)
+    ConversationParticipant.objects.filter(
+        conversation=conversation, user=user
+    ).exclude(unread_count=0).update(unread_count=0)
+    return marked
+
+
+def refresh_inbox(conversation_ids=None):
+    """
+    Recompute the last message and unread counters of `conversation_ids` (all
+    conversations when None) from the messages themselves. Used after messages
+    are removed or written in bulk, bypassing record_message.
+    """
+    conversations = Conversation.objects.all()
+    participants = ConversationParticipant.objects.all()
+    if conversation_ids is not None:
+        conversations = conversations.filter(pk__in=conversation_ids)
+        participants = participants.filter(conversation_id__in=conversation_ids)
+
+    conversations.update(last_message=Subquery(
+        Message.objects.filter(conversation=OuterRef('pk')).order_by('-id').values('id')[:1]
+    ))
+    unread = Message.objects.filter(
+        conversation=OuterRef('conversation'), is_read=False
+    ).exclude(sender=OuterRef('user')).order_by().values('conversation').annotate(total=Count('id')).values('total')
+    participants.update(unread_count=Coalesce(Subquery(unread), Value(0)))
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+
+from messaging.conversations import direct_key, find_direct_conversation, get_or_create_direct_conversation
+from messaging.models import Conversation, ConversationParticipant
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare finding a 1:1 conversation by direct key with the double participants join, '
+        'and race concurrent get-or-creates for one pair (created data is deleted afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=3000, help='Conversations of the benchmark user')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent get-or-creates for one pair')
+
+    def handle(self, *args, **options):
+        CustomUser.objects.filter(username__startswith='direct_bench_').delete()
+        user = CustomUser.objects.create(username='direct_bench_user', user_type='investor')
+        try:
+            self._run(user, options['conversations'], options['threads'])
+        finally:
+            users = CustomUser.objects.filter(username__startswith='direct_bench_')
+            Conversation.objects.filter(participants__in=users).delete()
+            users.delete()
+
+    def _run(self, user, count, thread_count):
+        contacts = CustomUser.objects.bulk_create([
+            CustomUser(username=f'direct_bench_{i}', user_type='entrepreneur') for i in range(count)
+        ], batch_size=500)
+        conversations = Conversation.objects.bulk_create([
+            Conversation(direct_key=direct_key(user, contact)) for contact in contacts
+        ], batch_size=500)
+        ConversationParticipant.objects.bulk_create([
+            ConversationParticipant(conversation=conversation, user=member)
+            for conversation, contact in zip(conversations, contacts) for member in (user, contact)
+        ], batch_size=500)
+
+        targets = contacts[::max(1, count // 200)]
+        started = time.perf_counter()
+        for contact in targets:
+            Conversation.objects.filter(participants=user).filter(participants=contact).first()
+        join_ms = (time.perf_counter() - started) * 1000 / len(targets)
+        started = time.perf_counter()
+        for contact in targets:
+            find_direct_conversation(user, contact)
+        key_ms = (time.perf_counter() - started) * 1000 / len(targets)
+        self.stdout.write(
+            f'Lookup among {count} conversations: direct key {key_ms:.3f} ms, '
+            f'double participants join {join_ms:.3f} ms'
+        )
+
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as context:
+            conversation, created = get_or_create_direct_conversation(targets[0], user)
+        if created or conversation.pk != conversations[0].pk or len(context.captured_queries) != 1:
+            raise CommandError('get_or_create_direct_conversation did not find the existing conversation in one query')
+
+        # Concurrent get-or-creates for a new pair must converge on one conversation
+        newcomer = CustomUser.objects.create(username='direct_bench_newcomer', user_type='investor')
+        barrier = threading.Barrier(thread_count)
+        results, errors = [], []
+
+        def race():
+            try:
+                barrier.wait()
+                results.append(get_or_create_direct_conversation(user, newcomer)[0].pk)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=race) for _ in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise CommandError(f'Concurrent get-or-create failed: {errors[0]}')
+        if len(set(results)) != 1 or Conversation.objects.filter(direct_key=direct_key(user, newcomer)).count() != 1:
+            raise CommandError(f'Concurrent get-or-creates made several conversations: {sorted(set(results))}')
+        self.stdout.write(f'{thread_count} concurrent get-or-creates for one pair returned one conversation')
+
+        self.stdout.write(self.style.SUCCESS('1:1 conversations are a single indexed probe and never duplicated'))
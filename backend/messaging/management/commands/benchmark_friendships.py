@@ -0,0 +1,107 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from Blossomvest.benchmarks import api_client, response_error
+from messaging.friendships import are_friends, rebuild_friendships, suggest_friends
+from messaging.models import FriendRequest, Friendship
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Time friend lists, friendship checks and friend suggestions on a random friendship '
+        'graph, and check the edges against the friend requests (all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Users in the graph')
+        parser.add_argument('--friends', type=int, default=40, help='Accepted friend requests sent per user')
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            users = CustomUser.objects.bulk_create([
+                CustomUser(username=f'friend_bench_{i}', user_type='investor') for i in range(options['users'])
+            ], batch_size=500)
+            ids = [user.pk for user in users]
+            pairs = set()
+            for user_id in ids:
+                for friend_id in rng.sample(ids, options['friends']):
+                    if friend_id != user_id and (friend_id, user_id) not in pairs:
+                        pairs.add((user_id, friend_id))
+            FriendRequest.objects.bulk_create([
+                FriendRequest(from_user_id=a, to_user_id=b, status='accepted') for a, b in pairs
+            ], batch_size=1000)
+            # bulk_create skips the signals that maintain the edges
+            rebuild_friendships()
+
+            user = users[0]
+            client = api_client()
+            client.force_authenticate(user)
+
+            queries, elapsed, data = self._get(client, '/api/messaging/friends/')
+            self.stdout.write(
+                f'Friends list ({len(data)} friends): {queries} queries, {elapsed:.1f} ms '
+                f'(was {2 * len(data) + 1} queries dereferencing each request)'
+            )
+            expected = {b for a, b in pairs if a == user.pk} | {a for a, b in pairs if b == user.pk}
+            if {row['id'] for row in data} != expected:
+                raise CommandError('The friends list does not match the accepted requests')
+
+            probes = [(rng.choice(ids), rng.choice(ids)) for _ in range(2000)]
+            started = time.perf_counter()
+            for a, b in probes:
+                are_friends(a, b)
+            edge_ms = (time.perf_counter() - started) * 1000 / len(probes)
+            started = time.perf_counter()
+            for a, b in probes:
+                FriendRequest.objects.filter(
+                    Q(from_user_id=a, to_user_id=b) | Q(from_user_id=b, to_user_id=a), status='accepted'
+                ).exists()
+            or_ms = (time.perf_counter() - started) * 1000 / len(probes)
+            self.stdout.write(f'are_friends: {edge_ms:.3f} ms per check (OR over friend requests: {or_ms:.3f} ms)')
+            for a, b in probes[:200]:
+                if are_friends(a, b) != ((a, b) in pairs or (b, a) in pairs):
+                    raise CommandError(f'are_friends({a}, {b}) disagrees with the friend requests')
+
+            queries, elapsed, data = self._get(client, '/api/messaging/friends/suggestions/')
+            self.stdout.write(f'Suggestions: {queries} queries, {elapsed:.1f} ms, top mutual count {data[0]["mutual_friends"] if data else 0}')
+            for row in data:
+                if row['id'] in expected or row['id'] == user.pk:
+                    raise CommandError('Suggested an existing friend')
+
+            # Unfriending and accepting keep the edges in step
+            friend_id = next(iter(expected))
+            self._check_status(client.delete('/api/messaging/unfriend/', {'target_user_id': friend_id}, format='json'))
+            if are_friends(user, friend_id) or are_friends(friend_id, user):
+                raise CommandError('Unfriending left a friendship edge behind')
+            suggestion = suggest_friends(user, limit=1)[0]
+            request = FriendRequest.objects.create(from_user=suggestion, to_user=user)
+            self._check_status(client.put(f'/api/messaging/friend-requests/{request.pk}/', {'action': 'accept'}, format='json'))
+            if not are_friends(user, suggestion):
+                raise CommandError('Accepting a request did not add the friendship')
+            if Friendship.objects.filter(user_id__in=ids).count() != Friendship.objects.filter(friend_id__in=ids).count():
+                raise CommandError('Friendship edges are not symmetric')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Friendship lookups use the edge table and stay in step with requests'))
+
+    def _get(self, client, url):
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = (time.perf_counter() - started) * 1000
+        self._check_status(response)
+        return len(context.captured_queries), elapsed, response.data
+
+    def _check_status(self, response):
+        if response.status_code != 200:
+            raise CommandError(f"{response.wsgi_request.path} returned {response.status_code}: {response_error(response)}")
@@ -0,0 +1,100 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from Blossomvest.benchmarks import api_client, response_error
+from messaging.inbox import refresh_inbox
+from messaging.models import Conversation, ConversationParticipant, Message
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the conversation inbox and check its maintained last message and unread '
+        'counters against the messages (all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=200, help='Conversations in the inbox')
+        parser.add_argument('--messages', type=int, default=50, help='Messages per conversation')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = CustomUser.objects.create(username='inbox_owner', user_type='investor')
+            others = CustomUser.objects.bulk_create([
+                CustomUser(username=f'inbox_contact_{i}', user_type='entrepreneur')
+                for i in range(options['conversations'])
+            ], batch_size=500)
+            conversations = Conversation.objects.bulk_create([Conversation() for _ in others], batch_size=500)
+            ConversationParticipant.objects.bulk_create([
+                ConversationParticipant(conversation=conversation, user=member)
+                for conversation, other in zip(conversations, others) for member in (user, other)
+            ], batch_size=500)
+            Message.objects.bulk_create([
+                Message(conversation=conversation, sender=user if i % 3 == 0 else other, content=f'Message {i}')
+                for conversation, other in zip(conversations, others) for i in range(options['messages'])
+            ], batch_size=1000)
+            # bulk_create skips the signals that maintain the inbox
+            refresh_inbox([conversation.pk for conversation in conversations])
+
+            client = api_client()
+            client.force_authenticate(user)
+            url = '/api/messaging/conversations/'
+            queries, elapsed, data = self._get(client, url)
+            self.stdout.write(
+                f'Inbox of {len(data)} conversations: {queries} queries, {elapsed:.1f} ms '
+                f'(was {3 * len(data) + 1} queries computing the last message and unread count per row)'
+            )
+            if queries > 2:
+                raise CommandError(f'The inbox took {queries} queries')
+            self._check(data, user)
+
+            # A new message moves the conversation to the top with one more unread
+            conversation, other = conversations[0], others[0]
+            sender = api_client()
+            sender.force_authenticate(other)
+            self._check_status(sender.post(
+                f'/api/messaging/conversations/{conversation.pk}/messages/', {'content': 'Latest news'}, format='json'
+            ), 201)
+            _, _, data = self._get(client, url)
+            if data[0]['id'] != conversation.pk or data[0]['last_message']['content'] != 'Latest news':
+                raise CommandError('A new message did not update the inbox')
+            self._check(data, user)
+
+            # Reading clears the counter, deleting a message recounts it
+            self._check_status(client.put(f'/api/messaging/conversations/{conversation.pk}/mark-read/'), 200)
+            Message.objects.filter(conversation=conversation).order_by('-id').first().delete()
+            _, _, data = self._get(client, url)
+            self._check(data, user)
+            row = next(row for row in data if row['id'] == conversation.pk)
+            if row['unread_count'] != 0 or row['last_message']['content'] == 'Latest news':
+                raise CommandError('Reading or deleting did not update the inbox')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('The inbox is two queries and its counters match the messages'))
+
+    def _get(self, client, url):
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = (time.perf_counter() - started) * 1000
+        self._check_status(response, 200)
+        return len(context.captured_queries), elapsed, response.data
+
+    def _check_status(self, response, expected):
+        if response.status_code != expected:
+            raise CommandError(f"{response.wsgi_request.path} returned {response.status_code}: {response_error(response)}")
+
+    def _check(self, data, user):
+        for row in data:
+            messages = Message.objects.filter(conversation_id=row['id'])
+            unread = messages.filter(is_read=False).exclude(sender=user).count()
+            last_message = messages.order_by('-id').first()
+            if row['unread_count'] != unread:
+                raise CommandError(f"Conversation {row['id']}: {row['unread_count']} unread, expected {unread}")
+            if (row['last_message'] or {}).get('content') != (last_message.content if last_message else None):
+                raise CommandError(f"Conversation {row['id']}: stale last message")
@@ -0,0 +1,103 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from Blossomvest.benchmarks import api_client, response_error
+from messaging.models import Conversation, Message
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Time polling a long and a short conversation in full and through the after_id / '
+        'before_id sync cursors (all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=20000, help='Messages in the long conversation')
+        parser.add_argument('--runs', type=int, default=20, help='Requests per measurement')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            investor = CustomUser.objects.create(username='sync_investor', user_type='investor')
+            founder = CustomUser.objects.create(username='sync_founder', user_type='entrepreneur')
+            long_thread = self._conversation(investor, founder, options['messages'])
+            short_thread = self._conversation(investor, founder, 20)
+
+            client = api_client()
+            client.force_authenticate(investor)
+
+            self.stdout.write(f"{'request':<44} {'rows':>6} {'queries':>8} {'median ms':>10}")
+            for label, conversation in (('long', long_thread), ('short', short_thread)):
+                url = f'/api/messaging/conversations/{conversation.pk}/messages/'
+                newest = conversation.messages.order_by('-id').values_list('id', flat=True).first()
+                oldest = conversation.messages.order_by('id').values_list('id', flat=True).first()
+                requests = [
+                    ('full thread', url),
+                    ('poll, nothing new', f'{url}?after_id={newest}'),
+                    ('poll, 5 new', f'{url}?after_id={newest - 5}'),
+                    ('latest page', f'{url}?limit=50'),
+                    ('older page', f'{url}?before_id={oldest + 100}&limit=50'),
+                ]
+                for name, request_url in requests:
+                    if label == 'long' and name == 'full thread' and options['messages'] > 50000:
+                        continue
+                    rows, queries, elapsed = self._measure(client, request_url, options['runs'])
+                    self.stdout.write(f"{label + ': ' + name:<44} {rows:>6} {queries:>8} {elapsed:>10.2f}")
+
+            # The cursors must hand back exactly the missing messages, oldest first
+            url = f'/api/messaging/conversations/{long_thread.pk}/messages/'
+            newest = long_thread.messages.order_by('-id').values_list('id', flat=True).first()
+            data = self._get(client, f'{url}?after_id={newest - 3}').data
+            if [message['id'] for message in data['results']] != [newest - 2, newest - 1, newest]:
+                raise CommandError('after_id did not return the newest messages in order')
+            if data['has_newer'] or data['after_id'] != newest:
+                raise CommandError('after_id reported the wrong cursor')
+            data = self._get(client, f'{url}?before_id={newest - 3}&limit=2').data
+            if [message['id'] for message in data['results']] != [newest - 5, newest - 4] or not data['has_older']:
+                raise CommandError('before_id did not return the page just older than the cursor')
+
+            self._explain(long_thread, newest)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Incremental sync costs the same on long and short threads'))
+
+    def _conversation(self, investor, founder, count):
+        conversation = Conversation.objects.create()
+        conversation.participants.add(investor, founder)
+        Message.objects.bulk_create([
+            Message(conversation=conversation, sender=investor if i % 2 else founder, content=f'Message {i}')
+            for i in range(count)
+        ], batch_size=1000)
+        return conversation
+
+    def _get(self, client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned {response.status_code}: {response_error(response)}')
+        return response
+
+    def _measure(self, client, url, runs):
+        timings = []
+        for _ in range(runs):
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = self._get(client, url)
+                timings.append((time.perf_counter() - started) * 1000)
+        data = response.data
+        rows = len(data['results'] if isinstance(data, dict) else data)
+        timings.sort()
+        return rows, len(context.captured_queries), timings[len(timings) // 2]
+
+    def _explain(self, conversation, newest):
+        if connection.vendor != 'sqlite':
+            return
+        queryset = Message.objects.filter(conversation=conversation, id__gt=newest).order_by('id')
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' / '.join(row[-1] for row in cursor.fetchall())
+        self.stdout.write(f'Query plan for after_id: {plan}')
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Blossomvest.asgi import application
+from messaging.models import Conversation, FriendRequest, Message
+from messaging.signals import push_messages_read
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Open WebSockets against the ASGI application and measure how fast new messages, '
+        'read receipts and friend requests reach them (created data is deleted afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=200, help='Open sockets listening on the conversation')
+        parser.add_argument('--messages', type=int, default=20, help='Messages to send')
+
+    def handle(self, *args, **options):
+        users = self._create_users(options['sockets'])
+        try:
+            asyncio.run(self._run(users, options['sockets'], options['messages']))
+        finally:
+            CustomUser.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def _create_users(self, count):
+        CustomUser.objects.filter(username__startswith='realtime_bench_').delete()
+        return [CustomUser.objects.create(username=f'realtime_bench_{i}') for i in range(count + 1)]
+
+    async def _run(self, users, socket_count, message_count):
+        sender, listeners = users[0], users[1:]
+        conversation = await sync_to_async(self._create_conversation)(users)
+
+        if await self._connect('not-a-token') is not None:
+            raise CommandError('A socket with an invalid token was accepted')
+
+        sockets = [await self._connect(str(AccessToken.for_user(user))) for user in listeners]
+        if any(socket is None for socket in sockets):
+            raise CommandError('A socket with a valid token was rejected')
+
+        latencies = []
+        for i in range(message_count):
+            started = time.perf_counter()
+            await sync_to_async(Message.objects.create)(conversation=conversation, sender=sender, content=f'Realtime {i}')
+            for socket in sockets:
+                event = await self._next_event(socket)
+                if event['type'] != 'message.created' or event['message']['content'] != f'Realtime {i}':
+                    raise CommandError(f'Unexpected event: {event}')
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        sender_socket = await self._connect(str(AccessToken.for_user(sender)))
+        await sync_to_async(push_messages_read)(conversation, listeners[0])
+        event = await self._next_event(sender_socket)
+        if event['type'] != 'messages.read' or event['reader_id'] != listeners[0].pk:
+            raise CommandError(f'Expected a read receipt, got {event}')
+
+        await sync_to_async(FriendRequest.objects.create)(from_user=sender, to_user=listeners[0])
+        for socket in (sender_socket, sockets[0]):
+            event = await self._next_event(socket)
+            if event['type'] != 'friend_request':
+                raise CommandError(f'Expected a friend request, got {event}')
+
+        for socket in sockets + [sender_socket]:
+            await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await socket.wait(timeout=1)
+
+        latencies.sort()
+        self.stdout.write(
+            f'{socket_count} sockets, {message_count} messages: fan-out to every socket took '
+            f'median {latencies[len(latencies) // 2]:.1f} ms, max {latencies[-1]:.1f} ms '
+            f'(including the INSERT)'
+        )
+        self.stdout.write(
+            f'Polling every 10 s, the same {socket_count} clients would make '
+            f'{socket_count * 6} requests a minute with nothing new to fetch'
+        )
+        self.stdout.write(self.style.SUCCESS('Messages, read receipts and friend requests are pushed to open sockets'))
+
+    def _create_conversation(self, users):
+        conversation = Conversation.objects.create()
+        conversation.participants.add(*users)
+        return conversation
+
+    async def _connect(self, token):
+        socket = ApplicationCommunicator(application, {
+            'type': 'websocket',
+            'path': '/ws/messaging/',
+            'query_string': f'token={token}'.encode(),
+            'headers': [],
+        })
+        await socket.send_input({'type': 'websocket.connect'})
+        reply = await socket.receive_output(timeout=5)
+        if reply['type'] != 'websocket.accept':
+            return None
+        hello = json.loads((await socket.receive_output(timeout=5))['text'])
+        if hello['type'] != 'connected':
+            raise CommandError(f'Unexpected greeting: {hello}')
+        return socket
+
+    async def _next_event(self, socket):
+        message = await socket.receive_output(timeout=5)
+        return json.loads(message['text'])
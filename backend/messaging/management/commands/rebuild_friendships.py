@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from messaging.friendships import rebuild_friendships
+
+
+class Command(BaseCommand):
+    help = 'Recreate the friendship edges from the accepted friend requests'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_friendships()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} friendships'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from messaging.inbox import refresh_inbox
+
+
+class Command(BaseCommand):
+    help = 'Recompute every conversation\'s last message and unread counters from its messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversation', type=int, nargs='+', dest='conversation_ids', help='Only rebuild these conversation ids')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            refresh_inbox(options['conversation_ids'])
+        self.stdout.write(self.style.SUCCESS('Rebuilt conversation inbox counters'))
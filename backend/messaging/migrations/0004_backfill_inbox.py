@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_inbox(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationParticipant = apps.get_model('messaging', 'ConversationParticipant')
+    Message = apps.get_model('messaging', 'Message')
+
+    Conversation.objects.update(last_message=Subquery(
+        Message.objects.filter(conversation=OuterRef('pk')).order_by('-id').values('id')[:1]
+    ))
+    unread = Message.objects.filter(
+        conversation=OuterRef('conversation'), is_read=False
+    ).exclude(sender=OuterRef('user')).order_by().values('conversation').annotate(total=Count('id')).values('total')
+    ConversationParticipant.objects.update(unread_count=Coalesce(Subquery(unread), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_inbox_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def backfill_friendships(apps, schema_editor):
+    FriendRequest = apps.get_model('messaging', 'FriendRequest')
+    Friendship = apps.get_model('messaging', 'Friendship')
+
+    pairs = set()
+    for from_id, to_id in FriendRequest.objects.filter(status='accepted').values_list('from_user_id', 'to_user_id'):
+        if from_id != to_id:
+            pairs.update({(from_id, to_id), (to_id, from_id)})
+    Friendship.objects.bulk_create(
+        [Friendship(user_id=user_id, friend_id=friend_id) for user_id, friend_id in pairs],
+        batch_size=500, ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_friendships'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_friendships, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 01:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0006_backfill_friendships'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='direct_key',
+            field=models.CharField(blank=True, max_length=41, null=True, unique=True),
+        ),
+    ]
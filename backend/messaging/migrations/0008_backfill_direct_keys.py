@@ -0,0 +1,36 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def backfill_direct_keys(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationParticipant = apps.get_model('messaging', 'ConversationParticipant')
+
+    members = defaultdict(set)
+    for conversation_id, user_id in ConversationParticipant.objects.values_list('conversation_id', 'user_id'):
+        members[conversation_id].add(user_id)
+
+    # Earlier code could open several conversations for the same pair; the most
+    # recently active one becomes the canonical one, the others stay unkeyed
+    keys = {}
+    for conversation in Conversation.objects.order_by('-updated_at', '-id').only('id'):
+        users = members.get(conversation.id, set())
+        if len(users) != 2:
+            continue
+        key = ':'.join(str(user_id) for user_id in sorted(users))
+        keys.setdefault(key, conversation.id)
+
+    for key, conversation_id in keys.items():
+        Conversation.objects.filter(pk=conversation_id).update(direct_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0007_conversation_direct_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_direct_keys, migrations.RunPython.noop),
+    ]
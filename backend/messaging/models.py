@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import OuterRef, Subquery
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -23,11 +24,51 @@ class FriendRequest(models.Model):
     def __str__(self):
         return f"{self.from_user.username} -> {self.to_user.username} ({self.status})"
 
+class Friendship(models.Model):
+    """
+    One direction of an accepted friendship: every friendship is stored as the
+    two rows (a, b) and (b, a), written and removed together by
+    messaging.friendships. A user's friends are then one index range scan and
+    "are a and b friends?" a single unique-index probe, with no OR across the
+    two directions of FriendRequest.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='friendships')
+    friend = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'friend'], name='friendship_unique_pair'),
+            models.CheckConstraint(check=~models.Q(user=models.F('friend')), name='friendship_not_self'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} <-> {self.friend_id}"
+
+class ConversationQuerySet(models.QuerySet):
+    def with_inbox_data(self, user):
+        """
+        Load everything an inbox row needs so ConversationSerializer runs no
+        per-row queries: the last message and its sender, the participants
+        (one prefetch query) and `user`'s unread counter (`user_unread_count`).
+        """
+        unread = ConversationParticipant.objects.filter(conversation=OuterRef('pk'), user=user).values('unread_count')[:1]
+        return self.select_related('last_message__sender').prefetch_related('participants').annotate(
+            user_unread_count=Subquery(unread)
+        )
+
 class Conversation(models.Model):
-    participants = models.ManyToManyField(User, related_name='conversations')
+    participants = models.ManyToManyField(User, related_name='conversations', through='ConversationParticipant')
+    # Maintained by messaging.inbox on every new message, so the inbox needs no per-row lookups
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # "<lower user id>:<higher user id>" for 1:1 conversations, null for group chats
+    # (see messaging.conversations)
+    direct_key = models.CharField(max_length=41, unique=True, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ConversationQuerySet.as_manager()
+
     class Meta:
         ordering = ['-updated_at']
     
@@ -35,6 +76,20 @@ class Conversation(models.Model):
         participant_names = [user.username for user in self.participants.all()]
         return f"Conversation between {', '.join(participant_names)}"
 
+class ConversationParticipant(models.Model):
+    """A user's membership of a conversation, with their unread message counter"""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE)
+    # Column names of the table Django created for the former implicit through model
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='customuser_id')
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'messaging_conversation_participants'
+        unique_together = ('conversation', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} in conversation {self.conversation_id} ({self.unread_count} unread)"
+
 class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
@@ -44,6 +99,10 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Incremental sync: a conversation's messages by id (see MessageSyncPagination)
+            models.Index(fields=['conversation', 'id'], name='message_conversation_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username}: {self.content[:50]}..."
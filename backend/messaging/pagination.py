@@ -0,0 +1,96 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class MessageSyncPagination(BasePagination):
+    """
+    Incremental sync for a conversation's messages, keyed on message ids.
+
+    - `?after_id=<id>` returns the messages newer than `id` (what a client
+      that already has the thread up to `id` is missing).
+    - `?before_id=<id>` returns the page of messages just older than `id`
+      (scrolling back through the history).
+    - `?limit=<n>` alone returns the latest page.
+
+    Either way a page is a range scan on the (conversation, id) index, so
+    polling a thread with tens of thousands of messages costs the same as
+    polling a new one. Messages are always returned oldest first.
+
+    Sync is opt-in: without any of these parameters the view returns the
+    whole thread as before.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'limit'
+    after_query_param = 'after_id'
+    before_query_param = 'before_id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if not any(param in params for param in (
+            self.page_size_query_param, self.after_query_param, self.before_query_param
+        )):
+            return None
+
+        self.page_size = self.get_page_size(request)
+        after_id = self.get_id(params, self.after_query_param)
+        before_id = self.get_id(params, self.before_query_param)
+
+        if after_id is not None:
+            queryset = queryset.filter(id__gt=after_id)
+            if before_id is not None:
+                queryset = queryset.filter(id__lt=before_id)
+            rows = list(queryset.order_by('id')[:self.page_size + 1])
+            self.has_more = len(rows) > self.page_size
+            rows = rows[:self.page_size]
+        else:
+            if before_id is not None:
+                queryset = queryset.filter(id__lt=before_id)
+            rows = list(queryset.order_by('-id')[:self.page_size + 1])
+            self.has_more = len(rows) > self.page_size
+            rows = rows[:self.page_size][::-1]
+
+        # With after_id, has_more means there are newer messages still to fetch;
+        # otherwise it means there is older history before this page
+        self.newer = after_id is not None
+        self.after_id = rows[-1].id if rows else after_id
+        self.before_id = rows[0].id if rows else before_id
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_id(self, params, name):
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: 'Must be a message id.'})
+
+    def get_paginated_response(self, data):
+        return Response({
+            'results': data,
+            'has_newer': self.newer and self.has_more,
+            'has_older': not self.newer and self.has_more,
+            'after_id': self.after_id,
+            'before_id': self.before_id,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'results': schema,
+                'has_newer': {'type': 'boolean'},
+                'has_older': {'type': 'boolean'},
+                'after_id': {'type': 'integer', 'nullable': True},
+                'before_id': {'type': 'integer', 'nullable': True},
+            },
+        }
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def user_channel(user_id):
+    """The channel a user's open sockets listen on; every realtime event for them goes here"""
+    return f'messaging.user.{user_id}'
+
+
+class Subscription:
+    """Events published to one channel, for one open socket"""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.queue = asyncio.Queue(maxsize=getattr(settings, 'REALTIME_QUEUE_SIZE', 100))
+        self.loop = asyncio.get_running_loop()
+
+    def deliver(self, event):
+        # Called from any thread: hand the event over to the socket's event loop
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client that stopped reading loses events rather than growing the queue;
+            # it catches up through the REST endpoints when it reconnects
+            logger.warning(f'Dropping realtime event for slow subscriber on {self.channel}')
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def close(self):
+        await self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Pub/sub between the threads of a single server process. Events published by
+    another process (a second worker, the job runner) are not seen; use
+    RedisBroker when running more than one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    async def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+
+class RedisBroker:
+    """
+    Pub/sub through Redis, so events reach sockets held by any worker process.
+    Needs the `redis` package; configure REALTIME_REDIS_URL.
+    """
+
+    def __init__(self):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImportError('RedisBroker needs the redis package: pip install redis')
+        url = getattr(settings, 'REALTIME_REDIS_URL', 'redis://localhost:6379/0')
+        self._client = redis.Redis.from_url(url)
+        self._async_client = redis.asyncio.Redis.from_url(url)
+        self._listeners = {}
+
+    def publish(self, channel, event):
+        self._client.publish(channel, json.dumps(event))
+
+    async def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        pubsub = self._async_client.pubsub()
+        await pubsub.subscribe(channel)
+        self._listeners[subscription] = (pubsub, asyncio.create_task(self._listen(pubsub, subscription)))
+        return subscription
+
+    async def _listen(self, pubsub, subscription):
+        async for message in pubsub.listen():
+            if message['type'] == 'message':
+                subscription.deliver(json.loads(message['data']))
+
+    async def unsubscribe(self, subscription):
+        pubsub, task = self._listeners.pop(subscription, (None, None))
+        if task:
+            task.cancel()
+            await pubsub.unsubscribe(subscription.channel)
+            await pubsub.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The broker named by REALTIME_BROKER, created on first use"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'REALTIME_BROKER', 'messaging.realtime.InProcessBroker'))()
+    return _broker
+
+
+def publish_to_users(user_ids, event):
+    """
+    Push `event` (a JSON-serializable dict with a 'type') to the sockets of
+    `user_ids` once the current transaction commits, so clients never hear
+    about rows they can't read yet. Delivery is best effort: clients reload
+    through the REST endpoints when they reconnect.
+    """
+    user_ids = list(user_ids)
+
+    def send():
+        broker = get_broker()
+        for user_id in user_ids:
+            try:
+                broker.publish(user_channel(user_id), event)
+            except Exception as e:
+                logger.error(f'Failed to publish {event.get("type")} to user {user_id}: {e}')
+
+    transaction.on_commit(send)
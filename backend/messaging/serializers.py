@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import FriendRequest, Conversation, Message
+from .models import FriendRequest, Conversation, ConversationParticipant, Message
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -9,6 +9,12 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'user_type', 'email']
 
+class FriendSuggestionSerializer(UserSerializer):
+    mutual_friends = serializers.IntegerField(read_only=True)
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ['mutual_friends']
+
 class FriendRequestSerializer(serializers.ModelSerializer):
     from_user = UserSerializer(read_only=True)
     to_user = UserSerializer(read_only=True)
@@ -47,7 +53,7 @@ class ConversationSerializer(serializers.ModelSerializer):
         fields = ['id', 'participants', 'last_message', 'unread_count', 'created_at', 'updated_at']
     
     def get_last_message(self, obj):
-        last_message = obj.messages.last()
+        last_message = obj.last_message
         if last_message:
             return {
                 'content': last_message.content,
@@ -57,9 +63,15 @@ class ConversationSerializer(serializers.ModelSerializer):
         return None
     
     def get_unread_count(self, obj):
+        # Annotated by Conversation.objects.with_inbox_data()
+        if hasattr(obj, 'user_unread_count'):
+            return obj.user_unread_count or 0
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.messages.filter(is_read=False).exclude(sender=request.user).count()
+            unread = ConversationParticipant.objects.filter(
+                conversation=obj, user=request.user
+            ).values_list('unread_count', flat=True).first()
+            return unread or 0
         return 0
 
 class CreateMessageSerializer(serializers.ModelSerializer):
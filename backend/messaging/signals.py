@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .friendships import sync_friendship
+from .inbox import record_message, refresh_inbox
+from .models import FriendRequest, Message
+from .realtime import publish_to_users
+from .serializers import FriendRequestSerializer, MessageSerializer
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Message)
+def track_new_message(sender, instance, created, **kwargs):
+    """Keep the conversation's last message and unread counters current"""
+    if created:
+        record_message(instance)
+
+
+@receiver(post_delete, sender=Message)
+def untrack_deleted_message(sender, instance, origin=None, **kwargs):
+    """
+    Recount the inbox of a conversation whose messages were deleted directly
+    (deleting the conversation or a user takes its counters with it).
+    """
+    deleting_messages = isinstance(origin, Message) or (
+        isinstance(origin, QuerySet) and origin.model is Message
+    )
+    if deleting_messages:
+        refresh_inbox([instance.conversation_id])
+
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, **kwargs):
+    """Push a new message to every participant's open sockets"""
+    if not created:
+        return
+    participant_ids = instance.conversation.participants.values_list('id', flat=True)
+    publish_to_users(participant_ids, {
+        'type': 'message.created',
+        'conversation_id': instance.conversation_id,
+        'message': MessageSerializer(instance).data,
+    })
+
+
+@receiver(post_save, sender=FriendRequest)
+def track_friendship(sender, instance, **kwargs):
+    """Keep the friendship edges in step with accepted friend requests"""
+    sync_friendship(instance.from_user_id, instance.to_user_id)
+
+
+@receiver(post_delete, sender=FriendRequest)
+def untrack_friendship(sender, instance, origin=None, **kwargs):
+    # Deleting a user removes their friendship edges by cascade
+    if isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User):
+        return
+    sync_friendship(instance.from_user_id, instance.to_user_id)
+
+
+@receiver(post_save, sender=FriendRequest)
+def push_friend_request(sender, instance, **kwargs):
+    """Push friend requests and their acceptance or rejection to both users"""
+    publish_to_users([instance.from_user_id, instance.to_user_id], {
+        'type': 'friend_request',
+        'friend_request': FriendRequestSerializer(instance).data,
+    })
+
+
+def push_messages_read(conversation, reader):
+    """
+    Tell the other participants that `reader` has read their messages in
+    `conversation`. Called by the views, since marking read is a queryset update.
+    """
+    participant_ids = conversation.participants.exclude(id=reader.id).values_list('id', flat=True)
+    publish_to_users(participant_ids, {
+        'type': 'messages.read',
+        'conversation_id': conversation.id,
+        'reader_id': reader.id,
+    })
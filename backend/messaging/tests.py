@@ -1,3 +1,243 @@
-from django.test import TestCase
+import asyncio
+import json
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import CustomUser
+
+from .friendships import are_friends, rebuild_friendships
+from .inbox import refresh_inbox
+from .models import Conversation, ConversationParticipant, FriendRequest, Friendship, Message
+from .realtime import InProcessBroker, get_broker, user_channel
+from .websocket import CLOSE_UNAUTHORIZED, websocket_router
+
+
+class MessageSyncTests(TestCase):
+    def setUp(self):
+        self.investor = CustomUser.objects.create(username='investor', user_type='investor')
+        self.founder = CustomUser.objects.create(username='founder', user_type='entrepreneur')
+        self.client = APIClient()
+        self.client.force_authenticate(self.investor)
+
+    def _conversation(self, count):
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.investor, self.founder)
+        Message.objects.bulk_create([
+            Message(conversation=conversation, sender=self.investor if i % 2 else self.founder, content=f'Message {i}')
+            for i in range(count)
+        ])
+        return conversation, list(conversation.messages.order_by('id').values_list('id', flat=True))
+
+    def _get(self, conversation, query=''):
+        response = self.client.get(f'/api/messaging/conversations/{conversation.pk}/messages/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_after_id_returns_the_missing_messages_oldest_first(self):
+        conversation, ids = self._conversation(30)
+        data = self._get(conversation, f'?after_id={ids[-4]}')
+        self.assertEqual([message['id'] for message in data['results']], ids[-3:])
+        self.assertFalse(data['has_newer'])
+        self.assertEqual(data['after_id'], ids[-1])
+
+        data = self._get(conversation, f'?after_id={ids[-1]}')
+        self.assertEqual(data['results'], [])
+
+    def test_before_id_returns_the_page_just_older_than_the_cursor(self):
+        conversation, ids = self._conversation(30)
+        data = self._get(conversation, f'?before_id={ids[-4]}&limit=2')
+        self.assertEqual([message['id'] for message in data['results']], ids[-6:-4])
+        self.assertTrue(data['has_older'])
+
+    def test_polling_costs_the_same_on_long_and_short_threads(self):
+        short, short_ids = self._conversation(10)
+        long, long_ids = self._conversation(2000)
+        with self.assertNumQueries(1):
+            self._get(short, f'?after_id={short_ids[-1]}')
+        with self.assertNumQueries(1):
+            self._get(long, f'?after_id={long_ids[-1]}')
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self._get(long, '?limit=50')['results']), 50)
+
+    def test_full_thread_without_cursors(self):
+        conversation, ids = self._conversation(5)
+        data = self._get(conversation)
+        self.assertEqual([message['id'] for message in data], ids)
+
+
+class InboxTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='owner', user_type='investor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _add_conversations(self, count, messages=6):
+        others = CustomUser.objects.bulk_create([
+            CustomUser(username=f'contact_{Conversation.objects.count()}_{i}', user_type='entrepreneur')
+            for i in range(count)
+        ])
+        conversations = Conversation.objects.bulk_create([Conversation() for _ in others])
+        ConversationParticipant.objects.bulk_create([
+            ConversationParticipant(conversation=conversation, user=member)
+            for conversation, other in zip(conversations, others) for member in (self.user, other)
+        ])
+        Message.objects.bulk_create([
+            Message(conversation=conversation, sender=self.user if i % 3 == 0 else other, content=f'Message {i}')
+            for conversation, other in zip(conversations, others) for i in range(messages)
+        ])
+        # bulk_create skips the signals that maintain the inbox
+        refresh_inbox([conversation.pk for conversation in conversations])
+        return list(zip(conversations, others))
+
+    def _inbox(self):
+        response = self.client.get('/api/messaging/conversations/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def _assert_counters_match(self, inbox):
+        for row in inbox:
+            messages = Message.objects.filter(conversation_id=row['id'])
+            self.assertEqual(row['unread_count'], messages.filter(is_read=False).exclude(sender=self.user).count())
+            self.assertEqual(row['last_message']['content'], messages.order_by('-id').first().content)
+
+    def test_inbox_query_count_does_not_grow_with_conversations(self):
+        for total in (3, 60):
+            self._add_conversations(total - Conversation.objects.count())
+            with self.assertNumQueries(2):
+                inbox = self._inbox()
+            self.assertEqual(len(inbox), total)
+            self._assert_counters_match(inbox)
+
+    def test_counters_follow_new_read_and_deleted_messages(self):
+        (conversation, other), _ = self._add_conversations(2)
+        sender = APIClient()
+        sender.force_authenticate(other)
+        response = sender.post(
+            f'/api/messaging/conversations/{conversation.pk}/messages/', {'content': 'Latest news'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        inbox = self._inbox()
+        self.assertEqual(inbox[0]['id'], conversation.pk)
+        self.assertEqual(inbox[0]['last_message']['content'], 'Latest news')
+        self._assert_counters_match(inbox)
+
+        response = self.client.put(f'/api/messaging/conversations/{conversation.pk}/mark-read/')
+        self.assertEqual(response.status_code, 200)
+        Message.objects.filter(conversation=conversation).order_by('-id').first().delete()
+        inbox = self._inbox()
+        row = next(row for row in inbox if row['id'] == conversation.pk)
+        self.assertEqual(row['unread_count'], 0)
+        self.assertNotEqual(row['last_message']['content'], 'Latest news')
+        self._assert_counters_match(inbox)
+
+
+class FriendshipTests(TestCase):
+    def setUp(self):
+        self.users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'user_{i}', user_type='investor') for i in range(6)
+        ])
+        self.me, self.alice, self.bob, self.carol, self.dave, self.erin = self.users
+        # me - alice, me - bob (accepted both ways round), alice - carol, bob - carol, bob - dave
+        FriendRequest.objects.bulk_create([
+            FriendRequest(from_user=a, to_user=b, status='accepted')
+            for a, b in ((self.me, self.alice), (self.bob, self.me), (self.alice, self.carol),
+                         (self.bob, self.carol), (self.bob, self.dave))
+        ] + [FriendRequest(from_user=self.erin, to_user=self.me, status='pending')])
+        # bulk_create skips the signals that maintain the edges
+        rebuild_friendships()
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+
+    def _get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_friend_list_and_checks_read_the_edges(self):
+        with self.assertNumQueries(1):
+            friends = self._get('/api/messaging/friends/')
+        self.assertEqual({row['id'] for row in friends}, {self.alice.pk, self.bob.pk})
+        self.assertTrue(are_friends(self.me, self.bob) and are_friends(self.bob, self.me))
+        self.assertFalse(are_friends(self.me, self.erin))
+
+    def test_suggestions_rank_friends_of_friends_by_mutual_friends(self):
+        with self.assertNumQueries(1):
+            suggestions = self._get('/api/messaging/friends/suggestions/')
+        self.assertEqual(
+            [(row['id'], row['mutual_friends']) for row in suggestions],
+            [(self.carol.pk, 2), (self.dave.pk, 1)],
+        )
+
+    def test_unfriending_and_accepting_keep_the_edges_in_step(self):
+        response = self.client.delete('/api/messaging/unfriend/', {'target_user_id': self.bob.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(are_friends(self.me, self.bob) or are_friends(self.bob, self.me))
+
+        request = FriendRequest.objects.get(from_user=self.erin, to_user=self.me)
+        response = self.client.put(f'/api/messaging/friend-requests/{request.pk}/', {'action': 'accept'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(are_friends(self.me, self.erin) and are_friends(self.erin, self.me))
+        self.assertEqual(
+            set(Friendship.objects.values_list('user_id', 'friend_id')),
+            set(Friendship.objects.values_list('friend_id', 'user_id')),
+        )
+
+
+class MessagingSocketTests(TransactionTestCase):
+    """
+    The realtime socket driven as a bare ASGI app, with the in-process broker
+    (a transaction test: the socket closes stale connections, and events wait for a commit)
+    """
+
+    def setUp(self):
+        self.investor = CustomUser.objects.create(username='investor', user_type='investor')
+        self.founder = CustomUser.objects.create(username='founder', user_type='entrepreneur')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.investor, self.founder)
+
+    async def _connect(self, token):
+        """(queue of frames for the socket, queue of what it sent, its task)"""
+        incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+        scope = {'type': 'websocket', 'path': '/ws/messaging/', 'query_string': f'token={token}'.encode()}
+        task = asyncio.create_task(websocket_router(scope, incoming.get, outgoing.put))
+        await incoming.put({'type': 'websocket.connect'})
+        return incoming, outgoing, task
+
+    async def _received(self, outgoing):
+        message = await asyncio.wait_for(outgoing.get(), timeout=5)
+        return json.loads(message['text']) if message['type'] == 'websocket.send' else message
+
+    def _send_message(self, content):
+        client = APIClient()
+        client.force_authenticate(self.founder)
+        response = client.post(
+            f'/api/messaging/conversations/{self.conversation.pk}/messages/', {'content': content}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    async def test_bad_tokens_are_refused(self):
+        _, outgoing, task = await self._connect('not-a-token')
+        self.assertEqual(await self._received(outgoing), {'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        await asyncio.wait_for(task, timeout=5)
+
+    async def test_events_reach_the_recipients_socket_until_it_closes(self):
+        broker = get_broker()
+        self.assertIsInstance(broker, InProcessBroker)
+        incoming, outgoing, task = await self._connect(str(AccessToken.for_user(self.investor)))
+        self.assertEqual(await self._received(outgoing), {'type': 'websocket.accept'})
+        self.assertEqual(await self._received(outgoing), {'type': 'connected', 'user_id': self.investor.pk})
+
+        await incoming.put({'type': 'websocket.receive', 'text': json.dumps({'type': 'ping'})})
+        self.assertEqual(await self._received(outgoing), {'type': 'pong'})
+
+        await sync_to_async(self._send_message)('Are you free on Friday?')
+        event = await self._received(outgoing)
+        self.assertEqual((event['type'], event['conversation_id']), ('message.created', self.conversation.pk))
+        self.assertEqual(event['message']['content'], 'Are you free on Friday?')
+
+        await incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(task, timeout=5)
+        self.assertNotIn(user_channel(self.investor.pk), broker._subscriptions)
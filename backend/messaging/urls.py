@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import (
     FriendRequestListView, CreateFriendRequestView, AcceptRejectFriendRequestView,
-    UserSearchView, FriendsListView, UnfriendView, ConversationListView, ConversationDetailView,
+    UserSearchView, FriendsListView, FriendSuggestionsView, UnfriendView, ConversationListView, ConversationDetailView,
     MessageListView, MarkMessagesAsReadView, ConversationDeleteView, CreateOrGetConversationView
 )
 
@@ -13,6 +13,7 @@ urlpatterns = [
     
     # Friends List
     path('friends/', FriendsListView.as_view(), name='friends-list'),
+    path('friends/suggestions/', FriendSuggestionsView.as_view(), name='friend-suggestions'),
     path('unfriend/', UnfriendView.as_view(), name='unfriend'),
     
     # User Search
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from .models import FriendRequest, Conversation
+from .conversations import get_or_create_direct_conversation
+from .friendships import are_friends
+from .models import FriendRequest
 import logging
 
 User = get_user_model()
@@ -14,6 +16,10 @@ def create_automatic_friendship(investor_user, business_owner_user):
     try:
         logger.info(f"Creating automatic friendship between investor {investor_user.username} and business owner {business_owner_user.username}")
         
+        # Repeat investments: already friends, nothing to do
+        if are_friends(investor_user, business_owner_user):
+            return True
+        
         # Check if a friend request already exists between these users
         existing_request = FriendRequest.objects.filter(
             (Q(from_user=investor_user, to_user=business_owner_user) |
@@ -29,27 +35,23 @@ def create_automatic_friendship(investor_user, business_owner_user):
                 logger.info(f"Updated existing friend request to accepted")
                 
                 # Create conversation if it doesn't exist
-                if not Conversation.objects.filter(
-                    participants=investor_user
-                ).filter(
-                    participants=business_owner_user
-                ).exists():
-                    conversation = Conversation.objects.create()
-                    conversation.participants.add(investor_user, business_owner_user)
+                conversation, created = get_or_create_direct_conversation(investor_user, business_owner_user)
+                if created:
                     logger.info(f"Created new conversation for existing friendship")
         else:
-            # Create a new friend request from investor to business owner
-            friend_request = FriendRequest.objects.create(
+            # Create a new friend request from investor to business owner. Concurrent
+            # first investments in two of the owner's businesses can both get here,
+            # so the loser of the unique (from_user, to_user) race reuses the winner's
+            friend_request, _ = FriendRequest.objects.get_or_create(
                 from_user=investor_user,
                 to_user=business_owner_user,
-                status='accepted'  # Automatically accept the request
+                defaults={'status': 'accepted'}  # Automatically accept the request
             )
             logger.info(f"Created new friend request: {friend_request.id}")
             
-            # Create a conversation between the two users
-            conversation = Conversation.objects.create()
-            conversation.participants.add(investor_user, business_owner_user)
-            logger.info(f"Created new conversation: {conversation.id}")
+            # Create a conversation between the two users (or reuse theirs)
+            conversation, created = get_or_create_direct_conversation(investor_user, business_owner_user)
+            logger.info(f"{'Created new' if created else 'Reusing'} conversation: {conversation.id}")
             
         logger.info(f"Automatic friendship creation successful between {investor_user.username} and {business_owner_user.username}")
         return True
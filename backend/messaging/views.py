@@ -8,9 +8,14 @@ from .models import FriendRequest, Conversation, Message
 from .serializers import (
     FriendRequestSerializer, CreateFriendRequestSerializer,
     ConversationSerializer, MessageSerializer, CreateMessageSerializer,
-    UserSerializer
+    UserSerializer, FriendSuggestionSerializer
 )
 from rest_framework import serializers
+from .conversations import find_direct_conversation, get_or_create_direct_conversation
+from .friendships import are_friends, friends_of, suggest_friends
+from .inbox import mark_read
+from .pagination import MessageSyncPagination
+from .signals import push_messages_read
 
 User = get_user_model()
 
@@ -31,6 +36,9 @@ class CreateFriendRequestView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
     
     def perform_create(self, serializer):
+        if are_friends(self.request.user, serializer.validated_data['to_user']):
+            raise serializers.ValidationError("You are already friends with this user.")
+
         # Check if a friend request already exists between these users
         existing_request = FriendRequest.objects.filter(
             from_user=self.request.user,
@@ -70,9 +78,8 @@ class AcceptRejectFriendRequestView(generics.UpdateAPIView):
             friend_request.status = 'accepted'
             friend_request.save()
             
-            # Create a conversation between the two users
-            conversation = Conversation.objects.create()
-            conversation.participants.add(friend_request.from_user, friend_request.to_user)
+            # Open a conversation between the two users (or reuse theirs)
+            get_or_create_direct_conversation(friend_request.from_user, friend_request.to_user)
             
             return Response({"message": "Friend request accepted!"}, status=status.HTTP_200_OK)
         elif action == 'reject':
@@ -108,21 +115,19 @@ class FriendsListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        # Get all accepted friend requests where current user is either sender or receiver
-        accepted_requests = FriendRequest.objects.filter(
-            Q(from_user=self.request.user) | Q(to_user=self.request.user),
-            status='accepted'
-        )
-        
-        # Get the other user from each accepted request
-        friend_ids = []
-        for request in accepted_requests:
-            if request.from_user == self.request.user:
-                friend_ids.append(request.to_user.id)
-            else:
-                friend_ids.append(request.from_user.id)
-        
-        return User.objects.filter(id__in=friend_ids)
+        return friends_of(self.request.user)
+
+class FriendSuggestionsView(generics.ListAPIView):
+    serializer_class = FriendSuggestionSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        # Friends of friends, most mutual friends first
+        try:
+            limit = max(1, min(int(self.request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            limit = 10
+        return suggest_friends(self.request.user, limit=limit)
 
 class UnfriendView(generics.DestroyAPIView):
     permission_classes = [IsAuthenticated]
@@ -135,21 +140,16 @@ class UnfriendView(generics.DestroyAPIView):
                 {"error": "target_user_id is required"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        friend_request = FriendRequest.objects.filter(
+        if not are_friends(request.user, target_user_id):
+            # Return 200 with a message even if already unfriended
+            return Response({"message": "No friendship found or already removed."}, status=status.HTTP_200_OK)
+        # Deleting the accepted request(s) removes the friendship edges too
+        FriendRequest.objects.filter(
             Q(from_user=request.user, to_user_id=target_user_id) | 
             Q(from_user_id=target_user_id, to_user=request.user),
             status='accepted'
-        ).first()
-        if not friend_request:
-            # Return 200 with a message even if already unfriended
-            return Response({"message": "No friendship found or already removed."}, status=status.HTTP_200_OK)
-        friend_request.delete()
-        from .models import Conversation
-        conversation = Conversation.objects.filter(
-            participants=request.user
-        ).filter(
-            participants_id=target_user_id
-        ).first()
+        ).delete()
+        conversation = find_direct_conversation(request.user, target_user_id)
         if conversation:
             conversation.delete()
         return Response({"message": "Friend removed successfully"}, status=status.HTTP_200_OK)
@@ -160,7 +160,9 @@ class ConversationListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Conversation.objects.filter(participants=self.request.user)
+        # The whole inbox in two queries: conversations with their last message and
+        # the user's unread counter, then the participants
+        return Conversation.objects.filter(participants=self.request.user).with_inbox_data(self.request.user)
     
     def get_serializer_context(self):
         return {'request': self.request}
@@ -177,10 +179,12 @@ class ConversationDetailView(generics.RetrieveAPIView):
 class MessageListView(generics.ListCreateAPIView):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = MessageSyncPagination  # Opt-in with ?after_id=, ?before_id= or ?limit=
     
     def get_queryset(self):
         conversation_id = self.kwargs.get('conversation_id')
-        return Message.objects.filter(conversation_id=conversation_id)
+        # Ids follow creation order, and (conversation, id) is indexed
+        return Message.objects.filter(conversation_id=conversation_id).select_related('sender').order_by('id')
     
     def perform_create(self, serializer):
         conversation_id = self.kwargs.get('conversation_id')
@@ -193,10 +197,9 @@ class MessageListView(generics.ListCreateAPIView):
         serializer.save(sender=self.request.user, conversation=conversation)
         
         # Mark other messages as read
-        Message.objects.filter(
-            conversation=conversation,
-            sender__in=conversation.participants.exclude(id=self.request.user.id)
-        ).update(is_read=True)
+        marked = mark_read(conversation, self.request.user)
+        if marked:
+            push_messages_read(conversation, self.request.user)
 
 class MarkMessagesAsReadView(generics.UpdateAPIView):
     permission_classes = [IsAuthenticated]
@@ -213,10 +216,9 @@ class MarkMessagesAsReadView(generics.UpdateAPIView):
             )
         
         # Mark messages from other participants as read
-        Message.objects.filter(
-            conversation=conversation,
-            sender__in=conversation.participants.exclude(id=request.user.id)
-        ).update(is_read=True)
+        marked = mark_read(conversation, request.user)
+        if marked:
+            push_messages_read(conversation, request.user)
         
         return Response({"message": "Messages marked as read."}, status=status.HTTP_200_OK)
 
@@ -251,20 +253,7 @@ class CreateOrGetConversationView(generics.GenericAPIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Check if conversation already exists between these users
-        existing_conversation = Conversation.objects.filter(
-            participants=request.user
-        ).filter(
-            participants=target_user
-        ).first()
-        
-        if existing_conversation:
-            # Return existing conversation
-            serializer = ConversationSerializer(existing_conversation, context={'request': request})
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        else:
-            # Create new conversation
-            conversation = Conversation.objects.create()
-            conversation.participants.add(request.user, target_user)
-            serializer = ConversationSerializer(conversation, context={'request': request})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # Reuse the existing conversation between these users, or create it
+        conversation, created = get_or_create_direct_conversation(request.user, target_user)
+        serializer = ConversationSerializer(conversation, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
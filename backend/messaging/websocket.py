@@ -0,0 +1,93 @@
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .realtime import get_broker, user_channel
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# Close code for a rejected handshake (bad or missing token)
+CLOSE_UNAUTHORIZED = 4401
+
+
+@sync_to_async
+def authenticate(token):
+    """The active user a JWT access token belongs to, or None"""
+    close_old_connections()
+    try:
+        user_id = AccessToken(token)['user_id']
+    except (TokenError, KeyError):
+        return None
+    try:
+        return User.objects.get(pk=user_id, is_active=True)
+    except User.DoesNotExist:
+        return None
+    finally:
+        close_old_connections()
+
+
+async def messaging_socket(scope, receive, send):
+    """
+    ASGI WebSocket endpoint at /ws/messaging/?token=<JWT access token>.
+
+    Pushes the signed-in user's realtime events as JSON text frames:
+    'message.created', 'messages.read' and 'friend_request'. The client may
+    send {"type": "ping"} and gets {"type": "pong"} back. Browsers can't set
+    headers on a WebSocket, hence the token in the query string.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [''])[0]
+    user = await authenticate(token) if token else None
+    if user is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+
+    subscription = await get_broker().subscribe(user_channel(user.pk))
+    await send({'type': 'websocket.accept'})
+    await send({'type': 'websocket.send', 'text': json.dumps({'type': 'connected', 'user_id': user.pk})})
+
+    async def push_events():
+        while True:
+            event = await subscription.get()
+            await send({'type': 'websocket.send', 'text': json.dumps(event, cls=DjangoJSONEncoder)})
+
+    pusher = asyncio.create_task(push_events())
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message['type'] == 'websocket.receive' and message.get('text'):
+                try:
+                    payload = json.loads(message['text'])
+                except ValueError:
+                    continue
+                if isinstance(payload, dict) and payload.get('type') == 'ping':
+                    await send({'type': 'websocket.send', 'text': json.dumps({'type': 'pong'})})
+    finally:
+        pusher.cancel()
+        await subscription.close()
+
+
+async def websocket_router(scope, receive, send):
+    """Dispatch WebSocket connections by path (the HTTP side is Django's)"""
+    if scope['path'].rstrip('/') == '/ws/messaging':
+        await messaging_socket(scope, receive, send)
+        return
+    # Unknown path: refuse the handshake
+    message = await receive()
+    if message['type'] == 'websocket.connect':
+        await send({'type': 'websocket.close'})
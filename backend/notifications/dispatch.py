@@ -0,0 +1,49 @@
+from .models import Notification
+
+# Rows per INSERT when fanning notifications out
+NOTIFICATION_BATCH_SIZE = 500
+
+
+class NotificationDispatcher:
+    """
+    Collects the notifications for an event and writes them with chunked
+    bulk_create calls, so fan-out costs one INSERT per `batch_size` recipients
+    instead of one per recipient.
+
+        dispatcher = NotificationDispatcher()
+        dispatcher.add_many(investor_ids, message, business=business)
+        dispatcher.send()
+    """
+
+    def __init__(self, batch_size=NOTIFICATION_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._pending = []
+        self.sent = 0
+
+    def add(self, recipient_id, message, business=None):
+        self._pending.append(Notification(recipient_id=recipient_id, message=message, business=business))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def add_many(self, recipient_ids, message, business=None):
+        """Queue the same message for every id in `recipient_ids` (any iterable, e.g. a values_list)"""
+        for recipient_id in recipient_ids:
+            self.add(recipient_id, message, business)
+
+    def send(self):
+        """Write whatever is still pending and return the total number of notifications sent"""
+        self._flush()
+        return self.sent
+
+    def _flush(self):
+        if self._pending:
+            Notification.objects.bulk_create(self._pending, batch_size=self.batch_size)
+            self.sent += len(self._pending)
+            self._pending = []
+
+
+def notify_many(recipient_ids, message, business=None):
+    """Send one message to many recipients in bulk. Returns the number sent."""
+    dispatcher = NotificationDispatcher()
+    dispatcher.add_many(recipient_ids, message, business)
+    return dispatcher.send()
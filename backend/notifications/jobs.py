@@ -0,0 +1,16 @@
+from jobs.queue import register_job
+from logs.models import Log
+from .dispatch import NOTIFICATION_BATCH_SIZE, notify_many
+
+@register_job('notifications.new_log')
+def new_log_notification_job(job, log_id):
+    """Tell every investor of a business that a new report log is available"""
+    try:
+        log = Log.objects.select_related('business').get(pk=log_id)
+    except Log.DoesNotExist:
+        return {'skipped': f'Log {log_id} no longer exists'}
+
+    investors = log.business.investments_received.values_list('user', flat=True)
+    message = f"A new business report log is available for '{log.business.title}'."
+    count = notify_many(investors.iterator(chunk_size=NOTIFICATION_BATCH_SIZE), message, business=log.business)
+    return {'notified': count}
@@ -0,0 +1,71 @@
+import math
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from notifications.dispatch import NotificationDispatcher
+from notifications.models import Notification
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that notification fan-out costs one INSERT per batch, not one per recipient '
+        '(all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipients',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000, 5000],
+            help='Recipient counts to check',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Dispatcher batch size',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        # The backend may split a batch further to stay under its parameter limit
+        insert_fields = [field for field in Notification._meta.concrete_fields if not field.primary_key]
+        rows_per_insert = min(batch_size, connection.ops.bulk_batch_size(insert_fields, []))
+
+        self.stdout.write(f"{'recipients':>10} {'queries':>8} {'expected':>9} {'seconds':>9}")
+        failures = []
+        for count in options['recipients']:
+            queries, elapsed = self._run(count, batch_size)
+            full_batches, remainder = divmod(count, batch_size)
+            expected = full_batches * math.ceil(batch_size / rows_per_insert) + math.ceil(remainder / rows_per_insert)
+            self.stdout.write(f"{count:>10} {queries:>8} {expected:>9} {elapsed:>9.3f}")
+            if queries != expected:
+                failures.append(count)
+
+        if failures:
+            raise CommandError(f"Query count grew with recipients for: {failures}")
+        self.stdout.write(self.style.SUCCESS('Fan-out query count only depends on the number of batches'))
+
+    def _run(self, count, batch_size):
+        with transaction.atomic():
+            recipients = CustomUser.objects.bulk_create([
+                CustomUser(username=f'fanout_recipient_{count}_{i}')
+                for i in range(count)
+            ], batch_size=500)
+            recipient_ids = [recipient.pk for recipient in recipients]
+
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                dispatcher = NotificationDispatcher(batch_size=batch_size)
+                dispatcher.add_many(recipient_ids, 'Fan-out benchmark')
+                dispatcher.send()
+                elapsed = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        return len(context.captured_queries), elapsed
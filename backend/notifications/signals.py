@@ -2,9 +2,13 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from investments_tracking.models import Investment
+from investments_tracking.services import investments_batched
 from logs.models import Log, ProfitDistribution
+from logs.signals import profit_distributed
 from messaging.models import FriendRequest
+from jobs.queue import enqueue, job_reference
 from .models import Notification
+from .dispatch import NotificationDispatcher
 import logging
 
 logger = logging.getLogger(__name__)
@@ -41,13 +45,34 @@ def investment_notification(sender, instance, created, **kwargs):
     except Exception as e:
         logger.error(f"Error creating investment notification: {e}")
 
+@receiver(investments_batched)
+def investment_batch_notification(sender, user, results, amounts, **kwargs):
+    """The investment_notification messages for a whole batch, written in bulk"""
+    investor_name = user.get_full_name() or user.username
+    dispatcher = NotificationDispatcher()
+    for investment, business, created in results:
+        amount = amounts[business.pk]
+        percentage_share = round((float(investment.amount) / float(business.funding_goal)) * 100, 2)
+        if created:
+            owner_message = f"You have a new investment of ${amount} from {investor_name} in your business '{business.title}'. They now own {percentage_share}% of your business."
+            investor_message = f"You have successfully invested ${amount} in '{business.title}'. You now own {percentage_share}% of this business."
+        else:
+            owner_message = f"{investor_name} has made an additional investment of ${amount} in your business '{business.title}'. They now own {percentage_share}% of your business."
+            investor_message = f"You have made an additional investment of ${amount} in '{business.title}'. You now own {percentage_share}% of this business."
+        dispatcher.add(business.user_id, owner_message, business)
+        dispatcher.add(user.pk, investor_message)
+    dispatcher.send()
+
 @receiver(post_save, sender=Log)
 def new_log_notification(sender, instance, created, **kwargs):
     if created:
-        investors = instance.business.investments_received.values_list('user', flat=True)
-        for investor_id in investors:
-            message = f"A new business report log is available for '{instance.business.title}'."
-            Notification.objects.create(recipient_id=investor_id, message=message, business=instance.business)
+        # One notification per investor, so fan out in the job worker
+        enqueue(
+            'notifications.new_log',
+            {'log_id': instance.pk},
+            owner=instance.business.user,
+            reference=job_reference(instance),
+        )
 
 @receiver(post_save, sender=ProfitDistribution)
 def invoice_notification(sender, instance, created, **kwargs):
@@ -55,6 +80,15 @@ def invoice_notification(sender, instance, created, **kwargs):
         message = f"You have received a profit distribution of ${instance.amount_distributed} from '{instance.log.business.title}'."
         Notification.objects.create(recipient=instance.user, message=message, business=instance.log.business)
 
+@receiver(profit_distributed, sender=Log)
+def bulk_invoice_notification(sender, log, distributions, **kwargs):
+    business = log.business
+    dispatcher = NotificationDispatcher()
+    for distribution in distributions:
+        message = f"You have received a profit distribution of ${distribution.amount_distributed} from '{business.title}'."
+        dispatcher.add(distribution.user_id, message, business)
+    dispatcher.send()
+
 @receiver(post_save, sender=FriendRequest)
 def friend_request_notification(sender, instance, created, **kwargs):
     if created:
@@ -69,12 +103,11 @@ def friend_request_notification(sender, instance, created, **kwargs):
         recipient_name = instance.to_user.get_full_name() or instance.to_user.username
         sender_name = instance.from_user.get_full_name() or instance.from_user.username
         
+        dispatcher = NotificationDispatcher()
         # Notify the recipient
-        message = f"You are now friends with {sender_name}. You can start messaging them!"
-        Notification.objects.create(recipient=instance.to_user, message=message)
-        
+        dispatcher.add(instance.to_user_id, f"You are now friends with {sender_name}. You can start messaging them!")
         # Notify the sender
-        message = f"You are now friends with {recipient_name}. You can start messaging them!"
-        Notification.objects.create(recipient=instance.from_user, message=message)
+        dispatcher.add(instance.from_user_id, f"You are now friends with {recipient_name}. You can start messaging them!")
+        dispatcher.send()
         
-        logger.info(f"Friend request notifications created for users {instance.from_user.username} and {instance.to_user.username}")
\ No newline at end of file
+        logger.info(f"Friend request notifications created for users {instance.from_user.username} and {instance.to_user.username}")
@@ -1,3 +1,57 @@
+import math
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from investments.models import Business
+from investments_tracking.models import Investment
+from jobs.models import Job
+from jobs.queue import run_pending_jobs
+from logs.models import Log
+from users.models import CustomUser
+
+from .dispatch import NOTIFICATION_BATCH_SIZE, NotificationDispatcher
+from .models import Notification
+
+
+class NotificationFanOutTests(TestCase):
+    def _users(self, prefix, count):
+        return CustomUser.objects.bulk_create([
+            CustomUser(username=f'{prefix}_{i}', user_type='investor') for i in range(count)
+        ])
+
+    def test_dispatcher_writes_one_insert_per_batch(self):
+        for count, batches in ((10, 1), (100, 1), (250, 3)):
+            recipient_ids = [user.pk for user in self._users(f'recipient_{count}', count)]
+            with self.assertNumQueries(batches):
+                dispatcher = NotificationDispatcher(batch_size=100)
+                dispatcher.add_many(recipient_ids, f'Hello {count}')
+                self.assertEqual(dispatcher.send(), count)
+            self.assertEqual(Notification.objects.filter(message=f'Hello {count}').count(), count)
+
+    def test_new_log_fan_out_queries_do_not_grow_with_investors(self):
+        # The backend may split a batch further to stay under its parameter limit
+        insert_fields = [field for field in Notification._meta.concrete_fields if not field.primary_key]
+        rows_per_insert = min(NOTIFICATION_BATCH_SIZE, connection.ops.bulk_batch_size(insert_fields, []))
+        owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        for count in (5, 50, 1200):
+            business = Business.objects.create(
+                title=f'Business {count}', tagline='Test', description='Fan-out test', category='Test',
+                location='Nowhere', funding_goal=Decimal('100000'), min_investment=Decimal('1'), user=owner,
+            )
+            Investment.objects.bulk_create([
+                Investment(user=investor, business=business, amount=Decimal('10'))
+                for investor in self._users(f'investor_{count}', count)
+            ])
+            Log.objects.create(business=business, content='Monthly update', month=1, year=2026)
+
+            # Nine queries to claim the job, read the log and its investors and
+            # record the result, plus the INSERTs of the notifications
+            full_batches, remainder = divmod(count, NOTIFICATION_BATCH_SIZE)
+            inserts = full_batches * math.ceil(NOTIFICATION_BATCH_SIZE / rows_per_insert) + math.ceil(remainder / rows_per_insert)
+            with self.assertNumQueries(9 + inserts):
+                self.assertEqual(run_pending_jobs(names=['notifications.new_log']), 1)
+            job = Job.objects.get(name='notifications.new_log', reference=f'logs.log:{Log.objects.latest("pk").pk}')
+            self.assertEqual(job.result, {'notified': count})
+            self.assertEqual(Notification.objects.filter(business=business).count(), count)
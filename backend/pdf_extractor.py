@@ -3,16 +3,48 @@ import requests
 import PyPDF2
 import io
 import logging
-from typing import List, Dict, Optional
+import multiprocessing
+import queue
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urlparse
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Characters of cleaned text kept per document; parsing stops once it is reached
+MAX_TEXT_LENGTH = 50000
+TRUNCATION_NOTE = "\n\n[Document truncated due to length]"
+
+# Seconds past its timeout a pooled document gets before it is abandoned, and
+# how often the parent checks on the pool meanwhile
+POOL_GRACE = 5
+POOL_POLL_INTERVAL = 0.05
+
+# In a pool worker: the queue on which it reports when it starts each document
+_started_queue = None
+
+
+def _init_worker(started_queue) -> None:
+    global _started_queue
+    _started_queue = started_queue
+
+
+def _extract_document_in_worker(index: int, source: Dict, max_length: int,
+                                timeout: Optional[float]) -> Tuple[Optional[str], bool]:
+    """Process pool entry point: extract one document described by `source`"""
+    if _started_queue is not None:
+        _started_queue.put((index, time.time()))
+    extractor = PDFExtractor(max_length=max_length)
+    deadline = time.monotonic() + timeout if timeout else None
+    return extractor.extract_document(source, deadline=deadline)
+
+
 class PDFExtractor:
-    def __init__(self):
+    def __init__(self, max_length: int = MAX_TEXT_LENGTH):
         self.supported_extensions = ['.pdf']
+        self.max_length = max_length
     
     def extract_text_from_url(self, url: str) -> Optional[str]:
         """
@@ -62,22 +94,70 @@ class PDFExtractor:
             logger.error(f"Error processing PDF file {file_path}: {str(e)}")
             return None
     
+    def iter_page_texts(self, pdf_bytes) -> Iterator[Tuple[int, str]]:
+        """
+        Yield (page number, text) for every page with text, parsing each page
+        only when the next one is asked for, so callers can stop early
+        """
+        pdf_reader = PyPDF2.PdfReader(pdf_bytes)
+        for page_num, page in enumerate(pdf_reader.pages):
+            try:
+                page_text = page.extract_text()
+            except Exception as e:
+                logger.warning(f"Failed to extract text from page {page_num + 1}: {str(e)}")
+                continue
+            if page_text.strip():
+                yield page_num + 1, page_text
+    
+    def extract_text_from_stream(self, stream, deadline: Optional[float] = None) -> Optional[str]:
+        """
+        Extract and clean the text of a PDF from an open binary file, e.g. a
+        document read straight from MEDIA_ROOT. Pages are parsed one at a time
+        and parsing stops once `max_length` characters of cleaned text are
+        collected, with the same result as cleaning the whole text. Past
+        `deadline` (a time.monotonic() value) the text so far is returned.
+        """
+        return self._collect_text(stream, deadline)[0]
+    
+    def _collect_text(self, stream, deadline: Optional[float] = None) -> Tuple[Optional[str], bool]:
+        """The cleaned, budgeted text of a PDF and whether the deadline cut it short"""
+        parts = []
+        length = -1  # the first part has no separator
+        timed_out = False
+        try:
+            for page_number, page_text in self.iter_page_texts(stream):
+                # Cleaning collapses all whitespace, so each page cleans on its own
+                part = ' '.join(f"--- Page {page_number} ---\n{page_text}".split()).replace('\x00', '')
+                parts.append(part)
+                length += len(part) + 1
+                if length > self.max_length:
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    timed_out = True
+                    break
+        except Exception as e:
+            logger.error(f"Error reading PDF: {str(e)}")
+            if not parts:
+                return None, timed_out
+        
+        if not parts:
+            logger.warning("No text content extracted from PDF")
+            return None, timed_out
+        
+        text = ' '.join(parts)
+        if len(text) > self.max_length:
+            text = text[:self.max_length] + TRUNCATION_NOTE
+        return text, timed_out
+    
     def _extract_text_from_bytes(self, pdf_bytes: io.BytesIO) -> Optional[str]:
         """
         Extract text from PDF bytes using PyPDF2
         """
         try:
-            pdf_reader = PyPDF2.PdfReader(pdf_bytes)
-            text_content = []
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text.strip():
-                        text_content.append(f"--- Page {page_num + 1} ---\n{page_text}")
-                except Exception as e:
-                    logger.warning(f"Failed to extract text from page {page_num + 1}: {str(e)}")
-                    continue
+            text_content = [
+                f"--- Page {page_number} ---\n{page_text}"
+                for page_number, page_text in self.iter_page_texts(pdf_bytes)
+            ]
             
             if not text_content:
                 logger.warning("No text content extracted from PDF")
@@ -89,44 +169,131 @@ class PDFExtractor:
             logger.error(f"Error reading PDF: {str(e)}")
             return None
     
-    def process_business_documents(self, documents: List[Dict]) -> Dict[str, str]:
+    def extract_document(self, source: Dict, deadline: Optional[float] = None) -> Tuple[Optional[str], bool]:
         """
-        Process multiple documents and return a dictionary of document names and their extracted text
+        Cleaned, budgeted text of one document, read from source['file_path']
+        if it has one and downloaded from source['file_url'] otherwise.
+        Returns (text or None, whether `deadline` cut it short).
         """
-        extracted_documents = {}
+        file_path = source.get('file_path')
+        if file_path:
+            with open(file_path, 'rb') as file:
+                return self._collect_text(file, deadline)
+        
+        response = requests.get(source['file_url'], timeout=30)
+        response.raise_for_status()
+        content_type = response.headers.get('content-type', '').lower()
+        if 'pdf' not in content_type:
+            logger.warning(f"URL does not point to a PDF file. Content-Type: {content_type}")
+            return None, False
+        return self._collect_text(io.BytesIO(response.content), deadline)
+    
+    def process_business_documents(self, documents: List[Dict], workers: int = 1,
+                                   timeout: Optional[float] = None) -> Dict[str, str]:
+        """
+        Process multiple documents and return a dictionary of document names and their extracted text.
+        Each document needs a 'file_path' (read directly) or a 'file_url' (downloaded).
         
+        With `workers` > 1 the documents are parsed in parallel in a process
+        pool. `timeout` is the most seconds spent on one document: its text so
+        far is kept when it runs out, and a document stuck inside a single page
+        is abandoned (the pool is terminated once the others are done).
+        """
+        sources = []
         for doc in documents:
-            try:
+            doc_name = doc.get('name', 'Unknown Document')
+            location = doc.get('file_path') or doc.get('file_url', '')
+            
+            if not location:
+                logger.warning(f"No file provided for document: {doc_name}")
+                continue
+            
+            # Check if it's a PDF
+            if not location.lower().endswith('.pdf'):
+                logger.info(f"Skipping non-PDF document: {doc_name} ({location})")
+                continue
+            
+            sources.append(doc)
+        
+        if workers > 1 and len(sources) > 1:
+            results = self._process_in_pool(sources, workers, timeout)
+        else:
+            results = {}
+            for doc in sources:
                 doc_name = doc.get('name', 'Unknown Document')
-                doc_url = doc.get('file_url', '')
-                
-                if not doc_url:
-                    logger.warning(f"No file URL provided for document: {doc_name}")
-                    continue
-                
-                # Check if it's a PDF
-                if not doc_url.lower().endswith('.pdf'):
-                    logger.info(f"Skipping non-PDF document: {doc_name} ({doc_url})")
-                    continue
-                
                 logger.info(f"Processing document: {doc_name}")
-                extracted_text = self.extract_text_from_url(doc_url)
-                
-                if extracted_text:
-                    # Clean and truncate text if too long (to avoid token limits)
-                    cleaned_text = self._clean_text(extracted_text)
-                    extracted_documents[doc_name] = cleaned_text
-                    logger.info(f"Successfully extracted text from: {doc_name} ({len(cleaned_text)} characters)")
-                else:
-                    logger.warning(f"Failed to extract text from: {doc_name}")
-                    
-            except Exception as e:
-                logger.error(f"Error processing document {doc.get('name', 'Unknown')}: {str(e)}")
-                continue
+                try:
+                    deadline = time.monotonic() + timeout if timeout else None
+                    results[doc_name] = self.extract_document(doc, deadline=deadline)
+                except Exception as e:
+                    logger.error(f"Error processing document {doc_name}: {str(e)}")
+        
+        extracted_documents = {}
+        for doc_name, (extracted_text, timed_out) in results.items():
+            if timed_out:
+                logger.warning(f"Timed out extracting {doc_name}; keeping the text parsed so far")
+            if extracted_text:
+                extracted_documents[doc_name] = extracted_text
+                logger.info(f"Successfully extracted text from: {doc_name} ({len(extracted_text)} characters)")
+            else:
+                logger.warning(f"Failed to extract text from: {doc_name}")
         
         return extracted_documents
     
-    def _clean_text(self, text: str, max_length: int = 50000) -> str:
+    def _process_in_pool(self, sources: List[Dict], workers: int,
+                         timeout: Optional[float]) -> Dict[str, Tuple[Optional[str], bool]]:
+        """Extract `sources` in a pool of `workers` processes: name -> (text, timed out)"""
+        workers = min(workers, len(sources))
+        results = {}
+        context = multiprocessing.get_context('spawn')
+        started_queue = context.Queue()
+        pool = context.Pool(workers, initializer=_init_worker, initargs=(started_queue,))
+        try:
+            pending = {
+                index: (doc.get('name', 'Unknown Document'),
+                        pool.apply_async(_extract_document_in_worker, (index, doc, self.max_length, timeout)))
+                for index, doc in enumerate(sources)
+            }
+            # The workers stop themselves between pages. A document that hangs
+            # inside one page is abandoned `timeout + POOL_GRACE` seconds after
+            # its own start, so the documents queued behind it keep their time
+            started = {}
+            stuck = []
+            while pending:
+                while True:
+                    try:
+                        index, started_at = started_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    started[index] = started_at
+                for index, (doc_name, result) in list(pending.items()):
+                    if result.ready():
+                        del pending[index]
+                        try:
+                            results[doc_name] = result.get()
+                        except Exception as e:
+                            logger.error(f"Error processing document {doc_name}: {str(e)}")
+                    elif timeout and index in started and time.time() > started[index] + timeout + POOL_GRACE:
+                        del pending[index]
+                        logger.error(f"Gave up on {doc_name} after {timeout} seconds")
+                        results[doc_name] = (None, True)
+                        stuck.append(result)
+                # Documents that haven't started wait for a worker; there is none left once every one is stuck
+                if pending and sum(not result.ready() for result in stuck) >= workers:
+                    for doc_name, _ in pending.values():
+                        logger.error(f"Gave up on {doc_name}: every worker is stuck on another document")
+                        results[doc_name] = (None, True)
+                    pending = {}
+                if pending:
+                    time.sleep(POOL_POLL_INTERVAL)
+        finally:
+            pool.terminate()
+            pool.join()
+        # In the order of `sources`, whatever order they finished in
+        names = [doc.get('name', 'Unknown Document') for doc in sources]
+        return {doc_name: results[doc_name] for doc_name in names if doc_name in results}
+    
+    def _clean_text(self, text: str, max_length: int = MAX_TEXT_LENGTH) -> str:
         """
         Clean and truncate extracted text
         """
@@ -139,7 +306,7 @@ class PDFExtractor:
         
         # Truncate if too long
         if len(text) > max_length:
-            text = text[:max_length] + "\n\n[Document truncated due to length]"
+            text = text[:max_length] + TRUNCATION_NOTE
         
         return text
     
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ResponseCacheConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'response_cache'
+
+    def ready(self):
+        import response_cache.signals
@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.views import View
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'responses'
+
+# Names of the cached views, for the hit/miss report
+_cached_views = set()
+
+
+def business_scope(business_id):
+    """Scope for data derived from one business (its investments, logs and distributions)"""
+    return f'business:{business_id}'
+
+
+def owner_scope(user_id):
+    """Scope for data aggregated over all the businesses an entrepreneur owns"""
+    return f'owner:{user_id}'
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def is_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', True)
+
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:version:{scope}'
+
+
+def _stat_key(view_name, outcome):
+    return f'{KEY_PREFIX}:stats:{view_name}:{outcome}'
+
+
+def _scope_versions(cache, scopes):
+    """
+    Current version token of each scope, creating missing ones. Cached responses
+    embed these tokens in their keys, so invalidating a scope is a single write
+    that orphans every response built from it, whatever the backend.
+    """
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def scope_fingerprint(*scopes):
+    """
+    A digest of the current versions of `scopes` that changes whenever one of
+    them is invalidated, for keying cached data other than responses.
+    """
+    return hashlib.sha1('|'.join(_scope_versions(get_cache(), list(scopes))).encode()).hexdigest()
+
+
+def invalidate(*scopes):
+    """
+    Drop every cached response built from `scopes`. Runs once the current
+    transaction commits, so a concurrent request can't re-cache the old data.
+    """
+    scopes = [scope for scope in scopes if scope]
+    if not scopes or not is_enabled():
+        return
+
+    def bump():
+        get_cache().set_many({_version_key(scope): uuid.uuid4().hex for scope in scopes}, timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def _count(cache, view_name, outcome):
+    key = _stat_key(view_name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def response_cache_stats():
+    """Hit and miss counts per cached view since the counters were last reset"""
+    cache = get_cache()
+    counts = cache.get_many([
+        _stat_key(view_name, outcome) for view_name in _cached_views for outcome in ('hits', 'misses')
+    ])
+    return {
+        view_name: {
+            'hits': counts.get(_stat_key(view_name, 'hits'), 0),
+            'misses': counts.get(_stat_key(view_name, 'misses'), 0),
+        }
+        for view_name in sorted(_cached_views)
+    }
+
+
+def reset_response_cache_stats():
+    get_cache().delete_many([
+        _stat_key(view_name, outcome) for view_name in _cached_views for outcome in ('hits', 'misses')
+    ])
+
+
+def cache_response(scopes, timeout=None):
+    """
+    Cache a GET view's successful responses per user and query string.
+    `scopes(request, *args, **kwargs)` returns the scopes the response is built
+    from (see business_scope and owner_scope); invalidate() on any of them
+    drops it. `timeout` defaults to RESPONSE_CACHE_TIMEOUT seconds.
+
+    Apply it under @api_view, or directly to a class-based view's get().
+    """
+    def decorator(view):
+        view_name = f'{view.__module__}.{view.__qualname__}'
+        _cached_views.add(view_name)
+
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            # Function views get (request, ...), view methods (self, request, ...)
+            view_args = args
+            if isinstance(args[0], View):
+                args = args[1:]
+            request, args = args[0], args[1:]
+            if request.method != 'GET' or not is_enabled():
+                return view(*view_args, **kwargs)
+
+            cache = get_cache()
+            try:
+                versions = _scope_versions(cache, list(scopes(request, *args, **kwargs)))
+            except Exception as e:
+                # An unreachable cache must not take the dashboard down with it
+                logger.warning(f'Response cache unavailable for {view_name}: {e}')
+                return view(*view_args, **kwargs)
+
+            fingerprint = hashlib.sha1(
+                '|'.join([request.get_full_path(), *versions]).encode()
+            ).hexdigest()
+            key = f'{KEY_PREFIX}:{view_name}:{request.user.pk}:{fingerprint}'
+
+            data = cache.get(key)
+            if data is not None:
+                _count(cache, view_name, 'hits')
+                response = Response(data)
+                response['X-Response-Cache'] = 'hit'
+                return response
+
+            _count(cache, view_name, 'misses')
+            response = view(*view_args, **kwargs)
+            if response.status_code == status.HTTP_200_OK and hasattr(response, 'data'):
+                cache_timeout = timeout if timeout is not None else getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+                cache.set(key, response.data, timeout=cache_timeout)
+                response['X-Response-Cache'] = 'miss'
+            return response
+
+        return wrapped
+    return decorator
@@ -0,0 +1,92 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from Blossomvest.benchmarks import api_client, response_error
+from investments.models import Business
+from investments_tracking.models import Investment
+from logs.models import Log
+from response_cache.cache import business_scope, invalidate, owner_scope
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the cached dashboard endpoints cold and warm, and check that writing an '
+        'investment or log invalidates them (all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--investors', type=int, default=500, help='Investors in the benchmark business')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            owner = CustomUser.objects.create(username='cache_owner', user_type='entrepreneur')
+            business = Business.objects.create(
+                title='Cache Business', tagline='Benchmark', description='Response cache benchmark',
+                category='Benchmark', location='Nowhere', funding_goal=Decimal('1000000'),
+                min_investment=Decimal('1'), user=owner,
+            )
+            investors = CustomUser.objects.bulk_create([
+                CustomUser(username=f'cache_investor_{i}', user_type='investor')
+                for i in range(options['investors'])
+            ], batch_size=500)
+            Investment.objects.bulk_create([
+                Investment(user=investor, business=business, amount=Decimal(10 + i))
+                for i, investor in enumerate(investors)
+            ], batch_size=500)
+            # Rolled-back runs reuse ids, so start from fresh scopes
+            invalidate(business_scope(business.pk), owner_scope(owner.pk))
+            self._commit_hooks()
+
+            client = api_client()
+            client.force_authenticate(owner)
+            urls = [
+                f'/api/investments-tracking/business/{business.pk}/stats/',
+                '/api/investments-tracking/recent/',
+                '/api/investments-tracking/entrepreneur-investors/',
+                '/api/logs/recent/',
+            ]
+
+            self.stdout.write(f"{'endpoint':<52} {'cold q':>7} {'cold ms':>8} {'warm q':>7} {'warm ms':>8}")
+            for url in urls:
+                cold_queries, cold_ms, cold = self._get(client, url)
+                warm_queries, warm_ms, warm = self._get(client, url)
+                if cold['X-Response-Cache'] != 'miss' or warm['X-Response-Cache'] != 'hit':
+                    raise CommandError(f'{url} was not served from the cache on the second request')
+                self.stdout.write(f"{url:<52} {cold_queries:>7} {cold_ms:>8.1f} {warm_queries:>7} {warm_ms:>8.1f}")
+
+            # Writes must drop the cached responses they affect
+            newcomer = CustomUser.objects.create(username='cache_newcomer', user_type='investor')
+            Investment.objects.create(user=newcomer, business=business, amount=Decimal('999999'))
+            Log.objects.create(business=business, content='Cache benchmark', month=1, year=2030)
+            self._commit_hooks()
+            for url in urls:
+                _, _, response = self._get(client, url)
+                if response['X-Response-Cache'] != 'miss':
+                    raise CommandError(f'{url} was still cached after an investment and a log were written')
+            stats = self._get(client, urls[0])[2].data
+            if stats['summary']['total_investors'] != options['investors'] + 1:
+                raise CommandError('The refreshed business stats are missing the new investment')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Warm requests are served from the cache and writes invalidate them'))
+
+    def _get(self, client, url):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned {response.status_code}: {response_error(response)}')
+        return len(context.captured_queries), elapsed, response
+
+    def _commit_hooks(self):
+        # Invalidation waits for the commit; run it now since the benchmark rolls back
+        callbacks, connection.run_on_commit = connection.run_on_commit, []
+        for _, callback, _ in callbacks:
+            callback()
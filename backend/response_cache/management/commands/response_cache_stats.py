@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.urls import get_resolver
+
+from response_cache.cache import get_cache, reset_response_cache_stats, response_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counts for the cached dashboard endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+        parser.add_argument('--clear', action='store_true', help='Drop every cached response and counter')
+
+    def handle(self, *args, **options):
+        # Importing the URLconf imports (and so registers) every cached view
+        get_resolver().url_patterns
+
+        stats = response_cache_stats()
+        self.stdout.write(f"{'view':<70} {'hits':>7} {'misses':>7} {'hit rate':>9}")
+        for view_name, counts in stats.items():
+            total = counts['hits'] + counts['misses']
+            rate = f"{counts['hits'] / total:.0%}" if total else '-'
+            self.stdout.write(f"{view_name:<70} {counts['hits']:>7} {counts['misses']:>7} {rate:>9}")
+
+        if options['clear']:
+            get_cache().clear()
+            self.stdout.write(self.style.SUCCESS('Response cache cleared'))
+        elif options['reset']:
+            reset_response_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
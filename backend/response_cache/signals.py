@@ -0,0 +1,73 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from investments.media import media_attached
+from investments.models import Business, BusinessDocument
+from investments_tracking.models import Investment
+from investments_tracking.services import investments_batched
+from logs.models import Log, ProfitDistribution
+from logs.signals import profit_distributed
+from .cache import business_scope, invalidate, owner_scope
+
+
+def _invalidate_business(business_id, owner_id=None):
+    if owner_id is None:
+        owner_id = Business.objects.filter(pk=business_id).values_list('user_id', flat=True).first()
+    invalidate(business_scope(business_id), owner_id and owner_scope(owner_id))
+
+
+@receiver(post_save, sender=Business)
+@receiver(post_delete, sender=Business)
+def invalidate_on_business_change(sender, instance, **kwargs):
+    # Investments update the business's funding and backers, so this also covers the invest endpoints
+    _invalidate_business(instance.pk, instance.user_id)
+
+
+@receiver(post_save, sender=BusinessDocument)
+@receiver(post_delete, sender=BusinessDocument)
+def invalidate_on_document_change(sender, instance, **kwargs):
+    # The AI chat context lists the business's documents (investments/chat.py)
+    _invalidate_business(instance.business_id)
+
+
+@receiver(media_attached)
+def invalidate_on_media_attached(sender, business, **kwargs):
+    # attach_media bulk inserts the documents, so this stands in for their post_save
+    _invalidate_business(business.pk, business.user_id)
+
+
+@receiver(post_save, sender=Investment)
+@receiver(post_delete, sender=Investment)
+def invalidate_on_investment_change(sender, instance, **kwargs):
+    # The owner's cached responses too, when the saver loaded the business (InvestmentService's
+    # own writes go through investments_batched instead)
+    owner_id = instance.business.user_id if Investment.business.is_cached(instance) else None
+    _invalidate_business(instance.business_id, owner_id)
+
+
+@receiver(investments_batched)
+def invalidate_on_investment_batch(sender, results, **kwargs):
+    # Bulk writes skip post_save, so this stands in for it
+    scopes = set()
+    for _, business, _ in results:
+        scopes.update((business_scope(business.pk), business.user_id and owner_scope(business.user_id)))
+    invalidate(*scopes)
+
+
+@receiver(post_save, sender=Log)
+@receiver(post_delete, sender=Log)
+def invalidate_on_log_change(sender, instance, **kwargs):
+    _invalidate_business(instance.business_id)
+
+
+@receiver(profit_distributed)
+def invalidate_on_distribution(sender, log, **kwargs):
+    # Distributions are bulk inserted, so this signal stands in for their post_save
+    _invalidate_business(log.business_id)
+
+
+@receiver(post_delete, sender=ProfitDistribution)
+def invalidate_on_distribution_delete(sender, instance, origin=None, **kwargs):
+    # Deleting a log or investment cascades here too; their own receivers cover that
+    if isinstance(origin, ProfitDistribution) or getattr(origin, 'model', None) is ProfitDistribution:
+        _invalidate_business(instance.log.business_id)
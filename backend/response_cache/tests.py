@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from investments.models import Business
+from investments_tracking.models import Investment
+from logs.models import Log
+from users.models import CustomUser
+
+
+@override_settings(RESPONSE_CACHE_ALIAS='default')
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        # Rolled-back tests reuse ids, so start from an empty cache
+        caches['default'].clear()
+        self.owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        self.business = Business.objects.create(
+            title='Cached business', tagline='Test', description='Response cache test', category='Test',
+            location='Nowhere', funding_goal=Decimal('100000'), min_investment=Decimal('1'), user=self.owner,
+        )
+        investors = CustomUser.objects.bulk_create([
+            CustomUser(username=f'investor_{i}', user_type='investor') for i in range(20)
+        ])
+        Investment.objects.bulk_create([
+            Investment(user=investor, business=self.business, amount=Decimal(10 + i))
+            for i, investor in enumerate(investors)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.urls = [
+            f'/api/investments-tracking/business/{self.business.pk}/stats/',
+            '/api/investments-tracking/recent/',
+            '/api/investments-tracking/entrepreneur-investors/',
+            '/api/logs/recent/',
+        ]
+
+    def _get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_second_request_is_served_from_the_cache(self):
+        for url in self.urls:
+            self.assertEqual(self._get(url)['X-Response-Cache'], 'miss')
+            with self.assertNumQueries(0):
+                self.assertEqual(self._get(url)['X-Response-Cache'], 'hit')
+
+    def test_investments_and_logs_invalidate_cached_responses(self):
+        for url in self.urls:
+            self._get(url)
+
+        newcomer = CustomUser.objects.create(username='newcomer', user_type='investor')
+        with self.captureOnCommitCallbacks(execute=True):
+            Investment.objects.create(user=newcomer, business=self.business, amount=Decimal('500'))
+            Log.objects.create(business=self.business, content='Monthly update', month=1, year=2030)
+
+        for url in self.urls:
+            self.assertEqual(self._get(url)['X-Response-Cache'], 'miss')
+        self.assertEqual(self._get(self.urls[0]).data['summary']['total_investors'], 21)
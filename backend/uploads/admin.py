@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import UploadSession
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'kind', 'owner', 'size', 'received', 'status', 'updated_at']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['filename', 'owner__username', 'sha256']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+    ordering = ['-created_at']
@@ -0,0 +1,299 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from django.core.files.storage import default_storage
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from images.management.commands.benchmark_image_derivatives import sample_photo
+from investments.management.commands.benchmark_document_extraction import sample_pdf
+from investments.models import Business, BusinessDocument, BusinessImage, BusinessVideo
+from jobs.models import Job
+from uploads.models import UploadSession
+from uploads.sessions import PART_DIR, chunk_size, delete_upload
+from users.models import CustomUser
+
+PITCH = {
+    'title': 'Upload business', 'tagline': 'Benchmark', 'description': 'Chunked upload benchmark',
+    'category': 'Benchmark', 'location': 'Nowhere', 'funding_goal': '1000', 'min_investment': '1',
+}
+
+MEDIA_TABLES = tuple(model._meta.db_table for model in (BusinessImage, BusinessVideo, BusinessDocument))
+
+
+class Command(BaseCommand):
+    help = (
+        'Submit the same pitch media as one multipart request and as resumable chunked '
+        'uploads through the WSGI handler, comparing the server-side memory, the request '
+        'sizes and the INSERTs, and check an interrupted chunk can be resumed (created '
+        'data and files are deleted afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--videos', type=int, default=3, help='Videos in the pitch')
+        parser.add_argument('--video-mb', type=int, default=32, help='Size of each video in MB')
+        parser.add_argument('--images', type=int, default=8, help='Images in the pitch')
+        parser.add_argument('--documents', type=int, default=2, help='PDFs in the pitch')
+
+    def handle(self, *args, **options):
+        self._cleanup()
+        self.workdir = tempfile.mkdtemp(prefix='uploads_bench_')
+        self.handler = WSGIHandler()
+        # The refused requests are deliberate
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        try:
+            self._run(options)
+        finally:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self._cleanup()
+
+    def _cleanup(self):
+        users = CustomUser.objects.filter(username__startswith='uploads_bench_')
+        for session in UploadSession.objects.filter(owner__in=users):
+            delete_upload(session)
+        for image in BusinessImage.objects.filter(business__user__in=users):
+            image.image.delete(save=False)
+        for video in BusinessVideo.objects.filter(business__user__in=users):
+            video.video_file.delete(save=False)
+        for document in BusinessDocument.objects.filter(business__user__in=users):
+            document.document_file.delete(save=False)
+        Job.objects.filter(owner__in=users).delete()
+        users.delete()
+
+    def _files(self, options):
+        """(kind, field, path, content type) of the pitch media, written to the work directory"""
+        files = []
+        for i in range(options['videos']):
+            path = os.path.join(self.workdir, f'video_{i}.mp4')
+            with open(path, 'wb') as file:
+                for _ in range(options['video_mb']):
+                    file.write(os.urandom(1024 * 1024))
+            files.append(('video', 'videos', path, 'video/mp4'))
+        for i in range(options['images']):
+            path = os.path.join(self.workdir, f'image_{i}.jpg')
+            with open(path, 'wb') as file:
+                file.write(sample_photo(1600, 1200, i))
+            files.append(('image', 'images', path, 'image/jpeg'))
+        for i in range(options['documents']):
+            path = os.path.join(self.workdir, f'deck_{i}.pdf')
+            with open(path, 'wb') as file:
+                file.write(sample_pdf(5, seed=2000 + i))
+            files.append(('document', 'documents', path, 'application/pdf'))
+        return files
+
+    def _request(self, method, path, body, content_type, token, length=None, **headers):
+        """
+        Send a request through the WSGI handler, as a server would, reading its
+        body from the file-like `body` (announced as `length` bytes, by default
+        all of it). Returns (status, JSON or None, peak bytes allocated while it
+        was handled).
+        """
+        if length is None:
+            length = body.seek(0, os.SEEK_END)
+            body.seek(0)
+        environ = {
+            'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': body, 'wsgi.errors': sys.stderr,
+            'wsgi.multithread': False, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            'CONTENT_LENGTH': str(length), 'CONTENT_TYPE': content_type,
+            'HTTP_AUTHORIZATION': f'Bearer {token}',
+            **{f'HTTP_{name.upper()}': value for name, value in headers.items()},
+        }
+        statuses = []
+        tracemalloc.start()
+        try:
+            response = self.handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            content = b''.join(response)
+            response.close()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        code = int(statuses[0].split()[0])
+        return code, json.loads(content) if content else None, peak
+
+    def _json(self, method, path, data, token):
+        return self._request(method, path, io.BytesIO(json.dumps(data).encode()), 'application/json', token)
+
+    def _multipart(self, files):
+        """The multipart body of the pitch with every file, written to disk"""
+        boundary = uuid.uuid4().hex
+        path = os.path.join(self.workdir, 'pitch.multipart')
+        with open(path, 'wb') as body:
+            for name, value in PITCH.items():
+                body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+            for _, field, file_path, content_type in files:
+                body.write(
+                    f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                    f'filename="{os.path.basename(file_path)}"\r\nContent-Type: {content_type}\r\n\r\n'.encode()
+                )
+                with open(file_path, 'rb') as file:
+                    shutil.copyfileobj(file, body)
+                body.write(b'\r\n')
+            body.write(f'--{boundary}--\r\n'.encode())
+        return path, f'multipart/form-data; boundary={boundary}'
+
+    def _put_chunk(self, upload_id, file, start, length, size, send=None):
+        """PUT `length` bytes of `file` from `start`; with `send`, only that many arrive, like a dropped connection"""
+        file.seek(start)
+        body = io.BytesIO(file.read(length if send is None else send))
+        return self._request(
+            'PUT', f'/api/uploads/{upload_id}/', body, 'application/octet-stream', self.token, length=length,
+            content_range=f'bytes {start}-{start + length - 1}/{size}',
+        )
+
+    def _upload(self, kind, path, content_type):
+        """Upload a file in chunks; returns (upload id, requests, peak bytes of the largest request)"""
+        size = os.path.getsize(path)
+        code, session, _ = self._json('POST', '/api/uploads/', {
+            'kind': kind, 'filename': os.path.basename(path), 'size': size, 'content_type': content_type,
+        }, self.token)
+        if code != 201:
+            raise CommandError(f'Starting an upload returned {code}: {session}')
+        peak, requests = 0, 1
+        with open(path, 'rb') as file:
+            offset = 0
+            while offset < size:
+                length = min(session['chunk_size'], size - offset)
+                code, data, chunk_peak = self._put_chunk(session['id'], file, offset, length, size)
+                if code != 200:
+                    raise CommandError(f'A chunk returned {code}: {data}')
+                offset, peak, requests = data['received'], max(peak, chunk_peak), requests + 1
+        code, data, _ = self._json('POST', f"/api/uploads/{session['id']}/complete/", {}, self.token)
+        if code != 200 or data['status'] != 'complete':
+            raise CommandError(f'Completing an upload returned {code}: {data}')
+        with open(path, 'rb') as file:
+            if data['sha256'] != hashlib.file_digest(file, 'sha256').hexdigest():
+                raise CommandError(f'The SHA-256 of {path} was not computed right')
+        return session['id'], requests + 1, peak
+
+    def _pitch_rows(self, business_id):
+        return (
+            BusinessImage.objects.filter(business_id=business_id).count(),
+            BusinessVideo.objects.filter(business_id=business_id).count(),
+            BusinessDocument.objects.filter(business_id=business_id).count(),
+        )
+
+    def _run(self, options):
+        user = CustomUser.objects.create(username='uploads_bench_owner', user_type='entrepreneur')
+        self.token = str(RefreshToken.for_user(user).access_token)
+        files = self._files(options)
+        total = sum(os.path.getsize(path) for _, _, path, _ in files)
+        counts = (options['images'], options['videos'], options['documents'])
+        self.stdout.write(f'{len(files)} files, {total / 1024 ** 2:.0f} MB in all, chunks of {chunk_size() // 1024 ** 2} MB')
+
+        # Everything in one multipart request
+        body, content_type = self._multipart(files)
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            code, data, multipart_peak = self._request('POST', '/api/businesses/pitch/', open(body, 'rb'), content_type, self.token)
+            multipart_seconds = time.perf_counter() - started
+        if code != 201:
+            raise CommandError(f'The multipart pitch returned {code}: {data}')
+        multipart_inserts = sum(
+            query['sql'].startswith('INSERT') and any(f'"{table}"' in query['sql'] for table in MEDIA_TABLES)
+            for query in context.captured_queries
+        )
+        business = Business.objects.filter(user=user).latest('id')
+        if self._pitch_rows(business.pk) != counts:
+            raise CommandError(f'The multipart pitch has {self._pitch_rows(business.pk)} media rows')
+
+        # The same files in chunks, then a pitch naming them
+        started = time.perf_counter()
+        uploads = [self._upload(kind, path, content_type) for kind, _, path, content_type in files]
+        upload_seconds = time.perf_counter() - started
+        chunk_peak = max(peak for _, _, peak in uploads)
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            code, data, pitch_peak = self._json('POST', '/api/businesses/pitch/', {**PITCH, 'uploads': [pk for pk, _, _ in uploads]}, self.token)
+            pitch_seconds = time.perf_counter() - started
+        if code != 201:
+            raise CommandError(f'The pitch with uploads returned {code}: {data}')
+        chunked_inserts = sum(
+            query['sql'].startswith('INSERT') and any(f'"{table}"' in query['sql'] for table in MEDIA_TABLES)
+            for query in context.captured_queries
+        )
+        business = Business.objects.filter(user=user).latest('id')
+        if self._pitch_rows(business.pk) != counts:
+            raise CommandError(f'The chunked pitch has {self._pitch_rows(business.pk)} media rows')
+
+        self.stdout.write(f'{"":<20} {"requests":>8} {"largest":>9} {"peak mem":>9} {"pitch":>9} {"media INSERTs":>14}')
+        self.stdout.write(
+            f'{"One multipart POST":<20} {1:>8} {os.path.getsize(body) / 1024 ** 2:>7.0f}MB '
+            f'{multipart_peak / 1024 ** 2:>7.1f}MB {multipart_seconds * 1000:>7.0f}ms {multipart_inserts:>14}'
+        )
+        self.stdout.write(
+            f'{"Chunked uploads":<20} {sum(requests for _, requests, _ in uploads) + 1:>8} '
+            f'{chunk_size() / 1024 ** 2:>7.0f}MB {max(chunk_peak, pitch_peak) / 1024 ** 2:>7.1f}MB '
+            f'{pitch_seconds * 1000:>7.0f}ms {chunked_inserts:>14}'
+        )
+        self.stdout.write(
+            f'Chunked: {upload_seconds:.2f} s to upload {total / 1024 ** 2:.0f} MB '
+            f'({total / 1024 ** 2 / upload_seconds:.0f} MB/s through the handler), the pitch itself only writes rows'
+        )
+        if chunked_inserts != 3:
+            raise CommandError(f'The media was attached with {chunked_inserts} INSERTs, not one per kind')
+        if chunk_peak > 4 * chunk_size():
+            raise CommandError(f'A chunk PUT peaked at {chunk_peak / 1024 ** 2:.1f} MB')
+
+        jobs = Job.objects.filter(owner=user, reference__in=[
+            f'investments.businessdocument:{pk}' for pk in BusinessDocument.objects.filter(business=business).values_list('pk', flat=True)
+        ] + [
+            f'investments.businessimage:{pk}' for pk in BusinessImage.objects.filter(business=business).values_list('pk', flat=True)
+        ]).count()
+        if jobs != options['images'] + options['documents']:
+            raise CommandError(f'{jobs} derivative and extraction jobs were queued for the attached media')
+        self.stdout.write(f'{jobs} image derivative and text extraction jobs queued for the bulk-inserted rows')
+
+        # A chunk cut short is resent; a chunk at the wrong offset is told where to resume
+        path = files[0][2]
+        size = os.path.getsize(path)
+        code, session, _ = self._json('POST', '/api/uploads/', {'kind': 'video', 'filename': 'resumed.mp4', 'size': size}, self.token)
+        length = session['chunk_size']
+        with open(path, 'rb') as file:
+            self._put_chunk(session['id'], file, 0, length, size)
+            code, data, _ = self._put_chunk(session['id'], file, length, length, size, send=length // 3)
+            if code != 400:
+                raise CommandError(f'A chunk cut short returned {code}: {data}')
+            code, data, _ = self._json('GET', f"/api/uploads/{session['id']}/", None, self.token)
+            if data['received'] != length:
+                raise CommandError(f"A chunk cut short moved the upload to byte {data['received']}")
+            code, data, _ = self._put_chunk(session['id'], file, 0, length, size)
+            if code != 409 or data['received'] != length:
+                raise CommandError(f'A chunk at the wrong offset returned {code}: {data}')
+            offset = length
+            while offset < size:
+                chunk = min(length, size - offset)
+                code, data, _ = self._put_chunk(session['id'], file, offset, chunk, size)
+                offset = data['received']
+            code, data, _ = self._json('POST', f"/api/uploads/{session['id']}/complete/", {}, self.token)
+            file.seek(0)
+            if code != 200 or data['sha256'] != hashlib.file_digest(file, 'sha256').hexdigest():
+                raise CommandError(f'The resumed upload did not complete intact: {data}')
+        self.stdout.write('A chunk cut short was resent and the upload completed with the right SHA-256')
+
+        code, data, _ = self._json('POST', '/api/businesses/pitch/', {**PITCH, 'uploads': [uploads[0][0]]}, self.token)
+        if code != 400:
+            raise CommandError(f'An attached upload was attached again: {code}')
+        leftovers = [
+            pk for pk in UploadSession.objects.filter(owner=user, status__in=['complete', 'attached']).values_list('pk', flat=True)
+            if default_storage.exists(os.path.join(PART_DIR, f'{pk}.part'))
+        ]
+        if leftovers:
+            raise CommandError(f'Part files were left behind: {leftovers}')
+
+        self.stdout.write(self.style.SUCCESS('Pitch media is streamed to MEDIA_ROOT in resumable chunks and attached with bulk INSERTs'))
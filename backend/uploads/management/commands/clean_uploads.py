@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from uploads.sessions import clean_expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that were abandoned or never attached, and their part files'
+
+    def handle(self, *args, **options):
+        sessions, orphans = clean_expired_uploads()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {sessions} expired uploads and {orphans} orphaned part files'))
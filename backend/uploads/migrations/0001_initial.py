@@ -0,0 +1,40 @@
+# Generated by Django 4.2.13 on 2026-10-18 01:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('image', 'Image'), ('video', 'Video'), ('document', 'Document')], max_length=10)),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('size', models.PositiveBigIntegerField(help_text='Bytes the client announced')),
+                ('received', models.PositiveBigIntegerField(default=0, help_text='Bytes written so far, where the next chunk starts')),
+                ('expected_sha256', models.CharField(blank=True, help_text='Checked on completion when the client gives it', max_length=64)),
+                ('sha256', models.CharField(blank=True, help_text='Computed while the chunks were written', max_length=64)),
+                ('file', models.FileField(blank=True, help_text='The finished file in storage', max_length=255, upload_to='')),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('writing', 'Writing a chunk'), ('complete', 'Complete'), ('attached', 'Attached')], default='uploading', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='uploads_session_status_idx')],
+            },
+        ),
+    ]
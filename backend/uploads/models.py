@@ -0,0 +1,57 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class UploadSession(models.Model):
+    """
+    A file uploaded in chunks (see sessions.py). Chunks are appended to a part
+    file under MEDIA_ROOT; once every byte is in, the file is moved into the
+    folder of the field it is meant for and `file` names it, ready to be
+    attached to a business without being copied again.
+    """
+    KIND_IMAGE = 'image'
+    KIND_VIDEO = 'video'
+    KIND_DOCUMENT = 'document'
+    KIND_CHOICES = [
+        (KIND_IMAGE, 'Image'),
+        (KIND_VIDEO, 'Video'),
+        (KIND_DOCUMENT, 'Document'),
+    ]
+
+    STATUS_UPLOADING = 'uploading'
+    STATUS_WRITING = 'writing'
+    STATUS_COMPLETE = 'complete'
+    STATUS_ATTACHED = 'attached'
+    STATUS_CHOICES = [
+        (STATUS_UPLOADING, 'Uploading'),
+        (STATUS_WRITING, 'Writing a chunk'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_ATTACHED, 'Attached'),
+    ]
+
+    # Unguessable, as it is all a chunk PUT names
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField(help_text="Bytes the client announced")
+    received = models.PositiveBigIntegerField(default=0, help_text="Bytes written so far, where the next chunk starts")
+    expected_sha256 = models.CharField(max_length=64, blank=True, help_text="Checked on completion when the client gives it")
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Computed while the chunks were written")
+    file = models.FileField(max_length=255, blank=True, help_text="The finished file in storage")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='uploads_session_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size} bytes, {self.status})"
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+from .models import UploadSession
+
+class UploadStartSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=UploadSession.KIND_CHOICES)
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True, default='')
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'kind', 'filename', 'size', 'received', 'status', 'sha256', 'created_at', 'updated_at']
+        read_only_fields = fields
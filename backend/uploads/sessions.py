@@ -0,0 +1,359 @@
+import hashlib
+import os
+import re
+import threading
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image
+
+from .models import UploadSession
+
+# The field each kind of upload ends up in. A finished file is moved into
+# that field's upload_to folder, so attaching it is only an INSERT.
+UPLOAD_KINDS = {
+    UploadSession.KIND_IMAGE: ('investments.BusinessImage', 'image'),
+    UploadSession.KIND_VIDEO: ('investments.BusinessVideo', 'video_file'),
+    UploadSession.KIND_DOCUMENT: ('investments.BusinessDocument', 'document_file'),
+}
+
+# Part files are written here, inside MEDIA_ROOT so finishing an upload is a rename
+PART_DIR = os.path.join('uploads', 'partial')
+
+# Bytes read from the request, hashed and written at a time
+READ_SIZE = 64 * 1024
+
+# A chunk whose writer went away (a crashed worker) no longer blocks the upload after this long
+WRITE_CLAIM_TIMEOUT = timedelta(minutes=5)
+
+# How often a writer renews its claim while the chunk streams in, well inside
+# the timeout so a slow client's claim isn't taken over while it still writes
+WRITE_CLAIM_RENEWAL = timedelta(minutes=1)
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    """Base class for reasons a chunked upload request is refused"""
+
+
+class InvalidUpload(UploadError):
+    pass
+
+
+class ChunkTooLarge(UploadError):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    """The chunk doesn't start where the upload stands; `received` is where the next one should"""
+
+    def __init__(self, received):
+        super().__init__(f'The next chunk starts at byte {received}.')
+        self.received = received
+
+
+class UploadIncomplete(UploadError):
+    pass
+
+
+class ChecksumMismatch(UploadError):
+    pass
+
+
+def chunk_size():
+    """Bytes per chunk suggested to clients"""
+    return getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024)
+
+
+def max_chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 16 * 1024 * 1024)
+
+
+def max_upload_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 2 * 1024 ** 3)
+
+
+def part_path(session):
+    return default_storage.path(os.path.join(PART_DIR, f'{session.pk}.part'))
+
+
+def target_field(kind):
+    model, field = UPLOAD_KINDS[kind]
+    return apps.get_model(model)._meta.get_field(field)
+
+
+# SHA-256 of each upload's part file so far, by session id: (bytes hashed,
+# hasher). Chunks are hashed as they are written; an upload continued by
+# another process, or after a restart, rehashes its part file once.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def _take_hasher(session):
+    with _hashers_lock:
+        entry = _hashers.pop(session.pk, None)
+    if entry and entry[0] == session.received:
+        return entry[1]
+    digest = hashlib.sha256()
+    remaining = session.received
+    with open(part_path(session), 'rb') as file:
+        while remaining:
+            data = file.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            digest.update(data)
+            remaining -= len(data)
+    return digest
+
+
+def _keep_hasher(session, digest):
+    with _hashers_lock:
+        _hashers[session.pk] = (session.received, digest)
+
+
+def start_upload(owner, kind, filename, size, content_type='', sha256=''):
+    """Open an upload session for a file of `size` bytes and create its empty part file"""
+    filename = os.path.basename(filename.replace('\\', '/')).strip()
+    if kind not in UPLOAD_KINDS:
+        raise InvalidUpload(f"Unknown kind of upload '{kind}'.")
+    if not filename:
+        raise InvalidUpload('The file needs a name.')
+    if size <= 0:
+        raise InvalidUpload('The file is empty.')
+    if size > max_upload_size():
+        raise InvalidUpload(f'Files are limited to {max_upload_size() // 1024 ** 2} MB.')
+    if kind == UploadSession.KIND_IMAGE and not content_type.startswith('image/'):
+        raise InvalidUpload('Only images can be uploaded as images.')
+
+    session = UploadSession.objects.create(
+        owner=owner, kind=kind, filename=filename, size=size,
+        content_type=content_type, expected_sha256=sha256.lower(),
+    )
+    os.makedirs(os.path.dirname(part_path(session)), exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def _claim(session, **conditions):
+    """
+    Move the session to 'writing' if it still matches `conditions`, so no
+    other request writes its part file meanwhile. Returns the time of the
+    claim, which identifies it to _renew and _release, or None.
+    """
+    now = timezone.now()
+    free = UploadSession.objects.filter(pk=session.pk, status=UploadSession.STATUS_UPLOADING, **conditions)
+    abandoned = UploadSession.objects.filter(
+        pk=session.pk, status=UploadSession.STATUS_WRITING, updated_at__lt=now - WRITE_CLAIM_TIMEOUT, **conditions
+    )
+    if free.update(status=UploadSession.STATUS_WRITING, updated_at=now) or abandoned.update(
+        status=UploadSession.STATUS_WRITING, updated_at=now
+    ):
+        return now
+    return None
+
+
+def _held(session, claimed_at):
+    return UploadSession.objects.filter(pk=session.pk, status=UploadSession.STATUS_WRITING, updated_at=claimed_at)
+
+
+def _renew(session, claimed_at):
+    """Refresh the claim made at `claimed_at`. Returns its new time, or None if another request took it over."""
+    now = timezone.now()
+    return now if _held(session, claimed_at).update(updated_at=now) else None
+
+
+def _release(session, claimed_at, **changes):
+    """End the claim made at `claimed_at`, unless it was taken over. Returns whether it was still held."""
+    return bool(_held(session, claimed_at).update(
+        status=UploadSession.STATUS_UPLOADING, updated_at=timezone.now(), **changes
+    ))
+
+
+def parse_content_range(header, length):
+    """
+    (start, end, total) of a chunk of `length` bytes from its
+    `Content-Range: bytes first-last/total` header, `end` being exclusive
+    """
+    match = CONTENT_RANGE.match(header or '')
+    if not match:
+        raise InvalidUpload("Chunks need a 'Content-Range: bytes start-end/total' header.")
+    start, end, total = map(int, match.groups())
+    if end < start or end - start + 1 != length:
+        raise InvalidUpload('Content-Range does not match the length of the chunk.')
+    return start, end + 1, total
+
+
+def write_chunk(session, stream, start, end, total):
+    """
+    Append the bytes start..end-1 read from `stream` to the upload, hashing
+    them on the way, READ_SIZE bytes at a time so memory stays flat however
+    large the chunk. A chunk ending early leaves the upload where it was, so
+    the client resends it. The claim on the upload is renewed as the chunk
+    streams in; a writer that lost it anyway (a client stalled for longer
+    than WRITE_CLAIM_TIMEOUT) stops without writing. Returns the refreshed
+    session.
+    """
+    if session.status not in (UploadSession.STATUS_UPLOADING, UploadSession.STATUS_WRITING):
+        raise InvalidUpload('The upload is already complete.')
+    if total != session.size:
+        raise InvalidUpload(f'The upload is {session.size} bytes, not {total}.')
+    if end > session.size:
+        raise InvalidUpload('The chunk goes past the end of the file.')
+    if end - start > max_chunk_size():
+        raise ChunkTooLarge(f'Chunks are limited to {max_chunk_size() // 1024 ** 2} MB.')
+    if start != session.received:
+        raise OffsetMismatch(session.received)
+    claimed_at = _claim(session, received=start)
+    if claimed_at is None:
+        session.refresh_from_db()
+        raise OffsetMismatch(session.received)
+
+    try:
+        digest = _take_hasher(session)
+        # Unbuffered, so nothing written under the claim is flushed after losing it
+        with open(part_path(session), 'r+b', buffering=0) as file:
+            # Drop whatever an interrupted attempt at this chunk left behind
+            file.seek(start)
+            file.truncate()
+            remaining = end - start
+            while remaining:
+                try:
+                    data = stream.read(min(READ_SIZE, remaining))
+                except OSError:  # UnreadablePostError: the client went away
+                    data = b''
+                if not data:
+                    raise InvalidUpload(f'The chunk ended {remaining} bytes early.')
+                if timezone.now() - claimed_at >= WRITE_CLAIM_RENEWAL:
+                    claimed_at = _renew(session, claimed_at)
+                    if claimed_at is None:
+                        session.refresh_from_db()
+                        raise OffsetMismatch(session.received)
+                file.write(data)
+                digest.update(data)
+                remaining -= len(data)
+    except BaseException:
+        if claimed_at is not None:
+            _release(session, claimed_at)
+        raise
+    if not _release(session, claimed_at, received=end):
+        session.refresh_from_db()
+        raise OffsetMismatch(session.received)
+    session.received, session.status = end, UploadSession.STATUS_UPLOADING
+    _keep_hasher(session, digest)
+    return session
+
+
+class _PartFile(File):
+    """A finished part file, which FileSystemStorage moves into place rather than copies"""
+
+    def __init__(self, path):
+        super().__init__(None, name=os.path.basename(path))
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def complete_upload(session):
+    """
+    Check the finished upload (its SHA-256 against the client's, images
+    against Pillow) and move it into the folder of the field it is meant for.
+    Completing a completed upload returns it unchanged.
+    """
+    if session.status in (UploadSession.STATUS_COMPLETE, UploadSession.STATUS_ATTACHED):
+        return session
+    if session.received != session.size:
+        raise UploadIncomplete(f'{session.received} of {session.size} bytes have been uploaded.')
+    claimed_at = _claim(session, received=session.size)
+    if claimed_at is None:
+        raise InvalidUpload('A chunk of this upload is still being written.')
+
+    try:
+        path = part_path(session)
+        digest = _take_hasher(session).hexdigest()
+        if session.expected_sha256 and digest != session.expected_sha256:
+            # Start over: which chunk went wrong can't be told
+            open(path, 'wb').close()
+            session.received = 0
+            raise ChecksumMismatch('The file does not match its SHA-256; upload it again.')
+        if session.kind == UploadSession.KIND_IMAGE:
+            try:
+                with Image.open(path) as image:
+                    image.verify()
+            except (OSError, SyntaxError, Image.DecompressionBombError):
+                raise InvalidUpload('The file is not an image.')
+
+        field = target_field(session.kind)
+        name = default_storage.save(field.generate_filename(None, session.filename), _PartFile(path))
+    except BaseException:
+        _release(session, claimed_at, received=session.received)
+        raise
+    UploadSession.objects.filter(pk=session.pk).update(
+        status=UploadSession.STATUS_COMPLETE, file=name, sha256=digest, updated_at=timezone.now(),
+    )
+    session.refresh_from_db()
+    return session
+
+
+def attach_uploads(owner, ids):
+    """
+    Mark `owner`'s completed uploads `ids` as attached and return them in
+    that order. Raises InvalidUpload if any is unknown, unfinished or attached
+    already. Call it in the transaction that attaches them, so a failure
+    there leaves them to be attached again.
+    """
+    ids = list(dict.fromkeys(ids))
+    sessions = {
+        session.pk: session
+        for session in UploadSession.objects.filter(owner=owner, pk__in=ids, status=UploadSession.STATUS_COMPLETE)
+    }
+    missing = [str(pk) for pk in ids if pk not in sessions]
+    if missing:
+        raise InvalidUpload(f"These uploads are unknown, unfinished or already attached: {', '.join(missing)}")
+    attached = UploadSession.objects.filter(pk__in=ids, status=UploadSession.STATUS_COMPLETE).update(
+        status=UploadSession.STATUS_ATTACHED, updated_at=timezone.now(),
+    )
+    if attached != len(ids):
+        raise InvalidUpload('Some uploads were attached by another request.')
+    return [sessions[pk] for pk in ids]
+
+
+def delete_upload(session):
+    """Drop an upload, with its part file and, unless attached, its finished file"""
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    if session.file and session.status != UploadSession.STATUS_ATTACHED:
+        session.file.delete(save=False)
+    session.delete()
+
+
+def clean_expired_uploads():
+    """
+    Delete uploads left alone for longer than CHUNKED_UPLOAD_EXPIRY seconds
+    (default a day), and part files whose upload no longer exists. Finished
+    files of attached uploads are kept. Returns (uploads, part files) deleted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'CHUNKED_UPLOAD_EXPIRY', 86400))
+    sessions = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        delete_upload(session)
+        sessions += 1
+
+    orphans = 0
+    directory = default_storage.path(PART_DIR)
+    if os.path.isdir(directory):
+        known = {f'{pk}.part' for pk in UploadSession.objects.values_list('pk', flat=True)}
+        for entry in os.scandir(directory):
+            if entry.name not in known and entry.stat().st_mtime < cutoff.timestamp():
+                os.remove(entry.path)
+                orphans += 1
+    return sessions, orphans
@@ -0,0 +1,225 @@
+import hashlib
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from investments.models import Business, BusinessDocument
+from users.models import CustomUser
+
+from .models import UploadSession
+from .sessions import InvalidUpload, OffsetMismatch, attach_uploads, part_path, start_upload, write_chunk
+
+PITCH = {
+    'title': 'Chunked', 'tagline': 'Test', 'description': 'Chunked upload test', 'category': 'Uploads',
+    'location': 'Nowhere', 'funding_goal': '1000', 'min_investment': '1',
+}
+
+
+class UploadSessionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def _start(self, data, kind='document', filename='plan.pdf', content_type='application/pdf', sha256=None):
+        response = self.client.post('/api/uploads/', {
+            'kind': kind, 'filename': filename, 'size': len(data), 'content_type': content_type,
+            'sha256': hashlib.sha256(data).hexdigest() if sha256 is None else sha256,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def _put(self, upload_id, data, start, total, expected_status=200):
+        response = self.client.put(
+            f'/api/uploads/{upload_id}/', data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{total}',
+        )
+        self.assertEqual(response.status_code, expected_status, response.data)
+        return response.data
+
+    def _complete(self, upload_id, expected_status=200):
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, expected_status, response.data)
+        return response.data
+
+    def _upload(self, data, **kwargs):
+        """A finished upload of `data`, sent in two chunks"""
+        upload_id = self._start(data, **kwargs)
+        half = len(data) // 2
+        self._put(upload_id, data[:half], 0, len(data))
+        self._put(upload_id, data[half:], half, len(data))
+        self._complete(upload_id)
+        return upload_id
+
+    def _session(self, upload_id):
+        return UploadSession.objects.get(pk=upload_id)
+
+    def test_chunks_at_the_wrong_offset_are_refused_with_where_to_resume(self):
+        data = b'%PDF-1.4 ' + b'x' * 1000
+        upload_id = self._start(data)
+        self.assertEqual(self._put(upload_id, data[:400], 0, len(data))['received'], 400)
+
+        # Sent again after a lost response, or skipping ahead
+        for start in (0, 600):
+            response = self._put(upload_id, data[start:start + 100], start, len(data), expected_status=409)
+            self.assertEqual(response['received'], 400)
+        self._complete(upload_id, expected_status=400)
+
+        self._put(upload_id, data[400:], 400, len(data))
+        self.assertEqual(self._complete(upload_id)['status'], UploadSession.STATUS_COMPLETE)
+        session = self._session(upload_id)
+        with session.file.open('rb') as file:
+            self.assertEqual(file.read(), data)
+        self.assertEqual(session.sha256, hashlib.sha256(data).hexdigest())
+
+    def test_a_chunk_ending_early_leaves_the_offset_unchanged(self):
+        data = b'y' * 1000
+        upload_id = self._start(data)
+        self._put(upload_id, data[:300], 0, len(data))
+
+        # The client went away 200 bytes into a 700 byte chunk
+        with self.assertRaisesMessage(InvalidUpload, 'The chunk ended 500 bytes early.'):
+            write_chunk(self._session(upload_id), io.BytesIO(data[300:500]), 300, 1000, len(data))
+        session = self._session(upload_id)
+        self.assertEqual((session.received, session.status), (300, UploadSession.STATUS_UPLOADING))
+
+        # Resent in full, it replaces the partial bytes
+        self._put(upload_id, data[300:], 300, len(data))
+        self._complete(upload_id)
+
+    def test_a_checksum_mismatch_starts_the_upload_over(self):
+        data = b'z' * 1000
+        upload_id = self._start(data, sha256=hashlib.sha256(b'something else').hexdigest())
+        self._put(upload_id, data, 0, len(data))
+
+        self.assertIn('SHA-256', self._complete(upload_id, expected_status=400)['error'])
+        session = self._session(upload_id)
+        self.assertEqual((session.received, session.status), (0, UploadSession.STATUS_UPLOADING))
+        with open(part_path(session), 'rb') as file:
+            self.assertEqual(file.read(), b'')
+        self.assertEqual(self._put(upload_id, data[:10], 0, len(data))['received'], 10)
+
+    def test_images_must_be_readable_by_pillow(self):
+        upload_id = self._start(b'not an image at all', kind='image', filename='photo.png', content_type='image/png')
+        self._put(upload_id, b'not an image at all', 0, 19)
+        self.assertEqual(self._complete(upload_id, expected_status=400)['error'], 'The file is not an image.')
+        self.assertEqual(self._session(upload_id).status, UploadSession.STATUS_UPLOADING)
+
+        output = io.BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(output, format='PNG')
+        upload_id = self._upload(output.getvalue(), kind='image', filename='photo.png', content_type='image/png')
+        self.assertTrue(self._session(upload_id).file.name.startswith('business_images/'))
+
+    def test_uploads_are_attached_once(self):
+        upload_id = self._upload(b'%PDF-1.4 plan')
+        response = self.client.post('/api/businesses/pitch/', {**PITCH, 'uploads': [upload_id]}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self._session(upload_id).status, UploadSession.STATUS_ATTACHED)
+        document = BusinessDocument.objects.get()
+        self.assertEqual((document.name, document.document_file.name), ('plan.pdf', self._session(upload_id).file.name))
+
+        response = self.client.post('/api/businesses/pitch/', {**PITCH, 'uploads': [upload_id]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(upload_id, response.data['uploads'])
+        self.assertEqual(Business.objects.count(), 1)
+        with self.assertRaises(InvalidUpload):
+            attach_uploads(self.owner, [upload_id])
+
+    def test_a_failed_pitch_leaves_its_uploads_to_be_attached_again(self):
+        upload_id = self._upload(b'%PDF-1.4 plan')
+        with mock.patch('investments.serializers.attach_media', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError), self.assertLogs('django.request', 'ERROR'):
+                self.client.post('/api/businesses/pitch/', {**PITCH, 'uploads': [upload_id]}, format='json')
+        self.assertEqual(Business.objects.count(), 0)
+        self.assertEqual(self._session(upload_id).status, UploadSession.STATUS_COMPLETE)
+
+        response = self.client.post('/api/businesses/pitch/', {**PITCH, 'uploads': [upload_id]}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(BusinessDocument.objects.count(), 1)
+
+
+class SlowStream(io.BytesIO):
+    """A request body from a slow client: `on_read` is called before each packet is read"""
+
+    def __init__(self, data, on_read):
+        super().__init__(data)
+        self.on_read = on_read
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        self.on_read(self.reads)
+        return super().read(size)
+
+
+class WriteClaimTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        owner = CustomUser.objects.create(username='owner', user_type='entrepreneur')
+        self.data = b'a' * 40
+        self.session = start_upload(owner, 'document', 'plan.pdf', len(self.data))
+        # Every read is a 4 byte packet, which slow clients send two minutes apart
+        self.now = timezone.now()
+        patches = [
+            mock.patch('uploads.sessions.READ_SIZE', 4),
+            mock.patch('uploads.sessions.timezone', now=lambda: self.now),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _slow(self, data, on_read):
+        def wait_then(reads):
+            self.now += timedelta(minutes=2)
+            on_read(reads)
+        return SlowStream(data, wait_then)
+
+    def _write(self, stream):
+        return write_chunk(UploadSession.objects.get(pk=self.session.pk), stream, 0, len(self.data), len(self.data))
+
+    def _part(self):
+        with open(part_path(self.session), 'rb') as file:
+            return file.read()
+
+    def test_a_slow_writer_keeps_its_claim(self):
+        def on_read(reads):
+            if reads == 5:
+                # Long past WRITE_CLAIM_TIMEOUT since the claim, a retry of the chunk arrives
+                with self.assertRaises(OffsetMismatch):
+                    self._write(io.BytesIO(b'b' * 40))
+
+        self.assertEqual(self._write(self._slow(self.data, on_read)).received, 40)
+        self.assertEqual(self._part(), self.data)
+
+    def test_a_writer_that_lost_its_claim_stops_writing(self):
+        def on_read(reads):
+            if reads == 3:
+                # The client stalled for ten minutes and its retry took over
+                self.now += timedelta(minutes=10)
+                self.assertEqual(self._write(io.BytesIO(b'b' * 40)).received, 40)
+
+        with self.assertRaises(OffsetMismatch) as raised:
+            self._write(self._slow(self.data, on_read))
+        self.assertEqual(raised.exception.received, 40)
+        self.assertEqual(self._part(), b'b' * 40)
+        session = UploadSession.objects.get(pk=self.session.pk)
+        self.assertEqual((session.received, session.status), (40, UploadSession.STATUS_UPLOADING))
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import UploadSessionView, complete_upload_session, start_upload_session
+
+urlpatterns = [
+    path('', start_upload_session, name='upload-start'),
+    path('<uuid:upload_id>/', UploadSessionView.as_view(), name='upload-session'),
+    path('<uuid:upload_id>/complete/', complete_upload_session, name='upload-complete'),
+]
@@ -0,0 +1,84 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import UploadSession
+from .serializers import UploadSessionSerializer, UploadStartSerializer
+from .sessions import (
+    ChunkTooLarge, OffsetMismatch, UploadError, chunk_size, complete_upload, delete_upload,
+    parse_content_range, start_upload, write_chunk,
+)
+
+
+def upload_error_response(error):
+    if isinstance(error, OffsetMismatch):
+        # The client resumes from `received`
+        return Response({'error': str(error), 'received': error.received}, status=status.HTTP_409_CONFLICT)
+    if isinstance(error, ChunkTooLarge):
+        return Response({'error': str(error)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def session_data(session):
+    return {**UploadSessionSerializer(session).data, 'chunk_size': chunk_size()}
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_upload_session(request):
+    """Open a chunked upload: {kind, filename, size, content_type?, sha256?}"""
+    serializer = UploadStartSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        session = start_upload(request.user, **serializer.validated_data)
+    except UploadError as e:
+        return upload_error_response(e)
+    return Response(session_data(session), status=status.HTTP_201_CREATED)
+
+
+class UploadSessionView(APIView):
+    """
+    GET where an upload stands (to resume it), PUT its next chunk as the raw
+    request body with a Content-Range header, or DELETE it.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_session(self, request, upload_id):
+        return get_object_or_404(UploadSession, pk=upload_id, owner=request.user)
+
+    def get(self, request, upload_id):
+        return Response(session_data(self.get_session(request, upload_id)))
+
+    def put(self, request, upload_id):
+        session = self.get_session(request, upload_id)
+        try:
+            start, end, total = parse_content_range(
+                request.META.get('HTTP_CONTENT_RANGE'), int(request.META.get('CONTENT_LENGTH') or 0)
+            )
+            # Read from the request stream, never request.body / request.data, so the chunk isn't held in memory
+            session = write_chunk(session, request._request, start, end, total)
+        except UploadError as e:
+            return upload_error_response(e)
+        return Response(session_data(session))
+
+    def delete(self, request, upload_id):
+        session = self.get_session(request, upload_id)
+        if session.status == UploadSession.STATUS_ATTACHED:
+            return Response({'error': 'The upload is attached to a business.'}, status=status.HTTP_400_BAD_REQUEST)
+        delete_upload(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_upload_session(request, upload_id):
+    """Finish an upload whose every chunk is in; its id can then be sent with a business pitch"""
+    session = get_object_or_404(UploadSession, pk=upload_id, owner=request.user)
+    try:
+        session = complete_upload(session)
+    except UploadError as e:
+        return upload_error_response(e)
+    return Response(session_data(session))
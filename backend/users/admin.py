@@ -2,7 +2,8 @@
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser # This imports your actual CustomUser MODEL
+from .funds import change_fund
+from .models import CustomUser, FundSnapshot, FundTransaction # This imports your actual CustomUser MODEL
 
 # Define your custom admin configuration class with a unique name
 class CustomUserAdmin(UserAdmin):
@@ -52,9 +53,44 @@ class CustomUserAdmin(UserAdmin):
 
     ordering = ('-date_joined',)
 
+    # The fund only changes through the ledger; add an adjustment under Fund transactions
+    readonly_fields = ('fund',)
+
 
 # Register your CustomUser MODEL with your CustomUserAdmin configuration class
 admin.site.register(CustomUser, CustomUserAdmin)
 
+
+@admin.register(FundTransaction)
+class FundTransactionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'kind', 'amount', 'reference', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('user__username', 'reference')
+    raw_id_fields = ('user',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        # Apply the entry to the user's balance along with recording it
+        entry = change_fund(obj.user, obj.amount, obj.kind, reference=obj.reference or f'admin:{request.user.username}')
+        obj.pk, obj.reference, obj.created_at = entry.pk, entry.reference, entry.created_at
+        obj._state.adding = False
+
+
+@admin.register(FundSnapshot)
+class FundSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('user', 'balance', 'through_transaction_id', 'taken_at')
+    search_fields = ('user__username',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # Remove this line, it's redundant and incorrect:
 # admin.site.register(CustomUser)
\ No newline at end of file
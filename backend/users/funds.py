@@ -0,0 +1,169 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Max, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CustomUser, FundSnapshot, FundTransaction
+
+# Users per CASE for the balance update and rows per INSERT for the ledger.
+# Kept well under SQLite's bound-parameter limit.
+FUND_UPDATE_BATCH_SIZE = 500
+
+AMOUNT_FIELD = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Value(Decimal('0'), output_field=AMOUNT_FIELD)
+
+
+class FundError(Exception):
+    """Base class for reasons a fund change is refused"""
+
+
+class InsufficientFunds(FundError):
+    pass
+
+
+def change_fund(user, amount, kind, reference='', require_balance=False):
+    """
+    Add the signed `amount` to `user`'s fund and record it in the ledger.
+    With `require_balance`, a debit larger than the balance raises
+    InsufficientFunds (checked in the UPDATE itself, so concurrent debits
+    can't overdraw). Returns the ledger entry; `user.fund` is set to the new
+    balance.
+    """
+    amount = Decimal(amount)
+    with transaction.atomic():
+        users = CustomUser.objects.filter(pk=user.pk)
+        if require_balance and amount < 0:
+            users = users.filter(fund__gte=-amount)
+        if not users.update(fund=F('fund') + amount):
+            raise InsufficientFunds('Insufficient funds')
+        entry = FundTransaction.objects.create(user_id=user.pk, kind=kind, amount=amount, reference=reference)
+        user.fund = CustomUser.objects.filter(pk=user.pk).values_list('fund', flat=True).get()
+    return entry
+
+
+def amount_case(items, column='id'):
+    """
+    `CASE column WHEN key THEN amount ... ELSE 0 END` for (key, amount)
+    pairs, to add per-row amounts in one UPDATE. Written as SQL because
+    resolving a When per row costs the ORM more than running the UPDATE.
+    """
+    whens = ' '.join(['WHEN %s THEN %s'] * len(items))
+    return RawSQL(
+        f'CASE {connection.ops.quote_name(column)} {whens} ELSE 0 END',
+        [value for item in items for value in item],
+        output_field=AMOUNT_FIELD,
+    )
+
+
+def apply_fund_changes(changes, kind, reference=''):
+    """
+    Add signed amounts to many users' funds with one set-based UPDATE and one
+    ledger INSERT per batch. `changes` maps user id -> Decimal amount.
+    """
+    items = [(user_id, amount) for user_id, amount in changes.items() if amount]
+
+    for start in range(0, len(items), FUND_UPDATE_BATCH_SIZE):
+        batch = items[start:start + FUND_UPDATE_BATCH_SIZE]
+        CustomUser.objects.filter(pk__in=[user_id for user_id, _ in batch]).update(
+            fund=F('fund') + amount_case(batch)
+        )
+        FundTransaction.objects.bulk_create([
+            FundTransaction(user_id=user_id, kind=kind, amount=amount, reference=reference)
+            for user_id, amount in batch
+        ])
+
+
+def ledger_balance(user):
+    """
+    `user`'s balance according to the ledger: their snapshot plus the
+    transactions written since it, so it never replays the full history.
+    """
+    snapshot = FundSnapshot.objects.filter(user_id=user.pk).values('balance', 'through_transaction_id').first()
+    balance = snapshot['balance'] if snapshot else Decimal('0')
+    through = snapshot['through_transaction_id'] if snapshot else 0
+    tail = FundTransaction.objects.filter(user_id=user.pk, id__gt=through).aggregate(total=Sum('amount'))['total']
+    return balance + (tail or Decimal('0'))
+
+
+def settled_transaction_id(settle_time=None):
+    """
+    The newest ledger id below which every transaction has committed. Ids are
+    taken at INSERT, so a transaction still open can hold a lower id than one
+    already committed; the watermark is therefore the newest transaction
+    written at least `settle_time` ago (FUND_SNAPSHOT_SETTLE_SECONDS, default
+    five minutes), longer than any ledger write stays open. None if there is
+    no such transaction.
+    """
+    if settle_time is None:
+        settle_time = timedelta(seconds=getattr(settings, 'FUND_SNAPSHOT_SETTLE_SECONDS', 300))
+    return (
+        FundTransaction.objects.filter(created_at__lte=timezone.now() - settle_time)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+
+
+def snapshot_balances(settle_time=None):
+    """
+    Roll every user's snapshot forward to the settled ledger watermark (see
+    settled_transaction_id), reading only the transactions written since the
+    oldest snapshot. Returns the number of snapshots written.
+    """
+    with transaction.atomic():
+        through = settled_transaction_id(settle_time)
+        marks = FundSnapshot.objects.aggregate(oldest=Min('through_transaction_id'), newest=Max('through_transaction_id'))
+        # Never move the watermark back: the tails after it would be counted twice
+        if through is None or through <= (marks['newest'] or 0):
+            return 0
+        # Every user with a transaction up to the last run got a snapshot then,
+        # so nothing at or before the oldest snapshot needs reading again
+        oldest = marks['oldest'] or 0
+
+        tails = dict(
+            FundTransaction.objects.filter(id__gt=oldest, id__lte=through)
+            .filter(Q(user__fund_snapshot__isnull=True) | Q(id__gt=F('user__fund_snapshot__through_transaction_id')))
+            .order_by().values('user_id').annotate(total=Sum('amount')).values_list('user_id', 'total')
+        )
+        snapshots = {snapshot.user_id: snapshot for snapshot in FundSnapshot.objects.filter(user_id__in=list(tails))}
+        changed, created = [], []
+        for user_id, total in tails.items():
+            snapshot = snapshots.get(user_id)
+            if snapshot is None:
+                created.append(FundSnapshot(user_id=user_id, balance=total, through_transaction_id=through))
+            else:
+                snapshot.balance += total
+                changed.append(snapshot)
+        FundSnapshot.objects.bulk_create(created, batch_size=FUND_UPDATE_BATCH_SIZE)
+        FundSnapshot.objects.bulk_update(changed, ['balance'], batch_size=FUND_UPDATE_BATCH_SIZE)
+        FundSnapshot.objects.update(through_transaction_id=through)
+    return len(created) + len(changed)
+
+
+def reconcile_balances(full=False, chunk_size=2000):
+    """
+    Yield (user_id, username, fund, ledger balance) for every user whose cached
+    fund differs from their ledger balance, in one streaming query. With
+    `full`, the ledger balance replays the whole history instead of starting
+    from the snapshots (which checks the snapshots too).
+    """
+    if full:
+        start = ZERO
+        through = Value(0)
+    else:
+        start = Coalesce(F('fund_snapshot__balance'), ZERO, output_field=AMOUNT_FIELD)
+        through = Coalesce(OuterRef('fund_snapshot__through_transaction_id'), Value(0))
+    tail = FundTransaction.objects.filter(user=OuterRef('pk'), id__gt=through).order_by().values('user').annotate(
+        total=Sum('amount')
+    ).values('total')
+    users = CustomUser.objects.annotate(
+        ledger=start + Coalesce(Subquery(tail, output_field=AMOUNT_FIELD), ZERO, output_field=AMOUNT_FIELD)
+    ).order_by('pk').values_list('pk', 'username', 'fund', 'ledger')
+
+    for user_id, username, fund, ledger in users.iterator(chunk_size=chunk_size):
+        ledger = Decimal(ledger or 0).quantize(Decimal('0.01'))
+        if fund != ledger:
+            yield user_id, username, fund, ledger
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+
+from jobs.models import Job
+from jobs.queue import enqueue, register_job
+from .funds import snapshot_balances
+
+SNAPSHOT_JOB = 'users.snapshot_fund_balances'
+
+
+def schedule_fund_snapshot(delay=None):
+    """Queue the next fund snapshot unless one is already waiting"""
+    if Job.objects.filter(name=SNAPSHOT_JOB, status=Job.STATUS_QUEUED).exists():
+        return None
+    if delay is None:
+        delay = timedelta(seconds=getattr(settings, 'FUND_SNAPSHOT_INTERVAL', 3600))
+    return enqueue(SNAPSHOT_JOB, delay=delay)
+
+
+@register_job(SNAPSHOT_JOB)
+def snapshot_fund_balances_job(job):
+    """Roll the fund snapshots forward, then queue the next run"""
+    count = snapshot_balances()
+    schedule_fund_snapshot()
+    return {'snapshots': count}
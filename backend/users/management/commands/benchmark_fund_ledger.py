@@ -0,0 +1,86 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from Blossomvest.benchmarks import api_client, response_error
+from users.funds import apply_fund_changes, ledger_balance, reconcile_balances, snapshot_balances
+from users.models import CustomUser, FundTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Write fund history through the ledger, then time balance lookups and reconciliation '
+        'from snapshots against replaying the full ledger (all data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--rounds', type=int, default=50, help='Ledger entries per user before the snapshot')
+        parser.add_argument('--seed', type=int, default=11)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            users = CustomUser.objects.bulk_create([
+                CustomUser(username=f'ledger_bench_{i}', user_type='investor') for i in range(options['users'])
+            ], batch_size=500)
+            ids = [user.pk for user in users]
+
+            started = time.perf_counter()
+            for round_number in range(options['rounds']):
+                kind = FundTransaction.DEPOSIT if round_number % 2 else FundTransaction.DISTRIBUTION
+                apply_fund_changes({user_id: Decimal(rng.randint(1, 500)) for user_id in ids}, kind, reference=f'bench:{round_number}')
+            written = options['users'] * options['rounds']
+            self.stdout.write(f'Wrote {written} ledger entries in {time.perf_counter() - started:.2f} s')
+
+            started = time.perf_counter()
+            # Everything here is one transaction, so nothing can commit behind the watermark
+            snapshot_balances(settle_time=timedelta(0))
+            self.stdout.write(f'Snapshot of {len(ids)} users in {(time.perf_counter() - started) * 1000:.0f} ms')
+
+            # Recent activity after the snapshot, through the API
+            user = users[0]
+            client = api_client()
+            client.force_authenticate(user)
+            response = client.post('/api/users/add_fund/', {'amount': '125.50', 'payment_method': 'card'}, format='json')
+            if response.status_code != 200:
+                raise CommandError(f'add_fund returned {response.status_code}: {response_error(response)}')
+            apply_fund_changes({user_id: Decimal('-1') for user_id in ids[::7]}, FundTransaction.ADJUSTMENT)
+
+            user.refresh_from_db()
+            started = time.perf_counter()
+            for _ in range(200):
+                balance = ledger_balance(user)
+            snapshot_ms = (time.perf_counter() - started) * 1000 / 200
+            started = time.perf_counter()
+            for _ in range(200):
+                replayed = FundTransaction.objects.filter(user=user).aggregate(total=Sum('amount'))['total']
+            replay_ms = (time.perf_counter() - started) * 1000 / 200
+            if balance != user.fund or replayed != user.fund:
+                raise CommandError(f'Ledger balance {balance} / {replayed} does not match fund {user.fund}')
+            self.stdout.write(
+                f'One balance from the ledger: {snapshot_ms:.3f} ms from its snapshot, '
+                f'{replay_ms:.3f} ms replaying {options["rounds"] + 2} entries'
+            )
+
+            for full in (False, True):
+                started = time.perf_counter()
+                mismatches = list(reconcile_balances(full=full))
+                label = 'full ledger' if full else 'from snapshots'
+                self.stdout.write(f'Reconcile all users, {label}: {(time.perf_counter() - started) * 1000:.0f} ms')
+                if mismatches:
+                    raise CommandError(f'{len(mismatches)} mismatches, first: {mismatches[0]}')
+
+            # A balance edited outside the ledger is caught
+            CustomUser.objects.filter(pk=ids[1]).update(fund=Decimal('1'))
+            if [row[0] for row in reconcile_balances()] != [ids[1]]:
+                raise CommandError('Reconciliation missed a fund changed outside the ledger')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Every fund change is in the ledger and balances reconcile'))
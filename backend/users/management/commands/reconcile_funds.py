@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from users.funds import reconcile_balances, snapshot_balances
+from users.jobs import schedule_fund_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Check every user\'s fund against their ledger balance in one streaming pass, '
+        'optionally rolling the snapshots forward first'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Replay the whole ledger instead of starting from the snapshots')
+        parser.add_argument('--snapshot', action='store_true', help='Roll the snapshots forward first and schedule the periodic snapshot job')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Users fetched per round trip')
+        parser.add_argument('--limit', type=int, default=20, help='Mismatches to print')
+
+    def handle(self, *args, **options):
+        if options['snapshot']:
+            started = time.perf_counter()
+            count = snapshot_balances()
+            with transaction.atomic():
+                schedule_fund_snapshot()
+            self.stdout.write(f'Snapshotted {count} balances in {time.perf_counter() - started:.2f} s')
+
+        started = time.perf_counter()
+        mismatches = 0
+        for user_id, username, fund, ledger in reconcile_balances(full=options['full'], chunk_size=options['chunk_size']):
+            mismatches += 1
+            if mismatches <= options['limit']:
+                self.stdout.write(f'  {username} (#{user_id}): fund {fund}, ledger {ledger}, off by {fund - ledger}')
+        elapsed = time.perf_counter() - started
+
+        mode = 'full ledger' if options['full'] else 'snapshots + recent ledger'
+        if mismatches:
+            raise CommandError(f'{mismatches} user(s) have a fund that differs from their ledger ({mode}, {elapsed:.2f} s)')
+        self.stdout.write(self.style.SUCCESS(f'Every fund matches its ledger ({mode}, {elapsed:.2f} s)'))
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def record_opening_balances(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    FundTransaction = apps.get_model('users', 'FundTransaction')
+
+    # Balances from before the ledger start it as one adjustment each
+    FundTransaction.objects.bulk_create([
+        FundTransaction(user_id=user_id, kind='adjustment', amount=fund, reference='opening balance')
+        for user_id, fund in CustomUser.objects.exclude(fund=0).values_list('id', 'fund').iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_fund_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
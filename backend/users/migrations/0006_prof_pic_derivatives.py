@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_opening_fund_balances'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='prof_pic_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -6,6 +6,8 @@ from django.contrib.auth.models import AbstractUser
 class CustomUser(AbstractUser):
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     prof_pic = models.ImageField(upload_to='profile_pics/', blank=True)
+    # Resized copies of prof_pic, written by the job worker (see images/derivatives.py)
+    prof_pic_derivatives = models.JSONField(default=dict, blank=True)
     fund = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, help_text='Available funds for the user')
 
     USER_TYPE_CHOICES = (
@@ -25,4 +27,57 @@ class CustomUser(AbstractUser):
     
     @property
     def formatted_fund(self):
-        return f"${self.fund:,.2f}"
\ No newline at end of file
+        return f"${self.fund:,.2f}"
+
+class FundTransaction(models.Model):
+    """
+    Append-only record of every change to a user's fund, written by
+    users.funds in the same transaction as the balance update. `amount` is
+    signed: deposits and distributions are positive, investments negative.
+    CustomUser.fund is the cached running balance of these rows.
+    """
+    DEPOSIT = 'deposit'
+    INVESTMENT = 'investment'
+    DISTRIBUTION = 'distribution'
+    ADJUSTMENT = 'adjustment'
+    KIND_CHOICES = (
+        (DEPOSIT, 'Deposit'),
+        (INVESTMENT, 'Investment'),
+        (DISTRIBUTION, 'Profit distribution'),
+        (ADJUSTMENT, 'Adjustment'),
+    )
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='fund_transactions')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    reference = models.CharField(max_length=100, blank=True, help_text='What caused the change, e.g. "log:12"')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'], name='fund_txn_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind} {self.amount:+}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Fund transactions are append-only')
+        super().save(*args, **kwargs)
+
+
+class FundSnapshot(models.Model):
+    """
+    A user's ledger balance through `through_transaction_id`, refreshed by
+    users.funds.snapshot_balances, so the ledger balance only replays the
+    transactions written since.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='fund_snapshot')
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    through_transaction_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.balance} through #{self.through_transaction_id}"
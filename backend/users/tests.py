@@ -1,3 +1,69 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import F
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .funds import apply_fund_changes, ledger_balance, reconcile_balances, snapshot_balances
+from .models import CustomUser, FundSnapshot, FundTransaction
+
+
+class FundLedgerTests(TestCase):
+    def setUp(self):
+        self.users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'investor_{i}', user_type='investor') for i in range(5)
+        ])
+
+    def _write(self, user, amount, pk=None, age=timedelta(0)):
+        """A ledger entry written `age` ago, with its balance update"""
+        entry = FundTransaction.objects.create(pk=pk, user=user, kind=FundTransaction.DEPOSIT, amount=Decimal(amount))
+        FundTransaction.objects.filter(pk=entry.pk).update(created_at=timezone.now() - age)
+        CustomUser.objects.filter(pk=user.pk).update(fund=F('fund') + Decimal(amount))
+        return entry
+
+    def _assert_balanced(self):
+        self.assertEqual(list(reconcile_balances()), [])
+        for user in CustomUser.objects.filter(pk__in=[user.pk for user in self.users]):
+            self.assertEqual(ledger_balance(user), user.fund)
+
+    def test_balances_stay_exact_across_snapshots(self):
+        ids = [user.pk for user in self.users]
+        apply_fund_changes({user_id: Decimal(100 + user_id) for user_id in ids}, FundTransaction.DEPOSIT)
+        self.assertEqual(snapshot_balances(settle_time=timedelta(0)), len(ids))
+        apply_fund_changes({user_id: Decimal('-7.50') for user_id in ids[::2]}, FundTransaction.ADJUSTMENT)
+        self._assert_balanced()
+        self.assertEqual(list(reconcile_balances(full=True)), [])
+
+        # A balance edited outside the ledger is caught
+        CustomUser.objects.filter(pk=ids[1]).update(fund=Decimal('1'))
+        self.assertEqual([row[0] for row in reconcile_balances()], [ids[1]])
+
+    def test_snapshots_stop_before_transactions_that_may_not_have_committed(self):
+        user = self.users[0]
+        settled = self._write(user, '10', pk=100, age=timedelta(hours=1))
+        self._write(user, '20', pk=102)
+        self.assertEqual(snapshot_balances(), 1)
+        self.assertEqual(FundSnapshot.objects.get(user=user).through_transaction_id, settled.pk)
+
+        # A transaction that took its id before #102 but committed after the snapshot
+        self._write(user, '5', pk=101)
+        self.assertEqual(ledger_balance(user), Decimal('35'))
+        self._assert_balanced()
+
+    def test_watermark_never_moves_back(self):
+        user = self.users[0]
+        self._write(user, '10', age=timedelta(hours=1))
+        self._write(user, '20')
+        snapshot_balances(settle_time=timedelta(0))
+        self.assertEqual(snapshot_balances(), 0)
+        self._assert_balanced()
 
-# Create your tests here.
+    def test_add_fund_goes_through_the_ledger(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        response = client.post('/api/users/add_fund/', {'amount': '125.50', 'payment_method': 'card'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FundTransaction.objects.get(user=self.users[0]).amount, Decimal('125.50'))
+        self._assert_balanced()
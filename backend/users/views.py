@@ -16,10 +16,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from decimal import Decimal # Import Decimal for accurate money calculations
-from django.db import transaction # Import transaction for atomicity
 
 from .serializers import UserRegisterSerializer, UserLoginSerializer, UserProfileUpdateSerializer
-from .models import CustomUser # <--- ENSURE CustomUser IS IMPORTED HERE
+from .funds import change_fund
+from .models import CustomUser, FundTransaction # <--- ENSURE CustomUser IS IMPORTED HERE
+from images.derivatives import delete_derivatives, derivative_urls
+
+# Width of the avatar image picked by default; the srcset offers the others
+AVATAR_WIDTH = 128
 
 # Helper function to generate JWT tokens for a given user
 def get_tokens_for_user(user):
@@ -92,9 +96,15 @@ class UserProfileView(APIView):
     def get(self, request, *args, **kwargs):
         user = request.user
         profile_picture_url = None
+        avatar = None
         
         if user.prof_pic:
             profile_picture_url = request.build_absolute_uri(user.prof_pic.url)
+            # Square resized copies, once the job worker has made them
+            avatar = derivative_urls(
+                user.prof_pic_derivatives, user.prof_pic.name, user.prof_pic.storage,
+                request.build_absolute_uri, AVATAR_WIDTH,
+            )
 
         return Response({
             "username": user.username,
@@ -104,6 +114,8 @@ class UserProfileView(APIView):
             "phone_number": user.phone_number,
             "user_type": user.user_type,
             "prof_pic": profile_picture_url,
+            "prof_pic_thumbnail": avatar['src'] if avatar else profile_picture_url,
+            "prof_pic_srcset": avatar['srcset'] if avatar else None,
             "fund": str(user.fund) if user.fund else "0",  # Include fund amount
         }, status=status.HTTP_200_OK)
 
@@ -139,11 +151,13 @@ class UserProfilePictureUploadView(APIView):
                     old_pic_path = request.user.prof_pic.path
                     if os.path.exists(old_pic_path):
                         os.remove(old_pic_path)
+                    delete_derivatives(request.user.prof_pic_derivatives, request.user.prof_pic.storage)
                 except Exception as e:
                     print(f"Error deleting old profile picture: {e}")
 
-            # Save new profile picture
+            # Save new profile picture; the job worker then renders its thumbnails
             request.user.prof_pic = profile_picture
+            request.user.prof_pic_derivatives = {}
             request.user.save()
 
             # Return the URL of the uploaded image
@@ -179,14 +193,8 @@ class AddFundView(APIView):
 
         user = request.user # The authenticated user instance
 
-        # Use a database transaction to ensure atomicity
-        # This prevents race conditions if multiple requests try to update the fund simultaneously
-        with transaction.atomic():
-            # Re-fetch the user within the transaction to get the latest fund value
-            # This is important for preventing race conditions if user fund is updated elsewhere
-            user.refresh_from_db() 
-            user.fund += amount
-            user.save()
+        # Atomic balance update plus a ledger entry, so concurrent deposits can't overwrite each other
+        change_fund(user, amount, FundTransaction.DEPOSIT, reference=f'payment:{payment_method}'[:100])
 
         # You can return the updated fund or a success message
         return Response({
@@ -208,6 +216,7 @@ class DeleteAccountView(APIView):
                     old_pic_path = user.prof_pic.path
                     if os.path.exists(old_pic_path):
                         os.remove(old_pic_path)
+                    delete_derivatives(request.user.prof_pic_derivatives, request.user.prof_pic.storage)
                 except Exception as e:
                     print(f"Error deleting profile picture: {e}")
             
@@ -42,10 +42,6 @@ interface AIChatPopupProps {
   businessData?: BusinessData;
 }
 
-interface DocumentContent {
-  [key: string]: string;
-}
-
 const SUGGESTED_QUESTIONS = [
   {
     icon: <BarChart3 className="h-4 w-4" />,
@@ -89,8 +85,7 @@ export default function AIChatPopup({ isOpen, onClose, businessData }: AIChatPop
   const [inputMessage, setInputMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [aiServiceStatus, setAiServiceStatus] = useState<'checking' | 'available' | 'unavailable'>('checking');
-  const [documentContent, setDocumentContent] = useState<DocumentContent>({});
-  const [documentSummary, setDocumentSummary] = useState<string>('');
+  const [documentNames, setDocumentNames] = useState<string[]>([]);
   const [isLoadingDocuments, setIsLoadingDocuments] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
@@ -106,13 +101,9 @@ export default function AIChatPopup({ isOpen, onClose, businessData }: AIChatPop
   useEffect(() => {
     const checkAiService = async () => {
       try {
-        const response = await fetch('http://localhost:11434/api/tags', {
-          method: 'GET',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-        });
-        if (response.ok) {
+        // The backend proxies the local model server; ask it whether the model is up
+        const response = await fetch('http://localhost:8000/api/ai/status/');
+        if (response.ok && (await response.json()).available) {
           setAiServiceStatus('available');
         } else {
           setAiServiceStatus('unavailable');
@@ -129,23 +120,27 @@ export default function AIChatPopup({ isOpen, onClose, businessData }: AIChatPop
 
   // Fetch document content when business data is available
   useEffect(() => {
-    const fetchDocuments = async () => {
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+
+    const fetchDocuments = async (attempt = 0) => {
       if (!businessData?.id) return;
       
       setIsLoadingDocuments(true);
       try {
-        const response = await fetch(`http://localhost:8000/api/businesses/${businessData.id}/documents/extract/`);
+        // Only the names here; the backend adds the passages relevant to each question to the prompt
+        const response = await fetch(`http://localhost:8000/api/businesses/${businessData.id}/documents/context/`);
         if (response.ok) {
           const data = await response.json();
-          setDocumentContent(data.documents || {});
-          setDocumentSummary(data.summary || 'No documents available.');
+          setDocumentNames(data.documents || []);
+          // Newly uploaded PDFs are still being extracted by the job worker
+          if (data.pending?.length && attempt < 5) {
+            retryTimer = setTimeout(() => fetchDocuments(attempt + 1), 3000);
+          }
         } else {
           console.error('Failed to fetch documents');
-          setDocumentSummary('Unable to load documents.');
         }
       } catch (error) {
         console.error('Error fetching documents:', error);
-        setDocumentSummary('Error loading documents.');
       } finally {
         setIsLoadingDocuments(false);
       }
@@ -154,6 +149,7 @@ export default function AIChatPopup({ isOpen, onClose, businessData }: AIChatPop
     if (isOpen && businessData) {
       fetchDocuments();
     }
+    return () => clearTimeout(retryTimer);
   }, [isOpen, businessData]);
 
   useEffect(() => {
@@ -213,99 +209,52 @@ What would you like to know about this investment opportunity?`,
     setIsLoading(true);
 
     try {
-      // Prepare comprehensive business context for the AI
-      const progressPercentage = Math.round((businessData!.current_funding / businessData!.funding_goal) * 100);
-      const daysLeft = Math.ceil((new Date(businessData!.deadline).getTime() - new Date().getTime()) / (1000 * 60 * 60 * 24));
-      
-      // Prepare document content for AI
-      let documentContext = '';
-      if (Object.keys(documentContent).length > 0) {
-        documentContext = "\n\nBUSINESS DOCUMENTS:\n" + documentSummary + "\n\n"
-        for (const [docName, content] of Object.entries(documentContent)) {
-          documentContext += `=== ${docName} ===\n${content}\n\n`
-        }
-      } else {
-        documentContext = "\n\nBUSINESS DOCUMENTS:\nNo documents available for this business.\n\n"
-      }
-      
-      const businessContext = `
-You are an investment assistant for "${businessData!.title}". Act as a professional, friendly business representative helping potential investors make informed decisions. Stay focused on investment-related topics and business analysis.
-
-BUSINESS DETAILS:
-- Business Name: ${businessData!.title}
-- Category: ${businessData!.category}
-- Description: ${businessData!.description}
-- Entrepreneur: ${businessData!.entrepreneur_name || businessData!.entrepreneur_full_name || 'Not specified'}
-- Founded: ${businessData!.founding_year}
-- Location: ${businessData!.location}
-- Team Size: ${businessData!.team_size} members
-
-INVESTMENT DETAILS:
-- Funding Goal: $${businessData!.funding_goal.toLocaleString()}
-- Current Funding: $${businessData!.current_funding.toLocaleString()} (${progressPercentage}%)
-- Backers: ${businessData!.backers}
-- Minimum Investment: $${businessData!.min_investment.toLocaleString()}
-- Days Left: ${daysLeft > 0 ? daysLeft : 0}
-
-BUSINESS ANALYSIS:
-- Business Plan: ${businessData!.business_plan || 'Not provided'}
-- Financial Projections: ${businessData!.financial_projections || 'Not provided'}
-- Market Analysis: ${businessData!.market_analysis || 'Not provided'}
-- Competitive Advantage: ${businessData!.competitive_advantage || 'Not provided'}
-- Use of Funds: ${businessData!.use_of_funds || 'Not provided'}
-- Industry Experience: ${businessData!.industry_experience || 'Not provided'}
-- Key Achievements: ${businessData!.key_achievements || 'Not provided'}
-- Target Market Size: ${businessData!.target_market_size || 'Not provided'}
-- Revenue Model: ${businessData!.revenue_model || 'Not provided'}
-- Growth Metrics: ${businessData!.growth_metrics || 'Not provided'}
-
-${documentContext}
-
-INSTRUCTIONS:
-1. Act as a professional investment assistant representing this business
-2. Help investors understand the business model, risks, and opportunities
-3. Provide investment advice based on the business data and documents
-4. If the user asks about unrelated topics, politely redirect them back to investment discussion
-5. Be friendly but professional and knowledgeable
-6. Use emojis sparingly to maintain professionalism
-7. Focus on helping them make an informed investment decision
-8. Provide specific, actionable insights based on the business data and documents
-9. When discussing risks, also mention mitigation strategies
-10. Always consider the investor's perspective and provide balanced analysis
-11. If the user asks about specific documents, reference the content from the documents provided
-12. If no documents are available, mention this limitation but still provide analysis based on other business data
-
-User Question: ${inputMessage}
-
-Please respond as the business investment assistant, helping the user understand this investment opportunity and make a decision. Provide specific insights based on the business data and documents provided.
-      `;
-
-      const response = await fetch('http://localhost:11434/api/generate', {
+      // The backend builds the prompt from the business, its funding and the document
+      // passages relevant to the question, and streams the answer back as it is generated
+      const response = await fetch(`http://localhost:8000/api/businesses/${businessData!.id}/chat/`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({
-          model: 'llama3.2:1b',
-          prompt: businessContext,
-          stream: false
-        }),
+        body: JSON.stringify({ question: userMessage.content }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to get AI response');
       }
 
-      const data = await response.json();
-      
-      const aiMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        content: data.response || 'I apologize, but I couldn\'t generate a response at the moment. Please try again.',
-        sender: 'ai',
-        timestamp: new Date()
+      const aiMessageId = (Date.now() + 1).toString();
+      setMessages(prev => [...prev, { id: aiMessageId, content: '', sender: 'ai', timestamp: new Date() }]);
+      const appendToAnswer = (text: string) => {
+        setMessages(prev => prev.map(message => message.id === aiMessageId ? { ...message, content: message.content + text } : message));
       };
 
-      setMessages(prev => [...prev, aiMessage]);
+      // Server-sent events: {"token": ...} while generating, then {"done": true} or {"error": ...}
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let answered = false;
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop() || '';
+        for (const event of events) {
+          if (!event.startsWith('data: ')) continue;
+          const data = JSON.parse(event.slice(6));
+          if (data.token) {
+            answered = true;
+            appendToAnswer(data.token);
+          } else if (data.error) {
+            console.error('AI model error:', data.error);
+          }
+        }
+      }
+
+      if (!answered) {
+        appendToAnswer('I apologize, but I couldn\'t generate a response at the moment. Please try again.');
+      }
     } catch (error) {
       console.error('Error sending message:', error);
       const errorMessage: Message = {
@@ -354,11 +303,11 @@ Please respond as the business investment assistant, helping the user understand
                      aiServiceStatus === 'unavailable' ? 'AI Offline' : 'Checking...'}
                   </span>
                 </div>
-                {Object.keys(documentContent).length > 0 && (
+                {documentNames.length > 0 && (
                   <div className="flex items-center space-x-1">
                     <FileText className="h-3 w-3 text-green-400" />
                     <span className="text-xs text-green-400">
-                      {Object.keys(documentContent).length} doc{Object.keys(documentContent).length !== 1 ? 's' : ''}
+                      {documentNames.length} doc{documentNames.length !== 1 ? 's' : ''}
                     </span>
                   </div>
                 )}
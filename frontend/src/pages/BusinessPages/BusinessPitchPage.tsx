@@ -3,6 +3,8 @@
 import { useState } from "react"
 import type { ChangeEvent, DragEvent } from "react"
 import { useNavigate } from "react-router-dom"
+import { uploadInChunks } from "../../utils/chunkedUpload"
+import type { UploadKind } from "../../utils/chunkedUpload"
 
 
 // Define TypeScript interfaces for our data structures
@@ -80,6 +82,9 @@ const BusinessPitchPage = () => {
     documents: [],
   })
 
+  // Share of the media uploaded while the pitch is being submitted, null otherwise
+  const [uploadProgress, setUploadProgress] = useState<number | null>(null)
+
   const [dragActive, setDragActive] = useState<DragActiveState>({
     images: false,
     videos: false,
@@ -183,19 +188,6 @@ const BusinessPitchPage = () => {
     data.append("competitive_advantage", formData.competitiveAdvantage)
     data.append("use_of_funds", formData.useOfFunds)
 
-    // Append uploaded files
-    uploadedFiles.images.forEach((item, index) => {
-      data.append(`images`, item.file)
-    })
-
-    uploadedFiles.videos.forEach((item, index) => {
-      data.append(`videos`, item.file)
-    })
-
-    uploadedFiles.documents.forEach((item, index) => {
-      data.append(`documents`, item.file)
-    })
-
     try {
       const token = localStorage.getItem('authToken');
       const headers: HeadersInit = {};
@@ -208,6 +200,23 @@ const BusinessPitchPage = () => {
         return;
       }
 
+      // Upload the media in resumable chunks first, then send the pitch with their ids
+      const media: { item: UploadedFile; kind: UploadKind }[] = [
+        ...uploadedFiles.images.map((item) => ({ item, kind: "image" as const })),
+        ...uploadedFiles.videos.map((item) => ({ item, kind: "video" as const })),
+        ...uploadedFiles.documents.map((item) => ({ item, kind: "document" as const })),
+      ]
+      const totalBytes = media.reduce((sum, { item }) => sum + item.size, 0)
+      let doneBytes = 0
+      setUploadProgress(0)
+      for (const { item, kind } of media) {
+        const uploadId = await uploadInChunks(item.file, kind, token, (uploaded) => {
+          setUploadProgress(totalBytes ? (doneBytes + uploaded) / totalBytes : 1)
+        })
+        doneBytes += item.size
+        data.append("uploads", uploadId)
+      }
+
       const response = await fetch("http://localhost:8000/api/businesses/pitch/", {
         method: "POST",
         headers,
@@ -246,7 +255,9 @@ const BusinessPitchPage = () => {
 
     } catch (error) {
       console.error("Network or unexpected error:", error)
-      alert("An error occurred while submitting your pitch. Please try again.")
+      alert(`An error occurred while submitting your pitch${error instanceof Error ? `: ${error.message}` : ""}. Please try again.`)
+    } finally {
+      setUploadProgress(null)
     }
   }
 
@@ -473,8 +484,8 @@ const BusinessPitchPage = () => {
               </div>
             </div>
             <div className="text-center pt-8">
-              <button type="submit" className="px-8 py-4 bg-white text-black text-lg font-semibold rounded-md hover:bg-gray-200 transition-colors">
-                Submit Business Pitch
+              <button type="submit" disabled={uploadProgress !== null} className="px-8 py-4 bg-white text-black text-lg font-semibold rounded-md hover:bg-gray-200 transition-colors disabled:opacity-60">
+                {uploadProgress === null ? "Submit Business Pitch" : `Uploading media... ${Math.round(uploadProgress * 100)}%`}
               </button>
               <p className="text-gray-400 text-sm mt-4">
                 By submitting, you agree to our terms and conditions. We'll review your pitch within 48 hours.
@@ -18,6 +18,7 @@ interface Investment {
   backers: number;
   min_investment: number;
   image?: string;
+  image_srcset?: string | null; // resized copies with width hints, once the server has made them
   user: number | string;
   user_investment_amount: number;
   user_investment_percentage: number;
@@ -345,7 +346,7 @@ export default function CataloguePage() {
                 <div key={investment.id} className="border border-gray-700 bg-gray-900 hover:shadow-lg hover:shadow-gray-800/50 transition-shadow duration-300 rounded-lg">
                   <div className="p-0">
                     <div className="relative">
-                      <img src={investment.image || "/placeholder.svg"} alt={investment.title} className="w-full h-56 object-cover rounded-t-lg" />
+                      <img src={investment.image || "/placeholder.svg"} srcSet={investment.image_srcset || undefined} sizes="(min-width: 1024px) 25vw, (min-width: 768px) 50vw, 100vw" loading="lazy" alt={investment.title} className="w-full h-56 object-cover rounded-t-lg" />
                       <span className="absolute top-3 left-3 bg-white text-black border border-gray-300 px-2 py-1 text-xs font-medium rounded-full">{investment.category}</span>
                       <button
                         className="absolute top-3 right-3 z-10"
@@ -1,8 +1,9 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useNavigate, useLocation, useSearchParams } from "react-router-dom";
 import Header from "../components/Header2";
 import { MessageCircle, Search, UserPlus, Send, Check, X, Users, Plus, UserMinus, Trash2 } from "lucide-react";
 import Notification from '../components/Notification';
+import { connectMessagingSocket, RealtimeEvent } from '../utils/realtime';
 
 interface User {
   id: number;
@@ -76,6 +77,10 @@ export default function MessagingPage() {
   const [showDeleteChatModal, setShowDeleteChatModal] = useState(false);
   const [deleteChatTarget, setDeleteChatTarget] = useState<Conversation | null>(null);
   const [urlParamProcessed, setUrlParamProcessed] = useState(false);
+  const [socketConnected, setSocketConnected] = useState(false);
+  const [hasOlderMessages, setHasOlderMessages] = useState(false);
+  // Latest event handler, so the long-lived socket sees the current conversation
+  const handleRealtimeEvent = useRef<(event: RealtimeEvent) => void>(() => {});
 
   console.log('MessagingPage render - searchParams:', searchParams.toString(), 'location:', location.pathname + location.search);
 
@@ -85,8 +90,25 @@ export default function MessagingPage() {
     fetchFriendRequests();
   }, []);
 
-  // Check for new friend requests periodically
+  // Messages, read receipts and friend requests are pushed over the socket
   useEffect(() => {
+    return connectMessagingSocket((event) => handleRealtimeEvent.current(event), setSocketConnected);
+  }, []);
+
+  // Events pushed while the socket was down are lost, so catch up whenever it (re)connects:
+  // the newest messages of the open chat by the after_id cursor, and the inbox
+  useEffect(() => {
+    if (!socketConnected) return;
+    fetchConversations();
+    if (selectedConversation) {
+      fetchNewMessages(selectedConversation.id);
+    }
+  }, [socketConnected]);
+
+  // Fall back to checking for new friend requests periodically while the socket is down
+  useEffect(() => {
+    if (socketConnected) return;
+
     const checkNewRequests = () => {
       fetchFriendRequests();
     };
@@ -94,7 +116,7 @@ export default function MessagingPage() {
     const interval = setInterval(checkNewRequests, 10000); // Check every 10 seconds
     
     return () => clearInterval(interval);
-  }, []);
+  }, [socketConnected]);
 
   // Fetch all users when search tab is active
   useEffect(() => {
@@ -382,23 +404,90 @@ export default function MessagingPage() {
     }
   };
 
+  const MESSAGE_PAGE_SIZE = 50;
+
+  // Latest page of a conversation; older pages load on demand
   const fetchMessages = async (conversationId: number) => {
     try {
       const token = localStorage.getItem('authToken');
-      const response = await fetch(`http://localhost:8000/api/messaging/conversations/${conversationId}/messages/`, {
+      const response = await fetch(`http://localhost:8000/api/messaging/conversations/${conversationId}/messages/?limit=${MESSAGE_PAGE_SIZE}`, {
         headers: {
           'Authorization': `Bearer ${token}`,
         },
       });
       if (response.ok) {
         const data = await response.json();
-        setMessages(data);
+        setMessages(data.results);
+        setHasOlderMessages(data.has_older);
       }
     } catch (error) {
       console.error('Error fetching messages:', error);
     }
   };
 
+  // Only the messages after the newest one already shown
+  const fetchNewMessages = async (conversationId: number) => {
+    const newestId = messages.length ? messages[messages.length - 1].id : null;
+    if (newestId === null) {
+      fetchMessages(conversationId);
+      return;
+    }
+    try {
+      const token = localStorage.getItem('authToken');
+      const response = await fetch(`http://localhost:8000/api/messaging/conversations/${conversationId}/messages/?after_id=${newestId}&limit=200`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setMessages(prev => {
+          const known = new Set(prev.map(m => m.id));
+          return [...prev, ...data.results.filter((m: Message) => !known.has(m.id))];
+        });
+      }
+    } catch (error) {
+      console.error('Error fetching new messages:', error);
+    }
+  };
+
+  const fetchOlderMessages = async () => {
+    if (!selectedConversation || !messages.length) return;
+    try {
+      const token = localStorage.getItem('authToken');
+      const response = await fetch(`http://localhost:8000/api/messaging/conversations/${selectedConversation.id}/messages/?before_id=${messages[0].id}&limit=${MESSAGE_PAGE_SIZE}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setMessages(prev => [...data.results, ...prev]);
+        setHasOlderMessages(data.has_older);
+      }
+    } catch (error) {
+      console.error('Error fetching older messages:', error);
+    }
+  };
+
+  handleRealtimeEvent.current = (event: RealtimeEvent) => {
+    if (event.type === 'message.created') {
+      if (selectedConversation?.id === event.conversation_id) {
+        setMessages(prev => prev.some(m => m.id === event.message.id) ? prev : [...prev, event.message]);
+      }
+      fetchConversations();
+    } else if (event.type === 'messages.read') {
+      if (selectedConversation?.id === event.conversation_id) {
+        setMessages(prev => prev.map(m => m.sender.id === event.reader_id ? m : { ...m, is_read: true }));
+      }
+    } else if (event.type === 'friend_request') {
+      fetchFriendRequests();
+      if (event.friend_request.status === 'accepted') {
+        fetchFriends();
+      }
+    }
+  };
+
   const sendMessage = async () => {
     if (!newMessage.trim() || !selectedConversation) return;
 
@@ -414,7 +503,7 @@ export default function MessagingPage() {
       });
       if (response.ok) {
         setNewMessage('');
-        fetchMessages(selectedConversation.id);
+        fetchNewMessages(selectedConversation.id);
       }
     } catch (error) {
       console.error('Error sending message:', error);
@@ -634,6 +723,16 @@ export default function MessagingPage() {
             {/* Messages */}
             <div className="flex-1 p-6 overflow-y-auto bg-gray-50">
               <div className="space-y-4">
+                 {hasOlderMessages && (
+                  <div className="text-center">
+                    <button
+                      onClick={fetchOlderMessages}
+                      className="text-sm text-gray-500 hover:text-black"
+                    >
+                      Load earlier messages
+                    </button>
+                  </div>
+                )}
                  {messages.map((message) => (
                   <div
                     key={message.id}
@@ -115,7 +115,8 @@ export default function ProfilePage() {
               first_name: backendData.first_name || userData.first_name,
               last_name: backendData.last_name || userData.last_name,
               phone_number: backendData.phone_number || userData.phone_number,
-              prof_pic: backendData.prof_pic || null,
+              // The 128px copy fits the avatar; the original until it has been made
+              prof_pic: backendData.prof_pic_thumbnail || backendData.prof_pic || null,
             };
             
             // Update localStorage with backend data
@@ -0,0 +1,86 @@
+export type UploadKind = 'image' | 'video' | 'document';
+
+interface UploadSession {
+  id: string;
+  received: number;
+  size: number;
+  chunk_size: number;
+  status: string;
+}
+
+const UPLOADS_URL = 'http://localhost:8000/api/uploads/';
+const MAX_RETRIES = 5;
+const RETRY_DELAY = 1000;
+
+const wait = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Uploads a file in chunks the backend streams to disk, so a large video never
+// rides in one request and a dropped connection only costs the chunk in flight:
+// failed chunks are retried from wherever the server says the upload stands.
+// onProgress gets the bytes uploaded so far. Resolves to the upload's id, which
+// is sent with the pitch to attach the file.
+export async function uploadInChunks(
+  file: File,
+  kind: UploadKind,
+  token: string,
+  onProgress?: (uploaded: number) => void,
+): Promise<string> {
+  const headers = { Authorization: `Bearer ${token}` };
+
+  const started = await fetch(UPLOADS_URL, {
+    method: 'POST',
+    headers: { ...headers, 'Content-Type': 'application/json' },
+    body: JSON.stringify({ kind, filename: file.name, size: file.size, content_type: file.type }),
+  });
+  if (!started.ok) {
+    const error = await started.json().catch(() => ({}));
+    throw new Error(error.error || `Could not start uploading ${file.name}`);
+  }
+  const session: UploadSession = await started.json();
+
+  let offset = 0;
+  let retries = 0;
+  while (offset < file.size) {
+    const end = Math.min(offset + session.chunk_size, file.size);
+    let response: Response | null = null;
+    try {
+      response = await fetch(`${UPLOADS_URL}${session.id}/`, {
+        method: 'PUT',
+        headers: {
+          ...headers,
+          'Content-Type': 'application/octet-stream',
+          'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`,
+        },
+        body: file.slice(offset, end),
+      });
+    } catch (error) {
+      console.error(`Chunk of ${file.name} failed:`, error);
+    }
+    if (response && (response.ok || response.status === 409)) {
+      // 409: the server has a different offset (e.g. an earlier attempt did land); continue from it
+      offset = (await response.json()).received;
+      retries = 0;
+      onProgress?.(offset);
+      continue;
+    }
+    // 400 (a chunk cut short), server errors and network failures are retried
+    if (response && response.status !== 400 && response.status < 500) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.error || `Uploading ${file.name} failed`);
+    }
+    if (++retries > MAX_RETRIES) {
+      throw new Error(`Uploading ${file.name} failed after ${MAX_RETRIES} retries`);
+    }
+    await wait(RETRY_DELAY * retries);
+    // Ask where the upload stands before resending
+    const status = await fetch(`${UPLOADS_URL}${session.id}/`, { headers }).then((r) => r.json()).catch(() => null);
+    if (status) offset = status.received;
+  }
+
+  const completed = await fetch(`${UPLOADS_URL}${session.id}/complete/`, { method: 'POST', headers });
+  if (!completed.ok) {
+    const error = await completed.json().catch(() => ({}));
+    throw new Error(error.error || `Could not finish uploading ${file.name}`);
+  }
+  return session.id;
+}
@@ -0,0 +1,54 @@
+export interface RealtimeEvent {
+  type: string;
+  [key: string]: any;
+}
+
+const SOCKET_URL = 'ws://localhost:8000/ws/messaging/';
+const RECONNECT_DELAY = 3000;
+
+// Opens the messaging WebSocket for the signed-in user and keeps it open,
+// reconnecting after drops. onStatus reports whether the socket is live so the
+// caller can fall back to polling meanwhile, and catch up through the REST
+// endpoints each time it turns true: events sent while the socket was down are
+// not replayed. Returns a function that closes it.
+export function connectMessagingSocket(
+  onEvent: (event: RealtimeEvent) => void,
+  onStatus: (connected: boolean) => void,
+): () => void {
+  let socket: WebSocket | null = null;
+  let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+  let closed = false;
+
+  const connect = () => {
+    const token = localStorage.getItem('authToken');
+    if (!token || closed) return;
+
+    socket = new WebSocket(`${SOCKET_URL}?token=${encodeURIComponent(token)}`);
+    socket.onopen = () => onStatus(true);
+    socket.onmessage = (message) => {
+      try {
+        const event = JSON.parse(message.data);
+        if (event.type !== 'connected' && event.type !== 'pong') {
+          onEvent(event);
+        }
+      } catch (error) {
+        console.error('Error reading realtime event:', error);
+      }
+    };
+    socket.onclose = (event) => {
+      onStatus(false);
+      // 4401: the token was rejected, retrying with it won't help
+      if (!closed && event.code !== 4401) {
+        reconnectTimer = setTimeout(connect, RECONNECT_DELAY);
+      }
+    };
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    if (reconnectTimer) clearTimeout(reconnectTimer);
+    socket?.close();
+  };
+}